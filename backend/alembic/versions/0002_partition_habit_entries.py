@@ -0,0 +1,172 @@
+"""partition habit_entries by date
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19 10:00:00.000000
+
+Only acts on PostgreSQL when HABIT_ENTRIES_PARTITIONING is set; elsewhere
+the revision is a no-op so that every database shares the same history.
+
+The table is moved online:
+
+1. create habit_entries_partitioned (PARTITION BY RANGE (date)) with
+   partitions covering the existing data plus upcoming periods and a
+   default partition,
+2. install a trigger mirroring writes on habit_entries into it,
+3. copy existing rows in id-ordered batches, each in its own transaction,
+4. swap the table names under a short ACCESS EXCLUSIVE lock.
+
+The old table is kept as habit_entries_unpartitioned for verification and
+can be dropped manually afterwards.
+"""
+
+from datetime import date
+
+from alembic import op
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.partitioning import create_partition, periods_between, upcoming_periods
+
+
+# revision identifiers, used by Alembic.
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 50_000
+NEW_TABLE = "habit_entries_partitioned"
+OLD_TABLE = "habit_entries_unpartitioned"
+COLUMNS = "id, date, completed, value, notes, created_at, updated_at, habit_id, user_id"
+
+MIRROR_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION habit_entries_mirror() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        DELETE FROM {NEW_TABLE} WHERE id = OLD.id AND date = OLD.date;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO {NEW_TABLE} ({COLUMNS})
+        VALUES (NEW.id, NEW.date, NEW.completed, NEW.value, NEW.notes,
+                NEW.created_at, NEW.updated_at, NEW.habit_id, NEW.user_id)
+        ON CONFLICT (id, date) DO UPDATE SET
+            completed = EXCLUDED.completed, value = EXCLUDED.value,
+            notes = EXCLUDED.notes, updated_at = EXCLUDED.updated_at;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def _enabled() -> bool:
+    return (
+        op.get_bind().dialect.name == "postgresql"
+        and settings.HABIT_ENTRIES_PARTITIONING is not None
+    )
+
+
+def upgrade() -> None:
+    if not _enabled():
+        return
+
+    granularity = settings.HABIT_ENTRIES_PARTITIONING
+    bind = op.get_bind()
+
+    op.execute(
+        f"CREATE TABLE {NEW_TABLE} ("
+        "id INTEGER NOT NULL DEFAULT nextval('habit_entries_id_seq'), "
+        "date DATE NOT NULL, "
+        "completed BOOLEAN, "
+        "value DOUBLE PRECISION, "
+        "notes TEXT, "
+        "created_at TIMESTAMP WITH TIME ZONE DEFAULT now(), "
+        "updated_at TIMESTAMP WITH TIME ZONE, "
+        "habit_id INTEGER NOT NULL REFERENCES habits (id), "
+        "user_id INTEGER NOT NULL REFERENCES users (id), "
+        "PRIMARY KEY (id, date)"
+        ") PARTITION BY RANGE (date)"
+    )
+    op.execute(f"CREATE INDEX ix_{NEW_TABLE}_habit_date ON {NEW_TABLE} (habit_id, date)")
+    op.execute(f"CREATE INDEX ix_{NEW_TABLE}_user_date ON {NEW_TABLE} (user_id, date)")
+
+    # Partitions for existing data and the upcoming periods, plus a default
+    # partition for anything outside them
+    first = bind.execute(text("SELECT MIN(date) FROM habit_entries")).scalar() or date.today()
+    periods = periods_between(granularity, first, date.today())
+    periods += [
+        period
+        for period in upcoming_periods(granularity, date.today(), settings.PARTITIONS_AHEAD)
+        if period not in periods
+    ]
+    for start, end in periods:
+        create_partition(bind, granularity, start, end, table=NEW_TABLE)
+    op.execute(f"CREATE TABLE {NEW_TABLE}_default PARTITION OF {NEW_TABLE} DEFAULT")
+
+    # Mirror concurrent writes while the backfill runs
+    op.execute(MIRROR_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER habit_entries_mirror AFTER INSERT OR UPDATE OR DELETE "
+        "ON habit_entries FOR EACH ROW EXECUTE FUNCTION habit_entries_mirror()"
+    )
+
+    # Backfill in batches, committing after each one so locks stay short
+    with op.get_context().autocommit_block():
+        last_id = 0
+        while True:
+            upper = bind.execute(
+                text(
+                    "SELECT MAX(id) FROM (SELECT id FROM habit_entries WHERE id > :last "
+                    "ORDER BY id LIMIT :batch) batch"
+                ),
+                {"last": last_id, "batch": BATCH_SIZE},
+            ).scalar()
+            if upper is None:
+                break
+            bind.execute(
+                text(
+                    f"INSERT INTO {NEW_TABLE} ({COLUMNS}) "
+                    f"SELECT {COLUMNS} FROM habit_entries WHERE id > :last AND id <= :upper "
+                    "ON CONFLICT (id, date) DO NOTHING"
+                ),
+                {"last": last_id, "upper": upper},
+            )
+            last_id = upper
+
+    # Swap under a short exclusive lock
+    op.execute("LOCK TABLE habit_entries IN ACCESS EXCLUSIVE MODE")
+    op.execute("DROP TRIGGER habit_entries_mirror ON habit_entries")
+    op.execute("DROP FUNCTION habit_entries_mirror()")
+    op.execute(f"ALTER TABLE habit_entries RENAME TO {OLD_TABLE}")
+    op.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO habit_entries")
+    op.execute("ALTER SEQUENCE habit_entries_id_seq OWNED BY habit_entries.id")
+    for suffix in ("habit_date", "user_date"):
+        op.execute(f"ALTER INDEX ix_{NEW_TABLE}_{suffix} RENAME TO ix_habit_entries_{suffix}")
+    # Keep partition names aligned with the table name
+    for name in bind.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent WHERE p.relname = 'habit_entries'"
+        )
+    ).scalars().all():
+        op.execute(f"ALTER TABLE {name} RENAME TO {name.replace(NEW_TABLE, 'habit_entries', 1)}")
+
+
+def downgrade() -> None:
+    if not _enabled():
+        return
+
+    op.execute(
+        f"CREATE TABLE {OLD_TABLE}_restore (LIKE habit_entries INCLUDING DEFAULTS)"
+    )
+    op.execute(f"INSERT INTO {OLD_TABLE}_restore SELECT * FROM habit_entries")
+    op.execute("ALTER SEQUENCE habit_entries_id_seq OWNED BY NONE")
+    op.execute("DROP TABLE habit_entries CASCADE")
+    op.execute(f"DROP TABLE IF EXISTS {OLD_TABLE}")
+    op.execute(f"ALTER TABLE {OLD_TABLE}_restore RENAME TO habit_entries")
+    op.execute("ALTER TABLE habit_entries ADD PRIMARY KEY (id)")
+    op.execute("ALTER TABLE habit_entries ADD FOREIGN KEY (habit_id) REFERENCES habits (id)")
+    op.execute("ALTER TABLE habit_entries ADD FOREIGN KEY (user_id) REFERENCES users (id)")
+    op.execute("ALTER SEQUENCE habit_entries_id_seq OWNED BY habit_entries.id")
+    op.execute("CREATE INDEX ix_habit_entries_id ON habit_entries (id)")
@@ -0,0 +1,43 @@
+"""habit entry archives
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19 11:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "habit_entry_archives",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("year", sa.Integer(), nullable=False),
+        sa.Column("entry_count", sa.Integer(), nullable=False),
+        sa.Column("present", sa.LargeBinary(), nullable=False),
+        sa.Column("completed", sa.LargeBinary(), nullable=False),
+        sa.Column("values", sa.LargeBinary(), nullable=True),
+        sa.Column("notes", sa.LargeBinary(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("habit_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["habit_id"], ["habits.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("habit_id", "year", name="uq_habit_entry_archives_habit_year"),
+    )
+    op.create_index(op.f("ix_habit_entry_archives_id"), "habit_entry_archives", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_habit_entry_archives_id"), table_name="habit_entry_archives")
+    op.drop_table("habit_entry_archives")
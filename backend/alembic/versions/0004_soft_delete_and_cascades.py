@@ -0,0 +1,64 @@
+"""soft delete and cascading foreign keys
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19 14:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+# Names SQLite's unnamed foreign keys are given when reflected in batch mode
+NAMING_CONVENTION = {"fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s"}
+
+FOREIGN_KEYS = [
+    ("habits", "owner_id", "users"),
+    ("habit_entries", "habit_id", "habits"),
+    ("habit_entries", "user_id", "users"),
+    ("habit_entry_archives", "habit_id", "habits"),
+    ("habit_entry_archives", "user_id", "users"),
+]
+
+
+def _foreign_key_name(table: str, column: str, referred: str) -> str:
+    for fk in sa.inspect(op.get_bind()).get_foreign_keys(table):
+        if fk["constrained_columns"] == [column] and fk["name"]:
+            return fk["name"]
+    return NAMING_CONVENTION["fk"] % {
+        "table_name": table, "column_0_name": column, "referred_table_name": referred,
+    }
+
+
+def _replace_foreign_keys(ondelete) -> None:
+    for table, column, referred in FOREIGN_KEYS:
+        name = _foreign_key_name(table, column, referred)
+        with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+            batch_op.drop_constraint(name, type_="foreignkey")
+            batch_op.create_foreign_key(name, referred, [column], ["id"], ondelete=ondelete)
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("habits") as batch_op:
+        batch_op.add_column(sa.Column("deleted_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index(batch_op.f("ix_habits_deleted_at"), ["deleted_at"], unique=False)
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(sa.Column("deactivated_at", sa.DateTime(timezone=True), nullable=True))
+        batch_op.create_index(batch_op.f("ix_users_deactivated_at"), ["deactivated_at"], unique=False)
+    _replace_foreign_keys("CASCADE")
+
+
+def downgrade() -> None:
+    _replace_foreign_keys(None)
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_index(batch_op.f("ix_users_deactivated_at"))
+        batch_op.drop_column("deactivated_at")
+    with op.batch_alter_table("habits") as batch_op:
+        batch_op.drop_index(batch_op.f("ix_habits_deleted_at"))
+        batch_op.drop_column("deleted_at")
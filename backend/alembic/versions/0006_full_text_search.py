@@ -0,0 +1,49 @@
+"""full-text search indexes
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 17:00:00.000000
+
+PostgreSQL: GIN indexes on the to_tsvector expressions of habit names,
+descriptions and entry notes. SQLite: contentless FTS5 tables kept in sync
+by triggers, populated from the existing rows.
+"""
+
+from alembic import op
+from sqlalchemy import text
+
+from app.core.search import ENTRIES_FTS, HABITS_FTS, install_search_index, rebuild_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+SQLITE_TRIGGERS = [
+    "habits_search_insert",
+    "habits_search_delete",
+    "habits_search_update",
+    "habit_entries_search_insert",
+    "habit_entries_search_delete",
+    "habit_entries_search_update",
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    install_search_index(bind)
+    rebuild_search_index(bind)
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name == "postgresql":
+        op.execute(text("DROP INDEX IF EXISTS ix_habit_entries_search"))
+        op.execute(text("DROP INDEX IF EXISTS ix_habits_search"))
+    elif bind.dialect.name == "sqlite":
+        for trigger in SQLITE_TRIGGERS:
+            op.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        op.execute(text(f"DROP TABLE IF EXISTS {ENTRIES_FTS}"))
+        op.execute(text(f"DROP TABLE IF EXISTS {HABITS_FTS}"))
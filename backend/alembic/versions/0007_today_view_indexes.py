@@ -0,0 +1,57 @@
+"""indexes for habit lists and the today view
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 18:00:00.000000
+
+Adds a partial index on (owner_id, is_active) of habits that are not
+deleted, and (habit_id, date) and (user_id, date) indexes on habit entries.
+A habit_entries table partitioned by migration 0002 already has the latter
+two, so existing indexes are left alone.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+ENTRY_INDEXES = [
+    ("ix_habit_entries_habit_date", ["habit_id", "date"]),
+    ("ix_habit_entries_user_date", ["user_id", "date"]),
+]
+
+
+def _partitioned() -> bool:
+    return (
+        op.get_bind().dialect.name == "postgresql"
+        and settings.HABIT_ENTRIES_PARTITIONING is not None
+    )
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_habits_owner_active",
+        "habits",
+        ["owner_id", "is_active"],
+        unique=False,
+        postgresql_where=sa.text("deleted_at IS NULL"),
+        sqlite_where=sa.text("deleted_at IS NULL"),
+    )
+    existing = {index["name"] for index in sa.inspect(op.get_bind()).get_indexes("habit_entries")}
+    for name, columns in ENTRY_INDEXES:
+        if name not in existing:
+            op.create_index(name, "habit_entries", columns, unique=False)
+
+
+def downgrade() -> None:
+    if not _partitioned():
+        for name, _ in reversed(ENTRY_INDEXES):
+            op.drop_index(name, table_name="habit_entries")
+    op.drop_index("ix_habits_owner_active", table_name="habits")
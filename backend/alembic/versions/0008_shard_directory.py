@@ -0,0 +1,44 @@
+"""shard directory
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19 20:00:00.000000
+
+Adds the shard directory (user_shards) and the id blocks of sharded tables
+(shard_id_blocks). Both are only used when SHARD_URIS is set; existing users
+are added to the directory, on shard 0, at startup.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "user_shards",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(length=255), nullable=False),
+        sa.Column("shard", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("moving", sa.Boolean(), server_default="0", nullable=False),
+        sa.PrimaryKeyConstraint("user_id"),
+    )
+    op.create_index(op.f("ix_user_shards_email"), "user_shards", ["email"], unique=True)
+    op.create_table(
+        "shard_id_blocks",
+        sa.Column("name", sa.String(length=64), nullable=False),
+        sa.Column("next_value", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("shard_id_blocks")
+    op.drop_index(op.f("ix_user_shards_email"), table_name="user_shards")
+    op.drop_table("user_shards")
@@ -0,0 +1,46 @@
+"""habit value sketches
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19 22:00:00.000000
+
+Adds per habit-month quantile sketches of entry values (habit_value_sketches).
+The application builds them from the existing entries and archives at
+startup (`ValueSketchService.backfill`), through its own sessions, so that on
+sharded deployments their ids are reserved from the shard directory like
+those of every other sharded table.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "habit_value_sketches",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("month", sa.Date(), nullable=False),
+        sa.Column("value_count", sa.Integer(), nullable=False),
+        sa.Column("sketch", sa.LargeBinary(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("habit_id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["habit_id"], ["habits.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("habit_id", "month", name="uq_habit_value_sketches_habit_month"),
+    )
+    op.create_index(op.f("ix_habit_value_sketches_id"), "habit_value_sketches", ["id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_habit_value_sketches_id"), table_name="habit_value_sketches")
+    op.drop_table("habit_value_sketches")
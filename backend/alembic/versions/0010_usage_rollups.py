@@ -0,0 +1,37 @@
+"""usage rollups
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19 23:00:00.000000
+
+Adds platform-wide usage per day (usage_rollups), merged from every
+worker's counts. Usage is recorded from this revision on; there is no
+backfill.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "usage_rollups",
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("active_users", sa.LargeBinary(), nullable=False),
+        sa.Column("check_ins", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("habits_created", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("users_registered", sa.Integer(), server_default="0", nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint("day"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("usage_rollups")
@@ -0,0 +1,167 @@
+"""
+Admin endpoints for superusers: request profiles, the slow-query log, shard
+placement and platform-wide usage.
+"""
+
+from datetime import date, timedelta
+from typing import Any, List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.core.database import get_db
+
+from app.core.profiling import profile_store
+from app.core.slow_queries import slow_query_log
+from app.models.habit import HabitFrequency
+from app.models.user import User
+from app.schemas.profile import Profile, ProfileSummary
+from app.schemas.shard import ShardMoveJob, ShardSummary
+from app.schemas.slow_query import SlowQuery
+from app.schemas.usage import UsageReport
+from app.services.shard_service import ShardService, move_jobs
+from app.services.usage_service import UsageService
+from app.api.deps import get_current_active_superuser
+
+router = APIRouter()
+
+
+@router.get("/profiles", response_model=List[ProfileSummary])
+def list_profiles(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """List the most recent request profiles of this worker, newest first."""
+    return [profile.summary() for profile in profile_store.list()]
+
+
+@router.get("/profiles/{profile_id}", response_model=Profile)
+def read_profile(
+    profile_id: str,
+    format: str = Query("json", pattern="^(json|folded)$"),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Get a request profile as JSON or as folded stacks for flame graphs."""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if format == "folded":
+        return PlainTextResponse(profile.folded())
+    
+    return profile.as_dict()
+
+
+@router.get("/slow-queries", response_model=List[SlowQuery])
+def list_slow_queries(
+    order_by: str = Query("total", pattern="^(total|max|mean|count)$"),
+    limit: int = Query(20, ge=1, le=200),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """List this worker's slow queries by fingerprint, slowest first."""
+    return [query.as_dict() for query in slow_query_log.report(order_by, limit)]
+
+
+@router.get("/slow-queries/{fingerprint}", response_model=SlowQuery)
+def read_slow_query(
+    fingerprint: str,
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Get one slow query with its callers and execution plan."""
+    query = slow_query_log.get(fingerprint)
+    if query is None:
+        raise HTTPException(status_code=404, detail="Slow query not found")
+    return query.as_dict()
+
+
+@router.delete("/slow-queries")
+def clear_slow_queries(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Reset this worker's slow-query report."""
+    slow_query_log.clear()
+    return {"message": "Slow-query report cleared"}
+
+
+def _shard_service(db: Session) -> ShardService:
+    try:
+        return ShardService(db)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="The database is not sharded")
+
+
+@router.get("/shards", response_model=ShardSummary)
+def read_shards(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Get the number of users on each shard."""
+    return _shard_service(db).summary()
+
+
+@router.post("/shards/users/{user_id}/move", response_model=ShardMoveJob, status_code=202)
+def move_user(
+    user_id: int,
+    shard: int = Query(..., ge=0),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Start moving a user and all their data to another shard, online."""
+    service = _shard_service(db)
+    try:
+        return service.start_moves(service.plan_move(user_id, shard)).as_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/shards/rebalance", response_model=ShardMoveJob, status_code=202)
+def rebalance_shards(
+    limit: int = Query(100, ge=1, le=10_000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Start moving up to `limit` users to the shards the hash ring assigns them."""
+    service = _shard_service(db)
+    try:
+        return service.start_moves(service.plan_rebalance(limit)).as_dict()
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/shards/moves", response_model=List[ShardMoveJob])
+def list_shard_moves(
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """List this worker's shard move jobs, newest first."""
+    return [job.as_dict() for job in move_jobs.list()]
+
+
+@router.get("/shards/moves/{job_id}", response_model=ShardMoveJob)
+def read_shard_move(
+    job_id: str,
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Get the progress of a shard move job started on this worker."""
+    job = move_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Shard move job not found")
+    return job.as_dict()
+
+
+@router.get("/usage", response_model=UsageReport)
+def read_usage(
+    start_date: Optional[date] = Query(None, description="First day (default: 29 days before end_date)"),
+    end_date: Optional[date] = Query(None, description="Last day (default: today)"),
+    period: HabitFrequency = Query(HabitFrequency.DAILY, description="Bucket size"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+) -> Any:
+    """Get active users, check-ins, new habits and registrations across the platform."""
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=29)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    if (end_date - start_date).days >= 3660:
+        raise HTTPException(status_code=400, detail="The window is limited to ten years")
+    
+    return UsageService(db).report(start_date, end_date, period)
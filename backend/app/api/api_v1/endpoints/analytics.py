@@ -2,55 +2,89 @@
 Analytics endpoints for dashboard statistics and habit analytics.
 """
 
-from typing import Any, List, Dict
+from typing import Any, List, Dict, Optional
 from datetime import date, datetime, timedelta
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import and_, case, func, select
 
-from app.core.database import get_db
+from app.core.cache import TaggedCache, habit_tag, habit_year_tag, invalidation_bus, user_tag
+from app.core.config import settings
+from app.core.formats import JSON, columnar_response, columns, negotiate
+from app.core.routing import read_from_primary
+from app.core.singleflight import SingleFlight
+from app.core.write_behind import write_behind
 from app.models.user import User
 from app.models.habit import Habit
 from app.models.habit_entry import HabitEntry
-from app.schemas.habit import HabitAnalytics, DashboardStats
-from app.api.deps import get_current_active_user
+from app.schemas.habit import HabitAnalytics, HabitInsights, HabitValueStatistics, DashboardStats
+from app.services.habit_service import HabitEntryService, HabitService
+from app.services.insights_service import InsightsService
+from app.services.period_service import PeriodService
+from app.services.value_sketch_service import ValueSketchService
+from app.api.deps import get_current_active_user, get_read_db
 
 router = APIRouter()
 
+# Identical concurrent requests (several tabs, client retries) share one
+# computation
+habit_analytics_flight = invalidation_bus.register(SingleFlight("habit_analytics"))
+insights_flight = invalidation_bus.register(SingleFlight("insights"))
+calendar_flight = invalidation_bus.register(SingleFlight("calendar"))
+
+# Registered after its flight: an invalidation detaches the flight before it
+# moves the cache generation, so a caller whose snapshot is already current
+# can no longer join the detached flight and store its older result
+calendar_cache = invalidation_bus.register(TaggedCache("calendar"))
+
 
 @router.get("/dashboard", response_model=DashboardStats)
 def get_dashboard_stats(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """Get dashboard statistics for current user."""
     today = date.today()
     
-    # Total habits
-    total_habits = db.query(Habit).filter(Habit.owner_id == current_user.id).count()
-    
-    # Active habits
-    active_habits = db.query(Habit).filter(
-        and_(Habit.owner_id == current_user.id, Habit.is_active == True)
-    ).count()
-    
-    # Today's entries
-    today_entries = db.query(HabitEntry).filter(
-        and_(HabitEntry.user_id == current_user.id, HabitEntry.date == today)
-    ).all()
-    
-    today_completed = sum(1 for entry in today_entries if entry.completed)
-    today_total = len(today_entries)
+    # Today's entries, folded into the habit aggregate as scalar subqueries
+    today_filter = and_(HabitEntry.user_id == current_user.id, HabitEntry.date == today)
+    live_habit_ids = select(Habit.id).where(
+        and_(Habit.owner_id == current_user.id, Habit.deleted_at.is_(None))
+    )
+    today_filter = and_(today_filter, HabitEntry.habit_id.in_(live_habit_ids))
+    today_total_query = (
+        select(func.count(HabitEntry.id)).where(today_filter).scalar_subquery()
+    )
+    today_completed_query = (
+        select(func.count(HabitEntry.id))
+        .where(and_(today_filter, HabitEntry.completed == True))
+        .scalar_subquery()
+    )
     
-    # Current streak (longest current streak among all habits)
-    habits = db.query(Habit).filter(Habit.owner_id == current_user.id).all()
-    current_streak = max((habit.current_streak for habit in habits), default=0)
+    # Habit totals, active habits, longest current streak and total
+    # completions in a single statement
+    (
+        total_habits,
+        active_habits,
+        current_streak,
+        total_completions,
+        today_total,
+        today_completed,
+    ) = db.query(
+        func.count(Habit.id),
+        func.coalesce(func.sum(case((Habit.is_active == True, 1), else_=0)), 0),
+        func.coalesce(func.max(Habit.current_streak), 0),
+        func.coalesce(func.sum(Habit.total_completions), 0),
+        today_total_query,
+        today_completed_query,
+    ).filter(and_(Habit.owner_id == current_user.id, Habit.deleted_at.is_(None))).one()
     
-    # Total completions
-    total_completions = db.query(func.sum(Habit.total_completions)).filter(
-        Habit.owner_id == current_user.id
-    ).scalar() or 0
+    # Check-ins still in the write-behind buffer count as soon as they are made
+    if write_behind.pending(current_user.id, today):
+        entries = HabitEntryService(db).get_by_user_and_date(current_user.id, today)
+        today_total = len(entries)
+        today_completed = sum(1 for entry in entries if entry.completed)
     
     return DashboardStats(
         total_habits=total_habits,
@@ -64,53 +98,105 @@ def get_dashboard_stats(
 
 @router.get("/habits", response_model=List[HabitAnalytics])
 def get_habit_analytics(
-    db: Session = Depends(get_db),
-    days: int = Query(30, description="Number of days to analyze"),
+    db: Session = Depends(get_read_db),
+    days: int = Query(30, ge=1, description="Number of days to analyze"),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """Get analytics for all user habits."""
-    start_date = date.today() - timedelta(days=days)
+    today = date.today()
+    return habit_analytics_flight.do(
+        (current_user.id, days, today),
+        lambda: _habit_analytics(db, current_user.id, days, today),
+        tags=[user_tag(current_user.id)],
+    )
+
+
+def _habit_analytics(db: Session, user_id: int, days: int, today: date) -> List[HabitAnalytics]:
+    """Analytics of every habit of a user over the last `days` days."""
+    start_date = today - timedelta(days=days)
     
-    habits = db.query(Habit).filter(Habit.owner_id == current_user.id).all()
+    # Per-period aggregates of every habit, bucketed by its frequency in one
+    # statement regardless of the number of habits
+    summaries = PeriodService(db).summarize(user_id, start_date, today)
+    # A streak running back to the start of the window may be longer than it:
+    # count those over the streak lookback as well, also as of today
+    reaching_start = [
+        summary.habit
+        for summary in summaries
+        if summary.current_streak and summary.current_streak >= summary.total_periods - 1
+    ]
+    lookback_streaks = HabitService(db).current_streaks(reaching_start, today)
     analytics = []
     
-    for habit in habits:
-        # Get entries for the specified period
-        entries = db.query(HabitEntry).filter(
-            and_(
-                HabitEntry.habit_id == habit.id,
-                HabitEntry.date >= start_date
-            )
-        ).all()
+    for summary in summaries:
+        habit = summary.habit
         
-        total_days = days
-        completed_days = sum(1 for entry in entries if entry.completed)
-        completion_rate = (completed_days / total_days) * 100 if total_days > 0 else 0
-        
-        # Calculate average value for count/duration habits
+        # Average value for count/duration habits
         average_value = None
         if habit.habit_type in ["count", "duration"]:
-            values = [entry.value for entry in entries if entry.value is not None]
-            average_value = sum(values) / len(values) if values else 0
+            average_value = summary.average_value or 0
         
         analytics.append(HabitAnalytics(
             habit_id=habit.id,
             habit_name=habit.name,
-            total_days=total_days,
-            completed_days=completed_days,
-            completion_rate=completion_rate,
-            current_streak=habit.current_streak,
-            longest_streak=habit.longest_streak,
+            frequency=summary.frequency,
+            total_days=days,
+            completed_days=summary.completed_entries,
+            total_periods=summary.total_periods,
+            completed_periods=summary.completed_periods,
+            completion_rate=summary.completion_rate,
+            current_streak=max(summary.current_streak, lookback_streaks.get(habit.id, 0)),
+            longest_streak=max(habit.longest_streak or 0, summary.longest_streak),
             average_value=average_value,
         ))
     
     return analytics
 
 
+@router.get("/insights", response_model=HabitInsights)
+def get_habit_insights(
+    db: Session = Depends(get_read_db),
+    limit: int = Query(10, ge=1, le=100, description="Pairs to return per insight"),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """Get habits completed together and habits that predict each other."""
+    return insights_flight.do(
+        (current_user.id, limit, date.today()),
+        lambda: InsightsService(db).insights(current_user.id, limit=limit),
+        tags=[user_tag(current_user.id)],
+    )
+
+
+def _calendar_data(db: Session, habit_id: int, year: int, tags: List[str]) -> Dict[str, Dict]:
+    """Calendar heatmap cells of a habit for one year."""
+    # Get all entries for the year, archived ones included
+    start_date = date(year, 1, 1)
+    end_date = date(year, 12, 31)
+    
+    # Cached until the next invalidation: right after one, a replica may still
+    # lag behind the write that caused it (the session itself only knows
+    # about the user's own writes, not e.g. a write-behind flush)
+    if calendar_cache.invalidated_within(tags, settings.READ_YOUR_WRITES_SECONDS):
+        read_from_primary(db)
+    entries = HabitEntryService(db).get_range(habit_id, start_date, end_date)
+    
+    calendar_data = {}
+    for entry in entries:
+        date_str = entry.date.isoformat()
+        calendar_data[date_str] = {
+            "completed": entry.completed,
+            "value": entry.value,
+            "notes": entry.notes,
+        }
+    return calendar_data
+
+
 @router.get("/habits/{habit_id}/calendar")
 def get_habit_calendar_data(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    request: Request,
+    response: Response,
     habit_id: int,
     year: int = Query(None, description="Year for calendar data"),
     current_user: User = Depends(get_current_active_user),
@@ -118,7 +204,11 @@ def get_habit_calendar_data(
     """Get calendar heatmap data for a specific habit."""
     # Verify habit ownership
     habit = db.query(Habit).filter(
-        and_(Habit.id == habit_id, Habit.owner_id == current_user.id)
+        and_(
+            Habit.id == habit_id,
+            Habit.owner_id == current_user.id,
+            Habit.deleted_at.is_(None),
+        )
     ).first()
     
     if not habit:
@@ -128,27 +218,33 @@ def get_habit_calendar_data(
     if year is None:
         year = date.today().year
     
-    # Get all entries for the year
-    start_date = date(year, 1, 1)
-    end_date = date(year, 12, 31)
+    # Cached until the habit or its entries for that year change; concurrent
+    # misses build it once. A flight that a write invalidated still answers
+    # the callers that joined it, but get_or_set does not store its result
+    tags = [habit_tag(habit_id), habit_year_tag(habit_id, year)]
+    calendar_data = calendar_cache.get_or_set(
+        (habit_id, year),
+        lambda: calendar_flight.do(
+            (habit_id, year), lambda: _calendar_data(db, habit_id, year, tags), tags=tags
+        ),
+        tags=tags,
+    )
     
-    entries = db.query(HabitEntry).filter(
-        and_(
-            HabitEntry.habit_id == habit_id,
-            HabitEntry.date >= start_date,
-            HabitEntry.date <= end_date
-        )
-    ).all()
-    
-    # Create calendar data
-    calendar_data = {}
-    for entry in entries:
-        date_str = entry.date.isoformat()
-        calendar_data[date_str] = {
-            "completed": entry.completed,
-            "value": entry.value,
-            "notes": entry.notes,
-        }
+    media_type = negotiate(request, response)
+    if media_type != JSON:
+        days = sorted(calendar_data)
+        return columnar_response({
+            "habit_id": habit_id,
+            "habit_name": habit.name,
+            "year": year,
+            "dates": days,
+            **columns(
+                (calendar_data[day] for day in days),
+                completed="completed",
+                values="value",
+                notes="notes",
+            ),
+        }, media_type)
     
     return {
         "habit_id": habit_id,
@@ -161,7 +257,9 @@ def get_habit_calendar_data(
 @router.get("/habits/{habit_id}/progress")
 def get_habit_progress(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    request: Request,
+    response: Response,
     habit_id: int,
     days: int = Query(30, description="Number of days for progress data"),
     current_user: User = Depends(get_current_active_user),
@@ -169,21 +267,34 @@ def get_habit_progress(
     """Get progress data for a specific habit."""
     # Verify habit ownership
     habit = db.query(Habit).filter(
-        and_(Habit.id == habit_id, Habit.owner_id == current_user.id)
+        and_(
+            Habit.id == habit_id,
+            Habit.owner_id == current_user.id,
+            Habit.deleted_at.is_(None),
+        )
     ).first()
     
     if not habit:
         raise HTTPException(status_code=404, detail="Habit not found")
     
-    # Get entries for the specified period
-    start_date = date.today() - timedelta(days=days)
+    # Get entries for the specified period (bounded on both sides so
+    # partitions outside the range are pruned)
+    today = date.today()
+    start_date = today - timedelta(days=days)
     
-    entries = db.query(HabitEntry).filter(
-        and_(
-            HabitEntry.habit_id == habit_id,
-            HabitEntry.date >= start_date
-        )
-    ).order_by(HabitEntry.date).all()
+    entries = HabitEntryService(db).get_range(habit_id, start_date, today)
+    
+    media_type = negotiate(request, response)
+    if media_type != JSON:
+        # Columnar shape: the target is sent once instead of on every row
+        return columnar_response({
+            "habit_id": habit_id,
+            "habit_name": habit.name,
+            "habit_type": habit.habit_type,
+            "target_value": habit.target_value,
+            "unit": habit.unit,
+            **columns(entries, dates="date", completed="completed", values="value"),
+        }, media_type)
     
     # Create progress data
     progress_data = []
@@ -204,3 +315,41 @@ def get_habit_progress(
         "progress": progress_data,
     }
 
+
+@router.get("/habits/{habit_id}/values", response_model=HabitValueStatistics)
+def get_habit_value_statistics(
+    *,
+    db: Session = Depends(get_read_db),
+    habit_id: int,
+    start_date: Optional[date] = Query(None, description="First day (default: a year before end_date)"),
+    end_date: Optional[date] = Query(None, description="Last day (default: today)"),
+    bins: int = Query(10, ge=1, le=100, description="Histogram bins"),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """Get quantiles and a histogram of a habit's values over a window."""
+    habit = db.query(Habit).filter(
+        and_(
+            Habit.id == habit_id,
+            Habit.owner_id == current_user.id,
+            Habit.deleted_at.is_(None),
+        )
+    ).first()
+    
+    if not habit:
+        raise HTTPException(status_code=404, detail="Habit not found")
+    
+    end_date = end_date or date.today()
+    start_date = start_date or end_date - timedelta(days=364)
+    if start_date > end_date:
+        raise HTTPException(status_code=400, detail="start_date must not be after end_date")
+    
+    # Merged from per-month sketches instead of scanning the entries
+    statistics = ValueSketchService(db).statistics(habit_id, start_date, end_date, bins=bins)
+    return HabitValueStatistics(
+        habit_id=habit_id,
+        habit_name=habit.name,
+        unit=habit.unit,
+        start_date=start_date,
+        end_date=end_date,
+        **statistics,
+    )
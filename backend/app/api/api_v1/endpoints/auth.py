@@ -2,8 +2,8 @@
 Authentication endpoints for login, registration, and token management.
 """
 
-from datetime import timedelta
-from typing import Any
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
@@ -12,10 +12,12 @@ from sqlalchemy.orm import Session
 from app.core import security
 from app.core.config import settings
 from app.core.database import get_db
+from app.core.revocation import revocation_list
+from app.core.routing import USER_ID
 from app.models.user import User
 from app.schemas.user import Token, UserCreate, User as UserSchema, UserLogin
 from app.services.user_service import UserService
-from app.api.deps import get_current_user
+from app.api.deps import get_current_user, get_token_payload
 
 router = APIRouter()
 
@@ -70,10 +72,10 @@ def login_for_access_token(
     
     return {
         "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
+            user.id, expires_delta=access_token_expires, version=user.token_version
         ),
         "refresh_token": security.create_refresh_token(
-            user.id, expires_delta=refresh_token_expires
+            user.id, expires_delta=refresh_token_expires, version=user.token_version
         ),
         "token_type": "bearer",
     }
@@ -107,10 +109,10 @@ def login_with_email(
     
     return {
         "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
+            user.id, expires_delta=access_token_expires, version=user.token_version
         ),
         "refresh_token": security.create_refresh_token(
-            user.id, expires_delta=refresh_token_expires
+            user.id, expires_delta=refresh_token_expires, version=user.token_version
         ),
         "token_type": "bearer",
     }
@@ -123,35 +125,82 @@ def refresh_token(
     refresh_token: str,
 ) -> Any:
     """Refresh access token using refresh token."""
-    user_id = security.verify_token(refresh_token, token_type="refresh")
-    if not user_id:
+    payload = security.decode_token(refresh_token, token_type="refresh")
+    if payload:
+        db.info[USER_ID] = int(payload["sub"])
+    jti = payload.get("jti") if payload else None
+    if not payload or (jti and revocation_list.is_revoked(db, jti)):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token",
         )
     
     user_service = UserService(db)
-    user = user_service.get(id=int(user_id))
+    user = user_service.get(id=int(payload["sub"]))
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
+    if not user.is_active or payload.get("ver", 0) != user.token_version:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid refresh token",
+        )
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     refresh_token_expires = timedelta(minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES)
     
     return {
         "access_token": security.create_access_token(
-            user.id, expires_delta=access_token_expires
+            user.id, expires_delta=access_token_expires, version=user.token_version
         ),
         "refresh_token": security.create_refresh_token(
-            user.id, expires_delta=refresh_token_expires
+            user.id, expires_delta=refresh_token_expires, version=user.token_version
         ),
         "token_type": "bearer",
     }
 
 
+@router.post("/logout")
+def logout(
+    *,
+    db: Session = Depends(get_db),
+    payload: Dict[str, Any] = Depends(get_token_payload),
+    current_user: User = Depends(get_current_user),
+    refresh_token: Optional[str] = None,
+) -> Any:
+    """Revoke the access token of this request and, if given, its refresh token."""
+    revoked = [payload]
+    if refresh_token:
+        refresh_payload = security.decode_token(refresh_token, token_type="refresh")
+        if refresh_payload and refresh_payload["sub"] == payload["sub"]:
+            revoked.append(refresh_payload)
+    
+    for claims in revoked:
+        # A refresh token can be passed again after an earlier logout
+        if claims.get("jti"):
+            revocation_list.revoke(
+                db,
+                claims["jti"],
+                current_user.id,
+                datetime.fromtimestamp(claims["exp"], tz=timezone.utc),
+            )
+    db.commit()
+    return {"message": "Logged out successfully"}
+
+
+@router.post("/revoke-all")
+def revoke_all_tokens(
+    *,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Any:
+    """Revoke every access and refresh token of the current user."""
+    UserService(db).revoke_all_tokens(current_user)
+    return {"message": "All sessions revoked successfully"}
+
+
 @router.post("/test-token", response_model=UserSchema)
 def test_token(current_user: User = Depends(get_current_user)) -> Any:
     """Test access token."""
@@ -2,13 +2,28 @@
 Habit endpoints for habit and habit entry management.
 """
 
-from typing import Any, List
+from typing import Any, List, Optional, Union
 from datetime import date
 
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import (
+    APIRouter,
+    BackgroundTasks,
+    Depends,
+    HTTPException,
+    status,
+    Query,
+    Request,
+    Response,
+)
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.orm import Session
 
 from app.core.database import get_db
+from app.core.events import event_hub
+from app.core.config import settings
+from app.core.formats import JSON, columnar_response, columns, negotiate
+from app.core.write_behind import write_behind
 from app.models.user import User
 from app.models.habit import Habit
 from app.schemas.habit import (
@@ -18,17 +33,31 @@ from app.schemas.habit import (
     HabitEntry as HabitEntrySchema,
     HabitEntryCreate,
     HabitEntryUpdate,
+    PendingHabitEntry,
+    SearchResult,
+    TodayView,
 )
-from app.services.habit_service import HabitService, HabitEntryService
-from app.api.deps import get_current_active_user
+from app.services.habit_service import HabitService, HabitEntryService, local_today
+from app.services.purge_service import PurgeService
+from app.services.search_service import SearchService
+from app.api.deps import get_current_active_user, get_read_db
 
 router = APIRouter()
 
 
+def purge_habit(bind, habit_id: int) -> None:
+    """Purge a soft-deleted habit outside the request."""
+    db = Session(bind=bind)
+    try:
+        PurgeService(db).purge_habit(habit_id)
+    finally:
+        db.close()
+
+
 # Habit endpoints
 @router.get("/", response_model=List[HabitSchema])
 def read_habits(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     skip: int = 0,
     limit: int = 100,
     active_only: bool = Query(False, description="Filter only active habits"),
@@ -47,6 +76,52 @@ def read_habits(
     return habits
 
 
+@router.get("/today", response_model=TodayView)
+def read_today(
+    db: Session = Depends(get_read_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """Active habits with their entries for today in the user's time zone."""
+    today = local_today(current_user.timezone)
+    rows = HabitService(db).get_today(user_id=current_user.id, day=today)
+    return {
+        "date": today,
+        "habits": [
+            {"habit": habit, "entry": entry} for habit, entry in rows
+        ],
+    }
+
+
+@router.get("/events")
+async def stream_habit_events(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """Stream live changes to the current user's habits as Server-Sent Events."""
+    user_id = current_user.id
+    # The stream stays open indefinitely; do not hold a database connection
+    db.close()
+    
+    subscription = event_hub.subscribe(user_id)
+    return StreamingResponse(
+        event_hub.stream(subscription),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/search", response_model=List[SearchResult])
+def search_habits(
+    db: Session = Depends(get_read_db),
+    q: str = Query(..., min_length=1, max_length=200, description="Words to search for"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    current_user: User = Depends(get_current_active_user),
+) -> Any:
+    """Search habit names, descriptions and entry notes of the current user."""
+    return SearchService(db).search(current_user.id, q, skip=skip, limit=limit)
+
+
 @router.post("/", response_model=HabitSchema)
 def create_habit(
     *,
@@ -107,6 +182,7 @@ def delete_habit(
     *,
     db: Session = Depends(get_db),
     habit_id: int,
+    background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """Delete habit."""
@@ -119,7 +195,9 @@ def delete_habit(
     if habit.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    # Hide the habit now; its entries are removed after the response
     habit = habit_service.delete(id=habit_id)
+    background_tasks.add_task(purge_habit, db.get_bind(), habit_id)
     return {"message": "Habit deleted successfully"}
 
 
@@ -127,10 +205,14 @@ def delete_habit(
 @router.get("/{habit_id}/entries", response_model=List[HabitEntrySchema])
 def read_habit_entries(
     *,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
+    request: Request,
+    response: Response,
     habit_id: int,
     skip: int = 0,
     limit: int = 100,
+    start_date: Optional[date] = Query(None, description="Earliest entry date"),
+    end_date: Optional[date] = Query(None, description="Latest entry date"),
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """Get habit entries for a specific habit."""
@@ -145,13 +227,35 @@ def read_habit_entries(
     
     entry_service = HabitEntryService(db)
     entries = entry_service.get_by_habit(
-        habit_id=habit_id, skip=skip, limit=limit
+        habit_id=habit_id,
+        skip=skip,
+        limit=limit,
+        start_date=start_date,
+        end_date=end_date,
     )
     
+    media_type = negotiate(request, response)
+    if media_type != JSON:
+        return columnar_response({
+            "habit_id": habit_id,
+            **columns(
+                entries,
+                ids="id",
+                dates="date",
+                completed="completed",
+                values="value",
+                notes="notes",
+            ),
+        }, media_type)
+    
     return entries
 
 
-@router.post("/entries", response_model=HabitEntrySchema)
+@router.post(
+    "/entries",
+    response_model=HabitEntrySchema,
+    responses={202: {"model": PendingHabitEntry, "description": "Check-in queued"}},
+)
 def create_habit_entry(
     *,
     db: Session = Depends(get_db),
@@ -168,6 +272,21 @@ def create_habit_entry(
     if habit.owner_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    if settings.WRITE_BEHIND_ENABLED:
+        # Stored by the background flusher; streaks are updated there too
+        pending = write_behind.enqueue(
+            current_user.id,
+            entry_in.habit_id,
+            entry_in.date,
+            entry_in.completed,
+            value=entry_in.value,
+            notes=entry_in.notes,
+        )
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(pending),
+        )
+    
     entry_service = HabitEntryService(db)
     entry = entry_service.create(obj_in=entry_in, user_id=current_user.id)
     
@@ -197,7 +316,11 @@ def read_habit_entry(
     return entry
 
 
-@router.put("/entries/{entry_id}", response_model=HabitEntrySchema)
+@router.put(
+    "/entries/{entry_id}",
+    response_model=HabitEntrySchema,
+    responses={202: {"model": PendingHabitEntry, "description": "Update queued"}},
+)
 def update_habit_entry(
     *,
     db: Session = Depends(get_db),
@@ -215,6 +338,17 @@ def update_habit_entry(
     if entry.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
+    queued = entry_service.get_pending(entry)
+    if queued is not None:
+        if queued.deleted:
+            raise HTTPException(status_code=404, detail="Habit entry not found")
+        # Flushing the queued check-in would overwrite a direct update
+        pending = entry_service.queue_update(db_obj=entry, queued=queued, obj_in=entry_in)
+        return JSONResponse(
+            status_code=status.HTTP_202_ACCEPTED,
+            content=jsonable_encoder(pending),
+        )
+    
     entry = entry_service.update(db_obj=entry, obj_in=entry_in)
     
     # Update habit streak
@@ -244,6 +378,9 @@ def delete_habit_entry(
         raise HTTPException(status_code=403, detail="Not enough permissions")
     
     habit_id = entry.habit_id
+    if entry_service.get_pending(entry) is not None:
+        # Keep the flusher from recreating the entry from the queued check-in
+        write_behind.enqueue(current_user.id, habit_id, entry.date, False, deleted=True)
     entry = entry_service.delete(id=entry_id)
     
     # Update habit streak
@@ -255,7 +392,10 @@ def delete_habit_entry(
     return {"message": "Habit entry deleted successfully"}
 
 
-@router.get("/entries/date/{entry_date}", response_model=List[HabitEntrySchema])
+@router.get(
+    "/entries/date/{entry_date}",
+    response_model=List[Union[PendingHabitEntry, HabitEntrySchema]],
+)
 def read_entries_by_date(
     *,
     db: Session = Depends(get_db),
@@ -2,6 +2,7 @@
 User endpoints for user management.
 """
 
+from datetime import datetime, timezone
 from typing import Any, List
 
 from fastapi import APIRouter, Depends, HTTPException, status
@@ -84,11 +85,11 @@ def delete_user_me(
     current_user: User = Depends(get_current_active_user),
 ) -> Any:
     """Delete current user."""
-    # Deactivate user instead of deleting to preserve data integrity
+    # Deactivate now; the account is purged after PURGE_USER_GRACE_DAYS
     user_service = UserService(db)
     user_service.update(
         db_obj=current_user,
-        obj_in={"is_active": False}
+        obj_in={"is_active": False, "deactivated_at": datetime.now(timezone.utc)}
     )
     return {"message": "User account deactivated successfully"}
 
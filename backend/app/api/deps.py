@@ -2,36 +2,81 @@
 Dependencies for API endpoints.
 """
 
-from fastapi import Depends, HTTPException, status
+import secrets
+from typing import Any, Dict, Optional
+
+from fastapi import Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
 
 from app.core import security
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.profiling import start_requested_profile
+from app.core.revocation import revocation_list
+from app.core.routing import READ_ONLY, USER_ID
+from app.core.usage import usage_rollups
 from app.models.user import User
 from app.services.user_service import UserService
 
 
-def get_current_user(
+def get_read_db(db: Session = Depends(get_db)) -> Session:
+    """Database session for read-only endpoints, served by a replica when configured."""
+    db.info[READ_ONLY] = True
+    return db
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+
+def get_token_payload(
     db: Session = Depends(get_db),
     token: str = Depends(security.oauth2_scheme)
+) -> Dict[str, Any]:
+    """Get the claims of a valid, unrevoked access token."""
+    payload = security.decode_token(token)
+    if not payload:
+        raise _credentials_exception()
+    
+    # Binds the session to the user's shard and keeps their reads on the
+    # primary right after writes
+    db.info[USER_ID] = int(payload["sub"])
+    
+    # Never-revoked tokens are cleared by the Bloom filter without I/O
+    jti = payload.get("jti")
+    if jti and revocation_list.is_revoked(db, jti):
+        raise _credentials_exception()
+    
+    return payload
+
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    payload: Dict[str, Any] = Depends(get_token_payload),
 ) -> User:
     """Get current authenticated user."""
-    user_id = security.verify_token(token)
-    if not user_id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
+    user_id = int(payload["sub"])
     
     user_service = UserService(db)
-    user = user_service.get(id=int(user_id))
+    user = user_service.get(id=user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="User not found",
         )
     
+    # Tokens issued before the user revoked all sessions
+    if payload.get("ver", 0) != user.token_version:
+        raise _credentials_exception()
+    
+    # Profiles are only recorded for superusers who asked for one
+    start_requested_profile(user.id, user_service.is_superuser(user))
+    usage_rollups.active(user.id)
+    
     return user
 
 
@@ -46,3 +91,27 @@ def get_current_active_user(
         )
     return current_user
 
+
+def get_current_active_superuser(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db),
+) -> User:
+    """Get current active user, who must be a superuser."""
+    if not UserService(db).is_superuser(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The user doesn't have enough privileges",
+        )
+    return current_user
+
+
+def verify_metrics_token(authorization: Optional[str] = Header(None)) -> None:
+    """Allow metrics scrapes that present METRICS_TOKEN as a bearer token."""
+    token = settings.METRICS_TOKEN
+    if not token or not secrets.compare_digest(
+        (authorization or "").encode(), f"Bearer {token}".encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not enough permissions",
+        )
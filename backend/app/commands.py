@@ -0,0 +1,47 @@
+"""
+One-off maintenance commands, run against every shard.
+
+    python -m app.commands rebuild-value-sketches
+
+`rebuild-value-sketches` builds the value sketches of the entries stored
+before they existed. Run it once after every worker runs a version that
+maintains sketches on entry writes; until then, the statistics of older
+months are computed from whatever sketches exist.
+"""
+
+import argparse
+
+from app.core.database import each_shard
+from app.services.value_sketch_service import REBUILD_BATCH_SIZE, ValueSketchService
+
+
+def rebuild_value_sketches(batch_size: int) -> int:
+    """Rebuild the value sketches of every shard; returns the sketches written."""
+    return sum(ValueSketchService(db).rebuild(batch_size) for db in each_shard())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.commands",
+        description=__doc__,
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    rebuild = commands.add_parser(
+        "rebuild-value-sketches", help="build the value sketches of existing entries"
+    )
+    rebuild.add_argument(
+        "--batch-size",
+        type=int,
+        default=REBUILD_BATCH_SIZE,
+        help="habits rebuilt per transaction",
+    )
+    args = parser.parse_args()
+
+    if args.command == "rebuild-value-sketches":
+        written = rebuild_value_sketches(args.batch_size)
+        print(f"Wrote {written} value sketches")
+
+
+if __name__ == "__main__":
+    main()
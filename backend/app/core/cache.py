@@ -0,0 +1,332 @@
+"""
+In-process caches kept consistent across workers by an invalidation bus.
+
+Cached values carry tags naming the data they were built from (a user, a
+habit, one year of a habit's entries). Writers call `invalidate_on_commit`
+with the tags they touched; once the transaction commits, the tags are
+evicted locally and published to every other worker through a broker
+(Redis pub/sub in production, an in-memory broker in tests and
+single-process deployments), where matching local entries are evicted too.
+
+Every invalidation also bumps a generation counter of its tags, so a value
+computed while one of its tags was invalidated is not stored
+(`get_or_set`, or `set` with a `generation` snapshot): it may predate the
+write that caused the invalidation. The time of the last invalidation is
+kept too (`invalidated_within`), so that a fill right after a write can read
+from the primary while replicas may still lag behind it.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core import lazy
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "habitflow:cache-invalidation"
+_PENDING_TAGS = "cache_invalidation_tags"
+# Generation counters are kept per slot of hashed tags; tags sharing a slot
+# only cause extra skipped stores
+_GENERATION_SLOTS = 4096
+
+INVALIDATION_DELAY = registry.histogram(
+    "habitflow_cache_invalidation_delay_seconds",
+    "Time from publishing a cache invalidation to its eviction in another worker.",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+INVALIDATIONS = registry.counter(
+    "habitflow_cache_invalidations_total",
+    "Cache invalidation messages by direction.",
+    ["direction"],
+)
+EVICTIONS = registry.counter(
+    "habitflow_cache_evictions_total", "Cache entries evicted by invalidation.", ["cache"]
+)
+
+
+# Tags
+def user_tag(user_id: int) -> str:
+    return f"user:{user_id}"
+
+
+def habit_tag(habit_id: int) -> str:
+    return f"habit:{habit_id}"
+
+
+def habit_year_tag(habit_id: int, year: int) -> str:
+    return f"habit-year:{habit_id}:{year}"
+
+
+def user_history_tag(user_id: int) -> str:
+    """Tag for data derived from a user's entries before today."""
+    return f"user-history:{user_id}"
+
+
+class TaggedCache:
+    """Thread-safe LRU cache with per-entry TTL and tag-based eviction."""
+
+    def __init__(self, name: str, max_size: int = 10_000, ttl: Optional[float] = None):
+        self.name = name
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float, Tuple[str, ...]]]" = OrderedDict()
+        self._keys_by_tag: Dict[str, Set[Hashable]] = {}
+        self._generations = [0] * _GENERATION_SLOTS
+        self._invalidated_at = [float("-inf")] * _GENERATION_SLOTS
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def generation(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        """Snapshot of the invalidations of `tags`, taken before computing a value."""
+        with self._lock:
+            return self._generation(tags)
+
+    def _generation(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        return tuple(self._generations[hash(tag) % _GENERATION_SLOTS] for tag in tags)
+
+    def invalidated_within(self, tags: Iterable[str], seconds: float) -> bool:
+        """Whether one of `tags` was invalidated during the last `seconds`."""
+        since = time.monotonic() - seconds
+        with self._lock:
+            return any(
+                self._invalidated_at[hash(tag) % _GENERATION_SLOTS] > since for tag in tags
+            )
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return default
+            value, expires_at, _ = item
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        tags: Iterable[str] = (),
+        ttl: Optional[float] = None,
+        generation: Optional[Tuple[int, ...]] = None,
+    ) -> bool:
+        """Store `value`, unless its tags were invalidated since `generation`."""
+        ttl = ttl if ttl is not None else self.ttl
+        if ttl is None:
+            ttl = settings.CACHE_TTL_SECONDS
+        tags = tuple(tags)
+        with self._lock:
+            if generation is not None and self._generation(tags) != generation:
+                return False
+            self._remove(key)
+            self._entries[key] = (value, time.monotonic() + ttl, tags)
+            for tag in tags:
+                self._keys_by_tag.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+        return True
+
+    def get_or_set(
+        self, key: Hashable, factory: Callable[[], Any], tags: Iterable[str] = ()
+    ) -> Any:
+        """Return the cached value for `key`, computing and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            tags = tuple(tags)
+            generation = self.generation(tags)
+            value = factory()
+            self.set(key, value, tags, generation=generation)
+        return value
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Evict every entry carrying one of `tags`; returns the number evicted."""
+        evicted = 0
+        now = time.monotonic()
+        with self._lock:
+            for tag in tags:
+                self._generations[hash(tag) % _GENERATION_SLOTS] += 1
+                self._invalidated_at[hash(tag) % _GENERATION_SLOTS] = now
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+                    evicted += 1
+        if evicted:
+            EVICTIONS.inc(evicted, cache=self.name)
+        return evicted
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+            self._generations = [generation + 1 for generation in self._generations]
+            self._invalidated_at = [time.monotonic()] * _GENERATION_SLOTS
+
+    def _remove(self, key: Hashable) -> None:
+        item = self._entries.pop(key, None)
+        if item is None:
+            return
+        for tag in item[2]:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+# Brokers
+class LocalBroker:
+    """In-memory pub/sub delivering synchronously to subscribers of this process."""
+
+    def __init__(self):
+        self._subscribers: Dict[str, List[Callable[[str], None]]] = {}
+
+    def publish(self, channel: str, message: str) -> None:
+        for callback in list(self._subscribers.get(channel, ())):
+            callback(message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        self._subscribers.setdefault(channel, []).append(callback)
+
+    def close(self) -> None:
+        self._subscribers.clear()
+
+
+class RedisBroker:
+    """Redis pub/sub; each subscription is served by a daemon thread."""
+
+    def __init__(self, url: str):
+        self.client = lazy.redis.Redis.from_url(url)
+        self._threads = []
+
+    def publish(self, channel: str, message: str) -> None:
+        self.client.publish(channel, message)
+
+    def subscribe(self, channel: str, callback: Callable[[str], None]) -> None:
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+
+        def _handle(message):
+            data = message["data"]
+            callback(data.decode() if isinstance(data, bytes) else data)
+
+        pubsub.subscribe(**{channel: _handle})
+        self._threads.append(pubsub.run_in_thread(sleep_time=1.0, daemon=True))
+
+    def close(self) -> None:
+        for thread in self._threads:
+            thread.stop()
+        self._threads.clear()
+        self.client.close()
+
+
+def create_broker():
+    """Broker selected by CACHE_BROKER."""
+    if settings.CACHE_BROKER == "redis":
+        return RedisBroker(settings.REDIS_URL)
+    return LocalBroker()
+
+
+class InvalidationBus:
+    """Publishes tag invalidations and applies those of other workers."""
+
+    def __init__(self, broker=None, channel: str = INVALIDATION_CHANNEL):
+        self._broker = broker
+        self.channel = channel
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.caches: List[TaggedCache] = []
+        self.started = False
+
+    @property
+    def broker(self):
+        if self._broker is None:
+            self._broker = create_broker()
+        return self._broker
+
+    def register(self, cache: TaggedCache) -> TaggedCache:
+        """Have `cache` evicted by invalidations from any worker."""
+        self.caches.append(cache)
+        return cache
+
+    def start(self) -> None:
+        """Subscribe to invalidations from other workers."""
+        if not self.started:
+            self.broker.subscribe(self.channel, self._receive)
+            self.started = True
+
+    def stop(self) -> None:
+        if self._broker is not None:
+            self._broker.close()
+            self._broker = None
+        self.started = False
+
+    def evict(self, tags: Iterable[str]) -> int:
+        """Evict `tags` from the caches of this worker only."""
+        tags = list(tags)
+        return sum(cache.invalidate_tags(tags) for cache in self.caches)
+
+    def clear(self) -> None:
+        """Empty every registered cache of this worker."""
+        for cache in self.caches:
+            cache.clear()
+
+    def publish(self, tags: Iterable[str]) -> None:
+        """Evict `tags` here and in every other worker."""
+        tags = sorted(set(tags))
+        if not tags:
+            return
+        self.evict(tags)
+        message = json.dumps({"origin": self.origin, "sent_at": time.time(), "tags": tags})
+        try:
+            self.broker.publish(self.channel, message)
+        except Exception:
+            # Other workers fall back to TTL expiry
+            logger.exception("Could not publish cache invalidation")
+            return
+        INVALIDATIONS.inc(direction="published")
+
+    def _receive(self, message: str) -> None:
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            logger.warning("Ignoring malformed cache invalidation: %r", message)
+            return
+        if payload.get("origin") == self.origin:
+            return
+        self.evict(payload.get("tags", ()))
+        INVALIDATIONS.inc(direction="received")
+        INVALIDATION_DELAY.observe(max(0.0, time.time() - payload.get("sent_at", time.time())))
+
+
+invalidation_bus = InvalidationBus()
+
+
+def invalidate_on_commit(db: Session, *tags: str) -> None:
+    """Publish `tags` once the session's current transaction commits."""
+    db.info.setdefault(_PENDING_TAGS, set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    tags = session.info.pop(_PENDING_TAGS, None)
+    if tags:
+        invalidation_bus.publish(tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_TAGS, None)
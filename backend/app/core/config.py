@@ -49,14 +49,164 @@ class Settings(BaseSettings):
     POSTGRES_DB: str = "habitflow"
     POSTGRES_PORT: int = 5432
     
+    # Read replicas (comma-separated database URLs) for read-only endpoints;
+    # a user's reads stay on the primary for a short window after they write
+    # (on every worker with CACHE_BROKER=redis, otherwise on the writing one)
+    SQLALCHEMY_REPLICA_URIS: List[str] = []
+    READ_YOUR_WRITES_SECONDS: float = 5.0
+
+    # Sharding by user id: the primary is shard 0 and holds the shard
+    # directory; SHARD_URIS (comma-separated) add shards 1..N. Users are
+    # placed by consistent hashing and moved with /api/v1/admin/shards
+    SHARD_URIS: List[str] = []
+    SHARD_VIRTUAL_NODES: int = 64
+    SHARD_ID_BLOCK_SIZE: int = 100
+    SHARD_DIRECTORY_CACHE_TTL_SECONDS: float = 60.0
+    # Writes of a user being moved are refused (503) while the copy catches
+    # up; this is how long in-flight requests get to finish first. Moves run
+    # in the background, this many users flagged at a time
+    SHARD_MOVE_SETTLE_SECONDS: float = 2.0
+    SHARD_MOVE_BATCH_SIZE: int = 100
+
+    @field_validator("SQLALCHEMY_REPLICA_URIS", "SHARD_URIS", mode="before")
+    @classmethod
+    def assemble_replica_uris(cls, v: Union[str, List[str]]) -> List[str]:
+        if isinstance(v, str):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        elif isinstance(v, list):
+            return v
+        return []
+    
     @property
     def SQLALCHEMY_DATABASE_URI(self) -> str:
         if self.USE_SQLITE:
             return "sqlite:///./habitflow.db"
         return f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
-    
+
+    # Schema handling at startup: "create" runs create_all (development),
+    # "verify" only checks the Alembic revision stamped in the database.
+    SCHEMA_STARTUP_MODE: str = "create"
+
+    @field_validator("SCHEMA_STARTUP_MODE")
+    @classmethod
+    def validate_schema_startup_mode(cls, v: str) -> str:
+        if v not in ("create", "verify"):
+            raise ValueError("SCHEMA_STARTUP_MODE must be 'create' or 'verify'")
+        return v
+
+    # Graceful shutdown: on SIGTERM /ready answers 503 for the readiness
+    # delay before the server stops accepting connections; in-flight
+    # requests then get up to the drain timeout to finish
+    DRAIN_READINESS_DELAY_SECONDS: float = 5.0
+    DRAIN_TIMEOUT_SECONDS: float = 20.0
+
+    # Optional range partitioning of habit_entries on PostgreSQL ("year" or
+    # "month"); applied by the Alembic migration, maintained at runtime
+    HABIT_ENTRIES_PARTITIONING: Optional[str] = None
+    PARTITIONS_AHEAD: int = 2
+    PARTITION_MAINTENANCE_INTERVAL_SECONDS: int = 6 * 60 * 60
+
+    @field_validator("HABIT_ENTRIES_PARTITIONING")
+    @classmethod
+    def validate_partitioning(cls, v: Optional[str]) -> Optional[str]:
+        if v is not None and v not in ("year", "month"):
+            raise ValueError("HABIT_ENTRIES_PARTITIONING must be 'year' or 'month'")
+        return v
+
+    # Cold storage: entries older than the horizon are packed per habit-year
+    # into habit_entry_archives by a background job and read back transparently.
+    # ARCHIVE_ENABLED only schedules the job; archived rows are always read
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_HORIZON_DAYS: int = 730
+    ARCHIVE_INTERVAL_SECONDS: int = 24 * 60 * 60
+
+    # Deletion: habits are soft-deleted and purged in the background in
+    # chunks; deactivated accounts are purged after the grace period
+    PURGE_CHUNK_SIZE: int = 5000
+    PURGE_USER_GRACE_DAYS: int = 30
+    PURGE_INTERVAL_SECONDS: int = 10 * 60
+
+    # Live updates over Server-Sent Events: per-connection buffer (a client
+    # that falls further behind is told to resync), heartbeat and reconnect delay
+    EVENTS_QUEUE_SIZE: int = 64
+    EVENTS_HEARTBEAT_SECONDS: float = 15.0
+    EVENTS_RETRY_MILLISECONDS: int = 5000
+
+    # Observability: Prometheus-format /metrics and Server-Timing headers
+    # (the latter exposes DB timings to clients, so enable it in staging only).
+    # Scrapers send METRICS_TOKEN as a bearer token; without one, /metrics
+    # refuses every request
+    METRICS_ENABLED: bool = True
+    METRICS_TOKEN: Optional[str] = None
+    SERVER_TIMING_ENABLED: bool = False
+
+    # Per-request profiling for superusers (X-HabitFlow-Profile: 1 or
+    # ?profile=1); finished profiles are kept in memory per worker
+    PROFILING_ENABLED: bool = True
+    PROFILING_SAMPLE_INTERVAL_SECONDS: float = 0.001
+    PROFILING_MAX_SECONDS: float = 30.0
+    PROFILING_STORE_SIZE: int = 50
+
+    # Slow-query log: statements at or above the threshold are logged and
+    # aggregated by fingerprint with the plan of the slowest execution,
+    # explained when the report is read (see /api/v1/admin/slow-queries);
+    # per worker, in memory
+    SLOW_QUERY_LOG_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: float = 100.0
+    SLOW_QUERY_EXPLAIN: bool = True
+    SLOW_QUERY_MAX_FINGERPRINTS: int = 200
+
+    # Token revocation: revoked token ids are mirrored into a per-worker
+    # Bloom filter so that tokens which were never revoked cost no lookup
+    TOKEN_REVOCATION_CAPACITY: int = 100_000
+    TOKEN_REVOCATION_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_REFRESH_SECONDS: int = 15 * 60
+
+    # Insights: correlations between habits over the last full days (keep the
+    # window within ARCHIVE_HORIZON_DAYS); pairs completed together on fewer
+    # days than the minimum support are not reported
+    INSIGHTS_WINDOW_DAYS: int = 365
+    INSIGHTS_MIN_SUPPORT: int = 5
+    INSIGHTS_CACHE_TTL_SECONDS: int = 24 * 60 * 60
+
+    # Platform usage (see /api/v1/admin/usage): workers count active users
+    # and events in memory and merge them into daily rollups this often
+    USAGE_FLUSH_INTERVAL_SECONDS: int = 60
+
     # Redis
     REDIS_URL: str = "redis://localhost:6379"
+
+    # In-process caches; invalidations reach other workers through the
+    # broker ("local" for a single process, "redis" for pub/sub over REDIS_URL).
+    # Token revocations travel the same way: run more than one worker with
+    # "redis" only, or revoked tokens keep working on the others until their
+    # next filter rebuild
+    CACHE_BROKER: str = "local"
+    CACHE_TTL_SECONDS: int = 300
+
+    @field_validator("CACHE_BROKER")
+    @classmethod
+    def validate_cache_broker(cls, v: str) -> str:
+        if v not in ("local", "redis"):
+            raise ValueError("CACHE_BROKER must be 'local' or 'redis'")
+        return v
+
+    # Write-behind check-ins: POST /habits/entries appends validated check-ins
+    # to a durable queue ("local" fsynced journal for a single process, "redis"
+    # list shared by all workers) and answers 202; a background job flushes
+    # the queue in batched transactions
+    WRITE_BEHIND_ENABLED: bool = False
+    WRITE_BEHIND_QUEUE: str = "local"
+    WRITE_BEHIND_JOURNAL_DIR: str = "./write_behind"
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS: float = 1.0
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+
+    @field_validator("WRITE_BEHIND_QUEUE")
+    @classmethod
+    def validate_write_behind_queue(cls, v: str) -> str:
+        if v not in ("local", "redis"):
+            raise ValueError("WRITE_BEHIND_QUEUE must be 'local' or 'redis'")
+        return v
     
     # Email
     SMTP_TLS: bool = True
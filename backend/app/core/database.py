@@ -2,29 +2,95 @@
 Database configuration and session management.
 """
 
-from sqlalchemy import create_engine
+from pathlib import Path
+from typing import Iterator, Optional
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import InvalidRequestError, SQLAlchemyError
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 from sqlalchemy.pool import StaticPool
 
 from app.core.config import settings
+from app.core.instrumentation import instrument_engine
+from app.core.routing import SHARD, RoutingSession
+from app.core.sharding import ShardRouter
+
+
+def enable_sqlite_foreign_keys(database_engine: Engine) -> None:
+    """Enforce foreign keys (and ON DELETE CASCADE) on SQLite connections."""
+
+    @event.listens_for(database_engine, "connect")
+    def _set_pragma(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA foreign_keys=ON")
+        cursor.close()
+
+
+def _refuse_lazy_load(orm_execute_state):
+    if not orm_execute_state.is_relationship_load:
+        return
+    state = orm_execute_state.lazy_loaded_from
+    if state is not None:
+        raise InvalidRequestError(
+            f"Lazy load from {state.class_.__name__} refused; load the relationship "
+            "with an explicit selectinload/joinedload option"
+        )
+
+
+def forbid_lazy_loads(session_class=Session) -> None:
+    """Fail every lazy relationship load, even of relationships not set to raise."""
+    if not event.contains(session_class, "do_orm_execute", _refuse_lazy_load):
+        event.listen(session_class, "do_orm_execute", _refuse_lazy_load)
 
-# Create database engine based on settings
-if settings.USE_SQLITE:
-    # SQLite configuration
-    SQLALCHEMY_DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL,
-        connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
+
+def create_database_engine(url: str) -> Engine:
+    """Create an instrumented engine for a primary or replica database."""
+    if url.startswith("sqlite"):
+        # SQLite configuration
+        database_engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False},
+            poolclass=StaticPool,
+        )
+        enable_sqlite_foreign_keys(database_engine)
+    else:
+        # PostgreSQL configuration
+        database_engine = create_engine(url)
+
+    # Per-request statement counts and timings for /metrics
+    instrument_engine(database_engine)
+    return database_engine
+
+
+# Create database engines based on settings
+SQLALCHEMY_DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
+engine = create_database_engine(SQLALCHEMY_DATABASE_URL)
+replica_engines = [create_database_engine(url) for url in settings.SQLALCHEMY_REPLICA_URIS]
+
+# Shard 0 is the primary; the directory gets its own engine on the primary
+shard_router = (
+    ShardRouter(
+        [engine] + [create_database_engine(url) for url in settings.SHARD_URIS],
+        directory=create_database_engine(SQLALCHEMY_DATABASE_URL),
     )
-else:
-    # PostgreSQL configuration
-    SQLALCHEMY_DATABASE_URL = settings.SQLALCHEMY_DATABASE_URI
-    engine = create_engine(SQLALCHEMY_DATABASE_URL)
+    if settings.SHARD_URIS
+    else None
+)
+
+ALEMBIC_INI_PATH = Path(__file__).resolve().parents[2] / "alembic.ini"
 
-# Create SessionLocal class
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Create SessionLocal class; sessions are bound to their user's shard and
+# route reads to replicas when flagged read-only
+SessionLocal = sessionmaker(
+    class_=RoutingSession,
+    autocommit=False,
+    autoflush=False,
+    primary=engine,
+    replicas=replica_engines,
+    shard_router=shard_router,
+)
 
 # Create Base class for models
 Base = declarative_base()
@@ -39,11 +105,83 @@ def get_db():
         db.close()
 
 
+def each_shard() -> Iterator:
+    """One session bound to each shard in turn, for work spanning all users."""
+    shards = len(shard_router.engines) if shard_router is not None else 1
+    for shard in range(shards):
+        db = SessionLocal(info={SHARD: shard})
+        try:
+            yield db
+        finally:
+            db.close()
+
+
+def shard_engines():
+    """Engines of every shard (just the primary when not sharded)."""
+    return shard_router.engines if shard_router is not None else [engine]
+
+
 def create_tables():
     """Create all database tables."""
-    Base.metadata.create_all(bind=engine)
+    for bind in shard_engines():
+        Base.metadata.create_all(bind=bind)
+
+
+def get_schema_head() -> str:
+    """Return the head revision of the Alembic migration scripts."""
+    # Imported here so that only the "verify" startup mode pays for alembic
+    from alembic.config import Config
+    from alembic.script import ScriptDirectory
+
+    config = Config(str(ALEMBIC_INI_PATH))
+    config.set_main_option("script_location", str(ALEMBIC_INI_PATH.parent / "alembic"))
+    return ScriptDirectory.from_config(config).get_current_head()
+
+
+def get_schema_revision(bind=None) -> Optional[str]:
+    """Return the Alembic revision stamped in the database, if any."""
+    with (bind or engine).connect() as connection:
+        try:
+            return connection.execute(
+                text("SELECT version_num FROM alembic_version")
+            ).scalar()
+        except SQLAlchemyError:
+            return None
+
+
+def verify_schema_version(bind=None) -> str:
+    """Check that the database is migrated to the current Alembic head."""
+    head = get_schema_head()
+    current = get_schema_revision(bind)
+    if current != head:
+        raise RuntimeError(
+            f"Database schema revision is {current!r}, expected {head!r}. "
+            "Run 'alembic upgrade head' before starting the application."
+        )
+    return current
+
+
+def prepare_schema():
+    """Create or verify the schema according to SCHEMA_STARTUP_MODE."""
+    if settings.SCHEMA_STARTUP_MODE == "verify":
+        for bind in shard_engines():
+            verify_schema_version(bind)
+    else:
+        create_tables()
+    if shard_router is not None:
+        shard_router.sync_directory()
+
+
+def dispose_engines():
+    """Close the pooled connections of every engine, at shutdown."""
+    engines = shard_engines() + replica_engines
+    if shard_router is not None:
+        engines = engines + [shard_router.directory]
+    for bind in engines:
+        bind.dispose()
 
 
 def drop_tables():
     """Drop all database tables."""
-    Base.metadata.drop_all(bind=engine)
+    for bind in shard_engines():
+        Base.metadata.drop_all(bind=bind)
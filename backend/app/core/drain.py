@@ -0,0 +1,171 @@
+"""
+Graceful drain of a worker for rolling deploys.
+
+On SIGTERM the worker starts draining: `GET /ready` answers 503 so load
+balancers stop routing to it (`/health` stays 200, the process is alive), and
+responses carry `Connection: close` so keep-alive clients reconnect
+elsewhere. After `DRAIN_READINESS_DELAY_SECONDS`, long enough for readiness
+probes to notice, open event streams are ended and the server's own graceful
+shutdown is started by raising SIGINT, which uvicorn handles like SIGTERM:
+it stops accepting connections and lets in-flight requests finish. A second
+SIGTERM skips the delay.
+
+The lifespan shutdown then waits for requests still running (their
+background tasks included: they run before the request's ASGI call returns)
+and stops the job scheduler, within what is left of `DRAIN_TIMEOUT_SECONDS`
+after the server's own graceful wait (`Drain.remaining`), so a worker is
+gone within the readiness delay plus the drain timeout plus the time to
+flush its buffers. Finally it flushes the buffers and disposes every
+engine's pool, so the database sees clean disconnects instead of connections
+timing out server-side. Each step runs in `shutdown_step`, so one failing
+does not skip the ones after it.
+"""
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+from starlette.datastructures import MutableHeaders
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Drain:
+    """Readiness and in-flight request tracking of this worker."""
+
+    def __init__(self):
+        self.started = False
+        self.draining = False
+        self.in_flight = 0
+        self._idle: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._on_handover: Optional[Callable[[], None]] = None
+        self._handed_over = False
+        self._handed_over_at: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.started and not self.draining
+
+    def start(self) -> None:
+        """Mark the worker ready; must be called on the serving event loop."""
+        self._loop = asyncio.get_running_loop()
+        self._idle = asyncio.Event()
+        if not self.in_flight:
+            self._idle.set()
+        self.started = True
+        self.draining = False
+        self._handed_over = False
+        self._handed_over_at = None
+
+    def begin(self) -> None:
+        """Stop reporting ready; requests are still served."""
+        if not self.draining:
+            logger.info("Draining: %d request(s) in flight", self.in_flight)
+        self.draining = True
+
+    def request_started(self) -> None:
+        self.in_flight += 1
+        if self._idle is not None:
+            self._idle.clear()
+
+    def request_finished(self) -> None:
+        self.in_flight -= 1
+        if not self.in_flight and self._idle is not None:
+            self._idle.set()
+
+    def remaining(self, timeout: float) -> float:
+        """What is left of `timeout` since the server's graceful shutdown started."""
+        if self._handed_over_at is None:
+            return timeout
+        return max(0.0, timeout - (time.monotonic() - self._handed_over_at))
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Wait up to `timeout` seconds for in-flight requests; True once there are none."""
+        if self._idle is None or self._idle.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("%d request(s) still running after the drain timeout", self.in_flight)
+            return False
+        return True
+
+    # Signals
+    def install_signal_handler(self, on_handover: Callable[[], None]) -> bool:
+        """Drain on SIGTERM before handing over to the server; False where unsupported."""
+        self._on_handover = on_handover
+        try:
+            self._loop.add_signal_handler(signal.SIGTERM, self._on_sigterm)
+        except (NotImplementedError, RuntimeError, ValueError):
+            # Not the main thread (test clients) or no signal support (Windows)
+            logger.debug("SIGTERM drain handler not installed", exc_info=True)
+            return False
+        return True
+
+    def remove_signal_handler(self) -> None:
+        if self._loop is None:
+            return
+        try:
+            self._loop.remove_signal_handler(signal.SIGTERM)
+        except (NotImplementedError, RuntimeError, ValueError):
+            pass
+
+    def _on_sigterm(self) -> None:
+        if self.draining:
+            self._handover()
+            return
+        self.begin()
+        self._loop.call_later(settings.DRAIN_READINESS_DELAY_SECONDS, self._handover)
+
+    def _handover(self) -> None:
+        if self._handed_over:
+            return
+        self._handed_over = True
+        self._handed_over_at = time.monotonic()
+        if self._on_handover is not None:
+            self._on_handover()
+        # uvicorn shuts down gracefully on SIGINT as it would have on SIGTERM
+        os.kill(os.getpid(), signal.SIGINT)
+
+
+drain = Drain()
+
+
+@contextmanager
+def shutdown_step(name: str) -> Iterator[None]:
+    """Log a failing shutdown step instead of skipping the steps after it."""
+    try:
+        yield
+    except Exception:
+        logger.exception("Shutdown step %s failed", name)
+
+
+class DrainMiddleware:
+    """ASGI middleware counting in-flight requests and closing connections while draining."""
+
+    def __init__(self, app, drain: Drain = drain):
+        self.app = app
+        self.drain = drain
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and self.drain.draining:
+                MutableHeaders(scope=message)["connection"] = "close"
+            await send(message)
+
+        self.drain.request_started()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.drain.request_finished()
@@ -0,0 +1,191 @@
+"""
+Live change events pushed to clients over Server-Sent Events.
+
+Write paths queue compact events with `publish_on_commit`; once the
+transaction commits they are handed to the `EventHub`, which delivers them
+to the streams of the affected user on this worker and publishes them
+through the broker so the other workers deliver them to their streams.
+
+Each stream owns a small bounded queue. A client that falls behind gets its
+queue replaced by a single "resync" event telling it to refetch, so a slow
+or stalled connection never holds more than `EVENTS_QUEUE_SIZE` events and
+idle connections cost only a queue and a suspended generator.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Any, AsyncIterator, Dict, Optional, Set
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.cache import create_broker
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "habitflow:events"
+RESYNC = "resync"
+_PENDING_EVENTS = "pending_events"
+_CLOSED = object()
+
+EVENTS = registry.counter(
+    "habitflow_events_total", "Live events by outcome.", ["outcome"]
+)
+
+
+def format_event(event_type: str, data: Dict[str, Any], event_id: Optional[int] = None) -> str:
+    """Serialize one event in the text/event-stream format."""
+    lines = [f"event: {event_type}"]
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'), default=str)}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """One connected stream of a user."""
+
+    def __init__(self, user_id: int, maxsize: int):
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def push(self, item: Any) -> None:
+        """Queue an event; on overflow replace the backlog by a resync marker."""
+        if not self.queue.full():
+            self.queue.put_nowait(item)
+            EVENTS.inc(outcome="queued")
+            return
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(item if item is _CLOSED else {"type": RESYNC, "data": {}})
+        EVENTS.inc(outcome="overflow")
+
+    def close(self) -> None:
+        self.push(_CLOSED)
+
+
+class EventHub:
+    """Fans events out to the local streams of each user and to other workers."""
+
+    def __init__(self, broker=None, channel: str = EVENTS_CHANNEL):
+        self._broker = broker
+        self.channel = channel
+        self.origin = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._subscriptions: Dict[int, Set[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._next_id = 0
+
+    @property
+    def broker(self):
+        if self._broker is None:
+            self._broker = create_broker()
+        return self._broker
+
+    @property
+    def connections(self) -> int:
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def start(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Bind to the serving event loop and subscribe to other workers."""
+        self._loop = loop or asyncio.get_running_loop()
+        self.broker.subscribe(self.channel, self._receive)
+
+    def stop(self) -> None:
+        """End every open stream and stop receiving events."""
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+        if self._broker is not None:
+            self._broker.close()
+            self._broker = None
+        self._loop = None
+
+    def subscribe(self, user_id: int) -> Subscription:
+        """Open a stream for `user_id`; must be called on the event loop."""
+        subscription = Subscription(user_id, settings.EVENTS_QUEUE_SIZE)
+        self._subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+
+    def publish(self, user_id: int, event_type: str, data: Dict[str, Any]) -> None:
+        """Deliver an event to the user's streams on every worker; thread-safe."""
+        item = {"type": event_type, "data": data}
+        self._dispatch(user_id, item)
+        message = json.dumps(
+            {"origin": self.origin, "user_id": user_id, "event": item}, default=str
+        )
+        try:
+            self.broker.publish(self.channel, message)
+        except Exception:
+            logger.exception("Could not publish live event")
+
+    def _receive(self, message: str) -> None:
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            logger.warning("Ignoring malformed live event: %r", message)
+            return
+        if payload.get("origin") != self.origin:
+            self._dispatch(payload["user_id"], payload["event"])
+
+    def _dispatch(self, user_id: int, item: Dict[str, Any]) -> None:
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        # Write paths run in worker threads; queues belong to the event loop
+        loop.call_soon_threadsafe(self._deliver, user_id, item)
+
+    def _deliver(self, user_id: int, item: Dict[str, Any]) -> None:
+        for subscription in list(self._subscriptions.get(user_id, ())):
+            self._next_id += 1
+            subscription.push({**item, "id": self._next_id})
+
+    async def stream(self, subscription: Subscription) -> AsyncIterator[str]:
+        """Yield SSE frames for a subscription until it is closed."""
+        try:
+            yield f"retry: {settings.EVENTS_RETRY_MILLISECONDS}\n\n"
+            while True:
+                try:
+                    item = await asyncio.wait_for(
+                        subscription.queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing idle connections
+                    yield ": heartbeat\n\n"
+                    continue
+                if item is _CLOSED:
+                    return
+                yield format_event(item["type"], item["data"], item.get("id"))
+        finally:
+            self.unsubscribe(subscription)
+
+
+event_hub = EventHub()
+
+
+def publish_on_commit(db: Session, user_id: int, event_type: str, data: Dict[str, Any]) -> None:
+    """Publish a live event once the session's current transaction commits."""
+    db.info.setdefault(_PENDING_EVENTS, []).append((user_id, event_type, data))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending(session):
+    for user_id, event_type, data in session.info.pop(_PENDING_EVENTS, ()):
+        event_hub.publish(user_id, event_type, data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_EVENTS, None)
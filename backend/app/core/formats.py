@@ -0,0 +1,90 @@
+"""
+Content negotiation for compact response formats.
+
+Endpoints returning per-day series (calendar, progress, entry lists) can
+serve, besides their regular JSON, a columnar shape with one array per
+field instead of one object per day, either as JSON or as MessagePack:
+
+    Accept: application/vnd.habitflow.columnar+json
+    Accept: application/msgpack
+"""
+
+import json
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from app.core import lazy
+
+JSON = "application/json"
+COLUMNAR_JSON = "application/vnd.habitflow.columnar+json"
+MSGPACK = "application/msgpack"
+
+# Accepted spellings of each offered format, in order of server preference
+_ALIASES = {
+    MSGPACK: MSGPACK,
+    "application/x-msgpack": MSGPACK,
+    COLUMNAR_JSON: COLUMNAR_JSON,
+    JSON: JSON,
+}
+
+
+def parse_accept(accept: Optional[str]) -> List[str]:
+    """Media types of an Accept header, highest quality first."""
+    if not accept:
+        return []
+    ranked = []
+    for position, part in enumerate(accept.split(",")):
+        media_type, *params = [piece.strip() for piece in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if media_type and quality > 0:
+            ranked.append((-quality, position, media_type.lower()))
+    return [media_type for _, _, media_type in sorted(ranked)]
+
+
+def negotiate(request: Request, response: Optional[Response] = None) -> str:
+    """Pick the response format for `request`; regular JSON unless asked otherwise."""
+    if response is not None:
+        response.headers["Vary"] = "Accept"
+    for media_type in parse_accept(request.headers.get("accept")):
+        if media_type in _ALIASES:
+            return _ALIASES[media_type]
+    return JSON
+
+
+def columns(rows: Iterable[Any], **fields: str) -> Dict[str, List[Any]]:
+    """Turn objects or dicts into parallel arrays.
+
+    Keyword arguments map each output array to the key or attribute it is
+    read from, e.g. ``columns(entries, values="value")``.
+    """
+    result: Dict[str, List[Any]] = {name: [] for name in fields}
+    for row in rows:
+        for name, field in fields.items():
+            result[name].append(row[field] if isinstance(row, dict) else getattr(row, field))
+    return result
+
+
+def render(content: Any, media_type: str) -> bytes:
+    """Encode `content` in one of the offered formats."""
+    content = jsonable_encoder(content)
+    if media_type == MSGPACK:
+        return lazy.msgpack.packb(content, use_bin_type=True)
+    return json.dumps(content, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+def columnar_response(content: Dict[str, Any], media_type: str) -> Response:
+    """Response carrying columnar `content` in the negotiated format."""
+    return Response(
+        render(content, media_type),
+        media_type=media_type,
+        headers={"Vary": "Accept"},
+    )
@@ -0,0 +1,188 @@
+"""
+Per-request SQL instrumentation and route latency metrics.
+
+SQLAlchemy engine hooks attribute every statement to the request being
+served (through a context variable that follows the request into the
+threadpool), and an ASGI middleware records per-route latency, statement
+counts, database time and rows into the metrics registry.
+"""
+
+import logging
+import time
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+from app.core.metrics import STATEMENT_COUNT_BUCKETS, registry
+
+logger = logging.getLogger(__name__)
+
+StatementObserver = Callable[[str, Any, float, Any], None]
+
+REQUEST_LATENCY = registry.histogram(
+    "habitflow_http_request_duration_seconds",
+    "HTTP request latency by route.",
+    ["method", "route"],
+)
+REQUESTS_TOTAL = registry.counter(
+    "habitflow_http_requests_total",
+    "HTTP requests by route and status code.",
+    ["method", "route", "status"],
+)
+REQUEST_STATEMENTS = registry.histogram(
+    "habitflow_http_request_db_statements",
+    "SQL statements executed per request by route.",
+    ["method", "route"],
+    buckets=STATEMENT_COUNT_BUCKETS,
+)
+REQUEST_DB_SECONDS = registry.histogram(
+    "habitflow_http_request_db_duration_seconds",
+    "Database time per request by route.",
+    ["method", "route"],
+)
+REQUEST_DB_ROWS = registry.counter(
+    "habitflow_http_request_db_rows_total",
+    "Rows returned (ORM entities loaded plus rows affected by DML) by route.",
+    ["method", "route"],
+)
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class RequestStats:
+    """Database activity recorded while serving one request."""
+
+    __slots__ = ("statements", "db_time", "rows")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.rows = 0
+
+
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "habitflow_request_stats", default=None
+)
+_statement_observers: List[StatementObserver] = []
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Return the stats of the request being served, if any."""
+    return _request_stats.get()
+
+
+def add_statement_observer(observer: StatementObserver) -> None:
+    """Call `observer(statement, parameters, duration, context)` after each statement."""
+    if observer not in _statement_observers:
+        _statement_observers.append(observer)
+
+
+def remove_statement_observer(observer: StatementObserver) -> None:
+    """Stop calling a previously added statement observer."""
+    if observer in _statement_observers:
+        _statement_observers.remove(observer)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("habitflow_query_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["habitflow_query_start"].pop()
+
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.statements += 1
+        stats.db_time += duration
+        if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+            stats.rows += max(cursor.rowcount, 0)
+
+    for observer in _statement_observers:
+        # An observer's failure must not fail the statement it observes
+        try:
+            observer(statement, parameters, duration, context)
+        except Exception:
+            logger.exception("Statement observer %r failed", observer)
+
+
+def _on_instance_load(target, context):
+    stats = _request_stats.get()
+    if stats is not None:
+        stats.rows += 1
+
+
+def instrument_engine(engine: Engine) -> Engine:
+    """Attach the statement timing hooks to `engine`."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    if not event.contains(Mapper, "load", _on_instance_load):
+        event.listen(Mapper, "load", _on_instance_load)
+    return engine
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency and database metrics."""
+
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+        self._route_paths: Optional[Dict[Any, str]] = None
+
+    def _route_template(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None and hasattr(route, "path"):
+            return route.path
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        if self._route_paths is None or endpoint not in self._route_paths:
+            routes = scope["app"].router.routes
+            self._route_paths = {
+                getattr(r, "endpoint", None): r.path for r in routes if hasattr(r, "path")
+            }
+        return self._route_paths.get(endpoint, UNMATCHED_ROUTE)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", self._server_timing(stats, started)))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            route = self._route_template(scope)
+            method = scope["method"]
+            REQUEST_LATENCY.observe(elapsed, method=method, route=route)
+            REQUESTS_TOTAL.inc(method=method, route=route, status=str(status_code))
+            REQUEST_STATEMENTS.observe(stats.statements, method=method, route=route)
+            REQUEST_DB_SECONDS.observe(stats.db_time, method=method, route=route)
+            REQUEST_DB_ROWS.inc(stats.rows, method=method, route=route)
+
+    @staticmethod
+    def _server_timing(stats: RequestStats, started: float) -> bytes:
+        total_ms = (time.perf_counter() - started) * 1000
+        return (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.statements} queries, '
+            f'{stats.rows} rows", app;dur={total_ms:.1f}'
+        ).encode("latin-1")
@@ -0,0 +1,101 @@
+"""
+Periodic background jobs run inside the application process.
+
+Jobs are plain synchronous functions (they typically open their own database
+session) executed in a worker thread at a fixed interval, so they never block
+the event loop. The scheduler is started and stopped by the app lifespan.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOB_RUNS = registry.counter(
+    "habitflow_job_runs_total", "Background job runs by outcome.", ["job", "outcome"]
+)
+JOB_DURATION = registry.histogram(
+    "habitflow_job_duration_seconds", "Background job run time.", ["job"]
+)
+
+
+@dataclass
+class PeriodicJob:
+    """A function run every `interval` seconds."""
+
+    name: str
+    func: Callable[[], object]
+    interval: float
+    run_at_startup: bool = False
+
+
+class JobScheduler:
+    """Runs registered periodic jobs on the event loop's default executor."""
+
+    def __init__(self):
+        self.jobs: Dict[str, PeriodicJob] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Future] = {}
+
+    def add(
+        self,
+        name: str,
+        func: Callable[[], object],
+        interval: float,
+        run_at_startup: bool = False,
+    ) -> PeriodicJob:
+        """Register a job; takes effect on the next `start`."""
+        job = PeriodicJob(name, func, interval, run_at_startup)
+        self.jobs[name] = job
+        return job
+
+    async def run_once(self, name: str) -> Optional[object]:
+        """Run a job now in a worker thread, recording metrics."""
+        job = self.jobs[name]
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        future = loop.run_in_executor(None, job.func)
+        self._running[name] = future
+        try:
+            # Shielded so that stopping the scheduler lets the thread finish
+            result = await asyncio.shield(future)
+        except Exception:
+            JOB_RUNS.inc(job=name, outcome="failure")
+            logger.exception("Background job %s failed", name)
+            return None
+        finally:
+            self._running.pop(name, None)
+            JOB_DURATION.observe(time.perf_counter() - started, job=name)
+        JOB_RUNS.inc(job=name, outcome="success")
+        return result
+
+    async def _loop(self, job: PeriodicJob) -> None:
+        if job.run_at_startup:
+            await self.run_once(job.name)
+        while True:
+            await asyncio.sleep(job.interval)
+            await self.run_once(job.name)
+
+    def start(self) -> None:
+        """Start one asyncio task per registered job."""
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._loop(job), name=f"job:{job.name}"))
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Cancel the job loops and wait (up to `timeout`) for running jobs."""
+        running = list(self._running.values())
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        if running:
+            _, pending = await asyncio.wait(running, timeout=timeout)
+            if pending:
+                logger.warning("%d background job(s) still running at shutdown", len(pending))
+
+
+scheduler = JobScheduler()
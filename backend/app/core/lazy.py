@@ -0,0 +1,53 @@
+"""
+Deferred imports for heavy optional dependencies.
+
+The Redis client, msgpack and numpy are only needed by a few code paths, so
+they are imported on first attribute access instead of at application
+startup.
+"""
+
+import importlib
+from types import ModuleType
+from typing import Any, Optional
+
+
+class LazyModule(ModuleType):
+    """Module proxy that imports the real module on first attribute access."""
+
+    def __init__(self, name: str, install_hint: Optional[str] = None):
+        super().__init__(name)
+        self._lazy_install_hint = install_hint
+        self._lazy_module: Optional[ModuleType] = None
+
+    def _load(self) -> ModuleType:
+        if self._lazy_module is None:
+            try:
+                self._lazy_module = importlib.import_module(self.__name__)
+            except ImportError as exc:
+                hint = self._lazy_install_hint or self.__name__
+                raise ImportError(
+                    f"Optional dependency '{self.__name__}' is not installed "
+                    f"(pip install {hint})"
+                ) from exc
+        return self._lazy_module
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._load(), item)
+
+    def __dir__(self):
+        return dir(self._load())
+
+
+def lazy_import(name: str, install_hint: Optional[str] = None) -> LazyModule:
+    """Return a proxy for module `name` that is imported on first use."""
+    return LazyModule(name, install_hint=install_hint)
+
+
+# Pub/sub, shared caches and the write-behind queue
+redis = lazy_import("redis")
+
+# Optional response encoders
+msgpack = lazy_import("msgpack")
+
+# Vectorised analytics
+numpy = lazy_import("numpy")
@@ -0,0 +1,139 @@
+"""
+Range partitioning of habit_entries by date on PostgreSQL.
+
+Partitioning is optional (HABIT_ENTRIES_PARTITIONING = "year" or "month")
+and is introduced by the Alembic migration 0002. Once the table is
+partitioned, `ensure_partitions` keeps partitions for the upcoming periods
+created ahead of time; it runs at startup and as a periodic job.
+"""
+
+import logging
+from datetime import date
+from typing import List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+TABLE_NAME = "habit_entries"
+DEFAULT_PARTITION = f"{TABLE_NAME}_default"
+GRANULARITIES = ("year", "month")
+
+
+def period_bounds(granularity: str, day: date) -> Tuple[date, date]:
+    """Return the [start, end) range of the partition containing `day`."""
+    if granularity == "year":
+        return date(day.year, 1, 1), date(day.year + 1, 1, 1)
+    if granularity == "month":
+        start = date(day.year, day.month, 1)
+        if day.month == 12:
+            return start, date(day.year + 1, 1, 1)
+        return start, date(day.year, day.month + 1, 1)
+    raise ValueError(f"Unsupported partition granularity: {granularity!r}")
+
+
+def partition_name(granularity: str, day: date) -> str:
+    """Name of the partition containing `day`, e.g. habit_entries_y2025m03."""
+    start, _ = period_bounds(granularity, day)
+    if granularity == "year":
+        return f"{TABLE_NAME}_y{start.year}"
+    return f"{TABLE_NAME}_y{start.year}m{start.month:02d}"
+
+
+def periods_between(granularity: str, first: date, last: date) -> List[Tuple[date, date]]:
+    """All partition ranges covering `first` through `last` inclusive."""
+    periods = []
+    start, end = period_bounds(granularity, first)
+    while start <= last:
+        periods.append((start, end))
+        start, end = period_bounds(granularity, end)
+    return periods
+
+
+def upcoming_periods(granularity: str, today: date, ahead: int) -> List[Tuple[date, date]]:
+    """The current partition range plus `ahead` following ones."""
+    periods = [period_bounds(granularity, today)]
+    for _ in range(ahead):
+        periods.append(period_bounds(granularity, periods[-1][1]))
+    return periods
+
+
+def is_partitioned(connection: Connection) -> bool:
+    """Whether habit_entries is a partitioned table on this database."""
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(
+        connection.execute(
+            text(
+                "SELECT 1 FROM pg_partitioned_table p "
+                "JOIN pg_class c ON c.oid = p.partrelid "
+                "WHERE c.relname = :table AND pg_table_is_visible(c.oid)"
+            ),
+            {"table": TABLE_NAME},
+        ).scalar()
+    )
+
+
+def partition_exists(connection: Connection, name: str) -> bool:
+    return bool(
+        connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}).scalar()
+    )
+
+
+def create_partition(
+    connection: Connection,
+    granularity: str,
+    start: date,
+    end: date,
+    table: str = TABLE_NAME,
+) -> Optional[str]:
+    """Create the partition for [start, end) unless it already exists.
+
+    Rows that landed in the default partition for that range (e.g. entries
+    dated further ahead than the pre-created partitions) are moved into the
+    new partition before it is attached, which PostgreSQL requires.
+    """
+    name = partition_name(granularity, start).replace(TABLE_NAME, table, 1)
+    if partition_exists(connection, name):
+        return None
+
+    default = f"{table}_default"
+    bounds = {"start": start, "end": end}
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS)"))
+    if partition_exists(connection, default):
+        connection.execute(
+            text(
+                f"WITH moved AS (DELETE FROM {default} "
+                f"WHERE date >= :start AND date < :end RETURNING *) "
+                f"INSERT INTO {name} SELECT * FROM moved"
+            ),
+            bounds,
+        )
+    connection.execute(
+        text(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+    )
+    logger.info("Created partition %s for [%s, %s)", name, start, end)
+    return name
+
+
+def ensure_partitions(
+    engine: Engine, granularity: str, ahead: int, today: Optional[date] = None
+) -> List[str]:
+    """Create missing partitions for the current and the next `ahead` periods."""
+    created = []
+    with engine.begin() as connection:
+        if not is_partitioned(connection):
+            logger.warning(
+                "HABIT_ENTRIES_PARTITIONING is set but %s is not partitioned; "
+                "run 'alembic upgrade head'", TABLE_NAME,
+            )
+            return created
+        for start, end in upcoming_periods(granularity, today or date.today(), ahead):
+            name = create_partition(connection, granularity, start, end)
+            if name:
+                created.append(name)
+    return created
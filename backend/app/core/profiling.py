@@ -0,0 +1,279 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+A request asks to be profiled with the `X-HabitFlow-Profile: 1` header or a
+`profile=1` query parameter. The middleware only marks such a request; the
+profiler starts once authentication has confirmed a superuser
+(`start_requested_profile`, called from `get_current_user`), so other users
+asking for a profile cost nothing beyond the mark, and requests that do
+not ask cost a header lookup.
+
+While a profile runs, a sampler thread records the stacks of the threads
+serving the request every `PROFILING_SAMPLE_INTERVAL_SECONDS`, and every
+SQL statement is recorded with its duration. Threads are attached when they
+run the request's authentication or SQL statements, so the endpoint's
+thread is sampled from its first statement onwards. A thread is sampled only
+while the application call that attached it is still on its stack, so a
+threadpool thread that moves on to another request's work drops out of the
+profile. Finished profiles are kept in a bounded per-worker store and served
+by the admin endpoints as JSON or as folded stacks (``frame;frame;frame
+count``), the input format of flamegraph.pl and speedscope.
+"""
+
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from app.core.config import settings
+from app.core.instrumentation import add_statement_observer, remove_statement_observer
+
+PROFILE_HEADER = "x-habitflow-profile"
+PROFILE_QUERY_PARAMETER = "profile"
+_TRUE = ("1", "true", "yes")
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    module = frame.f_globals.get("__name__", "?")
+    return f"{module}:{code.co_name}"
+
+
+def fold(frame) -> str:
+    """Folded stack of `frame`, outermost frame first."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def _outermost_app_frame(frame):
+    outermost = None
+    while frame is not None:
+        if frame.f_globals.get("__name__", "").startswith("app."):
+            outermost = frame
+        frame = frame.f_back
+    return outermost
+
+
+def _within(frame, anchor) -> bool:
+    while frame is not None:
+        if frame is anchor:
+            return True
+        frame = frame.f_back
+    return False
+
+
+class RequestProfile:
+    """Stack samples and SQL statements of one request."""
+
+    def __init__(self, method: str, path: str):
+        self.id = uuid.uuid4().hex
+        self.method = method
+        self.path = path
+        self.user_id: Optional[int] = None
+        self.started_at: Optional[datetime] = None
+        self.duration = 0.0
+        self.interval = settings.PROFILING_SAMPLE_INTERVAL_SECONDS
+        self.samples: Counter = Counter()
+        self.statements: List[Dict[str, Any]] = []
+        self.threads: Dict[int, Any] = {}
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    @property
+    def started(self) -> bool:
+        return self._sampler is not None
+
+    @property
+    def running(self) -> bool:
+        return self.started and not self._stop.is_set()
+
+    def start(self, user_id: int) -> None:
+        self.user_id = user_id
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.attach()
+        self._sampler = threading.Thread(
+            target=self._sample, name=f"profile:{self.id}", daemon=True
+        )
+        self._sampler.start()
+        _profiler.activate()
+
+    def attach(self) -> None:
+        """Sample the calling thread until the application call running it returns."""
+        self.threads[threading.get_ident()] = _outermost_app_frame(sys._getframe(1))
+
+    def stop(self) -> None:
+        if not self.running:
+            return
+        self._stop.set()
+        self._sampler.join()
+        self.threads.clear()
+        self.duration = time.perf_counter() - self._started
+        _profiler.deactivate()
+
+    def _sample(self) -> None:
+        deadline = self._started + settings.PROFILING_MAX_SECONDS
+        while not self._stop.wait(self.interval) and time.perf_counter() < deadline:
+            frames = sys._current_frames()
+            for ident, anchor in tuple(self.threads.items()):
+                frame = frames.get(ident)
+                if frame is not None and _within(frame, anchor):
+                    self.samples[fold(frame)] += 1
+
+    def record_statement(self, statement: str, duration: float) -> None:
+        self.attach()
+        self.statements.append({
+            "offset_ms": round((time.perf_counter() - self._started - duration) * 1000, 3),
+            "duration_ms": round(duration * 1000, 3),
+            "statement": statement,
+        })
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "user_id": self.user_id,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration * 1000, 3),
+            "samples": sum(self.samples.values()),
+            "statements": len(self.statements),
+            "db_ms": round(sum(s["duration_ms"] for s in self.statements), 3),
+        }
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            **self.summary(),
+            "sample_interval_ms": self.interval * 1000,
+            "stacks": [
+                {"stack": stack, "count": count} for stack, count in self.samples.most_common()
+            ],
+            "sql": self.statements,
+        }
+
+
+_requested_profile: ContextVar[Optional[RequestProfile]] = ContextVar(
+    "habitflow_requested_profile", default=None
+)
+
+
+class _Profiler:
+    """Keeps the SQL statement observer installed only while profiles run."""
+
+    def __init__(self):
+        self._active = 0
+        self._lock = threading.Lock()
+
+    def activate(self) -> None:
+        with self._lock:
+            self._active += 1
+            if self._active == 1:
+                add_statement_observer(_observe_statement)
+
+    def deactivate(self) -> None:
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                remove_statement_observer(_observe_statement)
+
+
+_profiler = _Profiler()
+
+
+def _observe_statement(statement, parameters, duration, context) -> None:
+    profile = _requested_profile.get()
+    if profile is not None and profile.running:
+        profile.record_statement(statement, duration)
+
+
+def start_requested_profile(user_id: int, is_superuser: bool) -> None:
+    """Start profiling the current request if it asked to be and the user may."""
+    profile = _requested_profile.get()
+    if profile is None or not is_superuser:
+        return
+    if profile.running:
+        profile.attach()
+    elif not profile.started:
+        profile.start(user_id)
+
+
+class ProfileStore:
+    """The most recent finished profiles of this worker."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._profiles: "OrderedDict[str, RequestProfile]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, profile: RequestProfile) -> None:
+        with self._lock:
+            self._profiles[profile.id] = profile
+            while len(self._profiles) > self.max_size:
+                self._profiles.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[RequestProfile]:
+        return self._profiles.get(profile_id)
+
+    def list(self) -> List[RequestProfile]:
+        with self._lock:
+            return list(reversed(self._profiles.values()))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._profiles.clear()
+
+
+profile_store = ProfileStore(settings.PROFILING_STORE_SIZE)
+
+
+def _requested(scope) -> bool:
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER.encode() and value.decode("latin-1").lower() in _TRUE:
+            return True
+    query = scope.get("query_string", b"")
+    if PROFILE_QUERY_PARAMETER.encode() not in query:
+        return False
+    values = parse_qs(query.decode("latin-1")).get(PROFILE_QUERY_PARAMETER, [])
+    return any(value.lower() in _TRUE for value in values)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware marking requests that ask to be profiled."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(scope["method"], scope["path"])
+        token = _requested_profile.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start" and profile.started:
+                headers = list(message.get("headers", []))
+                headers.append((PROFILE_HEADER.encode(), profile.id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _requested_profile.reset(token)
+            if profile.started:
+                profile.stop()
+                profile_store.add(profile)
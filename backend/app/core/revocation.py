@@ -0,0 +1,228 @@
+"""
+Revocation of individual access and refresh tokens.
+
+Revoked token ids (`jti` claims) are stored in the `revoked_tokens` table,
+mirrored into Redis when the Redis broker is configured, and added to a
+per-worker Bloom filter. Every authenticated request checks the filter
+first: a token that was never revoked is rejected by the filter without
+any I/O, and only filter hits (revoked tokens and rare false positives)
+are confirmed against Redis or the database.
+
+Revocations reach the filters of the other workers through the broker and
+each worker rebuilds its filter from the table periodically, which also
+drops ids of tokens that have expired in the meantime. With the local broker
+other workers only see a revocation on their next rebuild, so running more
+than one worker requires `CACHE_BROKER=redis`. Revoking every token
+of a user at once is done by bumping `User.token_version` instead.
+"""
+
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import delete, event, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.core.cache import RedisBroker, create_broker
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.sketches import BloomFilter
+from app.models.revoked_token import RevokedToken
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "habitflow:token-revocation"
+_PENDING_REVOCATIONS = "pending_revocations"
+
+REVOCATION_CHECKS = registry.counter(
+    "habitflow_token_revocation_checks_total",
+    "Token revocation checks by outcome.",
+    ["outcome"],
+)
+
+
+def _mirror_key(jti: str) -> str:
+    return f"habitflow:revoked:{jti}"
+
+
+def _aware(value: datetime) -> datetime:
+    # SQLite returns naive datetimes for timezone-aware columns
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class RevocationList:
+    """Revoked token ids of this worker, behind a Bloom filter."""
+
+    def __init__(self, broker=None, channel: str = REVOCATION_CHANNEL):
+        self._broker = broker
+        self.channel = channel
+        self.bloom = self._new_filter(0)
+        self.started = False
+        self._lock = threading.Lock()
+        # Ids added while a rebuild reads the table, re-added after the swap
+        self._rebuilding: Optional[List[str]] = None
+
+    @property
+    def broker(self):
+        if self._broker is None:
+            self._broker = create_broker()
+        return self._broker
+
+    @property
+    def mirror(self):
+        """Redis client holding revoked ids, when the Redis broker is in use."""
+        broker = self.broker
+        return broker.client if isinstance(broker, RedisBroker) else None
+
+    @staticmethod
+    def _new_filter(count: int) -> BloomFilter:
+        capacity = max(settings.TOKEN_REVOCATION_CAPACITY, count * 2)
+        return BloomFilter(capacity, settings.TOKEN_REVOCATION_ERROR_RATE)
+
+    def start(self) -> None:
+        """Receive revocations made by other workers."""
+        if not self.started:
+            self.broker.subscribe(self.channel, self._receive)
+            self.started = True
+
+    def stop(self) -> None:
+        if self._broker is not None:
+            self._broker.close()
+            self._broker = None
+        self.started = False
+
+    def load(self, *sessions: Session, now: Optional[datetime] = None) -> int:
+        """Rebuild the filter (and the Redis mirror) from unexpired revocations.
+
+        Pass one session per shard when the database is sharded.
+        """
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            self._rebuilding = added = []
+        try:
+            rows = [
+                row
+                for db in sessions
+                for row in db.execute(
+                    select(RevokedToken.jti, RevokedToken.expires_at)
+                    .where(RevokedToken.expires_at > now)
+                )
+            ]
+            bloom = self._new_filter(len(rows))
+            bloom.update(jti for jti, _ in rows)
+            with self._lock:
+                bloom.update(added)
+                self.bloom = bloom
+        finally:
+            with self._lock:
+                if self._rebuilding is added:
+                    self._rebuilding = None
+        self._mirror(rows, now)
+        return len(rows)
+
+    def prune(self, db: Session, now: Optional[datetime] = None) -> int:
+        """Delete revocations of tokens that have expired anyway."""
+        now = now or datetime.now(timezone.utc)
+        result = db.execute(
+            delete(RevokedToken).where(RevokedToken.expires_at <= now),
+            execution_options={"synchronize_session": False},
+        )
+        db.commit()
+        return result.rowcount
+
+    def revoke(self, db: Session, jti: str, user_id: int, expires_at: datetime) -> None:
+        """Revoke a token once the session's current transaction commits; idempotent."""
+        values = {"jti": jti, "user_id": user_id, "expires_at": expires_at}
+        shard_router = getattr(db, "shard_router", None)
+        if shard_router is not None:
+            # Core inserts skip the flush hook giving sharded rows their ids
+            values["id"] = shard_router.ids.take(RevokedToken.__tablename__)[0]
+        insert = postgresql_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        inserted = db.execute(
+            insert(RevokedToken).values(**values).on_conflict_do_nothing(index_elements=["jti"])
+        )
+        if not inserted.rowcount:
+            # Already revoked, possibly by a concurrent logout with the same token
+            return
+        pending = db.info.setdefault(_PENDING_REVOCATIONS, {})
+        pending.setdefault(self, []).append((jti, expires_at))
+
+    def is_revoked(self, db: Session, jti: str) -> bool:
+        """Whether `jti` was revoked; I/O only for Bloom filter hits."""
+        if jti not in self.bloom:
+            REVOCATION_CHECKS.inc(outcome="bloom_negative")
+            return False
+        revoked = None
+        mirror = self.mirror
+        if mirror is not None:
+            try:
+                revoked = bool(mirror.exists(_mirror_key(jti)))
+            except Exception:
+                logger.warning("Token revocation mirror unavailable, using the database")
+        if revoked is None:
+            revoked = db.scalar(
+                select(RevokedToken.id).where(RevokedToken.jti == jti).limit(1)
+            ) is not None
+        REVOCATION_CHECKS.inc(outcome="revoked" if revoked else "false_positive")
+        return revoked
+
+    def publish(self, revocations: List[Tuple[str, datetime]]) -> None:
+        """Add committed revocations here, to the mirror and to other workers."""
+        self._add([jti for jti, _ in revocations])
+        self._mirror(revocations)
+        message = json.dumps({"jtis": [jti for jti, _ in revocations]})
+        try:
+            self.broker.publish(self.channel, message)
+        except Exception:
+            # Other workers pick the revocation up on their next reload
+            logger.exception("Could not publish token revocation")
+
+    def _mirror(
+        self, revocations: Iterable[Tuple[str, datetime]], now: Optional[datetime] = None
+    ) -> None:
+        mirror = self.mirror
+        if mirror is None:
+            return
+        now = now or datetime.now(timezone.utc)
+        try:
+            pipeline = mirror.pipeline(transaction=False)
+            for jti, expires_at in revocations:
+                ttl = int((_aware(expires_at) - now).total_seconds()) + 1
+                if ttl > 0:
+                    pipeline.set(_mirror_key(jti), 1, ex=ttl)
+            pipeline.execute()
+        except Exception:
+            logger.exception("Could not mirror token revocations to Redis")
+
+    def _receive(self, message: str) -> None:
+        try:
+            jtis = json.loads(message)["jtis"]
+        except (ValueError, KeyError, TypeError):
+            logger.warning("Ignoring malformed token revocation: %r", message)
+            return
+        self._add(jtis)
+
+    def _add(self, jtis: List[str]) -> None:
+        with self._lock:
+            self.bloom.update(jtis)
+            if self._rebuilding is not None:
+                self._rebuilding.extend(jtis)
+
+
+revocation_list = RevocationList()
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_revocations(session):
+    pending = session.info.pop(_PENDING_REVOCATIONS, None)
+    for target, revocations in (pending or {}).items():
+        target.publish(revocations)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_revocations(session):
+    session.info.pop(_PENDING_REVOCATIONS, None)
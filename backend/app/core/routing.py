@@ -0,0 +1,226 @@
+"""
+Session routing between the primary database and read replicas.
+
+Sessions flagged read-only (see `app.api.deps.get_read_db`) send their
+SELECTs to a replica. Everything else goes to the primary: flushes, bulk
+writes, sessions that have written anything, and read-only sessions of a
+user who committed a write within the last READ_YOUR_WRITES_SECONDS, so
+that users always see their own changes despite replication lag. With the
+Redis broker the write markers are shared through Redis, so the window holds
+whichever worker serves the next read; with the local broker it only covers
+the worker that served the write.
+
+With sharding (see `app.core.sharding`) a session is first bound to the
+shard of its user; replicas only serve shard 0.
+"""
+
+import logging
+import random
+import threading
+import time
+from typing import Dict, List, Optional
+
+from sqlalchemy import Delete, Insert, Update, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core import lazy
+from app.core.config import settings
+from app.core.sharding import SHARDED_TABLES, ShardMoving, ShardRouter
+
+# Keys in Session.info
+READ_ONLY = "read_only"
+USER_ID = "user_id"
+SHARD = "shard"
+_PINNED = "routing_pinned_primary"
+_PENDING_WRITE = "routing_pending_write"
+_REPLICA = "routing_replica"
+_WRITABLE = "routing_writable"
+
+logger = logging.getLogger(__name__)
+
+
+def _marker_key(user_id: int) -> str:
+    return f"habitflow:recent-write:{user_id}"
+
+
+class RecentWrites:
+    """Record of when each user last committed a write, shared through Redis if configured."""
+
+    def __init__(self, max_size: int = 100_000, client=None):
+        self.max_size = max_size
+        self._writes: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._client = client
+
+    @property
+    def client(self):
+        """Redis client holding the markers of every worker, with the Redis broker."""
+        if self._client is None and settings.CACHE_BROKER == "redis":
+            self._client = lazy.redis.Redis.from_url(settings.REDIS_URL)
+        return self._client
+
+    def record(self, user_id: int, now: Optional[float] = None) -> None:
+        now = time.monotonic() if now is None else now
+        client = self.client
+        if client is not None:
+            window_ms = int(settings.READ_YOUR_WRITES_SECONDS * 1000)
+            try:
+                if window_ms > 0:
+                    client.set(_marker_key(user_id), 1, px=window_ms)
+            except Exception:
+                logger.warning("Could not share the write marker of user %s", user_id)
+        with self._lock:
+            self._writes[user_id] = now
+            if len(self._writes) > self.max_size:
+                # Drop entries that are past any sensible read-your-writes window
+                cutoff = now - max(settings.READ_YOUR_WRITES_SECONDS, 60)
+                self._writes = {
+                    key: value for key, value in self._writes.items() if value >= cutoff
+                }
+
+    def is_recent(self, user_id: int, window: float, now: Optional[float] = None) -> bool:
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            written = self._writes.get(user_id)
+        if written is not None and now - written < window:
+            return True
+        client = self.client
+        if client is None or window <= 0:
+            return False
+        try:
+            return bool(client.exists(_marker_key(user_id)))
+        except Exception:
+            # Without the shared markers the primary is the safe choice
+            logger.warning("Write markers unavailable, reading from the primary")
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._writes.clear()
+
+
+recent_writes = RecentWrites()
+
+
+def read_from_primary(db: Session) -> Session:
+    """Send the remaining reads of `db` to the primary, e.g. to fill a cache."""
+    db.info[_PINNED] = True
+    return db
+
+
+class RoutingSession(Session):
+    """Session choosing between a primary engine and replica engines per statement."""
+
+    def __init__(
+        self,
+        *args,
+        primary: Engine,
+        replicas: Optional[List[Engine]] = None,
+        shard_router: Optional[ShardRouter] = None,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        self.primary = primary
+        self.replicas = replicas or []
+        self.shard_router = shard_router if shard_router is not None and shard_router.enabled else None
+
+    def shard(self) -> int:
+        """Shard this session is bound to: its user's, or 0 before authentication."""
+        if self.shard_router is None:
+            return 0
+        shard = self.info.get(SHARD)
+        if shard is None:
+            user_id = self.info.get(USER_ID)
+            if user_id is None:
+                return 0
+            shard = self.info[SHARD] = self.shard_router.shard_for_user(user_id)
+        return shard
+
+    def check_writable(self) -> None:
+        """Refuse writes for a user whose rows are being moved between shards.
+
+        Checked once per session against the directory itself: this worker's
+        cached placement may not have seen a move started by another one yet.
+        """
+        user_id = self.info.get(USER_ID)
+        if self.shard_router is None or user_id is None or self.info.get(_WRITABLE):
+            return
+        shard, moving = self.shard_router.lookup(user_id, cached=False)
+        if moving or shard != self.shard():
+            raise ShardMoving(user_id)
+        self.info[_WRITABLE] = True
+
+    def uses_replica(self) -> bool:
+        """Whether reads of this session currently go to a replica."""
+        if not self.replicas or not self.info.get(READ_ONLY) or self.info.get(_PINNED):
+            return False
+        user_id = self.info.get(USER_ID)
+        if user_id is not None and recent_writes.is_recent(
+            user_id, settings.READ_YOUR_WRITES_SECONDS
+        ):
+            return False
+        return True
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is not None:
+            # Explicit bind_arguments, e.g. to read another shard
+            return bind
+        shard = self.shard()
+        if shard:
+            return self.shard_router.engines[shard]
+        if self._flushing or isinstance(clause, (Insert, Update, Delete)):
+            return self.primary
+        if not self.uses_replica():
+            return self.primary
+        # Stick to one replica for the lifetime of the session
+        replica = self.info.get(_REPLICA)
+        if replica is None:
+            replica = self.info[_REPLICA] = random.choice(self.replicas)
+        return replica
+
+
+@event.listens_for(RoutingSession, "after_begin")
+def _refill_ids(session, transaction, connection):
+    # Reserve ids while this transaction holds no locks yet
+    if session.shard_router is not None:
+        session.shard_router.ids.refill()
+
+
+@event.listens_for(RoutingSession, "before_flush")
+def _assign_ids(session, flush_context, instances):
+    if session.shard_router is None:
+        return
+    session.check_writable()
+    pending: Dict[str, List] = {}
+    for instance in session.new:
+        name = getattr(instance, "__tablename__", None)
+        if name in SHARDED_TABLES and instance.id is None:
+            pending.setdefault(name, []).append(instance)
+    for name, instances in pending.items():
+        for instance, id in zip(instances, session.shard_router.ids.take(name, len(instances))):
+            instance.id = id
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_flush(session, flush_context):
+    session.info[_PINNED] = session.info[_PENDING_WRITE] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _mark_bulk_write(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        session = orm_execute_state.session
+        session.check_writable()
+        session.info[_PINNED] = session.info[_PENDING_WRITE] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _record_write(session):
+    if session.info.pop(_PENDING_WRITE, False) and session.info.get(USER_ID) is not None:
+        recent_writes.record(session.info[USER_ID])
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _discard_write(session):
+    session.info.pop(_PENDING_WRITE, None)
@@ -0,0 +1,143 @@
+"""
+Full-text search indexes over habit names, descriptions and entry notes.
+
+PostgreSQL uses GIN indexes on `to_tsvector` expressions of the searched
+columns, which the database keeps current on every write. SQLite uses
+contentless FTS5 tables maintained by triggers; each indexed row also
+carries an `owner` token (``u<user id>``) so that a user's matches are
+found by intersecting posting lists instead of filtering every match.
+
+The indexes are created with the rest of the schema (`create_all` and the
+Alembic migration). SQLite batch migrations recreate tables and drop their
+triggers, so migrations touching `habits` or `habit_entries` must call
+`install_search_index` again. Notes moved into the archive are no longer
+searchable.
+"""
+
+import re
+from typing import List
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from app.core.database import Base
+
+# PostgreSQL text search configuration; queries must use the same one for
+# the expression indexes to apply
+TEXT_SEARCH_CONFIG = "english"
+
+HABITS_FTS = "habits_search"
+ENTRIES_FTS = "habit_entries_search"
+
+HABIT_DOCUMENT = (
+    f"to_tsvector('{TEXT_SEARCH_CONFIG}', "
+    "coalesce(habits.name, '') || ' ' || coalesce(habits.description, ''))"
+)
+ENTRY_DOCUMENT = f"to_tsvector('{TEXT_SEARCH_CONFIG}', coalesce(habit_entries.notes, ''))"
+
+POSTGRESQL_DDL = [
+    f"CREATE INDEX IF NOT EXISTS ix_habits_search ON habits USING GIN ({HABIT_DOCUMENT})",
+    f"CREATE INDEX IF NOT EXISTS ix_habit_entries_search ON habit_entries "
+    f"USING GIN ({ENTRY_DOCUMENT})",
+]
+
+SQLITE_DDL = [
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {HABITS_FTS} USING fts5("
+    "owner, name, description, content='', tokenize='porter unicode61')",
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {ENTRIES_FTS} USING fts5("
+    "owner, notes, content='', tokenize='porter unicode61')",
+    # habits
+    f"""CREATE TRIGGER IF NOT EXISTS habits_search_insert AFTER INSERT ON habits BEGIN
+        INSERT INTO {HABITS_FTS} (rowid, owner, name, description)
+        VALUES (new.id, 'u' || new.owner_id, new.name, coalesce(new.description, ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS habits_search_delete AFTER DELETE ON habits BEGIN
+        INSERT INTO {HABITS_FTS} ({HABITS_FTS}, rowid, owner, name, description)
+        VALUES ('delete', old.id, 'u' || old.owner_id, old.name, coalesce(old.description, ''));
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS habits_search_update
+    AFTER UPDATE OF name, description, owner_id ON habits BEGIN
+        INSERT INTO {HABITS_FTS} ({HABITS_FTS}, rowid, owner, name, description)
+        VALUES ('delete', old.id, 'u' || old.owner_id, old.name, coalesce(old.description, ''));
+        INSERT INTO {HABITS_FTS} (rowid, owner, name, description)
+        VALUES (new.id, 'u' || new.owner_id, new.name, coalesce(new.description, ''));
+    END""",
+    # habit_entries (only rows with notes are indexed)
+    f"""CREATE TRIGGER IF NOT EXISTS habit_entries_search_insert AFTER INSERT ON habit_entries
+    WHEN coalesce(new.notes, '') != '' BEGIN
+        INSERT INTO {ENTRIES_FTS} (rowid, owner, notes)
+        VALUES (new.id, 'u' || new.user_id, new.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS habit_entries_search_delete AFTER DELETE ON habit_entries
+    WHEN coalesce(old.notes, '') != '' BEGIN
+        INSERT INTO {ENTRIES_FTS} ({ENTRIES_FTS}, rowid, owner, notes)
+        VALUES ('delete', old.id, 'u' || old.user_id, old.notes);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS habit_entries_search_update
+    AFTER UPDATE OF notes, user_id ON habit_entries BEGIN
+        INSERT INTO {ENTRIES_FTS} ({ENTRIES_FTS}, rowid, owner, notes)
+        SELECT 'delete', old.id, 'u' || old.user_id, old.notes
+        WHERE coalesce(old.notes, '') != '';
+        INSERT INTO {ENTRIES_FTS} (rowid, owner, notes)
+        SELECT new.id, 'u' || new.user_id, new.notes
+        WHERE coalesce(new.notes, '') != '';
+    END""",
+]
+
+SQLITE_REBUILD = [
+    f"INSERT INTO {HABITS_FTS} ({HABITS_FTS}) VALUES ('delete-all')",
+    f"INSERT INTO {HABITS_FTS} (rowid, owner, name, description) "
+    "SELECT id, 'u' || owner_id, name, coalesce(description, '') FROM habits",
+    f"INSERT INTO {ENTRIES_FTS} ({ENTRIES_FTS}) VALUES ('delete-all')",
+    f"INSERT INTO {ENTRIES_FTS} (rowid, owner, notes) "
+    "SELECT id, 'u' || user_id, notes FROM habit_entries WHERE coalesce(notes, '') != ''",
+]
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def is_search_object(name: str) -> bool:
+    """Whether a table or index belongs to the search indexes (not the models)."""
+    return name.startswith((HABITS_FTS, ENTRIES_FTS)) or name in (
+        "ix_habits_search", "ix_habit_entries_search",
+    )
+
+
+def query_terms(query: str) -> List[str]:
+    """Words of a user's search query, without any search syntax."""
+    return _TERM.findall(query.lower())
+
+
+def fts5_match(terms: List[str], user_id: int, column: str) -> str:
+    """FTS5 MATCH expression for all `terms` (the last one as a prefix) in `column`."""
+    phrases = [f'"{term}"' for term in terms]
+    phrases[-1] += "*"
+    return f"owner : u{user_id} AND {column} : ({' AND '.join(phrases)})"
+
+
+def install_search_index(connection: Connection) -> None:
+    """Create the search indexes (and SQLite triggers) if missing."""
+    statements = {"postgresql": POSTGRESQL_DDL, "sqlite": SQLITE_DDL}.get(
+        connection.dialect.name, []
+    )
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def rebuild_search_index(connection: Connection) -> None:
+    """Re-index existing rows (SQLite; PostgreSQL indexes are always current)."""
+    if connection.dialect.name == "sqlite":
+        for statement in SQLITE_REBUILD:
+            connection.execute(text(statement))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_search_index(target, connection, **kw):
+    install_search_index(connection)
+
+
+@event.listens_for(Base.metadata, "before_drop")
+def _drop_search_index(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        for table in (HABITS_FTS, ENTRIES_FTS):
+            connection.execute(text(f"DROP TABLE IF EXISTS {table}"))
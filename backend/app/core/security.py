@@ -3,8 +3,9 @@ Security utilities for authentication and authorization.
 Handles password hashing, JWT tokens, and OAuth2.
 """
 
+import uuid
 from datetime import datetime, timedelta
-from typing import Any, Union, Optional
+from typing import Any, Dict, Union, Optional
 
 from jose import jwt
 from passlib.context import CryptContext
@@ -27,7 +28,7 @@ ALGORITHM = "HS256"
 
 
 def create_access_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any], expires_delta: timedelta = None, version: int = 0
 ) -> str:
     """Create access token."""
     if expires_delta:
@@ -37,13 +38,19 @@ def create_access_token(
             minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "access"}
+    to_encode = {
+        "exp": expire,
+        "sub": str(subject),
+        "type": "access",
+        "jti": uuid.uuid4().hex,
+        "ver": version,
+    }
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
 def create_refresh_token(
-    subject: Union[str, Any], expires_delta: timedelta = None
+    subject: Union[str, Any], expires_delta: timedelta = None, version: int = 0
 ) -> str:
     """Create refresh token."""
     if expires_delta:
@@ -53,7 +60,13 @@ def create_refresh_token(
             minutes=settings.REFRESH_TOKEN_EXPIRE_MINUTES
         )
     
-    to_encode = {"exp": expire, "sub": str(subject), "type": "refresh"}
+    to_encode = {
+        "exp": expire,
+        "sub": str(subject),
+        "type": "refresh",
+        "jti": uuid.uuid4().hex,
+        "ver": version,
+    }
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -68,21 +81,25 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
-def verify_token(token: str, token_type: str = "access") -> Optional[str]:
-    """Verify JWT token and return subject."""
+def decode_token(token: str, token_type: str = "access") -> Optional[Dict[str, Any]]:
+    """Verify JWT token and return its claims."""
     try:
         payload = jwt.decode(
             token, settings.SECRET_KEY, algorithms=[ALGORITHM]
         )
-        token_sub: str = payload.get("sub")
-        token_type_claim: str = payload.get("type")
-        
-        if token_sub is None or token_type_claim != token_type:
-            return None
-        
-        return token_sub
     except jwt.JWTError:
         return None
+    
+    if payload.get("sub") is None or payload.get("type") != token_type:
+        return None
+    
+    return payload
+
+
+def verify_token(token: str, token_type: str = "access") -> Optional[str]:
+    """Verify JWT token and return subject."""
+    payload = decode_token(token, token_type)
+    return payload["sub"] if payload else None
 
 
 def create_password_reset_token(email: str) -> str:
@@ -0,0 +1,321 @@
+"""
+Horizontal sharding by user id.
+
+Everything a user owns (their `users` row, habits, entries, archives, value
+sketches and revoked tokens) lives on one shard. Shard 0 is the primary
+database, which also holds the shard directory (`user_shards`): the shard of
+every user, looked up by id for authenticated requests and by email for
+logins. New users are placed by consistent hashing of their id, so adding a
+shard only asks the users the ring now assigns to it to move
+(`ShardService.rebalance`).
+
+`RoutingSession` binds a session to the shard of `Session.info[USER_ID]`
+(set by authentication), or to the shard given in `Session.info[SHARD]`;
+sessions of neither kind use shard 0. Ids of rows that may move between
+shards (`SHARDED_TABLES`) are reserved in blocks from the directory instead
+of each shard's own sequence, so moved rows keep their ids and clients'
+references stay valid. User ids come from the directory's own sequence.
+
+The directory is queried through a separate engine so that its short
+transactions never share a connection (or, with SQLite, a transaction) with
+a request's session. Lookups are cached per worker for
+SHARD_DIRECTORY_CACHE_TTL_SECONDS and evicted through the invalidation bus
+when a user moves. Placements of users being moved are not cached, and
+writes check the directory itself, so workers that miss the invalidation
+(the local broker, a dropped message) neither write to the source shard
+mid-move nor keep routing to it afterwards.
+"""
+
+import bisect
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import column, delete, func, insert, select, table, text, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+
+from app.core.cache import TaggedCache, invalidation_bus, user_tag
+from app.core.config import settings
+
+# Tables whose rows move with their user and take ids from the directory
+SHARDED_TABLES = (
+    "habits",
+    "habit_entries",
+    "habit_entry_archives",
+    "habit_value_sketches",
+    "revoked_tokens",
+)
+
+# Declared as models in app.models.user_shard; lightweight clauses here keep
+# this module importable from app.core.database
+_user_shards = table(
+    "user_shards", column("user_id"), column("email"), column("shard"), column("moving")
+)
+_id_blocks = table("shard_id_blocks", column("name"), column("next_value"))
+
+
+class ShardMoving(Exception):
+    """The user's rows are being moved to another shard; retry shortly."""
+
+
+class HashRing:
+    """Consistent hashing of integer keys onto shards."""
+
+    def __init__(self, shard_count: int, virtual_nodes: int = 64):
+        points = sorted(
+            (self._hash(f"shard-{shard}-{node}"), shard)
+            for shard in range(shard_count)
+            for node in range(virtual_nodes)
+        )
+        self._points = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], "big")
+
+    def shard_for(self, key: int) -> int:
+        index = bisect.bisect(self._points, self._hash(str(key))) % len(self._points)
+        return self._shards[index]
+
+
+class IdAllocator:
+    """Hands out ids of sharded tables from blocks reserved in the directory."""
+
+    def __init__(self, router: "ShardRouter", block_size: int):
+        self.router = router
+        self.block_size = block_size
+        # table -> (next id, end of block)
+        self._blocks: Dict[str, Tuple[int, int]] = {}
+        self._lock = threading.Lock()
+
+    def remaining(self, name: str) -> int:
+        start, end = self._blocks.get(name, (0, 0))
+        return end - start
+
+    def refill(self) -> None:
+        """Reserve fresh blocks for tables running low, ahead of any flush."""
+        for name in SHARDED_TABLES:
+            if self.remaining(name) < self.block_size // 2:
+                with self._lock:
+                    if self.remaining(name) < self.block_size // 2:
+                        self._blocks[name] = self._reserve(name, self.block_size)
+
+    def take(self, name: str, count: int = 1) -> List[int]:
+        """`count` unused ids for rows of table `name`."""
+        with self._lock:
+            start, end = self._blocks.get(name, (0, 0))
+            if end - start < count:
+                start, end = self._reserve(name, max(count, self.block_size))
+            self._blocks[name] = (start + count, end)
+        return list(range(start, start + count))
+
+    def _reserve(self, name: str, size: int) -> Tuple[int, int]:
+        while True:
+            with self.router.directory.begin() as connection:
+                reserved = connection.execute(
+                    update(_id_blocks)
+                    .where(_id_blocks.c.name == name)
+                    .values(next_value=_id_blocks.c.next_value + size)
+                )
+                if reserved.rowcount:
+                    end = connection.execute(
+                        select(_id_blocks.c.next_value).where(_id_blocks.c.name == name)
+                    ).scalar_one()
+                    return end - size, end
+            # First reservation: start above the ids the shards already use
+            first = 1 + max(self.router.max_id(name), 0)
+            try:
+                with self.router.directory.begin() as connection:
+                    connection.execute(
+                        insert(_id_blocks).values(name=name, next_value=first + size)
+                    )
+                return first, first + size
+            except IntegrityError:
+                # Another worker created the row meanwhile
+                continue
+
+    def clear(self) -> None:
+        with self._lock:
+            self._blocks.clear()
+
+
+class ShardRouter:
+    """Maps users to shard engines through the directory on shard 0."""
+
+    def __init__(self, engines: List[Engine], directory: Optional[Engine] = None):
+        self.engines = engines
+        # A separate engine (pool) for directory transactions
+        self.directory = directory or engines[0]
+        self.ring = HashRing(len(engines), settings.SHARD_VIRTUAL_NODES)
+        self.ids = IdAllocator(self, settings.SHARD_ID_BLOCK_SIZE)
+        self.cache = invalidation_bus.register(
+            TaggedCache("shards", ttl=settings.SHARD_DIRECTORY_CACHE_TTL_SECONDS)
+        )
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.engines) > 1
+
+    # Directory lookups
+    def lookup(self, user_id: int, cached: bool = True) -> Tuple[int, bool]:
+        """(shard, moving) of a user; users missing from the directory are on shard 0."""
+        placement = self.cache.get(user_id) if cached else None
+        if placement is None:
+            with self.directory.connect() as connection:
+                row = connection.execute(
+                    select(_user_shards.c.shard, _user_shards.c.moving).where(
+                        _user_shards.c.user_id == user_id
+                    )
+                ).first()
+            placement = (row.shard, bool(row.moving)) if row is not None else (0, False)
+            if not placement[1]:
+                self.cache.set(user_id, placement, tags=[user_tag(user_id)])
+        return placement
+
+    def shard_for_user(self, user_id: int) -> int:
+        return self.lookup(user_id)[0]
+
+    def is_moving(self, user_id: int) -> bool:
+        return self.lookup(user_id)[1]
+
+    def find_email(self, email: str) -> Optional[Tuple[int, int]]:
+        """(user id, shard) of the user with `email`, if any."""
+        with self.directory.connect() as connection:
+            row = connection.execute(
+                select(_user_shards.c.user_id, _user_shards.c.shard).where(
+                    _user_shards.c.email == email
+                )
+            ).first()
+        return (row.user_id, row.shard) if row is not None else None
+
+    def users(self, shard: Optional[int] = None) -> List[Tuple[int, int]]:
+        """(user id, shard) of every user, or of the users on `shard`."""
+        query = select(_user_shards.c.user_id, _user_shards.c.shard).order_by(
+            _user_shards.c.user_id
+        )
+        if shard is not None:
+            query = query.where(_user_shards.c.shard == shard)
+        with self.directory.connect() as connection:
+            return [(row.user_id, row.shard) for row in connection.execute(query)]
+
+    def counts(self) -> Dict[int, int]:
+        """Number of users on each shard."""
+        with self.directory.connect() as connection:
+            rows = connection.execute(
+                select(_user_shards.c.shard, func.count()).group_by(_user_shards.c.shard)
+            ).all()
+        counts = {shard: 0 for shard in range(len(self.engines))}
+        counts.update({shard: count for shard, count in rows})
+        return counts
+
+    # Directory changes
+    def place(self, email: str) -> Tuple[int, int]:
+        """Allocate an id for a new user and pick their shard; returns (id, shard)."""
+        with self.directory.begin() as connection:
+            user_id = connection.execute(
+                insert(_user_shards)
+                .values(email=email, shard=0, moving=False)
+                .returning(_user_shards.c.user_id)
+            ).scalar_one()
+            shard = self.ring.shard_for(user_id)
+            connection.execute(
+                update(_user_shards).where(_user_shards.c.user_id == user_id).values(shard=shard)
+            )
+        self.cache.set(user_id, (shard, False), tags=[user_tag(user_id)])
+        return user_id, shard
+
+    def update_email(self, user_id: int, email: str) -> None:
+        with self.directory.begin() as connection:
+            connection.execute(
+                update(_user_shards).where(_user_shards.c.user_id == user_id).values(email=email)
+            )
+
+    def set_moving(self, user_id: int, moving: bool) -> None:
+        self._update([user_id], moving=moving)
+
+    def set_moving_many(self, user_ids: List[int], moving: bool) -> None:
+        """Flag several users at once, in one directory transaction."""
+        self._update(user_ids, moving=moving)
+
+    def assign(self, user_id: int, shard: int) -> None:
+        """Point the directory at the user's new shard and allow writes again."""
+        self._update([user_id], shard=shard, moving=False)
+
+    def forget(self, user_id: int) -> None:
+        with self.directory.begin() as connection:
+            connection.execute(delete(_user_shards).where(_user_shards.c.user_id == user_id))
+        invalidation_bus.publish([user_tag(user_id)])
+
+    def _update(self, user_ids: List[int], **values) -> None:
+        with self.directory.begin() as connection:
+            connection.execute(
+                update(_user_shards).where(_user_shards.c.user_id.in_(user_ids)).values(**values)
+            )
+        # Every worker must see the change before it routes the users again
+        invalidation_bus.publish([user_tag(user_id) for user_id in user_ids])
+
+    def sync_directory(self) -> int:
+        """Add users of shard 0 created before sharding was enabled to the directory."""
+        with self.directory.begin() as connection:
+            added = connection.execute(
+                text(
+                    "INSERT INTO user_shards (user_id, email, shard, moving) "
+                    "SELECT id, email, 0, :moving FROM users "
+                    "WHERE id NOT IN (SELECT user_id FROM user_shards)"
+                ),
+                {"moving": False},
+            ).rowcount
+            if connection.dialect.name == "postgresql":
+                # New user ids must continue after the existing ones
+                connection.execute(
+                    text(
+                        "SELECT setval(pg_get_serial_sequence('user_shards', 'user_id'), "
+                        "GREATEST((SELECT max(user_id) FROM user_shards), 1))"
+                    )
+                )
+        return added
+
+    # Ids and records
+    def max_id(self, name: str) -> int:
+        """Highest id of table `name` on any shard."""
+        highest = 0
+        for engine in self.engines:
+            with engine.connect() as connection:
+                highest = max(
+                    highest, connection.execute(text(f"SELECT max(id) FROM {name}")).scalar() or 0
+                )
+        return highest
+
+    def partition(self, records: Iterable[Dict]) -> Tuple[Dict[int, List[Dict]], List[Dict]]:
+        """Group records carrying a `user_id` by shard; those of moving users apart.
+
+        Placements are read from the directory itself, in one query, so that a
+        cached placement from before a move never routes a record.
+        """
+        records = list(records)
+        user_ids = sorted({record["user_id"] for record in records})
+        with self.directory.connect() as connection:
+            placements = {
+                row.user_id: (row.shard, bool(row.moving))
+                for row in connection.execute(
+                    select(_user_shards.c.user_id, _user_shards.c.shard, _user_shards.c.moving)
+                    .where(_user_shards.c.user_id.in_(user_ids))
+                )
+            }
+        by_shard: Dict[int, List[Dict]] = {}
+        moving_records: List[Dict] = []
+        for record in records:
+            shard, moving = placements.get(record["user_id"], (0, False))
+            if moving:
+                moving_records.append(record)
+            else:
+                by_shard.setdefault(shard, []).append(record)
+        return by_shard, moving_records
+
+
+def sharded(db) -> Optional[ShardRouter]:
+    """The shard router of a session, if it spans several shards."""
+    router = getattr(db, "shard_router", None)
+    return router if router is not None and router.enabled else None
@@ -0,0 +1,107 @@
+"""
+Single-flight coalescing of identical concurrent computations.
+
+Dashboards open several tabs and clients retry, so the same user often asks
+for the same expensive result several times at once. `SingleFlight.do` runs
+the computation for the first caller of a key (the leader) and has callers
+arriving while it runs wait for and share its result, or its exception.
+Nothing is kept once the computation finishes; caching is left to
+`TaggedCache`.
+
+Flights carry cache tags and are registered with the invalidation bus: a
+write evicting one of their tags detaches the running computation, so
+callers arriving after the write start a fresh one instead of sharing a
+result that may predate it. Callers already waiting still get the result;
+when it feeds a `TaggedCache.get_or_set` the cache does not store it, because
+the same invalidation moved the cache's generation for those tags.
+"""
+
+import threading
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from app.core.metrics import registry
+
+REQUESTS = registry.counter(
+    "habitflow_singleflight_requests_total",
+    "Calls of coalesced computations by outcome (executed or coalesced).",
+    ["flight", "outcome"],
+)
+
+
+class _Call:
+    """One running computation and the callers waiting for it."""
+
+    def __init__(self, tags: Tuple[str, ...]):
+        self.tags = tags
+        self.done = threading.Event()
+        self.value: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs concurrent calls with the same key once and shares the outcome."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, _Call] = {}
+        self._keys_by_tag: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    def do(self, key: Hashable, fn: Callable[[], Any], tags: Iterable[str] = ()) -> Any:
+        """Result of `fn`, computed once for all concurrent callers of `key`."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call(tuple(tags))
+                for tag in call.tags:
+                    self._keys_by_tag.setdefault(tag, set()).add(key)
+
+        if not leader:
+            REQUESTS.inc(flight=self.name, outcome="coalesced")
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        REQUESTS.inc(flight=self.name, outcome="executed")
+        try:
+            call.value = fn()
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    self._remove(key)
+            call.done.set()
+        return call.value
+
+    def invalidate_tags(self, tags: Iterable[str]) -> int:
+        """Detach running calls carrying one of `tags`; returns the number detached."""
+        detached = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._keys_by_tag.get(tag, ())):
+                    self._remove(key)
+                    detached += 1
+        return detached
+
+    def clear(self) -> None:
+        with self._lock:
+            self._calls.clear()
+            self._keys_by_tag.clear()
+
+    def _remove(self, key: Hashable) -> None:
+        call = self._calls.pop(key, None)
+        if call is None:
+            return
+        for tag in call.tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
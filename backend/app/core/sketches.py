@@ -0,0 +1,263 @@
+"""
+Probabilistic data structures answering membership and counting questions
+in a small, fixed amount of memory.
+"""
+
+import bisect
+import hashlib
+import math
+import random
+import struct
+from itertools import accumulate
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+class BloomFilter:
+    """Set membership with no false negatives and a bounded false-positive rate.
+
+    Sized for `capacity` items at `error_rate`; adding more items than that
+    raises the false-positive rate but never produces false negatives.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        if capacity <= 0 or not 0 < error_rate < 1:
+            raise ValueError("capacity must be positive and error_rate within (0, 1)")
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.count = 0
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str) -> Iterable[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + index * second) % self.size for index in range(self.hash_count))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._bits)
+
+
+class KLLSketch:
+    """Mergeable quantile sketch (Karnin, Lang and Liberty) of float values.
+
+    Values are kept in levels of compactors; an item at level h stands for
+    2**h values. When a level fills up it is sorted and every other item is
+    promoted to the next level, so memory stays within about 3k items while
+    rank errors stay around 1.7/k of the count. Below `k` values nothing is
+    compacted and every answer is exact. Sketches built with the same `k`
+    merge into a sketch of the union of their values.
+    """
+
+    _HEADER = struct.Struct("<HBQdd")
+
+    def __init__(self, k: int = 200):
+        if k < 8:
+            raise ValueError("k must be at least 8")
+        self.k = k
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._levels: List[List[float]] = [[]]
+        self._random = random.Random()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self._levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def add(self, value: float) -> None:
+        value = float(value)
+        self._levels[0].append(value)
+        self.count += 1
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        if len(self._levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def update(self, values: Iterable[float]) -> None:
+        for value in values:
+            self.add(value)
+
+    def merge(self, other: "KLLSketch") -> None:
+        """Add the values summarized by `other` to this sketch."""
+        while len(self._levels) < len(other._levels):
+            self._levels.append([])
+        for level, items in enumerate(other._levels):
+            self._levels[level].extend(items)
+        self.count += other.count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+
+    def _compress(self) -> None:
+        while sum(map(len, self._levels)) > sum(map(self._capacity, range(len(self._levels)))):
+            for level, items in enumerate(self._levels):
+                if len(items) < self._capacity(level):
+                    continue
+                if level + 1 == len(self._levels):
+                    self._levels.append([])
+                items.sort()
+                # An odd item out stays behind so that weights keep adding up
+                kept = [items.pop()] if len(items) % 2 else []
+                self._levels[level + 1].extend(items[self._random.randint(0, 1)::2])
+                self._levels[level] = kept
+                break
+
+    def _weighted(self) -> Tuple[List[float], List[int]]:
+        """Sorted retained items and their cumulative weights."""
+        pairs = sorted(
+            (value, 1 << level) for level, items in enumerate(self._levels) for value in items
+        )
+        return [value for value, _ in pairs], list(accumulate(weight for _, weight in pairs))
+
+    def rank(self, value: float) -> int:
+        """Estimated number of values at most `value`."""
+        items, cumulative = self._weighted()
+        index = bisect.bisect_right(items, value)
+        return cumulative[index - 1] if index else 0
+
+    def quantiles(self, fractions: Sequence[float]) -> List[Optional[float]]:
+        """Values at the given fractions (0 to 1) of the count; None when empty."""
+        if not self.count:
+            return [None] * len(fractions)
+        items, cumulative = self._weighted()
+        total = cumulative[-1]
+        results = []
+        for fraction in fractions:
+            if not 0 <= fraction <= 1:
+                raise ValueError("fractions must be within [0, 1]")
+            if fraction == 0:
+                results.append(self.min)
+            elif fraction == 1:
+                results.append(self.max)
+            else:
+                index = bisect.bisect_left(cumulative, fraction * total)
+                results.append(items[min(index, len(items) - 1)])
+        return results
+
+    def quantile(self, fraction: float) -> Optional[float]:
+        return self.quantiles([fraction])[0]
+
+    def histogram(self, edges: Sequence[float]) -> List[int]:
+        """Estimated counts between consecutive `edges`; the last bin includes its upper edge."""
+        items, cumulative = self._weighted()
+
+        def at_most(value: float, strict: bool = False) -> int:
+            find = bisect.bisect_left if strict else bisect.bisect_right
+            index = find(items, value)
+            return cumulative[index - 1] if index else 0
+
+        counts = []
+        for index, (low, high) in enumerate(zip(edges, edges[1:])):
+            last = index == len(edges) - 2
+            counts.append(at_most(high, strict=not last) - at_most(low, strict=True))
+        return counts
+
+    @property
+    def size(self) -> int:
+        """Number of retained items."""
+        return sum(map(len, self._levels))
+
+    def to_bytes(self) -> bytes:
+        parts = [self._HEADER.pack(self.k, len(self._levels), self.count, self.min, self.max)]
+        for items in self._levels:
+            parts.append(struct.pack(f"<I{len(items)}d", len(items), *items))
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "KLLSketch":
+        k, level_count, count, low, high = cls._HEADER.unpack_from(data)
+        sketch = cls(k)
+        sketch.count, sketch.min, sketch.max = count, low, high
+        offset = cls._HEADER.size
+        sketch._levels = []
+        for _ in range(level_count):
+            (length,) = struct.unpack_from("<I", data, offset)
+            offset += 4
+            sketch._levels.append(list(struct.unpack_from(f"<{length}d", data, offset)))
+            offset += 8 * length
+        return sketch
+
+
+class HyperLogLog:
+    """Distinct-count estimate in 2**precision one-byte registers.
+
+    The relative error is about 1.04 / sqrt(2**precision) (1.6% at the
+    default precision of 12, in 4 KiB). Sketches of the same precision merge
+    into the sketch of the union of their items, so distinct counts of a
+    week or month come from the sketches of its days.
+    """
+
+    def __init__(self, precision: int = 12):
+        if not 4 <= precision <= 16:
+            raise ValueError("precision must be within [4, 16]")
+        self.precision = precision
+        self._registers = bytearray(1 << precision)
+
+    def add(self, item: str) -> None:
+        value = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "big")
+        bits = 64 - self.precision
+        index = value >> bits
+        # Position of the leftmost 1 among the remaining bits
+        rank = bits - (value & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self._registers[index]:
+            self._registers[index] = rank
+
+    def update(self, items: Iterable[str]) -> None:
+        for item in items:
+            self.add(item)
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Add the items counted by `other` to this sketch."""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        self._registers = bytearray(map(max, self._registers, other._registers))
+
+    def count(self) -> int:
+        """Estimated number of distinct items added."""
+        size = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / size)
+        estimate = alpha * size * size / sum(2.0 ** -register for register in self._registers)
+        empty = self._registers.count(0)
+        if estimate <= 2.5 * size and empty:
+            # Linear counting is more accurate for small cardinalities
+            estimate = size * math.log(size / empty)
+        return round(estimate)
+
+    def __len__(self) -> int:
+        return self.count()
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.precision]) + bytes(self._registers)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        sketch = cls(data[0])
+        if len(data) - 1 != len(sketch._registers):
+            raise ValueError("Truncated HyperLogLog sketch")
+        sketch._registers = bytearray(data[1:])
+        return sketch
@@ -0,0 +1,242 @@
+"""
+Slow-query log with execution plans, aggregated by statement fingerprint.
+
+`slow_query_log.install()` registers a statement observer (see
+`app.core.instrumentation`) on every instrumented engine. Statements running
+for at least `SLOW_QUERY_THRESHOLD_MS` are logged and folded into an
+in-memory report keyed by fingerprint: the statement with literals, bound
+parameters and IN lists normalized away, so the same query with different
+ids counts as one. Each entry keeps counts and timings, the application
+functions that issued it, the parameters of the slowest execution with
+strings redacted, and the plan of the slowest execution (`EXPLAIN QUERY PLAN`
+on SQLite, `EXPLAIN` on PostgreSQL). Plans are captured when the report is
+read, on a connection of their own that is rolled back, so the requests
+running slow statements pay for no extra round trip; the statement is not
+executed again.
+
+The report is per worker and bounded by `SLOW_QUERY_MAX_FINGERPRINTS`; the
+least recently seen fingerprints are dropped first.
+"""
+
+import hashlib
+import logging
+import re
+import sys
+import threading
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.core.instrumentation import add_statement_observer, remove_statement_observer
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERIES = registry.counter(
+    "habitflow_slow_queries_total",
+    "SQL statements running longer than SLOW_QUERY_THRESHOLD_MS.",
+)
+
+_EXPLAINABLE = ("select", "with", "insert", "update", "delete")
+_KEPT_PARAMETER_TYPES = (bool, int, float, date, datetime, type(None))
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_NAMED_PARAMETER = re.compile(r"%\(\w+\)s|(?<!:):\w+\b|\(__\[POSTCOMPILE_\w+\]\)|__\[POSTCOMPILE_\w+\]")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(statement: str) -> str:
+    """`statement` with literals and parameters replaced by `?` and IN lists collapsed."""
+    normalized = _STRING_LITERAL.sub("?", statement)
+    normalized = _NAMED_PARAMETER.sub("?", normalized)
+    normalized = _NUMBER.sub("?", normalized)
+    normalized = _IN_LIST.sub("(...)", normalized)
+    return _WHITESPACE.sub(" ", normalized).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode()).hexdigest()[:16]
+
+
+def _redact(value: Any) -> Any:
+    if isinstance(value, _KEPT_PARAMETER_TYPES):
+        return value.isoformat() if isinstance(value, (date, datetime)) else value
+    return f"<{type(value).__name__}>"
+
+
+def redact(parameters: Any) -> Any:
+    """Bound parameters with everything but numbers, booleans and dates redacted."""
+    if isinstance(parameters, dict):
+        return {name: _redact(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: the first parameter set stands for the batch
+            return redact(parameters[0])
+        return [_redact(value) for value in parameters]
+    return _redact(parameters)
+
+
+def caller() -> Optional[str]:
+    """The innermost application function (outside `app.core`) on the stack."""
+    frame = sys._getframe(1)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if module.startswith("app.") and not module.startswith("app.core."):
+            return f"{module}:{frame.f_code.co_name}:{frame.f_lineno}"
+        frame = frame.f_back
+    return None
+
+
+def explainable(statement: str, context: Any) -> bool:
+    return (
+        context is not None
+        and context.dialect.name in ("sqlite", "postgresql")
+        and statement.lstrip().lower().startswith(_EXPLAINABLE)
+    )
+
+
+def explain(engine: Engine, statement: str, parameters: Any) -> Optional[List[str]]:
+    """Plan of `statement` on a fresh connection of `engine`, if it can be explained."""
+    if isinstance(parameters, list) and parameters and isinstance(parameters[0], (dict, list, tuple)):
+        parameters = parameters[0]
+    dialect = engine.dialect.name
+    prefix = "EXPLAIN QUERY PLAN " if dialect == "sqlite" else "EXPLAIN "
+
+    # A raw connection: the EXPLAIN is not itself instrumented
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(prefix + statement, parameters)
+            rows = cursor.fetchall()
+        except Exception:
+            logger.debug("Could not explain statement", exc_info=True)
+            return None
+        finally:
+            cursor.close()
+            connection.rollback()
+    finally:
+        connection.close()
+    if dialect == "sqlite":
+        # (id, parent, notused, detail)
+        return [str(row[-1]) for row in rows]
+    return [str(row[0]) for row in rows]
+
+
+class SlowQuery:
+    """Aggregated executions of one statement fingerprint."""
+
+    def __init__(self, fingerprint: str, statement: str):
+        self.fingerprint = fingerprint
+        self.statement = statement
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.first_seen = datetime.now(timezone.utc)
+        self.last_seen = self.first_seen
+        self.callers: Counter = Counter()
+        self.parameters: Any = None
+        self.plan: Optional[List[str]] = None
+        # (engine, statement, parameters) of the slowest execution until explained
+        self._unexplained: Optional[Tuple[Engine, str, Any]] = None
+
+    def explain(self) -> None:
+        """Capture the plan of the slowest execution if it was not yet."""
+        unexplained, self._unexplained = self._unexplained, None
+        if unexplained is not None:
+            self.plan = explain(*unexplained)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "fingerprint": self.fingerprint,
+            "statement": self.statement,
+            "count": self.count,
+            "total_ms": round(self.total * 1000, 3),
+            "mean_ms": round(self.total / self.count * 1000, 3) if self.count else 0.0,
+            "max_ms": round(self.max * 1000, 3),
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "callers": [
+                {"caller": name, "count": count} for name, count in self.callers.most_common()
+            ],
+            "parameters": self.parameters,
+            "plan": self.plan,
+        }
+
+
+REPORT_ORDERS = {
+    "total": lambda query: query.total,
+    "max": lambda query: query.max,
+    "mean": lambda query: query.total / query.count,
+    "count": lambda query: query.count,
+}
+
+
+class SlowQueryLog:
+    """Statements slower than the threshold, aggregated by fingerprint."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._queries: "OrderedDict[str, SlowQuery]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def install(self) -> None:
+        add_statement_observer(self.observe)
+
+    def uninstall(self) -> None:
+        remove_statement_observer(self.observe)
+
+    def observe(self, statement, parameters, duration, context) -> None:
+        if duration * 1000 < settings.SLOW_QUERY_THRESHOLD_MS:
+            return
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        location = caller()
+        with self._lock:
+            query = self._queries.pop(key, None) or SlowQuery(key, normalized)
+            self._queries[key] = query
+            while len(self._queries) > self.max_size:
+                self._queries.popitem(last=False)
+            query.count += 1
+            query.total += duration
+            query.last_seen = datetime.now(timezone.utc)
+            if location is not None:
+                query.callers[location] += 1
+            slowest = duration >= query.max
+            if slowest:
+                query.max = duration
+                query.parameters = redact(parameters)
+                if settings.SLOW_QUERY_EXPLAIN and explainable(statement, context):
+                    query._unexplained = (context.engine, statement, parameters)
+        SLOW_QUERIES.inc()
+        logger.warning(
+            "Slow query %s (%.1f ms) from %s: %s", key, duration * 1000, location, normalized
+        )
+
+    def get(self, key: str) -> Optional[SlowQuery]:
+        query = self._queries.get(key)
+        if query is not None:
+            query.explain()
+        return query
+
+    def report(self, order_by: str = "total", limit: Optional[int] = None) -> List[SlowQuery]:
+        """Aggregated slow queries, slowest first by `order_by`, with their plans."""
+        with self._lock:
+            queries = list(self._queries.values())
+        queries.sort(key=REPORT_ORDERS[order_by], reverse=True)
+        queries = queries[:limit] if limit is not None else queries
+        for query in queries:
+            query.explain()
+        return queries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._queries.clear()
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_MAX_FINGERPRINTS)
@@ -0,0 +1,50 @@
+"""
+Startup timing report.
+
+Records how long each import and startup phase takes so slow cold starts and
+worker restarts can be traced to a specific step.
+"""
+
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class StartupReport:
+    """Ordered breakdown of import-time and startup-time phases."""
+
+    def __init__(self):
+        self.phases: List[Tuple[str, float]] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Time the wrapped block and record it under `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - started))
+
+    @property
+    def total(self) -> float:
+        """Total seconds spent in all recorded phases."""
+        return sum(duration for _, duration in self.phases)
+
+    def as_dict(self) -> Dict[str, float]:
+        """Return phase durations in seconds, plus the total."""
+        report = {name: round(duration, 6) for name, duration in self.phases}
+        report["total"] = round(self.total, 6)
+        return report
+
+    def log(self) -> None:
+        """Log the breakdown, one phase per line."""
+        lines = [f"  {name}: {duration * 1000:.1f} ms" for name, duration in self.phases]
+        logger.info(
+            "Startup completed in %.1f ms\n%s", self.total * 1000, "\n".join(lines)
+        )
+
+
+startup_report = StartupReport()
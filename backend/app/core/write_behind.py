@@ -0,0 +1,372 @@
+"""
+Write-behind buffer absorbing bursts of habit check-ins.
+
+When `WRITE_BEHIND_ENABLED` is set, `POST /habits/entries` validates a
+check-in, appends it to a durable queue and answers 202 without writing to
+`habit_entries`. A background job drains the queue into the database in
+batched transactions, and the read paths that show a user's day merge the
+check-ins still pending for that user, so users see their own writes at once.
+
+Two queues are available:
+
+- `JournalQueue` appends to an fsynced JSON-lines journal on local disk and
+  suits single-process deployments (each process needs its own directory),
+- `RedisQueue` pushes to a Redis list shared by every worker, with a
+  per-user hash of pending check-ins for the read paths.
+
+Check-ins are upserts keyed by habit and date, so applying the same record
+twice is harmless. Updates and deletions of an entry that still has a check-in
+queued go through the queue too (a deletion as a `deleted` record), behind
+the check-in they would otherwise be overwritten by. Records are acknowledged (removed from the queue) only
+after the transaction applying them commits; whatever a crash leaves behind
+is applied again by the next flush. Records of users being moved between
+shards are queued again and applied once the move is over, while everyone
+else's are flushed as usual.
+"""
+
+import json
+import logging
+import os
+import threading
+import uuid
+from dataclasses import dataclass
+from datetime import date, datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from app.core import lazy
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_KEY = "habitflow:write-behind"
+
+WRITE_BEHIND_RECORDS = registry.counter(
+    "habitflow_write_behind_records_total",
+    "Check-ins passing through the write-behind buffer by stage.",
+    ["stage"],
+)
+WRITE_BEHIND_BATCH = registry.histogram(
+    "habitflow_write_behind_flush_records",
+    "Check-ins applied per write-behind flush.",
+    buckets=(1, 10, 50, 100, 500, 1000, 5000, 10000),
+)
+
+
+@dataclass
+class PendingEntry:
+    """A check-in not yet in the database, shaped like a `HabitEntry`."""
+
+    habit_id: int
+    user_id: int
+    date: date
+    completed: bool
+    value: Optional[float]
+    notes: Optional[str]
+    queued_at: datetime
+    # Deletes the habit's entry for the day instead of writing it
+    deleted: bool = False
+    # Set when the check-in replaces an entry already in the database
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    pending: bool = True
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any]) -> "PendingEntry":
+        return cls(
+            habit_id=record["habit_id"],
+            user_id=record["user_id"],
+            date=date.fromisoformat(record["date"]),
+            completed=record["completed"],
+            value=record["value"],
+            notes=record["notes"],
+            queued_at=datetime.fromisoformat(record["queued_at"]),
+            deleted=record.get("deleted", False),
+        )
+
+
+def _pending_key(record: Dict[str, Any]) -> str:
+    return f"{record['habit_id']}:{record['date']}"
+
+
+# Queues
+class JournalQueue:
+    """Check-ins journaled to local disk; one process per directory."""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.journal = self.directory / "pending.jsonl"
+        self.claimed = self.directory / "flushing.jsonl"
+        self._lock = threading.Lock()
+        self._file = None
+        # user id -> "habit:date" -> latest record, for the read paths
+        self._pending: Dict[int, Dict[str, Dict[str, Any]]] = {}
+        for path in (self.claimed, self.journal):
+            for record in self._read(path):
+                self._remember(record)
+
+    @staticmethod
+    def _read(path: Path) -> List[Dict[str, Any]]:
+        if not path.exists():
+            return []
+        records = []
+        with path.open() as journal:
+            for line in journal:
+                try:
+                    records.append(json.loads(line))
+                except ValueError:
+                    # A torn last line from a crash mid-append was never acknowledged
+                    logger.warning("Skipping unreadable write-behind record in %s", path)
+        return records
+
+    def _remember(self, record: Dict[str, Any]) -> None:
+        self._pending.setdefault(record["user_id"], {})[_pending_key(record)] = record
+
+    def _open_journal(self):
+        """The journal opened for appending, without a torn last line to append onto."""
+        if self.journal.exists():
+            with self.journal.open("rb+") as journal:
+                content = journal.read()
+                end = content.rfind(b"\n") + 1
+                if end != len(content):
+                    logger.warning("Truncating a torn write-behind record in %s", self.journal)
+                    journal.truncate(end)
+                    journal.flush()
+                    os.fsync(journal.fileno())
+        return self.journal.open("a")
+
+    def append(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = self._open_journal()
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._remember(record)
+
+    def requeue(self, records: List[Dict[str, Any]]) -> None:
+        """Append claimed records again, unless a newer record replaced them."""
+        for record in records:
+            with self._lock:
+                latest = self._pending.get(record["user_id"], {}).get(_pending_key(record), {})
+            if latest.get("id") == record["id"]:
+                self.append(record)
+
+    def claim(self) -> List[Dict[str, Any]]:
+        """Records to flush: an unacknowledged claim first, else the whole journal."""
+        with self._lock:
+            if not self.claimed.exists():
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                if not self.journal.exists():
+                    return []
+                os.replace(self.journal, self.claimed)
+            return self._read(self.claimed)
+
+    def ack(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            self.claimed.unlink(missing_ok=True)
+            for record in records:
+                pending = self._pending.get(record["user_id"], {})
+                # A newer check-in for the same habit and day stays pending
+                if pending.get(_pending_key(record), {}).get("id") == record["id"]:
+                    del pending[_pending_key(record)]
+                    if not pending:
+                        self._pending.pop(record["user_id"], None)
+
+    def release(self) -> None:
+        """Give up a claim without acknowledging it."""
+
+    def pending(self, user_id: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return list(self._pending.get(user_id, {}).values())
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+# Deletes a user's pending check-in only if it is the one that was flushed
+_ACK_PENDING = """
+if redis.call('HGET', KEYS[1], ARGV[1]) == ARGV[2] then
+    return redis.call('HDEL', KEYS[1], ARGV[1])
+end
+return 0
+"""
+
+# Queues a record again only if it is still the user's latest for its day
+_REQUEUE = """
+if redis.call('HGET', KEYS[2], ARGV[1]) == ARGV[2] then
+    return redis.call('RPUSH', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class RedisQueue:
+    """Check-ins in a Redis list shared by all workers."""
+
+    def __init__(self, url: str, key: str = WRITE_BEHIND_KEY, lock_seconds: int = 300):
+        self.client = lazy.redis.Redis.from_url(url)
+        self.key = key
+        self.claimed = f"{key}:flushing"
+        self.flush_lock = f"{key}:flush-lock"
+        self.lock_seconds = lock_seconds
+        self._ack_pending = self.client.register_script(_ACK_PENDING)
+        self._requeue = self.client.register_script(_REQUEUE)
+
+    def _user_key(self, user_id: int) -> str:
+        return f"{self.key}:user:{user_id}"
+
+    def append(self, record: Dict[str, Any]) -> None:
+        message = json.dumps(record)
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.rpush(self.key, message)
+        pipeline.hset(self._user_key(record["user_id"]), _pending_key(record), message)
+        pipeline.execute()
+
+    def claim(self) -> List[Dict[str, Any]]:
+        """Records to flush, unless another worker is flushing."""
+        if not self.client.set(self.flush_lock, 1, nx=True, ex=self.lock_seconds):
+            return []
+        if not self.client.exists(self.claimed):
+            try:
+                self.client.rename(self.key, self.claimed)
+            except lazy.redis.ResponseError:
+                # Nothing queued
+                self.client.delete(self.flush_lock)
+                return []
+        return [json.loads(message) for message in self.client.lrange(self.claimed, 0, -1)]
+
+    def requeue(self, records: List[Dict[str, Any]]) -> None:
+        """Push claimed records again, unless a newer record replaced them."""
+        pipeline = self.client.pipeline(transaction=False)
+        for record in records:
+            self._requeue(
+                keys=[self.key, self._user_key(record["user_id"])],
+                args=[_pending_key(record), json.dumps(record)],
+                client=pipeline,
+            )
+        pipeline.execute()
+
+    def release(self) -> None:
+        """Let the next flush, on any worker, retry the claimed records."""
+        self.client.delete(self.flush_lock)
+
+    def ack(self, records: List[Dict[str, Any]]) -> None:
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.delete(self.claimed)
+        for record in records:
+            self._ack_pending(
+                keys=[self._user_key(record["user_id"])],
+                args=[_pending_key(record), json.dumps(record)],
+                client=pipeline,
+            )
+        pipeline.delete(self.flush_lock)
+        pipeline.execute()
+
+    def pending(self, user_id: int) -> List[Dict[str, Any]]:
+        return [json.loads(message) for message in self.client.hvals(self._user_key(user_id))]
+
+    def close(self) -> None:
+        self.client.close()
+
+
+def create_queue():
+    """Queue selected by WRITE_BEHIND_QUEUE."""
+    if settings.WRITE_BEHIND_QUEUE == "redis":
+        return RedisQueue(settings.REDIS_URL)
+    return JournalQueue(settings.WRITE_BEHIND_JOURNAL_DIR)
+
+
+class WriteBehindBuffer:
+    """Queue of acknowledged check-ins waiting to be written to the database."""
+
+    def __init__(self, queue=None):
+        self._queue = queue
+        self._flush_lock = threading.Lock()
+
+    @property
+    def queue(self):
+        if self._queue is None:
+            self._queue = create_queue()
+        return self._queue
+
+    def enqueue(
+        self,
+        user_id: int,
+        habit_id: int,
+        day: date,
+        completed: bool,
+        value: Optional[float] = None,
+        notes: Optional[str] = None,
+        deleted: bool = False,
+    ) -> PendingEntry:
+        """Durably queue a validated check-in, or with `deleted` the removal of one."""
+        record = {
+            "id": uuid.uuid4().hex,
+            "user_id": user_id,
+            "habit_id": habit_id,
+            "date": day.isoformat(),
+            "completed": completed,
+            "value": value,
+            "notes": notes,
+            "queued_at": datetime.now(timezone.utc).isoformat(),
+            "deleted": deleted,
+        }
+        self.queue.append(record)
+        WRITE_BEHIND_RECORDS.inc(stage="queued")
+        return PendingEntry.from_record(record)
+
+    def pending(self, user_id: int, day: Optional[date] = None) -> List[PendingEntry]:
+        """Check-ins of `user_id` (on `day`, if given) not flushed yet."""
+        if self._queue is None and not settings.WRITE_BEHIND_ENABLED:
+            return []
+        entries = [PendingEntry.from_record(record) for record in self.queue.pending(user_id)]
+        return [entry for entry in entries if day is None or entry.date == day]
+
+    def flush(
+        self, apply: Callable[[List[Dict[str, Any]]], Optional[List[Dict[str, Any]]]]
+    ) -> int:
+        """Apply queued check-ins with `apply`, one call (transaction) per batch.
+
+        `apply` may return records it could not apply yet (those of users
+        being moved between shards); they are queued again behind the rest.
+        """
+        with self._flush_lock:
+            records = self.queue.claim()
+            if not records:
+                return 0
+            deferred: List[Dict[str, Any]] = []
+            batch_size = settings.WRITE_BEHIND_BATCH_SIZE
+            try:
+                for start in range(0, len(records), batch_size):
+                    deferred.extend(apply(records[start:start + batch_size]) or [])
+                self.queue.requeue(deferred)
+            except BaseException:
+                # Otherwise a shared queue stays locked for every worker
+                self.queue.release()
+                raise
+            deferred_ids = {record["id"] for record in deferred}
+            flushed = [record for record in records if record["id"] not in deferred_ids]
+            self.queue.ack(flushed)
+        if deferred:
+            WRITE_BEHIND_RECORDS.inc(len(deferred), stage="deferred")
+        WRITE_BEHIND_RECORDS.inc(len(flushed), stage="flushed")
+        WRITE_BEHIND_BATCH.observe(len(flushed))
+        return len(flushed)
+
+    def close(self) -> None:
+        if self._queue is not None:
+            self._queue.close()
+            self._queue = None
+
+
+write_behind = WriteBehindBuffer()
@@ -5,6 +5,11 @@ Models package initialization.
 from .user import User
 from .habit import Habit, HabitType, HabitFrequency
 from .habit_entry import HabitEntry
+from .habit_entry_archive import HabitEntryArchive
+from .habit_value_sketch import HabitValueSketch
+from .revoked_token import RevokedToken
+from .user_shard import ShardIdBlock, UserShard
+from .usage_rollup import UsageRollup
 
 __all__ = [
     "User",
@@ -12,5 +17,11 @@ __all__ = [
     "HabitType", 
     "HabitFrequency",
     "HabitEntry",
+    "HabitEntryArchive",
+    "HabitValueSketch",
+    "RevokedToken",
+    "UserShard",
+    "ShardIdBlock",
+    "UsageRollup",
 ]
 
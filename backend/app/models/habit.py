@@ -2,7 +2,7 @@
 Habit model for habit management.
 """
 
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, Float
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Text, ForeignKey, Float, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from enum import Enum
@@ -56,13 +56,48 @@ class Habit(Base):
     # Timestamps
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Set when the habit is deleted; its rows are purged in the background
+    deleted_at = Column(DateTime(timezone=True), nullable=True, index=True)
     
     # Foreign keys
-    owner_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    owner_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
-    # Relationships
-    owner = relationship("User", back_populates="habits")
-    entries = relationship("HabitEntry", back_populates="habit", cascade="all, delete-orphan")
+    # Relationships (child rows are removed by ON DELETE CASCADE, not loaded;
+    # lazy="raise": load them with explicit options where needed)
+    owner = relationship("User", back_populates="habits", lazy="raise")
+    entries = relationship(
+        "HabitEntry",
+        back_populates="habit",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
+    archives = relationship(
+        "HabitEntryArchive",
+        back_populates="habit",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
+    value_sketches = relationship(
+        "HabitValueSketch",
+        back_populates="habit",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
+    
+    # A user's habit lists (all or active only) read this partial index of
+    # habits that are not deleted
+    __table_args__ = (
+        Index(
+            "ix_habits_owner_active",
+            "owner_id",
+            "is_active",
+            postgresql_where=deleted_at.is_(None),
+            sqlite_where=deleted_at.is_(None),
+        ),
+    )
     
     def __repr__(self):
         return f"<Habit(id={self.id}, name='{self.name}', owner_id={self.owner_id})>"
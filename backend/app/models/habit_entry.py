@@ -2,7 +2,7 @@
 Habit entry model for tracking daily habit completions.
 """
 
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, Date, ForeignKey, Float, Text
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, Date, ForeignKey, Float, Index, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from datetime import date
@@ -28,15 +28,18 @@ class HabitEntry(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Foreign keys
-    habit_id = Column(Integer, ForeignKey("habits.id"), nullable=False)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
     
-    # Relationships
-    habit = relationship("Habit", back_populates="entries")
-    user = relationship("User", back_populates="habit_entries")
+    # Relationships (lazy="raise": load them with explicit options where needed)
+    habit = relationship("Habit", back_populates="entries", lazy="raise")
+    user = relationship("User", back_populates="habit_entries", lazy="raise")
     
-    # Unique constraint to prevent duplicate entries for same habit on same date
+    # Entries of a habit or of a user by date (the partitioned table of
+    # migration 0002 already has both)
     __table_args__ = (
+        Index("ix_habit_entries_habit_date", "habit_id", "date"),
+        Index("ix_habit_entries_user_date", "user_id", "date"),
         {"sqlite_autoincrement": True},
     )
     
@@ -0,0 +1,49 @@
+"""
+Habit entry archive model for compact cold storage of old entries.
+"""
+
+from sqlalchemy import Column, Integer, DateTime, ForeignKey, LargeBinary, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class HabitEntryArchive(Base):
+    """One habit's entries for one year, packed column by column.
+
+    Days are indexed from January 1st. `present` and `completed` are bitmaps
+    with one bit per day; `values` holds the zlib-compressed float64 values
+    of the present days in date order and `notes` a zlib-compressed JSON
+    object mapping day index to note.
+    """
+
+    __tablename__ = "habit_entry_archives"
+
+    id = Column(Integer, primary_key=True, index=True)
+    year = Column(Integer, nullable=False)
+    entry_count = Column(Integer, nullable=False, default=0)
+
+    # Packed columns
+    present = Column(LargeBinary, nullable=False)
+    completed = Column(LargeBinary, nullable=False)
+    values = Column(LargeBinary, nullable=True)
+    notes = Column(LargeBinary, nullable=True)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Foreign keys
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    # Relationships (lazy="raise": load it with explicit options where needed)
+    habit = relationship("Habit", back_populates="archives", lazy="raise")
+
+    __table_args__ = (
+        UniqueConstraint("habit_id", "year", name="uq_habit_entry_archives_habit_year"),
+    )
+
+    def __repr__(self):
+        return f"<HabitEntryArchive(habit_id={self.habit_id}, year={self.year}, entries={self.entry_count})>"
@@ -0,0 +1,43 @@
+"""
+Habit value sketch model: quantile sketches of entry values per habit-month.
+"""
+
+from sqlalchemy import Column, Date, DateTime, ForeignKey, Integer, LargeBinary, UniqueConstraint
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class HabitValueSketch(Base):
+    """Serialized `KLLSketch` of one habit's entry values in one month.
+
+    `month` is the first day of the month. Rebuilt from the month's entries
+    whenever one of their values changes; quantiles of any window merge the
+    sketches of the months it covers.
+    """
+
+    __tablename__ = "habit_value_sketches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    month = Column(Date, nullable=False)
+    value_count = Column(Integer, nullable=False, default=0)
+    sketch = Column(LargeBinary, nullable=False)
+
+    # Timestamps
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Foreign keys
+    habit_id = Column(Integer, ForeignKey("habits.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    # Relationships (lazy="raise": load it with explicit options where needed)
+    habit = relationship("Habit", back_populates="value_sketches", lazy="raise")
+
+    __table_args__ = (
+        UniqueConstraint("habit_id", "month", name="uq_habit_value_sketches_habit_month"),
+    )
+
+    def __repr__(self):
+        return f"<HabitValueSketch(habit_id={self.habit_id}, month={self.month}, values={self.value_count})>"
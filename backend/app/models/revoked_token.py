@@ -0,0 +1,29 @@
+"""
+Revoked token model for logged-out access and refresh tokens.
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class RevokedToken(Base):
+    """A token revoked before its expiry, identified by its `jti` claim.
+
+    Rows are only needed until `expires_at`; after that the token is
+    rejected on its own and the row is pruned.
+    """
+
+    __tablename__ = "revoked_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(64), unique=True, index=True, nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    # Foreign keys
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+
+    def __repr__(self):
+        return f"<RevokedToken(jti='{self.jti}', user_id={self.user_id})>"
@@ -0,0 +1,28 @@
+"""
+Usage rollup model: platform-wide usage per day.
+"""
+
+from sqlalchemy import Column, Date, DateTime, Integer, LargeBinary
+from sqlalchemy.sql import func
+
+from app.core.database import Base
+
+
+class UsageRollup(Base):
+    """Usage of one day, merged from every worker's deltas.
+
+    `active_users` is a serialized `HyperLogLog` of the users who made an
+    authenticated request that day. Lives on the primary (shard 0).
+    """
+
+    __tablename__ = "usage_rollups"
+
+    day = Column(Date, primary_key=True)
+    active_users = Column(LargeBinary, nullable=False)
+    check_ins = Column(Integer, nullable=False, default=0, server_default="0")
+    habits_created = Column(Integer, nullable=False, default=0, server_default="0")
+    users_registered = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<UsageRollup(day={self.day}, check_ins={self.check_ins})>"
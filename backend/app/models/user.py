@@ -22,6 +22,8 @@ class User(Base):
     is_active = Column(Boolean, default=True)
     is_superuser = Column(Boolean, default=False)
     is_verified = Column(Boolean, default=False)
+    # Embedded in issued tokens; bumping it revokes every outstanding token
+    token_version = Column(Integer, nullable=False, default=0, server_default="0")
     
     # Profile settings
     avatar_url = Column(String(500), nullable=True)
@@ -35,10 +37,25 @@ class User(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     last_login = Column(DateTime(timezone=True), nullable=True)
+    # Set when the account is deactivated; purged after a grace period
+    deactivated_at = Column(DateTime(timezone=True), nullable=True, index=True)
     
-    # Relationships
-    habits = relationship("Habit", back_populates="owner", cascade="all, delete-orphan")
-    habit_entries = relationship("HabitEntry", back_populates="user", cascade="all, delete-orphan")
+    # Relationships (child rows are removed by ON DELETE CASCADE, not loaded;
+    # lazy="raise" everywhere: queries load what they need with explicit options)
+    habits = relationship(
+        "Habit",
+        back_populates="owner",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
+    habit_entries = relationship(
+        "HabitEntry",
+        back_populates="user",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+        lazy="raise",
+    )
     
     def __repr__(self):
         return f"<User(id={self.id}, email='{self.email}')>"
@@ -0,0 +1,38 @@
+"""
+Shard directory models: where each user lives and the id blocks handed out.
+"""
+
+from sqlalchemy import Boolean, Column, Integer, String
+
+from app.core.database import Base
+
+
+class UserShard(Base):
+    """Directory row placing a user (and all their data) on one shard.
+
+    Lives on the directory database (the primary), which also hands out user
+    ids so that they are unique across shards; `email` serves logins.
+    """
+
+    __tablename__ = "user_shards"
+
+    user_id = Column(Integer, primary_key=True)
+    email = Column(String(255), unique=True, index=True, nullable=False)
+    shard = Column(Integer, nullable=False, default=0, server_default="0")
+    # Set while the user's rows are copied to another shard; writes are refused
+    moving = Column(Boolean, nullable=False, default=False, server_default="0")
+
+    def __repr__(self):
+        return f"<UserShard(user_id={self.user_id}, shard={self.shard})>"
+
+
+class ShardIdBlock(Base):
+    """Next unreserved id of a sharded table; workers reserve ids in blocks."""
+
+    __tablename__ = "shard_id_blocks"
+
+    name = Column(String(64), primary_key=True)
+    next_value = Column(Integer, nullable=False)
+
+    def __repr__(self):
+        return f"<ShardIdBlock(name='{self.name}', next_value={self.next_value})>"
@@ -2,8 +2,8 @@
 Habit schemas for request/response validation.
 """
 
-from typing import Optional, List
-from pydantic import BaseModel, validator
+from typing import Dict, Optional, List, Union
+from pydantic import BaseModel, ConfigDict, validator
 from datetime import datetime, date
 
 from app.models.habit import HabitType, HabitFrequency
@@ -145,19 +145,118 @@ class HabitEntry(HabitEntryInDBBase):
     pass
 
 
+class PendingHabitEntry(HabitEntryBase):
+    """Check-in accepted by the write-behind buffer but not yet stored.
+
+    `id` and the timestamps are only set when it replaces a stored entry.
+    """
+    habit_id: int
+    user_id: int
+    queued_at: datetime
+    pending: bool
+    id: Optional[int] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class TodayHabit(BaseModel):
+    """Active habit with its entry for the user's current date."""
+    habit: Habit
+    entry: Optional[Union[PendingHabitEntry, HabitEntry]] = None
+
+
+class TodayView(BaseModel):
+    """Today screen schema; `date` is the current date in the user's time zone."""
+    date: date
+    habits: List[TodayHabit]
+
+
+# Search schemas
+class SearchResult(BaseModel):
+    """Search result schema; `entry_id` and `entry_date` are set for entry matches."""
+    kind: str  # "habit" or "entry"
+    habit_id: int
+    habit_name: str
+    entry_id: Optional[int] = None
+    entry_date: Optional[date] = None
+    snippet: str
+    rank: float
+
+
 # Analytics schemas
 class HabitAnalytics(BaseModel):
     """Habit analytics schema."""
     habit_id: int
     habit_name: str
+    frequency: HabitFrequency = HabitFrequency.DAILY
     total_days: int
     completed_days: int
+    # Periods of the habit's frequency (days, weeks or months) in the window
+    total_periods: int
+    completed_periods: int
     completion_rate: float
     current_streak: int
     longest_streak: int
     average_value: Optional[float] = None
 
 
+class ValueHistogramBin(BaseModel):
+    """Values between `low` and `high` (inclusive only for the last bin)."""
+    low: float
+    high: float
+    count: int
+
+
+class HabitValueStatistics(BaseModel):
+    """Distribution of a count or duration habit's values over a window."""
+    habit_id: int
+    habit_name: str
+    unit: Optional[str] = None
+    start_date: date
+    end_date: date
+    count: int
+    # Set once the window holds too many values for exact answers
+    approximate: bool = False
+    min_value: Optional[float] = None
+    max_value: Optional[float] = None
+    median_value: Optional[float] = None
+    p90_value: Optional[float] = None
+    quantiles: Dict[str, Optional[float]] = {}
+    histogram: List[ValueHistogramBin] = []
+
+
+class HabitPairInsight(BaseModel):
+    """Two habits completed on the same days more often than by chance."""
+    habit_id: int
+    habit_name: str
+    other_habit_id: int
+    other_habit_name: str
+    support: int  # days both were completed
+    co_completion_rate: float
+    lift: float
+
+
+class LaggedInsight(BaseModel):
+    """Correlation between completing one habit and another `lag_days` later."""
+    habit_id: int
+    habit_name: str
+    other_habit_id: int
+    other_habit_name: str
+    lag_days: int
+    correlation: float
+
+
+class HabitInsights(BaseModel):
+    """Cross-habit insights over the days `start_date`..`end_date`."""
+    start_date: date
+    end_date: date
+    days: int
+    together: List[HabitPairInsight]
+    predictors: List[LaggedInsight]
+
+
 class DashboardStats(BaseModel):
     """Dashboard statistics schema."""
     total_habits: int
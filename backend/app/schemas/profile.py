@@ -0,0 +1,41 @@
+"""
+Request profile schemas for API serialization.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ProfileSummary(BaseModel):
+    """Request profile summary schema."""
+    id: str
+    method: str
+    path: str
+    user_id: Optional[int] = None
+    started_at: Optional[datetime] = None
+    duration_ms: float
+    samples: int
+    statements: int
+    db_ms: float
+
+
+class ProfileStack(BaseModel):
+    """Folded stack (outermost frame first) and how often it was sampled."""
+    stack: str
+    count: int
+
+
+class ProfileStatement(BaseModel):
+    """SQL statement run while profiling; `offset_ms` is from the profile start."""
+    offset_ms: float
+    duration_ms: float
+    statement: str
+
+
+class Profile(ProfileSummary):
+    """Request profile schema."""
+    sample_interval_ms: float
+    stacks: List[ProfileStack]
+    sql: List[ProfileStatement]
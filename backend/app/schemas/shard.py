@@ -0,0 +1,41 @@
+"""
+Shard schemas for API serialization.
+"""
+
+from datetime import datetime
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+
+class ShardUsage(BaseModel):
+    """Users on a shard; `misplaced` ones belong elsewhere on the hash ring."""
+    shard: int
+    users: int
+    misplaced: int
+
+
+class ShardSummary(BaseModel):
+    """Shard summary schema."""
+    shards: List[ShardUsage]
+
+
+class ShardMove(BaseModel):
+    """Result of moving a user between shards."""
+    user_id: int
+    source: int
+    target: int
+    copied: int
+    caught_up: int
+    error: Optional[str] = None
+
+
+class ShardMoveJob(BaseModel):
+    """Users being moved in the background, and the moves done so far."""
+    id: str
+    status: str
+    users: int
+    moves: List[ShardMove]
+    error: Optional[str] = None
+    started_at: datetime
+    finished_at: Optional[datetime] = None
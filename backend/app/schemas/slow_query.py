@@ -0,0 +1,30 @@
+"""
+Slow-query report schemas for API serialization.
+"""
+
+from datetime import datetime
+from typing import Any, List, Optional
+
+from pydantic import BaseModel
+
+
+class SlowQueryCaller(BaseModel):
+    """Application function (`module:function:line`) issuing a slow query."""
+    caller: str
+    count: int
+
+
+class SlowQuery(BaseModel):
+    """Slow executions of one normalized statement."""
+    fingerprint: str
+    statement: str
+    count: int
+    total_ms: float
+    mean_ms: float
+    max_ms: float
+    first_seen: datetime
+    last_seen: datetime
+    callers: List[SlowQueryCaller]
+    # Of the slowest execution; strings are redacted
+    parameters: Any = None
+    plan: Optional[List[str]] = None
@@ -0,0 +1,29 @@
+"""
+Usage schemas for API serialization.
+"""
+
+from datetime import date
+from typing import List
+
+from pydantic import BaseModel
+
+from app.models.habit import HabitFrequency
+
+
+class UsageBucket(BaseModel):
+    """Platform-wide usage over `start_date`..`end_date`."""
+    start_date: date
+    end_date: date
+    active_users: int  # distinct, estimated within about 2%
+    check_ins: int
+    habits_created: int
+    users_registered: int
+
+
+class UsageReport(BaseModel):
+    """Usage of a window in daily, weekly or monthly buckets."""
+    start_date: date
+    end_date: date
+    period: HabitFrequency
+    active_users: int
+    buckets: List[UsageBucket]
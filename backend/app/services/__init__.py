@@ -4,10 +4,14 @@ Services package initialization.
 
 from .user_service import UserService
 from .habit_service import HabitService, HabitEntryService
+from .archive_service import ArchiveService
+from .purge_service import PurgeService
 
 __all__ = [
     "UserService",
     "HabitService", 
     "HabitEntryService",
+    "ArchiveService",
+    "PurgeService",
 ]
 
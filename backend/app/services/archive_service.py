@@ -0,0 +1,200 @@
+"""
+Archive service for moving old habit entries into compact cold storage.
+
+Entries older than the archive horizon are packed per habit and year into
+`HabitEntryArchive` rows and removed from the hot `habit_entries` table.
+Range reads go through `HabitEntryService.get_range`, which merges hot rows
+with the unpacked archive so callers need not know where an entry lives.
+"""
+
+import json
+import logging
+import math
+import struct
+import zlib
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.habit_entry import HabitEntry
+from app.models.habit_entry_archive import HabitEntryArchive
+
+logger = logging.getLogger(__name__)
+
+BITMAP_BYTES = 46  # 366 days
+
+
+@dataclass
+class ArchivedEntry:
+    """Read-only view of an archived entry, shaped like `HabitEntry`."""
+
+    habit_id: int
+    user_id: int
+    date: date
+    completed: bool
+    value: Optional[float] = None
+    notes: Optional[str] = None
+    id: Optional[int] = None
+    archived: bool = True
+
+
+def _set_bit(bitmap: bytearray, index: int) -> None:
+    bitmap[index >> 3] |= 1 << (index & 7)
+
+
+def _get_bit(bitmap: bytes, index: int) -> bool:
+    return bool(bitmap[index >> 3] & (1 << (index & 7)))
+
+
+def pack_entries(year: int, entries: List) -> Dict:
+    """Pack one habit-year of entries into archive columns."""
+    first_day = date(year, 1, 1)
+    by_day = {(entry.date - first_day).days: entry for entry in entries}
+    present = bytearray(BITMAP_BYTES)
+    completed = bytearray(BITMAP_BYTES)
+    values: List[float] = []
+    notes: Dict[str, str] = {}
+
+    for index in sorted(by_day):
+        entry = by_day[index]
+        _set_bit(present, index)
+        if entry.completed:
+            _set_bit(completed, index)
+        values.append(math.nan if entry.value is None else float(entry.value))
+        if entry.notes:
+            notes[str(index)] = entry.notes
+
+    has_values = any(not math.isnan(value) for value in values)
+    return {
+        "year": year,
+        "entry_count": len(by_day),
+        "present": bytes(present),
+        "completed": bytes(completed),
+        "values": zlib.compress(struct.pack(f"<{len(values)}d", *values)) if has_values else None,
+        "notes": zlib.compress(json.dumps(notes).encode()) if notes else None,
+    }
+
+
+def unpack_entries(archive: HabitEntryArchive) -> List[ArchivedEntry]:
+    """Unpack an archive row into entries in date order."""
+    first_day = date(archive.year, 1, 1)
+    days = [index for index in range(BITMAP_BYTES * 8) if _get_bit(archive.present, index)]
+    values = [math.nan] * len(days)
+    if archive.values:
+        values = list(struct.unpack(f"<{len(days)}d", zlib.decompress(archive.values)))
+    notes = json.loads(zlib.decompress(archive.notes)) if archive.notes else {}
+
+    return [
+        ArchivedEntry(
+            habit_id=archive.habit_id,
+            user_id=archive.user_id,
+            date=first_day + timedelta(days=index),
+            completed=_get_bit(archive.completed, index),
+            value=None if math.isnan(value) else value,
+            notes=notes.get(str(index)),
+        )
+        for index, value in zip(days, values)
+    ]
+
+
+class ArchiveService:
+    """Archive service for database operations."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def horizon(today: Optional[date] = None) -> date:
+        """Entries dated before this day are eligible for archiving."""
+        return (today or date.today()) - timedelta(days=settings.ARCHIVE_HORIZON_DAYS)
+
+    def archive_before(self, cutoff: date, max_habits: int = 500) -> int:
+        """Move entries dated before `cutoff` into the archive.
+
+        Works one habit at a time, committing after each, and stops after
+        `max_habits` so a single run stays short. Returns the number of
+        entries archived.
+        """
+        habits = (
+            self.db.query(HabitEntry.habit_id, HabitEntry.user_id)
+            .filter(HabitEntry.date < cutoff)
+            .distinct()
+            .limit(max_habits)
+            .all()
+        )
+
+        archived = 0
+        for habit_id, user_id in habits:
+            archived += self._archive_habit(habit_id, user_id, cutoff)
+        if archived:
+            logger.info("Archived %d habit entries older than %s", archived, cutoff)
+        return archived
+
+    def _archive_habit(self, habit_id: int, user_id: int, cutoff: date) -> int:
+        hot = (
+            self.db.query(HabitEntry)
+            .filter(and_(HabitEntry.habit_id == habit_id, HabitEntry.date < cutoff))
+            .all()
+        )
+        by_year: Dict[int, List] = {}
+        for entry in hot:
+            by_year.setdefault(entry.date.year, []).append(entry)
+
+        archives = {
+            archive.year: archive
+            for archive in self.db.query(HabitEntryArchive).filter(
+                and_(
+                    HabitEntryArchive.habit_id == habit_id,
+                    HabitEntryArchive.year.in_(list(by_year)),
+                )
+            )
+        }
+        for year, entries in by_year.items():
+            archive = archives.get(year)
+            if archive is not None:
+                # Hot rows win over previously archived values for the same day
+                hot_days = {entry.date for entry in entries}
+                entries = entries + [
+                    entry for entry in unpack_entries(archive) if entry.date not in hot_days
+                ]
+            else:
+                archive = HabitEntryArchive(habit_id=habit_id, user_id=user_id)
+                self.db.add(archive)
+            for field, value in pack_entries(year, entries).items():
+                setattr(archive, field, value)
+
+        self.db.query(HabitEntry).filter(
+            and_(HabitEntry.habit_id == habit_id, HabitEntry.date < cutoff)
+        ).delete(synchronize_session=False)
+        self.db.commit()
+        return len(hot)
+
+    def read_range(self, habit_id: int, start_date: date, end_date: date) -> List[ArchivedEntry]:
+        """Archived entries of a habit within [start_date, end_date]."""
+        archives = (
+            self.db.query(HabitEntryArchive)
+            .filter(
+                and_(
+                    HabitEntryArchive.habit_id == habit_id,
+                    HabitEntryArchive.year >= start_date.year,
+                    HabitEntryArchive.year <= end_date.year,
+                )
+            )
+            .all()
+        )
+        return [
+            entry
+            for archive in archives
+            for entry in unpack_entries(archive)
+            if start_date <= entry.date <= end_date
+        ]
+
+    def table_sizes(self) -> Tuple[int, int]:
+        """Number of hot entries and of archived entries."""
+        hot = self.db.query(func.count(HabitEntry.id)).scalar() or 0
+        cold = self.db.query(func.coalesce(func.sum(HabitEntryArchive.entry_count), 0)).scalar()
+        return hot, cold
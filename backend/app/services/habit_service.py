@@ -2,16 +2,81 @@
 Habit service for habit management operations.
 """
 
-from typing import Any, Dict, List, Optional, Union
-from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple, Union
+from datetime import date, datetime, timedelta, timezone
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, func, tuple_
 
-from app.models.habit import Habit
+from app.core.cache import (
+    habit_tag,
+    habit_year_tag,
+    invalidate_on_commit,
+    user_history_tag,
+    user_tag,
+)
+from app.core.events import publish_on_commit
+from app.core.usage import record_on_commit
+from app.core.write_behind import PendingEntry, write_behind
+from app.models.habit import Habit, HabitFrequency
 from app.models.habit_entry import HabitEntry
+from app.services.archive_service import ArchivedEntry, ArchiveService
+from app.services.period_service import PeriodService, period_start, previous_period
+from app.services.value_sketch_service import ValueSketchService
 from app.schemas.habit import HabitCreate, HabitUpdate, HabitEntryCreate, HabitEntryUpdate
 
+# Periods scanned when recomputing a streak
+STREAK_LOOKBACK_PERIODS = 30
+
+
+def _entry_tags(entry: HabitEntry) -> List[str]:
+    """Cache tags for data derived from `entry`."""
+    tags = [
+        habit_tag(entry.habit_id),
+        habit_year_tag(entry.habit_id, entry.date.year),
+        user_tag(entry.user_id),
+    ]
+    if entry.date < date.today():
+        tags.append(user_history_tag(entry.user_id))
+    return tags
+
+
+def local_today(timezone_name: Optional[str], now: Optional[datetime] = None) -> date:
+    """Current date in the IANA time zone `timezone_name` (UTC if unknown)."""
+    try:
+        zone = ZoneInfo(timezone_name or "UTC")
+    except (ZoneInfoNotFoundError, ValueError):
+        zone = timezone.utc
+    return (now or datetime.now(timezone.utc)).astimezone(zone).date()
+
+
+def _entry_event(entry: HabitEntry) -> Dict[str, Any]:
+    """Compact live-event payload for an entry."""
+    return {
+        "id": entry.id,
+        "habit_id": entry.habit_id,
+        "date": entry.date.isoformat(),
+        "completed": entry.completed,
+        "value": entry.value,
+    }
+
+
+def _overlay_pending(
+    pending: PendingEntry, stored: Optional[HabitEntry]
+) -> PendingEntry:
+    """A buffered check-in standing in for the entry it will replace, if any."""
+    if stored is not None:
+        pending.id = stored.id
+        pending.created_at = stored.created_at
+        pending.updated_at = stored.updated_at
+    return pending
+
+
+def _habit_event(habit: Habit) -> Dict[str, Any]:
+    """Compact live-event payload for a habit."""
+    return {"id": habit.id, "name": habit.name, "is_active": habit.is_active}
+
 
 class HabitService:
     """Habit service for database operations."""
@@ -21,13 +86,17 @@ class HabitService:
     
     def get(self, id: int) -> Optional[Habit]:
         """Get habit by ID."""
-        return self.db.query(Habit).filter(Habit.id == id).first()
+        return (
+            self.db.query(Habit)
+            .filter(and_(Habit.id == id, Habit.deleted_at.is_(None)))
+            .first()
+        )
     
     def get_by_user(self, user_id: int, skip: int = 0, limit: int = 100) -> List[Habit]:
         """Get habits by user ID."""
         return (
             self.db.query(Habit)
-            .filter(Habit.owner_id == user_id)
+            .filter(and_(Habit.owner_id == user_id, Habit.deleted_at.is_(None)))
             .offset(skip)
             .limit(limit)
             .all()
@@ -37,10 +106,50 @@ class HabitService:
         """Get active habits by user ID."""
         return (
             self.db.query(Habit)
-            .filter(and_(Habit.owner_id == user_id, Habit.is_active == True))
+            .filter(
+                and_(
+                    Habit.owner_id == user_id,
+                    Habit.is_active == True,
+                    Habit.deleted_at.is_(None),
+                )
+            )
             .all()
         )
     
+    def get_today(
+        self, user_id: int, day: date
+    ) -> List[Tuple[Habit, Optional[Union[HabitEntry, PendingEntry]]]]:
+        """Active habits of a user, each with its entry for `day` (if any), in one query.
+
+        Check-ins still in the write-behind buffer replace the stored entries.
+        """
+        rows = (
+            self.db.query(Habit, HabitEntry)
+            .outerjoin(
+                HabitEntry, and_(HabitEntry.habit_id == Habit.id, HabitEntry.date == day)
+            )
+            .filter(
+                and_(
+                    Habit.owner_id == user_id,
+                    Habit.is_active == True,
+                    Habit.deleted_at.is_(None),
+                )
+            )
+            .order_by(Habit.id, HabitEntry.id)
+            .all()
+        )
+        # Keep the first entry should a habit have several for the day
+        today: Dict[int, Tuple[Habit, Optional[Union[HabitEntry, PendingEntry]]]] = {}
+        for habit, entry in rows:
+            today.setdefault(habit.id, (habit, entry))
+        for pending in sorted(write_behind.pending(user_id, day), key=lambda entry: entry.queued_at):
+            row = today.get(pending.habit_id)
+            if row is not None:
+                habit, stored = row
+                entry = None if pending.deleted else _overlay_pending(pending, stored)
+                today[habit.id] = (habit, entry)
+        return list(today.values())
+    
     def create(self, *, obj_in: HabitCreate, user_id: int) -> Habit:
         """Create new habit."""
         db_obj = Habit(
@@ -48,6 +157,10 @@ class HabitService:
             owner_id=user_id,
         )
         self.db.add(db_obj)
+        self.db.flush()
+        invalidate_on_commit(self.db, user_tag(user_id))
+        publish_on_commit(self.db, user_id, "habit.created", _habit_event(db_obj))
+        record_on_commit(self.db, habits_created=1)
         self.db.commit()
         self.db.refresh(db_obj)
         return db_obj
@@ -68,54 +181,76 @@ class HabitService:
             setattr(db_obj, field, value)
         
         self.db.add(db_obj)
+        invalidate_on_commit(self.db, habit_tag(db_obj.id), user_tag(db_obj.owner_id))
+        publish_on_commit(self.db, db_obj.owner_id, "habit.updated", _habit_event(db_obj))
         self.db.commit()
         self.db.refresh(db_obj)
         return db_obj
     
     def delete(self, *, id: int) -> Habit:
-        """Delete habit."""
+        """Mark habit deleted; its rows are removed later by `PurgeService`."""
         obj = self.db.query(Habit).get(id)
-        self.db.delete(obj)
+        obj.deleted_at = datetime.now(timezone.utc)
+        invalidate_on_commit(self.db, habit_tag(obj.id), user_tag(obj.owner_id))
+        publish_on_commit(self.db, obj.owner_id, "habit.deleted", {"id": obj.id})
         self.db.commit()
         return obj
     
     def update_streak(self, habit: Habit) -> Habit:
-        """Update habit streak based on recent entries."""
-        # Get recent entries ordered by date descending
-        recent_entries = (
-            self.db.query(HabitEntry)
-            .filter(HabitEntry.habit_id == habit.id)
-            .order_by(HabitEntry.date.desc())
-            .limit(30)
-            .all()
-        )
-        
-        if not recent_entries:
-            habit.current_streak = 0
-            self.db.commit()
-            return habit
-        
-        # Calculate current streak
-        current_streak = 0
-        today = date.today()
-        
-        for entry in recent_entries:
-            if entry.completed:
-                if entry.date == today or entry.date == today - timedelta(days=current_streak):
-                    current_streak += 1
-                else:
-                    break
-            else:
-                break
-        
-        habit.current_streak = current_streak
-        
-        # Update longest streak if current is longer
-        if current_streak > habit.longest_streak:
-            habit.longest_streak = current_streak
-        
+        """Update habit streak, counted in periods of the habit's frequency."""
+        self.refresh_streaks([habit])
         self.db.commit()
         return habit
+    
+    def refresh_streaks(self, habits: List[Habit]) -> None:
+        """Recompute streaks without committing, one statement per owner and frequency."""
+        streaks = self.current_streaks(habits)
+        for habit in habits:
+            previous = (habit.current_streak, habit.longest_streak)
+            habit.current_streak = streaks[habit.id]
+            
+            # Update longest streak if current is longer
+            if habit.current_streak > (habit.longest_streak or 0):
+                habit.longest_streak = habit.current_streak
+            
+            self._streak_changed(habit, previous)
+    
+    def current_streaks(self, habits: List[Habit], today: Optional[date] = None) -> Dict[int, int]:
+        """Current streak of each habit as of `today`, without storing it."""
+        today = today or date.today()
+        groups: Dict[Tuple[int, str], Dict[int, Habit]] = {}
+        for habit in habits:
+            frequency = habit.frequency or HabitFrequency.DAILY
+            groups.setdefault((habit.owner_id, frequency), {})[habit.id] = habit
+        
+        streaks: Dict[int, int] = {}
+        for (owner_id, frequency), group in groups.items():
+            # Look back a bounded number of periods (bounded by date so only the
+            # latest partitions are scanned when habit_entries is partitioned)
+            start = period_start(today, frequency)
+            for _ in range(STREAK_LOOKBACK_PERIODS - 1):
+                start = previous_period(start, frequency)
+            summaries = {
+                summary.habit.id: summary
+                for summary in PeriodService(self.db).summarize(
+                    owner_id, start, today, habit_id=next(iter(group)) if len(group) == 1 else None
+                )
+            }
+            for habit_id in group:
+                summary = summaries.get(habit_id)
+                streaks[habit_id] = summary.current_streak if summary else 0
+        return streaks
+    
+    def _streak_changed(self, habit: Habit, previous: Tuple[int, int]) -> None:
+        """Invalidate caches and notify clients when a streak moved."""
+        if (habit.current_streak, habit.longest_streak) == previous:
+            return
+        invalidate_on_commit(self.db, habit_tag(habit.id), user_tag(habit.owner_id))
+        publish_on_commit(self.db, habit.owner_id, "streak.changed", {
+            "habit_id": habit.id,
+            "current_streak": habit.current_streak,
+            "longest_streak": habit.longest_streak,
+        })
 
 
 class HabitEntryService:
@@ -126,7 +261,12 @@ class HabitEntryService:
     
     def get(self, id: int) -> Optional[HabitEntry]:
         """Get habit entry by ID."""
-        return self.db.query(HabitEntry).filter(HabitEntry.id == id).first()
+        return (
+            self.db.query(HabitEntry)
+            .join(Habit, Habit.id == HabitEntry.habit_id)
+            .filter(and_(HabitEntry.id == id, Habit.deleted_at.is_(None)))
+            .first()
+        )
     
     def get_by_habit_and_date(self, habit_id: int, entry_date: date) -> Optional[HabitEntry]:
         """Get habit entry by habit ID and date."""
@@ -136,24 +276,212 @@ class HabitEntryService:
             .first()
         )
     
-    def get_by_habit(self, habit_id: int, skip: int = 0, limit: int = 100) -> List[HabitEntry]:
-        """Get habit entries by habit ID."""
+    def get_by_habit(
+        self,
+        habit_id: int,
+        skip: int = 0,
+        limit: int = 100,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+    ) -> List[HabitEntry]:
+        """Get habit entries by habit ID, optionally within a date range."""
+        query = self.db.query(HabitEntry).filter(HabitEntry.habit_id == habit_id)
+        # Date bounds let PostgreSQL prune habit_entries partitions
+        if start_date is not None:
+            query = query.filter(HabitEntry.date >= start_date)
+        if end_date is not None:
+            query = query.filter(HabitEntry.date <= end_date)
         return (
-            self.db.query(HabitEntry)
-            .filter(HabitEntry.habit_id == habit_id)
+            query
             .order_by(HabitEntry.date.desc())
             .offset(skip)
             .limit(limit)
             .all()
         )
     
-    def get_by_user_and_date(self, user_id: int, entry_date: date) -> List[HabitEntry]:
-        """Get habit entries by user ID and date."""
-        return (
+    def get_range(
+        self, habit_id: int, start_date: date, end_date: date
+    ) -> List[Union[HabitEntry, ArchivedEntry]]:
+        """Get habit entries within a date range, including archived ones."""
+        entries = (
+            self.db.query(HabitEntry)
+            .filter(
+                and_(
+                    HabitEntry.habit_id == habit_id,
+                    HabitEntry.date >= start_date,
+                    HabitEntry.date <= end_date,
+                )
+            )
+            .order_by(HabitEntry.date)
+            .all()
+        )
+        # Only ranges reaching past the archive horizon can touch the archive;
+        # rows archived before ARCHIVE_ENABLED was turned off are still read
+        if start_date >= ArchiveService.horizon():
+            return entries
+        
+        hot_days = {entry.date for entry in entries}
+        archived = [
+            entry
+            for entry in ArchiveService(self.db).read_range(habit_id, start_date, end_date)
+            if entry.date not in hot_days
+        ]
+        return sorted(entries + archived, key=lambda entry: entry.date)
+    
+    def get_by_user_and_date(
+        self, user_id: int, entry_date: date
+    ) -> List[Union[HabitEntry, PendingEntry]]:
+        """Get habit entries by user ID and date, including buffered check-ins."""
+        entries = (
             self.db.query(HabitEntry)
-            .filter(and_(HabitEntry.user_id == user_id, HabitEntry.date == entry_date))
+            .join(Habit, Habit.id == HabitEntry.habit_id)
+            .filter(
+                and_(
+                    HabitEntry.user_id == user_id,
+                    HabitEntry.date == entry_date,
+                    Habit.deleted_at.is_(None),
+                )
+            )
             .all()
         )
+        pending = write_behind.pending(user_id, entry_date)
+        return self._merge_pending(user_id, entries, pending) if pending else entries
+    
+    def _merge_pending(
+        self, user_id: int, entries: List[HabitEntry], pending: List[PendingEntry]
+    ) -> List[Union[HabitEntry, PendingEntry]]:
+        """Overlay check-ins still in the write-behind buffer on stored entries."""
+        live_habits = {
+            habit_id
+            for (habit_id,) in self.db.query(Habit.id).filter(
+                and_(
+                    Habit.id.in_({entry.habit_id for entry in pending}),
+                    Habit.owner_id == user_id,
+                    Habit.deleted_at.is_(None),
+                )
+            )
+        }
+        merged: Dict[int, Union[HabitEntry, PendingEntry]] = {
+            entry.habit_id: entry for entry in entries
+        }
+        for entry in sorted(pending, key=lambda entry: entry.queued_at):
+            if entry.habit_id not in live_habits:
+                continue
+            if entry.deleted:
+                merged.pop(entry.habit_id, None)
+                continue
+            merged[entry.habit_id] = _overlay_pending(entry, merged.get(entry.habit_id))
+        return list(merged.values())
+    
+    def get_pending(self, entry: HabitEntry) -> Optional[PendingEntry]:
+        """Latest buffered check-in for the habit and date of `entry`, if any."""
+        pending = [
+            queued
+            for queued in write_behind.pending(entry.user_id, entry.date)
+            if queued.habit_id == entry.habit_id
+        ]
+        return max(pending, key=lambda queued: queued.queued_at, default=None)
+    
+    def queue_update(
+        self, *, db_obj: HabitEntry, queued: PendingEntry, obj_in: HabitEntryUpdate
+    ) -> PendingEntry:
+        """Queue an update behind the buffered check-in that would overwrite it."""
+        fields = {"completed": queued.completed, "value": queued.value, "notes": queued.notes}
+        fields.update(obj_in.model_dump(exclude_unset=True))
+        pending = write_behind.enqueue(
+            db_obj.user_id,
+            db_obj.habit_id,
+            db_obj.date,
+            fields["completed"],
+            value=fields["value"],
+            notes=fields["notes"],
+        )
+        return _overlay_pending(pending, db_obj)
+    
+    def upsert_many(self, records: List[Dict[str, Any]]) -> int:
+        """Apply buffered check-ins and deletions in one transaction; later ones win."""
+        latest: Dict[Tuple[int, date], Dict[str, Any]] = {}
+        for record in records:
+            latest[(record["habit_id"], date.fromisoformat(record["date"]))] = record
+        if not latest:
+            return 0
+        
+        habits = {
+            habit.id: habit
+            for habit in self.db.query(Habit).filter(
+                and_(Habit.id.in_({habit_id for habit_id, _ in latest}), Habit.deleted_at.is_(None))
+            )
+        }
+        existing = {
+            (entry.habit_id, entry.date): entry
+            for entry in self.db.query(HabitEntry).filter(
+                tuple_(HabitEntry.habit_id, HabitEntry.date).in_(list(latest))
+            )
+        }
+        
+        applied: List[Tuple[HabitEntry, List[str]]] = []
+        deleted: List[HabitEntry] = []
+        valued: List[HabitEntry] = []
+        touched: Dict[int, Habit] = {}
+        checked_in = 0
+        for (habit_id, day), record in latest.items():
+            habit = habits.get(habit_id)
+            # Deleted (or re-owned) since the check-in was queued
+            if habit is None or habit.owner_id != record["user_id"]:
+                continue
+            entry = existing.get((habit_id, day))
+            if record.get("deleted"):
+                if entry is not None:
+                    self.db.delete(entry)
+                    if entry.value is not None:
+                        valued.append(entry)
+                    habit.total_completions = max(
+                        0, (habit.total_completions or 0) - int(bool(entry.completed))
+                    )
+                    deleted.append(entry)
+                    touched[habit.id] = habit
+                continue
+            previous_tags: List[str] = []
+            was_completed = False
+            previous_value = None
+            if entry is None:
+                entry = HabitEntry(habit_id=habit_id, user_id=record["user_id"], date=day)
+                self.db.add(entry)
+            else:
+                previous_tags = _entry_tags(entry)
+                was_completed = bool(entry.completed)
+                previous_value = entry.value
+            if previous_value != record["value"]:
+                valued.append(entry)
+            entry.completed = record["completed"]
+            entry.value = record["value"]
+            entry.notes = record["notes"]
+            # Replaying an already applied record changes nothing
+            habit.total_completions = max(
+                0, (habit.total_completions or 0) + int(entry.completed) - int(was_completed)
+            )
+            checked_in += int(bool(entry.completed) and not was_completed)
+            applied.append((entry, previous_tags))
+            touched[habit.id] = habit
+        
+        self.db.flush()
+        ValueSketchService(self.db).refresh(valued)
+        for entry, previous_tags in applied:
+            invalidate_on_commit(self.db, *previous_tags, *_entry_tags(entry))
+            publish_on_commit(self.db, entry.user_id, "entry.upserted", _entry_event(entry))
+        for entry in deleted:
+            invalidate_on_commit(self.db, *_entry_tags(entry))
+            publish_on_commit(self.db, entry.user_id, "entry.deleted", {
+                "id": entry.id,
+                "habit_id": entry.habit_id,
+                "date": entry.date.isoformat(),
+            })
+        for habit in touched.values():
+            invalidate_on_commit(self.db, habit_tag(habit.id), user_tag(habit.owner_id))
+        HabitService(self.db).refresh_streaks(list(touched.values()))
+        record_on_commit(self.db, check_ins=checked_in)
+        self.db.commit()
+        return len(applied)
     
     def create(self, *, obj_in: HabitEntryCreate, user_id: int) -> HabitEntry:
         """Create new habit entry."""
@@ -168,6 +496,13 @@ class HabitEntryService:
             user_id=user_id,
         )
         self.db.add(db_obj)
+        self.db.flush()
+        if db_obj.value is not None:
+            ValueSketchService(self.db).refresh([db_obj])
+        if db_obj.completed:
+            record_on_commit(self.db, check_ins=1)
+        invalidate_on_commit(self.db, *_entry_tags(db_obj))
+        publish_on_commit(self.db, user_id, "entry.upserted", _entry_event(db_obj))
         self.db.commit()
         self.db.refresh(db_obj)
         
@@ -175,6 +510,7 @@ class HabitEntryService:
         habit = self.db.query(Habit).filter(Habit.id == obj_in.habit_id).first()
         if habit and db_obj.completed:
             habit.total_completions += 1
+            invalidate_on_commit(self.db, habit_tag(habit.id), user_tag(habit.owner_id))
             self.db.commit()
         
         return db_obj
@@ -193,11 +529,18 @@ class HabitEntryService:
         
         # Track completion change for statistics
         was_completed = db_obj.completed
+        previous_value = db_obj.value
         
+        previous_tags = _entry_tags(db_obj)
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         
         self.db.add(db_obj)
+        if db_obj.value != previous_value:
+            self.db.flush()
+            ValueSketchService(self.db).refresh([db_obj])
+        invalidate_on_commit(self.db, *previous_tags, *_entry_tags(db_obj))
+        publish_on_commit(self.db, db_obj.user_id, "entry.upserted", _entry_event(db_obj))
         self.db.commit()
         self.db.refresh(db_obj)
         
@@ -207,8 +550,10 @@ class HabitEntryService:
             if habit:
                 if db_obj.completed and not was_completed:
                     habit.total_completions += 1
+                    record_on_commit(self.db, check_ins=1)
                 elif not db_obj.completed and was_completed:
                     habit.total_completions = max(0, habit.total_completions - 1)
+                invalidate_on_commit(self.db, habit_tag(habit.id), user_tag(habit.owner_id))
                 self.db.commit()
         
         return db_obj
@@ -225,6 +570,15 @@ class HabitEntryService:
                 self.db.commit()
         
         self.db.delete(obj)
+        if obj.value is not None:
+            self.db.flush()
+            ValueSketchService(self.db).refresh([obj])
+        invalidate_on_commit(self.db, *_entry_tags(obj))
+        publish_on_commit(self.db, obj.user_id, "entry.deleted", {
+            "id": obj.id,
+            "habit_id": obj.habit_id,
+            "date": obj.date.isoformat(),
+        })
         self.db.commit()
         return obj
 
@@ -0,0 +1,257 @@
+"""
+Insights service for correlations between a user's habits.
+
+A user's completion history over the last `INSIGHTS_WINDOW_DAYS` full days
+is loaded as a habit × day bit matrix. Pairwise statistics then come from
+a few matrix products instead of per-habit queries:
+
+- co-completion counts ``C = M Mᵀ`` give the co-completion rate of two
+  habits and their lift (how much more often they are completed together
+  than if they were independent),
+- lagged products ``M[:, :-1] M[:, 1:]ᵀ`` give the correlation between
+  completing one habit on a day and completing another the next day.
+
+The matrix (bit-packed) and these sums are cached per user. When the
+window moves forward, only the new days are read and the sums are updated
+with the columns entering and leaving the window; edits to past days evict
+the state through the `user_history_tag` invalidation tag. Since each state
+builds on the previous one, it is read from the primary and not stored if
+such an eviction lands while it is computed.
+"""
+
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+
+from app.core import lazy
+from app.core.cache import TaggedCache, invalidation_bus, user_history_tag
+from app.core.config import settings
+from app.core.routing import read_from_primary
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+
+np = lazy.numpy
+
+insights_cache = invalidation_bus.register(TaggedCache("insights", max_size=1_000))
+
+
+@dataclass
+class CompletionState:
+    """A user's completion matrix over `start`..`end` plus its sufficient statistics."""
+
+    habit_ids: Tuple[int, ...]
+    start: date
+    end: date
+    bits: Any        # packed bool matrix, habits × days
+    completed: Any   # completed days per habit
+    together: Any    # days both habits were completed
+    lag_x: Any       # completions on days that have a following day in the window
+    lag_y: Any       # completions on days that have a preceding day in the window
+    lag_xy: Any      # habit i on day t and habit j on day t + 1
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    def matrix(self):
+        return np.unpackbits(self.bits, axis=1, count=self.days).astype(bool)
+
+
+def _statistics(matrix) -> Dict[str, Any]:
+    values = matrix.astype(np.float32)
+    x, y = values[:, :-1], values[:, 1:]
+    return {
+        "completed": values.sum(axis=1),
+        "together": values @ values.T,
+        "lag_x": x.sum(axis=1),
+        "lag_y": y.sum(axis=1),
+        "lag_xy": x @ y.T,
+    }
+
+
+class InsightsService:
+    """Insights service for database operations."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _habits(self, user_id: int) -> List[Tuple[int, str]]:
+        return self.db.execute(
+            select(Habit.id, Habit.name)
+            .where(and_(Habit.owner_id == user_id, Habit.deleted_at.is_(None)))
+            .order_by(Habit.id)
+        ).all()
+
+    def _load(self, user_id: int, habit_ids: Tuple[int, ...], start: date, end: date):
+        """Completion matrix of `habit_ids` for the days `start`..`end`."""
+        days = (end - start).days + 1
+        matrix = np.zeros((len(habit_ids), max(days, 0)), dtype=bool)
+        if days <= 0 or not habit_ids:
+            return matrix
+        rows = self.db.execute(
+            select(HabitEntry.habit_id, HabitEntry.date).where(
+                and_(
+                    HabitEntry.user_id == user_id,
+                    HabitEntry.habit_id.in_(habit_ids),
+                    HabitEntry.completed == True,
+                    HabitEntry.date >= start,
+                    HabitEntry.date <= end,
+                )
+            )
+        ).all()
+        if rows:
+            row_of = {habit_id: index for index, habit_id in enumerate(habit_ids)}
+            matrix[
+                np.fromiter((row_of[habit_id] for habit_id, _ in rows), dtype=np.int64, count=len(rows)),
+                np.fromiter(((day - start).days for _, day in rows), dtype=np.int64, count=len(rows)),
+            ] = True
+        return matrix
+
+    def _build(self, user_id: int, habit_ids: Tuple[int, ...], start: date, end: date):
+        matrix = self._load(user_id, habit_ids, start, end)
+        return CompletionState(
+            habit_ids=habit_ids,
+            start=start,
+            end=end,
+            bits=np.packbits(matrix, axis=1),
+            **_statistics(matrix),
+        )
+
+    def _advance(self, user_id: int, state: CompletionState, end: date) -> CompletionState:
+        """Move the window to end on `end`, reading only the days that entered it."""
+        shift = (end - state.end).days
+        days = state.days
+        old = state.matrix()
+        new_days = self._load(user_id, state.habit_ids, state.end + timedelta(days=1), end)
+        matrix = np.concatenate([old[:, shift:], new_days], axis=1)
+
+        def product(a, b):
+            return a.astype(np.float32) @ b.astype(np.float32).T
+
+        # Columns and lagged pairs leaving the window...
+        leaving, entering = old[:, :shift], new_days
+        together = state.together - product(leaving, leaving) + product(entering, entering)
+        completed = state.completed - leaving.sum(axis=1) + entering.sum(axis=1)
+        lag_xy = state.lag_xy - product(old[:, :shift], old[:, 1:shift + 1])
+        lag_x = state.lag_x - old[:, :shift].sum(axis=1)
+        lag_y = state.lag_y - old[:, 1:shift + 1].sum(axis=1)
+        # ...and the ones entering it, starting from the previous last day
+        tail = matrix[:, days - shift - 1:]
+        lag_xy = lag_xy + product(tail[:, :-1], tail[:, 1:])
+        lag_x = lag_x + tail[:, :-1].sum(axis=1)
+        lag_y = lag_y + tail[:, 1:].sum(axis=1)
+
+        return CompletionState(
+            habit_ids=state.habit_ids,
+            start=state.start + timedelta(days=shift),
+            end=end,
+            bits=np.packbits(matrix, axis=1),
+            completed=completed,
+            together=together,
+            lag_x=lag_x,
+            lag_y=lag_y,
+            lag_xy=lag_xy,
+        )
+
+    def completion_state(
+        self, user_id: int, end: Optional[date] = None, habits: Optional[List] = None
+    ) -> CompletionState:
+        """Cached completion state of a user's habits for the window ending on `end`."""
+        end = end or date.today() - timedelta(days=1)
+        window = settings.INSIGHTS_WINDOW_DAYS
+        start = end - timedelta(days=window - 1)
+        habits = habits if habits is not None else self._habits(user_id)
+        habit_ids = tuple(habit_id for habit_id, _ in habits)
+
+        tags = [user_history_tag(user_id)]
+        generation = insights_cache.generation(tags)
+        state = insights_cache.get(user_id)
+        if (
+            state is None
+            or state.habit_ids != habit_ids
+            or state.days != window
+            or not state.end <= end < state.end + timedelta(days=window - 1)
+        ):
+            read_from_primary(self.db)
+            state = self._build(user_id, habit_ids, start, end)
+        elif state.end < end:
+            read_from_primary(self.db)
+            state = self._advance(user_id, state, end)
+        insights_cache.set(
+            user_id, state, tags=tags, ttl=settings.INSIGHTS_CACHE_TTL_SECONDS, generation=generation
+        )
+        return state
+
+    def insights(
+        self, user_id: int, limit: int = 10, end: Optional[date] = None
+    ) -> Dict[str, Any]:
+        """Habit pairs completed together most and strongest next-day predictors."""
+        habits = self._habits(user_id)
+        names = dict(habits)
+        state = self.completion_state(user_id, end, habits)
+        result = {
+            "start_date": state.start,
+            "end_date": state.end,
+            "days": state.days,
+            "together": [],
+            "predictors": [],
+        }
+        if len(habits) < 2:
+            return result
+        ids = state.habit_ids
+        days = state.days
+
+        # Co-completion and lift of unordered pairs with enough support
+        completed = state.completed
+        expected = np.outer(completed, completed) / days
+        with np.errstate(divide="ignore", invalid="ignore"):
+            lift = np.where(expected > 0, state.together / expected, 0.0)
+        upper = np.triu(np.ones_like(lift, dtype=bool), k=1)
+        eligible = upper & (state.together >= settings.INSIGHTS_MIN_SUPPORT)
+        for i, j in _top(np.where(eligible, lift, -np.inf), limit):
+            result["together"].append({
+                "habit_id": ids[i],
+                "habit_name": names[ids[i]],
+                "other_habit_id": ids[j],
+                "other_habit_name": names[ids[j]],
+                "support": int(state.together[i, j]),
+                "co_completion_rate": float(state.together[i, j] / days),
+                "lift": float(lift[i, j]),
+            })
+
+        # Pearson correlation of habit i on day t with habit j on day t + 1
+        pairs = days - 1
+        if pairs > 1:
+            covariance = pairs * state.lag_xy - np.outer(state.lag_x, state.lag_y)
+            spread = np.outer(
+                pairs * state.lag_x - state.lag_x ** 2, pairs * state.lag_y - state.lag_y ** 2
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                correlation = np.where(spread > 0, covariance / np.sqrt(spread), 0.0)
+            np.fill_diagonal(correlation, 0.0)
+            for i, j in _top(np.abs(correlation), limit):
+                if correlation[i, j] == 0:
+                    break
+                result["predictors"].append({
+                    "habit_id": ids[i],
+                    "habit_name": names[ids[i]],
+                    "other_habit_id": ids[j],
+                    "other_habit_name": names[ids[j]],
+                    "lag_days": 1,
+                    "correlation": float(correlation[i, j]),
+                })
+        return result
+
+
+def _top(scores, limit: int) -> List[Tuple[int, int]]:
+    """Indices of the `limit` largest finite scores, best first."""
+    flat = scores.ravel()
+    count = min(limit, int(np.isfinite(flat).sum()))
+    if count <= 0:
+        return []
+    best = np.argpartition(-flat, count - 1)[:count]
+    best = best[np.argsort(-flat[best], kind="stable")]
+    return [tuple(int(v) for v in np.unravel_index(index, scores.shape)) for index in best]
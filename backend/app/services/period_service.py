@@ -0,0 +1,197 @@
+"""
+Period aggregation for daily, weekly and monthly habits.
+
+Entries are bucketed in SQL into the periods of their habit's frequency
+(days, ISO weeks starting on Monday, calendar months), so one statement
+yields per-period completion for every habit of a user. A period counts as
+completed when at least one of its entries is completed; streaks and
+completion rates are then counted in periods rather than days.
+"""
+
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Set
+
+from sqlalchemy import Date, and_, case, cast, func, literal_column, select, type_coerce
+from sqlalchemy.orm import Session
+
+from app.models.habit import Habit, HabitFrequency
+from app.models.habit_entry import HabitEntry
+
+
+# Period arithmetic
+def period_start(day: date, frequency: str) -> date:
+    """First day of the period of `frequency` containing `day`."""
+    if frequency == HabitFrequency.WEEKLY:
+        return day - timedelta(days=day.weekday())
+    if frequency == HabitFrequency.MONTHLY:
+        return day.replace(day=1)
+    return day
+
+
+def previous_period(start: date, frequency: str) -> date:
+    """First day of the period before the one starting on `start`."""
+    if frequency == HabitFrequency.WEEKLY:
+        return start - timedelta(days=7)
+    if frequency == HabitFrequency.MONTHLY:
+        return (start - timedelta(days=1)).replace(day=1)
+    return start - timedelta(days=1)
+
+
+def period_count(start: date, end: date, frequency: str) -> int:
+    """Number of periods of `frequency` overlapping `start`..`end`."""
+    first, last = period_start(start, frequency), period_start(end, frequency)
+    if last < first:
+        return 0
+    if frequency == HabitFrequency.WEEKLY:
+        return (last - first).days // 7 + 1
+    if frequency == HabitFrequency.MONTHLY:
+        return (last.year - first.year) * 12 + last.month - first.month + 1
+    return (last - first).days + 1
+
+
+def period_start_expression(dialect: str):
+    """SQL expression for the start of each entry's period, by habit frequency."""
+    if dialect == "postgresql":
+        weekly = cast(func.date_trunc(literal_column("'week'"), HabitEntry.date), Date)
+        monthly = cast(func.date_trunc(literal_column("'month'"), HabitEntry.date), Date)
+    else:
+        # SQLite: move to the week's Sunday, then back to its Monday
+        weekly = type_coerce(func.date(HabitEntry.date, "weekday 0", "-6 days"), Date)
+        monthly = type_coerce(func.date(HabitEntry.date, "start of month"), Date)
+    return case(
+        (Habit.frequency == HabitFrequency.WEEKLY.value, weekly),
+        (Habit.frequency == HabitFrequency.MONTHLY.value, monthly),
+        else_=HabitEntry.date,
+    )
+
+
+@dataclass
+class PeriodSummary:
+    """Completion of one habit over a window, counted in its own periods."""
+
+    habit: Habit
+    total_periods: int = 0
+    completed_periods: int = 0
+    completed_entries: int = 0
+    current_streak: int = 0
+    longest_streak: int = 0
+    average_value: Optional[float] = None
+    completed: Set[date] = field(default_factory=set, repr=False)
+
+    @property
+    def frequency(self) -> str:
+        return self.habit.frequency or HabitFrequency.DAILY.value
+
+    @property
+    def completion_rate(self) -> float:
+        if not self.total_periods:
+            return 0.0
+        return self.completed_periods / self.total_periods * 100
+
+
+def _streaks(summary: PeriodSummary, end: date) -> None:
+    """Fill in the current and longest streak from the completed periods."""
+    frequency = summary.frequency
+    # The period in progress does not break a streak until it is over
+    period = period_start(end, frequency)
+    if period not in summary.completed:
+        period = previous_period(period, frequency)
+    current = 0
+    while period in summary.completed:
+        current += 1
+        period = previous_period(period, frequency)
+
+    longest = run = 0
+    previous = None
+    for period in sorted(summary.completed):
+        run = run + 1 if previous == previous_period(period, frequency) else 1
+        longest = max(longest, run)
+        previous = period
+    summary.current_streak = current
+    summary.longest_streak = longest
+
+
+class PeriodService:
+    """Period aggregation service for database operations."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def summarize(
+        self,
+        owner_id: int,
+        start: date,
+        end: date,
+        habit_id: Optional[int] = None,
+    ) -> List[PeriodSummary]:
+        """Per-period completion, streaks and rates of a user's habits.
+
+        Every habit of `owner_id` (or only `habit_id`) is summarized over the
+        periods overlapping `start`..`end` in a single statement.
+        """
+        habit_filter = and_(Habit.owner_id == owner_id, Habit.deleted_at.is_(None))
+        if habit_id is not None:
+            habit_filter = and_(habit_filter, Habit.id == habit_id)
+
+        bucketed = (
+            select(
+                HabitEntry.habit_id.label("habit_id"),
+                period_start_expression(self.db.get_bind().dialect.name).label("period_start"),
+                case((HabitEntry.completed == True, 1), else_=0).label("completed"),
+                HabitEntry.value.label("value"),
+            )
+            .join(Habit, Habit.id == HabitEntry.habit_id)
+            .where(and_(habit_filter, HabitEntry.date >= start, HabitEntry.date <= end))
+            .subquery()
+        )
+        periods = (
+            select(
+                bucketed.c.habit_id,
+                bucketed.c.period_start,
+                func.max(bucketed.c.completed).label("completed"),
+                func.sum(bucketed.c.completed).label("completed_entries"),
+                func.sum(bucketed.c.value).label("value_sum"),
+                func.count(bucketed.c.value).label("value_count"),
+            )
+            .group_by(bucketed.c.habit_id, bucketed.c.period_start)
+            .subquery()
+        )
+        rows = self.db.execute(
+            select(
+                Habit,
+                periods.c.period_start,
+                periods.c.completed,
+                periods.c.completed_entries,
+                periods.c.value_sum,
+                periods.c.value_count,
+            )
+            .outerjoin(periods, periods.c.habit_id == Habit.id)
+            .where(habit_filter)
+            .order_by(Habit.id, periods.c.period_start)
+        ).all()
+
+        summaries: Dict[int, PeriodSummary] = {}
+        value_totals: Dict[int, List[float]] = {}
+        for habit, start_of_period, completed, completed_entries, value_sum, value_count in rows:
+            summary = summaries.get(habit.id)
+            if summary is None:
+                summary = summaries[habit.id] = PeriodSummary(habit=habit)
+                summary.total_periods = period_count(start, end, summary.frequency)
+                value_totals[habit.id] = [0.0, 0]
+            if start_of_period is None:
+                continue
+            summary.completed_entries += completed_entries or 0
+            if completed:
+                summary.completed.add(start_of_period)
+            totals = value_totals[habit.id]
+            totals[0] += value_sum or 0.0
+            totals[1] += value_count or 0
+
+        for habit_id, summary in summaries.items():
+            summary.completed_periods = len(summary.completed)
+            value_sum, value_count = value_totals[habit_id]
+            if value_count:
+                summary.average_value = value_sum / value_count
+            _streaks(summary, end)
+        return list(summaries.values())
@@ -0,0 +1,104 @@
+"""
+Purge service for removing soft-deleted habits and deactivated users.
+
+Deleting a habit or deactivating an account only marks the row; the data
+is removed here, outside the request, with bulk DELETEs of at most
+`PURGE_CHUNK_SIZE` rows per transaction so that purging years of entries
+never holds long locks or loads rows into memory. The final DELETE of the
+habit or user row relies on ON DELETE CASCADE for anything written since.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.sharding import sharded
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.models.habit_entry_archive import HabitEntryArchive
+from app.models.habit_value_sketch import HabitValueSketch
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+
+class PurgeService:
+    """Purge service for database operations."""
+
+    def __init__(self, db: Session, chunk_size: Optional[int] = None):
+        self.db = db
+        self.chunk_size = chunk_size or settings.PURGE_CHUNK_SIZE
+
+    def _delete_in_chunks(self, model, condition) -> int:
+        """Delete rows of `model` matching `condition`, one chunk per commit."""
+        deleted = 0
+        while True:
+            chunk = select(model.id).where(condition).limit(self.chunk_size)
+            result = self.db.execute(
+                delete(model).where(model.id.in_(chunk.scalar_subquery())),
+                execution_options={"synchronize_session": False},
+            )
+            self.db.commit()
+            deleted += result.rowcount
+            if result.rowcount < self.chunk_size:
+                return deleted
+
+    def purge_habit(self, habit_id: int) -> int:
+        """Remove a habit with its entries and archives; returns entries removed."""
+        entries = self._delete_in_chunks(HabitEntry, HabitEntry.habit_id == habit_id)
+        self._delete_in_chunks(HabitEntryArchive, HabitEntryArchive.habit_id == habit_id)
+        self._delete_in_chunks(HabitValueSketch, HabitValueSketch.habit_id == habit_id)
+        self.db.execute(
+            delete(Habit).where(Habit.id == habit_id),
+            execution_options={"synchronize_session": False},
+        )
+        self.db.commit()
+        return entries
+
+    def purge_user(self, user_id: int) -> int:
+        """Remove a user with all their data; returns entries removed."""
+        entries = self._delete_in_chunks(HabitEntry, HabitEntry.user_id == user_id)
+        self._delete_in_chunks(HabitEntryArchive, HabitEntryArchive.user_id == user_id)
+        self._delete_in_chunks(HabitValueSketch, HabitValueSketch.user_id == user_id)
+        self._delete_in_chunks(Habit, Habit.owner_id == user_id)
+        self.db.execute(
+            delete(User).where(User.id == user_id),
+            execution_options={"synchronize_session": False},
+        )
+        self.db.commit()
+        return entries
+
+    def purge_pending(self, now: Optional[datetime] = None, limit: int = 100) -> Dict[str, int]:
+        """Purge deleted habits and users deactivated longer than the grace period."""
+        now = now or datetime.now(timezone.utc)
+        counts = {"habits": 0, "users": 0, "entries": 0}
+
+        habit_ids = self.db.scalars(
+            select(Habit.id).where(Habit.deleted_at.is_not(None)).limit(limit)
+        ).all()
+        for habit_id in habit_ids:
+            counts["entries"] += self.purge_habit(habit_id)
+            counts["habits"] += 1
+
+        cutoff = now - timedelta(days=settings.PURGE_USER_GRACE_DAYS)
+        user_ids = self.db.scalars(
+            select(User.id)
+            .where(User.is_active == False, User.deactivated_at <= cutoff)
+            .limit(limit)
+        ).all()
+        router = sharded(self.db)
+        for user_id in user_ids:
+            counts["entries"] += self.purge_user(user_id)
+            counts["users"] += 1
+            if router is not None:
+                router.forget(user_id)
+
+        if counts["habits"] or counts["users"]:
+            logger.info(
+                "Purged %(habits)d habits and %(users)d users (%(entries)d entries)", counts
+            )
+        return counts
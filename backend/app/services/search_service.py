@@ -0,0 +1,112 @@
+"""
+Search service for full-text search over a user's habits and entry notes.
+"""
+
+from typing import Any, Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.core.search import (
+    ENTRIES_FTS,
+    ENTRY_DOCUMENT,
+    HABIT_DOCUMENT,
+    HABITS_FTS,
+    TEXT_SEARCH_CONFIG,
+    fts5_match,
+    query_terms,
+)
+
+SNIPPET_CHARS = 120
+
+SQLITE_SEARCH = f"""
+SELECT 'habit' AS kind, habits.id AS habit_id, habits.name AS habit_name,
+       NULL AS entry_id, NULL AS entry_date,
+       coalesce(habits.description, habits.name) AS text,
+       -bm25({HABITS_FTS}, 0.0, 10.0, 1.0) AS rank
+FROM {HABITS_FTS} JOIN habits ON habits.id = {HABITS_FTS}.rowid
+WHERE {HABITS_FTS} MATCH :habit_match AND habits.deleted_at IS NULL
+UNION ALL
+SELECT 'entry', habits.id, habits.name, habit_entries.id, habit_entries.date,
+       habit_entries.notes, -bm25({ENTRIES_FTS}, 0.0, 1.0)
+FROM {ENTRIES_FTS}
+JOIN habit_entries ON habit_entries.id = {ENTRIES_FTS}.rowid
+JOIN habits ON habits.id = habit_entries.habit_id
+WHERE {ENTRIES_FTS} MATCH :entry_match AND habits.deleted_at IS NULL
+ORDER BY rank DESC, kind DESC, entry_id DESC
+LIMIT :limit OFFSET :skip
+"""
+
+POSTGRESQL_SEARCH = f"""
+WITH query AS (SELECT to_tsquery('{TEXT_SEARCH_CONFIG}', :tsquery) AS q)
+SELECT 'habit' AS kind, habits.id AS habit_id, habits.name AS habit_name,
+       NULL::integer AS entry_id, NULL::date AS entry_date,
+       coalesce(habits.description, habits.name) AS text,
+       ts_rank({HABIT_DOCUMENT}, query.q) AS rank
+FROM habits, query
+WHERE {HABIT_DOCUMENT} @@ query.q
+  AND habits.owner_id = :user_id AND habits.deleted_at IS NULL
+UNION ALL
+SELECT 'entry', habits.id, habits.name, habit_entries.id, habit_entries.date,
+       habit_entries.notes, ts_rank({ENTRY_DOCUMENT}, query.q)
+FROM habit_entries JOIN habits ON habits.id = habit_entries.habit_id, query
+WHERE {ENTRY_DOCUMENT} @@ query.q
+  AND habit_entries.user_id = :user_id AND habits.deleted_at IS NULL
+ORDER BY rank DESC, kind DESC, entry_id DESC
+LIMIT :limit OFFSET :skip
+"""
+
+
+def snippet(content: str, terms: List[str], width: int = SNIPPET_CHARS) -> str:
+    """Excerpt of `content` around the first matching term."""
+    lowered = content.lower()
+    positions = [lowered.find(term) for term in terms if term in lowered]
+    start = max(0, min(positions) - width // 3) if positions else 0
+    excerpt = content[start:start + width]
+    if start > 0:
+        excerpt = "…" + excerpt
+    if start + width < len(content):
+        excerpt += "…"
+    return excerpt
+
+
+class SearchService:
+    """Search service for database operations."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def search(
+        self, user_id: int, query: str, skip: int = 0, limit: int = 20
+    ) -> List[Dict[str, Any]]:
+        """Habits and entries of `user_id` matching every word of `query`, best first."""
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        if self.db.get_bind().dialect.name == "postgresql":
+            statement = POSTGRESQL_SEARCH
+            params = {
+                "tsquery": " & ".join(terms[:-1] + [f"{terms[-1]}:*"]),
+                "user_id": user_id,
+            }
+        else:
+            statement = SQLITE_SEARCH
+            params = {
+                "habit_match": fts5_match(terms, user_id, "{name description}"),
+                "entry_match": fts5_match(terms, user_id, "notes"),
+            }
+        rows = self.db.execute(text(statement), {**params, "skip": skip, "limit": limit})
+
+        return [
+            {
+                "kind": row.kind,
+                "habit_id": row.habit_id,
+                "habit_name": row.habit_name,
+                "entry_id": row.entry_id,
+                "entry_date": row.entry_date,
+                "snippet": snippet(row.text or "", terms),
+                "rank": float(row.rank or 0.0),
+            }
+            for row in rows
+        ]
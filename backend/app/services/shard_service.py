@@ -0,0 +1,358 @@
+"""
+Shard service for moving users between shards while they keep using the app.
+
+Moves run as background jobs (`ShardMoveJob`) on a thread of the worker that
+accepted them, in batches of SHARD_MOVE_BATCH_SIZE users. The rows of a
+batch are copied to their target shards without blocking the users, then
+the whole batch is marked as moving in one directory update, which evicts
+the users' cached placements on every worker through the invalidation bus:
+from then on their writes are refused with 503 and Retry-After (reads
+still work). After SHARD_MOVE_SETTLE_SECONDS, for requests already past the
+check to finish, each user's rows are compared with the copy and every row
+added, changed or deleted since it was made is re-copied. Timestamps are not
+trusted for this: a transaction that began before the copy can commit
+during it with older `created_at`/`updated_at` values. The directory is
+then pointed at the target and the user's writes resume there.
+
+Source rows are purged once the directory cache TTL has passed since the
+switch, so a worker that missed the eviction still finds the user's data
+where its cached placement sends it. A failed move clears the user's flag
+and removes the partial copy; the user stays where they were and the rest
+of the batch carries on.
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, delete, insert, select, update
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.sharding import sharded
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.models.habit_entry_archive import HabitEntryArchive
+from app.models.habit_value_sketch import HabitValueSketch
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+from app.services.purge_service import PurgeService
+
+logger = logging.getLogger(__name__)
+
+# Tables holding a user's rows with the column naming the user, parents first
+USER_TABLES = [
+    (User.__table__, "id"),
+    (Habit.__table__, "owner_id"),
+    (HabitEntry.__table__, "user_id"),
+    (HabitEntryArchive.__table__, "user_id"),
+    (HabitValueSketch.__table__, "user_id"),
+    (RevokedToken.__table__, "user_id"),
+]
+COPY_CHUNK_SIZE = 1000
+MOVE_JOBS_KEPT = 50
+
+
+class ShardMoveJob:
+    """Users being moved to other shards in the background."""
+
+    def __init__(self, plan: List[Tuple[int, int]]):
+        self.id = uuid.uuid4().hex
+        # (user id, target shard)
+        self.plan = plan
+        self.status = "queued"
+        self.moves: List[Dict] = []
+        self.error: Optional[str] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.thread: Optional[threading.Thread] = None
+
+    @property
+    def user_ids(self) -> set:
+        return {user_id for user_id, _ in self.plan}
+
+    @property
+    def running(self) -> bool:
+        return self.status in ("queued", "running")
+
+    def as_dict(self) -> Dict:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "users": len(self.plan),
+            "moves": self.moves,
+            "error": self.error,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ShardMoveJobs:
+    """Move jobs of this worker: the running ones and the most recent others."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.stopping = threading.Event()
+        self._jobs: "OrderedDict[str, ShardMoveJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def start(self, job: ShardMoveJob, run: Callable[[ShardMoveJob], None]) -> ShardMoveJob:
+        """Run `job` on its own thread, unless one of its users is being moved already."""
+        with self._lock:
+            for other in self._jobs.values():
+                busy = other.user_ids & job.user_ids if other.running else set()
+                if busy:
+                    raise ValueError(f"User {min(busy)} is already being moved")
+            self._jobs[job.id] = job
+            finished = [other.id for other in self._jobs.values() if not other.running]
+            while len(self._jobs) > self.max_size and finished:
+                del self._jobs[finished.pop(0)]
+        job.thread = threading.Thread(
+            target=run, args=(job,), name=f"shard-move:{job.id}", daemon=True
+        )
+        job.thread.start()
+        return job
+
+    def get(self, job_id: str) -> Optional[ShardMoveJob]:
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[ShardMoveJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def stop(self, timeout: float) -> None:
+        """Start no further batches and wait up to `timeout` for the current ones."""
+        self.stopping.set()
+        deadline = time.monotonic() + timeout
+        for job in self.list():
+            if job.thread is not None:
+                job.thread.join(max(0.0, deadline - time.monotonic()))
+        self.stopping.clear()
+
+
+move_jobs = ShardMoveJobs(MOVE_JOBS_KEPT)
+
+
+class ShardService:
+    """Shard service for database operations."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        self.router = sharded(db)
+        if self.router is None:
+            raise ValueError("The database is not sharded")
+
+    def summary(self) -> Dict[str, List[Dict[str, int]]]:
+        """Users per shard, and how many the hash ring would place elsewhere."""
+        counts = self.router.counts()
+        misplaced = {shard: 0 for shard in counts}
+        for user_id, shard in self.router.users():
+            if self.router.ring.shard_for(user_id) != shard:
+                misplaced[shard] += 1
+        return {
+            "shards": [
+                {"shard": shard, "users": counts[shard], "misplaced": misplaced[shard]}
+                for shard in sorted(counts)
+            ]
+        }
+
+    def plan_move(self, user_id: int, target: int) -> List[Tuple[int, int]]:
+        """Check that a user can be moved to shard `target`."""
+        if not 0 <= target < len(self.router.engines):
+            raise ValueError(f"Unknown shard {target}")
+        if self.router.lookup(user_id, cached=False)[1]:
+            raise ValueError(f"User {user_id} is already being moved")
+        return [(user_id, target)]
+
+    def plan_rebalance(self, limit: int = 100) -> List[Tuple[int, int]]:
+        """Up to `limit` users not on the shard the hash ring assigns them."""
+        plan = []
+        for user_id, shard in self.router.users():
+            if len(plan) >= limit:
+                break
+            target = self.router.ring.shard_for(user_id)
+            if target != shard:
+                plan.append((user_id, target))
+        return plan
+
+    def start_moves(self, plan: List[Tuple[int, int]]) -> ShardMoveJob:
+        """Move the users of `plan` in a background job."""
+        return move_jobs.start(ShardMoveJob(plan), self._run)
+
+    def _run(self, job: ShardMoveJob) -> None:
+        job.status = "running"
+        try:
+            self.move_users(job.plan, results=job.moves, stop=move_jobs.stopping)
+        except Exception as e:
+            logger.exception("Shard move job %s failed", job.id)
+            job.status, job.error = "failed", str(e)
+        else:
+            job.status = "done" if len(job.moves) == len(job.plan) else "stopped"
+        job.finished_at = datetime.now(timezone.utc)
+
+    def move_user(self, user_id: int, target: int) -> Dict:
+        """Move a user and all their rows to shard `target`, waiting for the move."""
+        return self.move_users(self.plan_move(user_id, target))[0]
+
+    def move_users(
+        self,
+        plan: List[Tuple[int, int]],
+        results: Optional[List[Dict]] = None,
+        stop: Optional[threading.Event] = None,
+    ) -> List[Dict]:
+        """Move users to their target shards in batches; one result per user moved."""
+        results = [] if results is None else results
+        # (purge after, [(source engine, user id)])
+        purges: List[Tuple[float, List[Tuple[Engine, int]]]] = []
+        batch_size = settings.SHARD_MOVE_BATCH_SIZE
+        try:
+            for start in range(0, len(plan), batch_size):
+                if stop is not None and stop.is_set():
+                    break
+                moved = self._move_batch(plan[start:start + batch_size], results)
+                purges.append((time.monotonic() + (self.router.cache.ttl or 0), moved))
+        finally:
+            for purge_after, moved in purges:
+                if stop is None or not stop.is_set():
+                    time.sleep(max(0.0, purge_after - time.monotonic()))
+                for engine, user_id in moved:
+                    self._purge(engine, user_id)
+        return results
+
+    def _move_batch(
+        self, batch: List[Tuple[int, int]], results: List[Dict]
+    ) -> List[Tuple[Engine, int]]:
+        """Move a batch of users, refusing their writes for one settle period."""
+        copied = []
+        for user_id, target in batch:
+            source, moving = self.router.lookup(user_id, cached=False)
+            result = {
+                "user_id": user_id,
+                "source": source,
+                "target": target,
+                "copied": 0,
+                "caught_up": 0,
+                "error": None,
+            }
+            results.append(result)
+            if moving:
+                result["error"] = "Already being moved"
+                continue
+            if source == target:
+                continue
+            target_engine = self.router.engines[target]
+            self._purge(target_engine, user_id)  # leftovers of an earlier failed move
+            try:
+                result["copied"] = self._copy(self.router.engines[source], target_engine, user_id)
+            except Exception as e:
+                self._failed(result, e)
+                continue
+            copied.append(result)
+        if not copied:
+            return []
+
+        self.router.set_moving_many([result["user_id"] for result in copied], True)
+        time.sleep(settings.SHARD_MOVE_SETTLE_SECONDS)
+        moved = []
+        for result in copied:
+            user_id = result["user_id"]
+            source_engine = self.router.engines[result["source"]]
+            try:
+                result["caught_up"] = self._resync(
+                    source_engine, self.router.engines[result["target"]], user_id
+                )
+                self.router.assign(user_id, result["target"])
+            except Exception as e:
+                self.router.set_moving(user_id, False)
+                self._failed(result, e)
+                continue
+            moved.append((source_engine, user_id))
+            logger.info(
+                "Moved user %d from shard %d to shard %d", user_id, result["source"], result["target"]
+            )
+        return moved
+
+    def _failed(self, result: Dict, error: Exception) -> None:
+        """Record a failed move and remove its partial copy; the user stays put."""
+        logger.exception("Moving user %d to shard %d failed", result["user_id"], result["target"])
+        result["error"] = str(error)
+        self._purge(self.router.engines[result["target"]], result["user_id"])
+
+    @staticmethod
+    def _purge(engine: Engine, user_id: int) -> None:
+        with Session(bind=engine) as db:
+            PurgeService(db).purge_user(user_id)
+
+    @staticmethod
+    def _owned(table, column: str, user_id: int):
+        return table.c[column] == user_id
+
+    def _copy(self, source: Engine, target: Engine, user_id: int) -> int:
+        """Copy every row of the user in one target transaction."""
+        copied = 0
+        with source.connect() as reader, target.begin() as writer:
+            for table, column in USER_TABLES:
+                rows = reader.execute(
+                    select(table).where(self._owned(table, column, user_id)).order_by(table.c.id)
+                )
+                copied += self._insert(writer, table, rows)
+        return copied
+
+    def _resync(self, source: Engine, target: Engine, user_id: int) -> int:
+        """Make the target copy match the source row by row, under the moving flag."""
+        changed = 0
+        with source.connect() as reader, target.begin() as writer:
+            vanished = []
+            for table, column in USER_TABLES:
+                owned = self._owned(table, column, user_id)
+                source_rows = self._rows(reader, table, owned)
+                target_rows = self._rows(writer, table, owned)
+                vanished.append((table, target_rows.keys() - source_rows.keys()))
+
+                added = [row for id_, row in source_rows.items() if id_ not in target_rows]
+                updated = [
+                    row
+                    for id_, row in source_rows.items()
+                    if id_ in target_rows and row != target_rows[id_]
+                ]
+                changed += self._insert(writer, table, added)
+                if updated:
+                    writer.execute(
+                        update(table).where(table.c.id == bindparam("_id")),
+                        [{**row, "_id": row["id"]} for row in updated],
+                    )
+                    changed += len(updated)
+            # Children before parents
+            for table, ids in reversed(vanished):
+                for start in range(0, len(ids), COPY_CHUNK_SIZE):
+                    chunk = sorted(ids)[start:start + COPY_CHUNK_SIZE]
+                    writer.execute(delete(table).where(table.c.id.in_(chunk)))
+                changed += len(ids)
+        return changed
+
+    @staticmethod
+    def _rows(connection: Connection, table, condition) -> Dict[int, Dict]:
+        return {
+            row["id"]: dict(row)
+            for row in connection.execute(select(table).where(condition)).mappings()
+        }
+
+    @staticmethod
+    def _insert(connection: Connection, table, rows) -> int:
+        inserted = 0
+        chunk: List[Dict] = []
+        for row in rows:
+            chunk.append(dict(row._mapping) if hasattr(row, "_mapping") else dict(row))
+            if len(chunk) == COPY_CHUNK_SIZE:
+                connection.execute(insert(table), chunk)
+                inserted += len(chunk)
+                chunk = []
+        if chunk:
+            connection.execute(insert(table), chunk)
+            inserted += len(chunk)
+        return inserted
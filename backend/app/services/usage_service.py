@@ -0,0 +1,87 @@
+"""
+Usage service for platform-wide usage reports.
+
+Reads the daily rollups maintained by `app.core.usage` (at most one row per
+day of the window) and folds in this worker's deltas that are not flushed
+yet. Weekly and monthly buckets add their days' counters and merge their
+days' active-user sketches, so distinct users are not counted twice.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import Session
+
+from app.core.sharding import sharded
+from app.core.sketches import HyperLogLog
+from app.core.usage import COUNTERS, HLL_PRECISION, DayUsage, usage_rollups
+from app.models.habit import HabitFrequency
+from app.models.usage_rollup import UsageRollup
+from app.services.period_service import period_start
+
+
+class UsageService:
+    """Usage service for database operations."""
+
+    def __init__(self, db: Session):
+        self.db = db
+        router = sharded(db)
+        # Rollups live on the primary, whichever shard the session is bound to
+        self.bind_arguments = {"bind": router.engines[0]} if router is not None else None
+
+    def days(self, start_date: date, end_date: date) -> Dict[date, DayUsage]:
+        """Usage of each day within [start_date, end_date] that had any."""
+        rows = self.db.execute(
+            select(UsageRollup).where(
+                and_(UsageRollup.day >= start_date, UsageRollup.day <= end_date)
+            ),
+            bind_arguments=self.bind_arguments,
+        ).scalars()
+        days = {
+            row.day: DayUsage(
+                active_users=HyperLogLog.from_bytes(row.active_users),
+                counts={name: getattr(row, name) for name in COUNTERS},
+            )
+            for row in rows
+        }
+        for day, usage in usage_rollups.pending().items():
+            if start_date <= day <= end_date:
+                days.setdefault(day, DayUsage()).merge(usage)
+        return days
+
+    def report(
+        self, start_date: date, end_date: date, period: str = HabitFrequency.DAILY
+    ) -> Dict:
+        """Usage of the window in buckets of `period`, plus its distinct active users."""
+        days = self.days(start_date, end_date)
+        buckets: Dict[date, DayUsage] = {}
+        day = start_date
+        while day <= end_date:
+            bucket = buckets.setdefault(max(period_start(day, period), start_date), DayUsage())
+            usage = days.get(day)
+            if usage is not None:
+                bucket.merge(usage)
+            day += timedelta(days=1)
+        total = HyperLogLog(HLL_PRECISION)
+        for bucket in buckets.values():
+            total.merge(bucket.active_users)
+
+        starts = sorted(buckets)
+        ends = [next_start - timedelta(days=1) for next_start in starts[1:]] + [end_date]
+        rows: List[Dict] = [
+            {
+                "start_date": start,
+                "end_date": end,
+                "active_users": buckets[start].active_users.count(),
+                **buckets[start].counts,
+            }
+            for start, end in zip(starts, ends)
+        ]
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "period": period,
+            "active_users": total.count(),
+            "buckets": rows,
+        }
@@ -4,9 +4,14 @@ User service for user management operations.
 
 from typing import Any, Dict, Optional, Union
 
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 
+from app.core.cache import invalidate_on_commit, user_tag
+from app.core.routing import SHARD
 from app.core.security import get_password_hash, verify_password
+from app.core.sharding import sharded
+from app.core.usage import record_on_commit
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
 
@@ -19,16 +24,42 @@ class UserService:
     
     def get(self, id: int) -> Optional[User]:
         """Get user by ID."""
+        router = sharded(self.db)
+        if router is not None:
+            shard = router.shard_for_user(id)
+            if shard != self.db.shard():
+                return self._get_from_shard(shard, User.id == id)
         return self.db.query(User).filter(User.id == id).first()
     
     def get_by_email(self, *, email: str) -> Optional[User]:
         """Get user by email."""
+        router = sharded(self.db)
+        if router is not None:
+            # The directory knows every email and its shard
+            found = router.find_email(email)
+            if found is None:
+                return None
+            return self._get_from_shard(found[1], User.email == email)
         return self.db.query(User).filter(User.email == email).first()
     
     def get_by_username(self, *, username: str) -> Optional[User]:
         """Get user by username."""
+        router = sharded(self.db)
+        if router is not None:
+            for shard in range(len(router.engines)):
+                user = self._get_from_shard(shard, User.username == username)
+                if user is not None:
+                    return user
+            return None
         return self.db.query(User).filter(User.username == username).first()
     
+    def _get_from_shard(self, shard: int, condition) -> Optional[User]:
+        """Load a user from `shard` without binding the session to it."""
+        return self.db.scalars(
+            select(User).where(condition),
+            bind_arguments={"bind": sharded(self.db).engines[shard]},
+        ).first()
+    
     def create(self, *, obj_in: UserCreate) -> User:
         """Create new user."""
         db_obj = User(
@@ -40,8 +71,23 @@ class UserService:
             timezone=obj_in.timezone,
             theme=obj_in.theme,
         )
-        self.db.add(db_obj)
-        self.db.commit()
+        record_on_commit(self.db, users_registered=1)
+        router = sharded(self.db)
+        if router is None:
+            self.db.add(db_obj)
+            self.db.commit()
+            self.db.refresh(db_obj)
+            return db_obj
+        
+        # The directory allocates the id and picks the shard
+        db_obj.id, self.db.info[SHARD] = router.place(obj_in.email)
+        try:
+            self.db.add(db_obj)
+            self.db.commit()
+        except Exception:
+            self.db.rollback()
+            router.forget(db_obj.id)
+            raise
         self.db.refresh(db_obj)
         return db_obj
     
@@ -62,14 +108,30 @@ class UserService:
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
         
+        # A new password or a deactivation ends every existing session
+        if "hashed_password" in update_data or update_data.get("is_active") is False:
+            update_data["token_version"] = (db_obj.token_version or 0) + 1
+        
         for field, value in update_data.items():
             setattr(db_obj, field, value)
         
         self.db.add(db_obj)
+        invalidate_on_commit(self.db, user_tag(db_obj.id))
         self.db.commit()
+        router = sharded(self.db)
+        if router is not None and "email" in update_data:
+            router.update_email(db_obj.id, db_obj.email)
         self.db.refresh(db_obj)
         return db_obj
     
+    def revoke_all_tokens(self, user: User) -> User:
+        """Revoke every access and refresh token issued to the user."""
+        user.token_version = (user.token_version or 0) + 1
+        self.db.add(user)
+        invalidate_on_commit(self.db, user_tag(user.id))
+        self.db.commit()
+        return user
+    
     def authenticate(self, *, email: str, password: str) -> Optional[User]:
         """Authenticate user with email and password."""
         user = self.get_by_email(email=email)
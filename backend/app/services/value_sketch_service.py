@@ -0,0 +1,232 @@
+"""
+Value sketch service for quantiles of count and duration values.
+
+Every habit-month with values has a `KLLSketch` of them in
+`habit_value_sketches`. Entry writes rebuild the sketch of the month they
+touch from that month's entries: a month holds at most 31 values of a habit,
+and a sketch cannot forget a value that was changed or deleted. Statistics
+of a window merge the stored sketches of the whole months inside it with
+the values of the partial months at its edges, so long windows (archived
+years included) read one small row per month instead of every entry.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.sketches import KLLSketch
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.models.habit_entry_archive import HabitEntryArchive
+from app.models.habit_value_sketch import HabitValueSketch
+from app.services.archive_service import ArchiveService, unpack_entries
+
+# Exact up to SKETCH_K values, within about 1% of the rank beyond
+SKETCH_K = 200
+# Habits rebuilt per transaction by `rebuild`
+REBUILD_BATCH_SIZE = 500
+QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+# (habit id, first day of the month)
+HabitMonth = Tuple[int, date]
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def month_end(day: date) -> date:
+    return next_month(day) - timedelta(days=1)
+
+
+def _sketch(values: Iterable[float]) -> KLLSketch:
+    sketch = KLLSketch(SKETCH_K)
+    sketch.update(values)
+    return sketch
+
+
+class ValueSketchService:
+    """Value sketch service for database operations."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def _values(self, ranges: Sequence[Tuple[int, date, date]]) -> Dict[HabitMonth, List[float]]:
+        """Entry values within (habit id, start, end) ranges, archived ones included, by month."""
+        values: Dict[HabitMonth, List[float]] = {}
+        if not ranges:
+            return values
+        rows = self.db.query(HabitEntry.habit_id, HabitEntry.date, HabitEntry.value).filter(
+            or_(*(
+                and_(HabitEntry.habit_id == habit_id, HabitEntry.date >= start, HabitEntry.date <= end)
+                for habit_id, start, end in ranges
+            ))
+        )
+        hot_days = set()
+        for habit_id, day, value in rows:
+            hot_days.add((habit_id, day))
+            if value is not None:
+                values.setdefault((habit_id, month_start(day)), []).append(value)
+
+        horizon = ArchiveService.horizon()
+        for habit_id, start, end in ranges:
+            if start >= horizon:
+                continue
+            for entry in ArchiveService(self.db).read_range(habit_id, start, end):
+                # Hot rows win over archived values for the same day
+                if entry.value is not None and (habit_id, entry.date) not in hot_days:
+                    values.setdefault((habit_id, month_start(entry.date)), []).append(entry.value)
+        return values
+
+    def refresh(self, entries: Iterable) -> None:
+        """Rebuild the sketches of the months of `entries` without committing."""
+        owners: Dict[HabitMonth, int] = {
+            (entry.habit_id, month_start(entry.date)): entry.user_id for entry in entries
+        }
+        if not owners:
+            return
+        months = sorted(owners)
+        values = self._values([(habit_id, month, month_end(month)) for habit_id, month in months])
+        stored = {
+            (row.habit_id, row.month): row
+            for row in self.db.query(HabitValueSketch).filter(
+                tuple_(HabitValueSketch.habit_id, HabitValueSketch.month).in_(months)
+            )
+        }
+        for habit_id, month in months:
+            row = stored.get((habit_id, month))
+            month_values = values.get((habit_id, month))
+            if not month_values:
+                if row is not None:
+                    self.db.delete(row)
+                continue
+            if row is None:
+                row = HabitValueSketch(
+                    habit_id=habit_id, user_id=owners[(habit_id, month)], month=month
+                )
+                self.db.add(row)
+            row.value_count = len(month_values)
+            row.sketch = _sketch(month_values).to_bytes()
+
+    def rebuild(self, batch_size: int = REBUILD_BATCH_SIZE) -> int:
+        """Rebuild every habit's sketches, committing per batch of habits; returns the sketches written."""
+        written = 0
+        last_id = 0
+        while True:
+            owners = dict(
+                self.db.query(Habit.id, Habit.owner_id)
+                .filter(Habit.id > last_id)
+                .order_by(Habit.id)
+                .limit(batch_size)
+            )
+            if not owners:
+                return written
+            try:
+                written += self._rebuild_habits(owners)
+                self.db.commit()
+            except IntegrityError:
+                # An entry write built one of these sketches meanwhile
+                self.db.rollback()
+                written += self._rebuild_habits(owners)
+                self.db.commit()
+            last_id = max(owners)
+
+    def _rebuild_habits(self, owners: Dict[int, int]) -> int:
+        """Replace the sketches of habits (id: owner id) without committing."""
+        habit_ids = list(owners)
+        self.db.query(HabitValueSketch).filter(
+            HabitValueSketch.habit_id.in_(habit_ids)
+        ).delete(synchronize_session=False)
+        days: Dict[Tuple[int, date], Optional[float]] = {}
+        for archive in self.db.query(HabitEntryArchive).filter(
+            HabitEntryArchive.habit_id.in_(habit_ids)
+        ):
+            days.update(
+                ((archive.habit_id, entry.date), entry.value) for entry in unpack_entries(archive)
+            )
+        # Hot rows win over archived values for the same day
+        days.update(
+            ((habit_id, day), value)
+            for habit_id, day, value in self.db.query(
+                HabitEntry.habit_id, HabitEntry.date, HabitEntry.value
+            ).filter(HabitEntry.habit_id.in_(habit_ids))
+        )
+        months: Dict[HabitMonth, List[float]] = {}
+        for (habit_id, day), value in days.items():
+            if value is not None:
+                months.setdefault((habit_id, month_start(day)), []).append(value)
+        for (habit_id, month), values in months.items():
+            self.db.add(HabitValueSketch(
+                habit_id=habit_id,
+                user_id=owners[habit_id],
+                month=month,
+                value_count=len(values),
+                sketch=_sketch(values).to_bytes(),
+            ))
+        self.db.flush()
+        return len(months)
+
+    def window(self, habit_id: int, start_date: date, end_date: date) -> KLLSketch:
+        """Sketch of a habit's values within [start_date, end_date]."""
+        first_full = start_date if start_date.day == 1 else next_month(start_date)
+        after_full = month_start(end_date + timedelta(days=1))
+
+        sketch = KLLSketch(SKETCH_K)
+        if first_full >= after_full:
+            edges = [(habit_id, start_date, end_date)]
+        else:
+            for (data,) in self.db.query(HabitValueSketch.sketch).filter(
+                and_(
+                    HabitValueSketch.habit_id == habit_id,
+                    HabitValueSketch.month >= first_full,
+                    HabitValueSketch.month < after_full,
+                )
+            ):
+                sketch.merge(KLLSketch.from_bytes(data))
+            edges = [
+                (habit_id, start, end)
+                for start, end in (
+                    (start_date, first_full - timedelta(days=1)),
+                    (after_full, end_date),
+                )
+                if start <= end
+            ]
+        for values in self._values(edges).values():
+            sketch.update(values)
+        return sketch
+
+    def statistics(
+        self, habit_id: int, start_date: date, end_date: date, bins: int = 10
+    ) -> Dict:
+        """Count, range, quantiles and an equal-width histogram of a habit's values."""
+        sketch = self.window(habit_id, start_date, end_date)
+        if not sketch.count:
+            return {"count": 0, "approximate": False, "quantiles": {}, "histogram": []}
+
+        quantiles = dict(zip(QUANTILES, sketch.quantiles(QUANTILES)))
+        width = (sketch.max - sketch.min) / bins
+        if width:
+            edges = [sketch.min + width * index for index in range(bins)] + [sketch.max]
+        else:
+            edges = [sketch.min, sketch.max]
+        return {
+            "count": sketch.count,
+            # Answers are exact until the sketch had to compact values
+            "approximate": sketch.size < sketch.count,
+            "min_value": sketch.min,
+            "max_value": sketch.max,
+            "median_value": quantiles[0.5],
+            "p90_value": quantiles[0.9],
+            "quantiles": {f"p{round(fraction * 100)}": value for fraction, value in quantiles.items()},
+            "histogram": [
+                {"low": low, "high": high, "count": count}
+                for low, high, count in zip(edges, edges[1:], sketch.histogram(edges))
+            ],
+        }
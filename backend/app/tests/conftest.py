@@ -7,8 +7,10 @@ from fastapi.testclient import TestClient
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
-from app.core.database import Base, get_db
+from app.core.cache import invalidation_bus
+from app.core.database import Base, enable_sqlite_foreign_keys, forbid_lazy_loads, get_db
 from app.core.config import settings
+from app.core.instrumentation import instrument_engine
 from main import app
 
 # Test database
@@ -16,6 +18,8 @@ SQLALCHEMY_DATABASE_URL = "sqlite:///./test.db"
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}
 )
+instrument_engine(engine)
+enable_sqlite_foreign_keys(engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 
@@ -30,6 +34,9 @@ def override_get_db():
 
 app.dependency_overrides[get_db] = override_get_db
 
+# Relationships must be loaded with explicit options: any lazy load fails
+forbid_lazy_loads()
+
 
 @pytest.fixture(scope="session")
 def client():
@@ -40,6 +47,17 @@ def client():
     Base.metadata.drop_all(bind=engine)
 
 
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Start every test with empty in-process caches.
+
+    Some tests point the app at other databases whose ids overlap with the
+    test database, so cached entries must not leak between tests.
+    """
+    invalidation_bus.clear()
+    yield
+
+
 @pytest.fixture
 def test_user_data():
     """Test user data."""
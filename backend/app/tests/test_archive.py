@@ -0,0 +1,96 @@
+"""
+Test archiving old habit entries and reading them back transparently.
+"""
+
+from datetime import date, timedelta
+
+from app.core.config import settings
+from app.models.habit_entry import HabitEntry
+from app.models.habit_entry_archive import HabitEntryArchive
+from app.services.archive_service import ArchiveService, pack_entries, unpack_entries
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+
+def test_pack_round_trip():
+    """Test that packing and unpacking preserves every field."""
+    entries = [
+        HabitEntry(date=date(2024, 1, 1), completed=True, value=2.5, notes="first"),
+        HabitEntry(date=date(2024, 2, 29), completed=False, value=None, notes=None),
+        HabitEntry(date=date(2024, 12, 31), completed=True, value=0.0, notes="leap day 366"),
+    ]
+    archive = HabitEntryArchive(habit_id=1, user_id=1, **pack_entries(2024, entries))
+    unpacked = unpack_entries(archive)
+
+    assert archive.entry_count == 3
+    assert [(e.date, e.completed, e.value, e.notes) for e in unpacked] == [
+        (e.date, e.completed, e.value, e.notes) for e in entries
+    ]
+
+    # Years without values or notes store neither column
+    plain = pack_entries(2023, [HabitEntry(date=date(2023, 5, 1), completed=True)])
+    assert plain["values"] is None and plain["notes"] is None
+
+
+def test_archived_entries_read_transparently(client, monkeypatch):
+    """Test calendar and progress reads spanning hot and archived entries."""
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", True)
+    monkeypatch.setattr(settings, "ARCHIVE_HORIZON_DAYS", 30)
+
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "archive@example.com", 1, entry_days=0)
+        habit_id = seeded["habit_ids"][0]
+        today = date.today()
+        for offset in range(0, 90, 3):
+            db.add(HabitEntry(
+                habit_id=habit_id,
+                user_id=seeded["user_id"],
+                date=today - timedelta(days=offset),
+                completed=offset % 2 == 0,
+                value=float(offset),
+                notes=f"day {offset}",
+            ))
+        db.commit()
+
+        archived = ArchiveService(db).archive_before(ArchiveService.horizon())
+        hot, cold = ArchiveService(db).table_sizes()
+    finally:
+        db.close()
+
+    # Entries dated before the 30-day horizon: offsets 33, 36, ..., 87
+    assert archived == 19
+    assert cold == 19
+    assert hot == 11
+
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    response = client.get(
+        f"{settings.API_V1_STR}/analytics/habits/{habit_id}/progress?days=89",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    progress = response.json()["progress"]
+    assert len(progress) == 30
+    assert [item["date"] for item in progress] == sorted(item["date"] for item in progress)
+    oldest = today - timedelta(days=87)
+    assert progress[0] == {
+        "date": oldest.isoformat(),
+        "completed": False,
+        "value": 87.0,
+        "target": 1.0,
+    }
+
+    response = client.get(
+        f"{settings.API_V1_STR}/analytics/habits/{habit_id}/calendar?year={oldest.year}",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.json()["data"][oldest.isoformat()]["notes"] == "day 87"
+
+    # Turning archiving off stops the job, not reads of what it archived
+    monkeypatch.setattr(settings, "ARCHIVE_ENABLED", False)
+    response = client.get(
+        f"{settings.API_V1_STR}/analytics/habits/{habit_id}/progress?days=89",
+        headers=headers,
+    )
+    assert response.json()["progress"] == progress
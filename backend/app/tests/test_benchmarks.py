@@ -0,0 +1,68 @@
+"""
+Test the synthetic data generator and the API benchmark harness.
+"""
+
+import asyncio
+from datetime import date
+
+from sqlalchemy import select
+
+from app.core.database import get_db
+from app.models.habit_entry import HabitEntry
+from benchmarks.api_load import SCENARIOS, run_benchmark
+from benchmarks.common import compare, create_benchmark_engine, override_database
+from benchmarks.datagen import generate
+from main import app
+
+END_DATE = date(2024, 6, 30)
+
+
+def _entry_rows(engine):
+    with engine.connect() as connection:
+        return connection.execute(
+            select(
+                HabitEntry.habit_id, HabitEntry.date, HabitEntry.completed,
+                HabitEntry.value, HabitEntry.notes,
+            ).order_by(HabitEntry.id)
+        ).all()
+
+
+def test_generator_is_deterministic(tmp_path):
+    """Test that the same seed and end date produce identical rows."""
+    engines = [
+        create_benchmark_engine(f"sqlite:///{tmp_path / f'gen{index}.db'}")
+        for index in range(2)
+    ]
+    datasets = [generate(engine, 3, 4, 1, seed=7, end_date=END_DATE) for engine in engines]
+
+    assert datasets[0].entry_count == datasets[1].entry_count > 0
+    assert _entry_rows(engines[0]) == _entry_rows(engines[1])
+
+    rows = _entry_rows(engines[0])
+    assert max(row.date for row in rows) <= END_DATE
+    completion = sum(row.completed for row in rows) / len(rows)
+    assert 0.2 < completion < 0.95
+
+
+def test_api_benchmark_runs(tmp_path):
+    """Test a tiny benchmark run against the in-process app."""
+    engine = create_benchmark_engine(f"sqlite:///{tmp_path / 'bench.db'}")
+    data = generate(engine, 2, 3, 0.1, seed=1)
+
+    previous_override = app.dependency_overrides.get(get_db)
+    override_database(app, engine)
+    try:
+        results = asyncio.run(run_benchmark(app, data, requests=5, concurrency=2))
+    finally:
+        if previous_override is None:
+            app.dependency_overrides.pop(get_db, None)
+        else:
+            app.dependency_overrides[get_db] = previous_override
+
+    assert set(results["scenarios"]) == set(SCENARIOS)
+    for summary in results["scenarios"].values():
+        assert summary["requests"] == 5
+        assert summary["errors"] == 0
+        assert summary["p50_ms"] <= summary["p95_ms"] <= summary["p99_ms"]
+
+    assert compare(results, results)["list"]["p95_ms"] == 0.0
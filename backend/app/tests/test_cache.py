@@ -0,0 +1,134 @@
+"""
+Test tagged caches and cross-worker invalidation.
+"""
+
+import time
+from datetime import date
+
+from app.core import cache as cache_module
+from app.core.cache import (
+    INVALIDATION_DELAY,
+    InvalidationBus,
+    LocalBroker,
+    TaggedCache,
+    habit_tag,
+    invalidate_on_commit,
+    user_tag,
+)
+from app.core.config import settings
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+
+def test_tagged_cache_eviction_and_expiry():
+    """Test tag eviction, TTL expiry and the size bound."""
+    cache = TaggedCache("test", max_size=2)
+    cache.set("a", 1, tags=[user_tag(1), habit_tag(10)])
+    cache.set("b", 2, tags=[user_tag(1)])
+    assert cache.invalidate_tags([habit_tag(10)]) == 1
+    assert cache.get("a") is None and cache.get("b") == 2
+
+    cache.set("c", 3)
+    cache.set("d", 4)
+    assert cache.get("b") is None and len(cache) == 2
+
+    cache.set("short", 5, ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("short", "expired") == "expired"
+
+    calls = []
+    assert cache.get_or_set("e", lambda: calls.append(1) or "built") == "built"
+    assert cache.get_or_set("e", lambda: calls.append(1) or "rebuilt") == "built"
+    assert len(calls) == 1
+
+
+def test_value_computed_across_an_invalidation_is_not_stored():
+    """Test that get_or_set skips storing a value whose tags were invalidated meanwhile."""
+    cache = TaggedCache("test")
+
+    def racing_factory():
+        cache.invalidate_tags([habit_tag(1)])
+        return "stale"
+
+    assert cache.get_or_set("a", racing_factory, tags=[habit_tag(1)]) == "stale"
+    assert cache.get("a") is None
+    assert cache.get_or_set("a", lambda: "fresh", tags=[habit_tag(1)]) == "fresh"
+    assert cache.get("a") == "fresh"
+
+    generation = cache.generation([user_tag(2)])
+    cache.clear()
+    assert not cache.set("b", "stale", tags=[user_tag(2)], generation=generation)
+
+
+def test_recent_invalidations():
+    """Test that a cache tells whether its tags were invalidated lately."""
+    cache = TaggedCache("test")
+    assert not cache.invalidated_within([habit_tag(1)], 5)
+    cache.invalidate_tags([habit_tag(1)])
+    assert cache.invalidated_within([user_tag(1), habit_tag(1)], 5)
+    assert not cache.invalidated_within([habit_tag(1)], 0)
+
+
+def test_invalidation_reaches_other_workers():
+    """Test that publishing on one bus evicts the caches of another."""
+    broker = LocalBroker()
+    first, second = InvalidationBus(broker), InvalidationBus(broker)
+    first_cache = first.register(TaggedCache("first"))
+    second_cache = second.register(TaggedCache("second"))
+    first.start()
+    second.start()
+
+    for cache in (first_cache, second_cache):
+        cache.set("habits", ["cached"], tags=[user_tag(7)])
+        cache.set("other", ["kept"], tags=[user_tag(8)])
+
+    observed = INVALIDATION_DELAY.get_count()
+    first.publish([user_tag(7)])
+
+    assert first_cache.get("habits") is None
+    assert second_cache.get("habits") is None
+    assert second_cache.get("other") == ["kept"]
+    assert INVALIDATION_DELAY.get_count() == observed + 1  # own messages are skipped
+
+
+def test_invalidation_waits_for_commit(monkeypatch):
+    """Test that tags are published on commit and dropped on rollback."""
+    broker = LocalBroker()
+    received = []
+    broker.subscribe("probe", received.append)
+    monkeypatch.setattr(cache_module, "invalidation_bus", InvalidationBus(broker, channel="probe"))
+
+    db = TestingSessionLocal()
+    try:
+        invalidate_on_commit(db, user_tag(1))
+        db.rollback()
+        assert received == []
+
+        invalidate_on_commit(db, user_tag(2), habit_tag(3))
+        db.commit()
+        assert len(received) == 1 and '"user:2"' in received[0]
+    finally:
+        db.close()
+
+
+def test_calendar_cache_invalidated_by_writes(client):
+    """Test that an entry write evicts the cached calendar of its habit-year."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "cache@example.com", 1, entry_days=0)
+    finally:
+        db.close()
+    habit_id = seeded["habit_ids"][0]
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    url = f"{settings.API_V1_STR}/analytics/habits/{habit_id}/calendar"
+
+    assert client.get(url, headers=headers).json()["data"] == {}
+
+    today = date.today().isoformat()
+    response = client.post(
+        f"{settings.API_V1_STR}/habits/entries",
+        json={"habit_id": habit_id, "date": today, "completed": True},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert client.get(url, headers=headers).json()["data"][today]["completed"] is True
@@ -0,0 +1,99 @@
+"""
+Test readiness, draining of in-flight requests and the SIGTERM handover.
+"""
+
+import asyncio
+import signal
+
+from fastapi.testclient import TestClient
+
+from app.core import drain as drain_module
+from app.core.config import settings
+from app.core.drain import Drain
+import main
+from main import app
+
+
+def test_readiness_flips_while_draining():
+    """Test that /ready fails during drain while /health and requests still work."""
+    with TestClient(app) as client:
+        assert client.get("/ready").json() == {"status": "ready"}
+
+        drain_module.drain.begin()
+        response = client.get("/ready")
+        assert response.status_code == 503 and response.json() == {"status": "draining"}
+        health = client.get("/health")
+        assert health.status_code == 200
+        assert health.headers["connection"] == "close"
+        assert drain_module.drain.in_flight == 0
+    assert not drain_module.drain.ready
+
+
+def test_wait_idle_waits_for_in_flight_requests():
+    """Test that draining waits for running requests, up to the timeout."""
+
+    async def scenario():
+        drain = Drain()
+        drain.start()
+        assert await drain.wait_idle(0.01)
+
+        drain.request_started()
+        asyncio.get_running_loop().call_later(0.05, drain.request_finished)
+        assert await drain.wait_idle(5)
+
+        drain.request_started()
+        assert not await drain.wait_idle(0.01)
+        drain.request_finished()
+        return drain.in_flight
+
+    assert asyncio.run(scenario()) == 0
+
+
+def test_sigterm_drains_before_handing_over(monkeypatch):
+    """Test that SIGTERM flips readiness first and hands over after the delay."""
+    monkeypatch.setattr(settings, "DRAIN_READINESS_DELAY_SECONDS", 0.05)
+    forwarded = []
+    monkeypatch.setattr(drain_module.os, "kill", lambda pid, sig: forwarded.append(sig))
+
+    async def scenario():
+        drain = Drain()
+        drain.start()
+        handovers = []
+        assert drain.install_signal_handler(on_handover=lambda: handovers.append(drain.draining))
+        try:
+            signal.raise_signal(signal.SIGTERM)
+            await asyncio.sleep(0.01)
+            assert drain.draining and not drain.ready and not forwarded
+            await asyncio.sleep(0.1)
+            return handovers
+        finally:
+            drain.remove_signal_handler()
+
+    assert asyncio.run(scenario()) == [True]
+    assert forwarded == [signal.SIGINT]
+
+
+def test_drain_budget_is_shared_with_the_server(monkeypatch):
+    """Test that the shutdown waits only get what the server's graceful wait left."""
+    monkeypatch.setattr(drain_module.os, "kill", lambda pid, sig: None)
+    drain = Drain()
+    assert drain.remaining(20) == 20
+    drain._handover()
+    drain._handed_over_at -= 15
+    assert 4 < drain.remaining(20) <= 5
+    drain._handed_over_at -= 10
+    assert drain.remaining(20) == 0
+
+
+def test_failing_shutdown_step_does_not_skip_the_rest(monkeypatch):
+    """Test that the engines are disposed even if flushing usage fails."""
+    disposed = []
+
+    def fail():
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(main, "flush_usage", fail)
+    monkeypatch.setattr(main, "dispose_engines", lambda: disposed.append(True))
+    with TestClient(app):
+        pass
+    assert disposed == [True]
@@ -0,0 +1,108 @@
+"""
+Test live habit events delivered over Server-Sent Events.
+"""
+
+import asyncio
+import json
+from datetime import date
+
+from app.core import events
+from app.core.cache import LocalBroker
+from app.core.config import settings
+from app.core.events import RESYNC, EventHub, Subscription
+from app.schemas.habit import HabitEntryCreate
+from app.services.habit_service import HabitEntryService, HabitService
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+
+def _parse(frame: str):
+    fields = dict(line.split(": ", 1) for line in frame.strip().splitlines())
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_slow_subscriber_is_told_to_resync():
+    """Test that an overflowing buffer collapses into one resync event."""
+    subscription = Subscription(user_id=1, maxsize=3)
+    for index in range(5):
+        subscription.push({"type": "entry.upserted", "data": {"id": index}})
+
+    # The backlog at overflow is replaced; later events queue up behind it
+    assert subscription.queue.get_nowait()["type"] == RESYNC
+    assert subscription.queue.get_nowait()["data"] == {"id": 4}
+    assert subscription.queue.empty()
+
+
+def test_events_reach_streams_on_other_workers():
+    """Test delivery to the publishing user only, on every worker."""
+
+    async def scenario():
+        broker = LocalBroker()
+        first, second = EventHub(broker), EventHub(broker)
+        first.start()
+        second.start()
+        mine, other = second.subscribe(1), second.subscribe(2)
+
+        first.publish(1, "habit.updated", {"id": 5, "name": "Read"})
+        await asyncio.sleep(0)
+        return mine.queue.get_nowait(), other.queue.qsize()
+
+    item, other_size = asyncio.run(scenario())
+    assert item["type"] == "habit.updated" and item["data"]["name"] == "Read"
+    assert other_size == 0
+
+
+def test_write_paths_stream_committed_changes(monkeypatch):
+    """Test that entry writes produce entry and streak events after commit."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "events@example.com", 1, entry_days=0)
+    finally:
+        db.close()
+    habit_id, user_id = seeded["habit_ids"][0], seeded["user_id"]
+
+    def check_in():
+        db = TestingSessionLocal()
+        try:
+            entry = HabitEntryService(db).create(
+                obj_in=HabitEntryCreate(habit_id=habit_id, date=date.today(), completed=True),
+                user_id=user_id,
+            )
+            habit_service = HabitService(db)
+            habit_service.update_streak(habit_service.get(id=habit_id))
+            return entry.id
+        finally:
+            db.close()
+
+    async def scenario():
+        hub = EventHub(LocalBroker())
+        monkeypatch.setattr(events, "event_hub", hub)
+        monkeypatch.setattr(settings, "EVENTS_HEARTBEAT_SECONDS", 5)
+        hub.start()
+        stream = hub.stream(hub.subscribe(user_id))
+        frames = [await stream.__anext__()]
+        entry_id = await asyncio.get_running_loop().run_in_executor(None, check_in)
+        frames += [await stream.__anext__(), await stream.__anext__()]
+        hub.stop()
+        assert [frame async for frame in stream] == []
+        assert hub.connections == 0
+        return entry_id, frames
+
+    entry_id, frames = asyncio.run(scenario())
+    assert frames[0].startswith("retry:")
+    assert _parse(frames[1]) == ("entry.upserted", {
+        "id": entry_id,
+        "habit_id": habit_id,
+        "date": date.today().isoformat(),
+        "completed": True,
+        "value": None,
+    })
+    assert _parse(frames[2]) == ("streak.changed", {
+        "habit_id": habit_id, "current_streak": 1, "longest_streak": 1,
+    })
+
+
+def test_events_endpoint_requires_authentication(client):
+    """Test that /habits/events is routed and authenticated."""
+    response = client.get(f"{settings.API_V1_STR}/habits/events")
+    assert response.status_code == 401
@@ -0,0 +1,72 @@
+"""
+Test content negotiation of compact response formats.
+"""
+
+import json
+
+import msgpack
+import pytest
+
+from app.core.config import settings
+from app.core.formats import COLUMNAR_JSON, JSON, MSGPACK, columns, parse_accept
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+
+def test_parse_accept_orders_by_quality():
+    """Test Accept header ranking, including q=0 exclusions."""
+    assert parse_accept("application/json;q=0.5, application/msgpack") == [
+        "application/msgpack", "application/json",
+    ]
+    assert parse_accept("text/html;q=0, */*") == ["*/*"]
+    assert parse_accept(None) == []
+
+
+def test_columns_from_objects_and_dicts():
+    """Test building parallel arrays with renamed fields."""
+    rows = [{"value": 1.0, "completed": True}, {"value": None, "completed": False}]
+    assert columns(rows, values="value", completed="completed") == {
+        "values": [1.0, None], "completed": [True, False],
+    }
+
+
+@pytest.fixture(scope="module")
+def seeded(client):
+    db = TestingSessionLocal()
+    try:
+        return create_user_with_habits(db, "formats@example.com", 1, entry_days=5)
+    finally:
+        db.close()
+
+
+@pytest.mark.parametrize("path", ["calendar", "progress", "entries"])
+def test_compact_formats_match_json(client, seeded, path):
+    """Test that columnar JSON and MessagePack carry the same entries as JSON."""
+    habit_id = seeded["habit_ids"][0]
+    url = {
+        "calendar": f"{settings.API_V1_STR}/analytics/habits/{habit_id}/calendar",
+        "progress": f"{settings.API_V1_STR}/analytics/habits/{habit_id}/progress",
+        "entries": f"{settings.API_V1_STR}/habits/{habit_id}/entries",
+    }[path]
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+
+    default = client.get(url, headers=headers)
+    assert default.headers["content-type"].startswith(JSON)
+    assert default.headers["vary"] == "Accept"
+    if path == "calendar":
+        expected = {day: cell["value"] for day, cell in default.json()["data"].items()}
+    elif path == "progress":
+        expected = {row["date"]: row["value"] for row in default.json()["progress"]}
+    else:
+        expected = {row["date"]: row["value"] for row in default.json()}
+    assert len(expected) == 5
+
+    columnar = client.get(url, headers={**headers, "Accept": COLUMNAR_JSON})
+    assert columnar.headers["content-type"] == COLUMNAR_JSON
+    body = json.loads(columnar.content)
+    assert dict(zip(body["dates"], body["values"])) == expected
+
+    packed = client.get(url, headers={**headers, "Accept": f"{MSGPACK}, {JSON};q=0.9"})
+    assert packed.headers["content-type"] == MSGPACK
+    assert msgpack.unpackb(packed.content) == body
+    assert len(packed.content) < len(columnar.content) < len(default.content)
@@ -0,0 +1,156 @@
+"""
+Test cross-habit insights and their incremental updates.
+"""
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from app.core.cache import user_history_tag
+from app.core.config import settings
+from app.models.habit_entry import HabitEntry
+from app.services.insights_service import InsightsService, insights_cache
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+END = date(2024, 3, 20)
+
+# habits × days, oldest day first
+MATRIX = np.array([
+    [1, 1, 0, 1, 0, 1, 1, 0, 1, 1],
+    [1, 1, 0, 1, 0, 1, 0, 0, 1, 1],
+    [0, 1, 1, 0, 1, 0, 1, 1, 0, 1],
+], dtype=bool)
+
+
+@pytest.fixture
+def small_window(monkeypatch):
+    monkeypatch.setattr(settings, "INSIGHTS_WINDOW_DAYS", MATRIX.shape[1])
+    monkeypatch.setattr(settings, "INSIGHTS_MIN_SUPPORT", 1)
+
+
+def _seed(db, email, matrix, end=END):
+    seeded = create_user_with_habits(db, email, matrix.shape[0], entry_days=0)
+    start = end - timedelta(days=matrix.shape[1] - 1)
+    db.add_all(
+        HabitEntry(
+            habit_id=seeded["habit_ids"][row],
+            user_id=seeded["user_id"],
+            date=start + timedelta(days=int(column)),
+            completed=True,
+        )
+        for row, column in zip(*np.nonzero(matrix))
+    )
+    db.commit()
+    return seeded
+
+
+def test_pairs_and_predictors(client, small_window):
+    """Test co-completion, lift and next-day correlation against NumPy."""
+    db = TestingSessionLocal()
+    try:
+        seeded = _seed(db, "insights-pairs@example.com", MATRIX)
+        result = InsightsService(db).insights(seeded["user_id"], end=END)
+    finally:
+        db.close()
+    ids = seeded["habit_ids"]
+    days = MATRIX.shape[1]
+    assert (result["start_date"], result["end_date"], result["days"]) == (
+        END - timedelta(days=days - 1), END, days
+    )
+
+    best = result["together"][0]
+    assert (best["habit_id"], best["other_habit_id"]) == (ids[0], ids[1])
+    assert best["support"] == 6
+    assert best["co_completion_rate"] == pytest.approx(0.6)
+    assert best["lift"] == pytest.approx(6 * days / (7 * 6))
+    assert len(result["together"]) == 3
+
+    values = MATRIX.astype(float)
+    for predictor in result["predictors"]:
+        i, j = ids.index(predictor["habit_id"]), ids.index(predictor["other_habit_id"])
+        expected = np.corrcoef(values[i, :-1], values[j, 1:])[0, 1]
+        assert predictor["correlation"] == pytest.approx(expected, abs=1e-5)
+    assert len(result["predictors"]) == 6
+
+
+def test_incremental_update_matches_full_recompute(client, small_window):
+    """Test that moving the window forward equals recomputing it."""
+    rng = np.random.default_rng(7)
+    history = rng.random((4, MATRIX.shape[1] + 3)) < 0.5
+    db = TestingSessionLocal()
+    try:
+        seeded = _seed(db, "insights-incremental@example.com", history)
+        service = InsightsService(db)
+        end = END - timedelta(days=3)
+        service.completion_state(seeded["user_id"], end)
+        advanced = service.completion_state(seeded["user_id"], END)
+
+        insights_cache.clear()
+        rebuilt = service.completion_state(seeded["user_id"], END)
+    finally:
+        db.close()
+
+    assert advanced.start == rebuilt.start and advanced.end == rebuilt.end
+    np.testing.assert_array_equal(advanced.matrix(), history[:, 3:])
+    for name in ("completed", "together", "lag_x", "lag_y", "lag_xy"):
+        np.testing.assert_allclose(getattr(advanced, name), getattr(rebuilt, name))
+
+
+def test_past_entry_evicts_insights(client):
+    """Test that insights are cached and recomputed after a past entry changes."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "insights-api@example.com", 2, entry_days=0)
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+
+    response = client.get(f"{API}/analytics/insights", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["end_date"] == (date.today() - timedelta(days=1)).isoformat()
+    assert insights_cache.get(seeded["user_id"]) is not None
+
+    client.post(
+        f"{API}/habits/entries",
+        headers=headers,
+        json={"habit_id": seeded["habit_ids"][0], "date": date.today().isoformat(), "completed": True},
+    )
+    assert insights_cache.get(seeded["user_id"]) is not None
+
+    client.post(
+        f"{API}/habits/entries",
+        headers=headers,
+        json={
+            "habit_id": seeded["habit_ids"][0],
+            "date": (date.today() - timedelta(days=1)).isoformat(),
+            "completed": True,
+        },
+    )
+    assert insights_cache.get(seeded["user_id"]) is None
+
+
+def test_state_evicted_while_built_is_not_cached(client, small_window, monkeypatch):
+    """Test that a state computed across an eviction of its user is not kept."""
+    db = TestingSessionLocal()
+    try:
+        seeded = _seed(db, "insights-race@example.com", MATRIX)
+        service = InsightsService(db)
+        build = InsightsService._build
+
+        def racing_build(self, user_id, *args):
+            state = build(self, user_id, *args)
+            insights_cache.invalidate_tags([user_history_tag(user_id)])
+            return state
+
+        monkeypatch.setattr(InsightsService, "_build", racing_build)
+        service.completion_state(seeded["user_id"], END)
+        assert insights_cache.get(seeded["user_id"]) is None
+
+        monkeypatch.setattr(InsightsService, "_build", build)
+        service.completion_state(seeded["user_id"], END)
+        assert insights_cache.get(seeded["user_id"]) is not None
+    finally:
+        db.close()
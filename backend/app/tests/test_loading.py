@@ -0,0 +1,58 @@
+"""
+Test that relationships are never loaded lazily.
+"""
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.orm import lazyload, selectinload
+
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+
+def test_relationships_raise_unless_loaded_explicitly(client):
+    """Test that relationships raise by default and load with explicit options."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "strict-loading@example.com", 1)
+        db.commit()
+        db.expunge_all()
+
+        habit = db.query(Habit).filter(Habit.id == seeded["habit_ids"][0]).one()
+        for relationship in ("owner", "entries", "archives"):
+            with pytest.raises(InvalidRequestError):
+                getattr(habit, relationship)
+
+        db.expunge_all()
+        habit = (
+            db.query(Habit)
+            .options(selectinload(Habit.entries).joinedload(HabitEntry.user))
+            .filter(Habit.id == seeded["habit_ids"][0])
+            .one()
+        )
+        assert len(habit.entries) == 3
+        assert {entry.user.email for entry in habit.entries} == {"strict-loading@example.com"}
+    finally:
+        db.close()
+
+
+def test_lazy_loads_fail_in_tests(client):
+    """Test that the test-mode guard refuses lazy loads requested per query."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "lazy-guard@example.com", 1)
+        db.commit()
+        db.expunge_all()
+
+        habit = (
+            db.query(Habit)
+            .options(lazyload(Habit.entries))
+            .filter(Habit.id == seeded["habit_ids"][0])
+            .one()
+        )
+        with pytest.raises(InvalidRequestError, match="Lazy load from Habit refused"):
+            habit.entries
+    finally:
+        db.close()
@@ -0,0 +1,78 @@
+"""
+Test per-request SQL instrumentation and the /metrics endpoint.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.metrics import registry
+from app.core.instrumentation import REQUEST_STATEMENTS
+from app.tests.conftest import override_get_db
+from main import create_application
+
+METRICS_TOKEN = "scrape-token"
+SCRAPE = {"Authorization": f"Bearer {METRICS_TOKEN}"}
+
+
+@pytest.fixture
+def metrics_token(monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_TOKEN", METRICS_TOKEN)
+
+
+def test_metrics_records_route_statements(client: TestClient, test_user_data, metrics_token):
+    """Test that SQL statements are attributed to the route template."""
+    registry.clear()
+    client.post("/api/v1/auth/register", json=test_user_data)
+
+    route = "/api/v1/auth/register"
+    assert REQUEST_STATEMENTS.get_count(method="POST", route=route) == 1
+    assert REQUEST_STATEMENTS.get_sum(method="POST", route=route) >= 1
+
+    response = client.get("/metrics", headers=SCRAPE)
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    body = response.text
+    assert "# TYPE habitflow_http_request_duration_seconds histogram" in body
+    assert f'habitflow_http_requests_total{{method="POST",route="{route}",status=' in body
+    assert 'le="+Inf"' in body
+
+
+def test_metrics_use_route_template(client: TestClient, metrics_token):
+    """Test that path parameters do not create new label values."""
+    registry.clear()
+    client.get("/api/v1/habits/12345")
+    client.get("/this/does/not/exist")
+
+    body = client.get("/metrics", headers=SCRAPE).text
+    assert 'route="/api/v1/habits/{habit_id}"' in body
+    assert 'route="<unmatched>"' in body
+    assert "12345" not in body
+
+
+def test_metrics_require_the_token(client: TestClient, monkeypatch):
+    """Test that /metrics refuses scrapes without the token, and is absent when disabled."""
+    assert client.get("/metrics", headers=SCRAPE).status_code == 403
+    monkeypatch.setattr(settings, "METRICS_TOKEN", METRICS_TOKEN)
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 403
+    assert client.get("/metrics", headers=SCRAPE).status_code == 200
+
+    monkeypatch.setattr(settings, "METRICS_ENABLED", False)
+    with TestClient(create_application()) as disabled:
+        assert disabled.get("/metrics", headers=SCRAPE).status_code == 404
+
+
+def test_server_timing_header(monkeypatch, test_user_data):
+    """Test the optional Server-Timing debug header."""
+    monkeypatch.setattr(settings, "SERVER_TIMING_ENABLED", True)
+    app = create_application()
+    app.dependency_overrides[get_db] = override_get_db
+
+    with TestClient(app) as client:
+        response = client.post("/api/v1/auth/register", json=test_user_data)
+
+    header = response.headers["server-timing"]
+    assert header.startswith("db;dur=")
+    assert "queries" in header and "app;dur=" in header
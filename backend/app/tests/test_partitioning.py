@@ -0,0 +1,75 @@
+"""
+Test habit_entries partition layout helpers and the job scheduler.
+"""
+
+import asyncio
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.core.jobs import JobScheduler
+from app.core.partitioning import (
+    ensure_partitions,
+    partition_name,
+    period_bounds,
+    periods_between,
+    upcoming_periods,
+)
+
+
+def test_period_bounds():
+    """Test yearly and monthly partition ranges."""
+    assert period_bounds("year", date(2025, 7, 14)) == (date(2025, 1, 1), date(2026, 1, 1))
+    assert period_bounds("month", date(2025, 12, 31)) == (date(2025, 12, 1), date(2026, 1, 1))
+    assert period_bounds("month", date(2024, 2, 29)) == (date(2024, 2, 1), date(2024, 3, 1))
+    with pytest.raises(ValueError):
+        period_bounds("week", date(2025, 1, 1))
+
+
+def test_partition_names():
+    """Test that partition names sort chronologically."""
+    assert partition_name("year", date(2025, 7, 14)) == "habit_entries_y2025"
+    assert partition_name("month", date(2025, 3, 2)) == "habit_entries_y2025m03"
+
+
+def test_periods_cover_range_without_gaps():
+    """Test that consecutive partitions share their boundaries."""
+    periods = periods_between("month", date(2024, 11, 20), date(2025, 2, 1))
+    assert [start for start, _ in periods] == [
+        date(2024, 11, 1), date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1),
+    ]
+    assert all(end == next_start for (_, end), (next_start, _) in zip(periods, periods[1:]))
+
+    upcoming = upcoming_periods("year", date(2025, 6, 1), ahead=2)
+    assert upcoming[0][0] == date(2025, 1, 1)
+    assert upcoming[-1] == (date(2027, 1, 1), date(2028, 1, 1))
+
+
+def test_ensure_partitions_skips_unpartitioned_tables():
+    """Test that SQLite and unpartitioned tables are left alone."""
+    engine = create_engine("sqlite://")
+    assert ensure_partitions(engine, "year", ahead=2) == []
+
+
+def test_scheduler_runs_jobs_and_survives_failures():
+    """Test periodic execution, failure isolation and shutdown."""
+    calls = []
+
+    def failing():
+        raise RuntimeError("boom")
+
+    async def scenario():
+        scheduler = JobScheduler()
+        scheduler.add("record", lambda: calls.append(1), interval=0.01, run_at_startup=True)
+        scheduler.add("failing", failing, interval=0.01)
+        scheduler.start()
+        await asyncio.sleep(0.1)
+        await scheduler.stop()
+        count = len(calls)
+        await asyncio.sleep(0.05)
+        return count
+
+    count = asyncio.run(scenario())
+    assert count >= 2
+    assert len(calls) == count
@@ -0,0 +1,202 @@
+"""
+Test period aggregation of daily, weekly and monthly habits.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.services.period_service import PeriodService, period_count, period_start
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+END = date(2024, 3, 20)  # A Wednesday
+
+
+@pytest.mark.parametrize("day, frequency, expected", [
+    (date(2024, 3, 20), "daily", date(2024, 3, 20)),
+    (date(2024, 3, 20), "weekly", date(2024, 3, 18)),
+    (date(2024, 3, 17), "weekly", date(2024, 3, 11)),
+    (date(2024, 2, 29), "monthly", date(2024, 2, 1)),
+])
+def test_period_start(day, frequency, expected):
+    """Test that weeks start on Monday and months on their first day."""
+    assert period_start(day, frequency) == expected
+
+
+def test_period_count():
+    """Test counting the periods overlapping a window, partial ones included."""
+    assert period_count(date(2024, 3, 11), END, "daily") == 10
+    assert period_count(date(2024, 2, 28), END, "weekly") == 4
+    assert period_count(date(2023, 12, 15), END, "monthly") == 4
+
+
+def _summaries(frequency_entries, start):
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(
+            db, f"periods-{start.isoformat()}@example.com", len(frequency_entries), entry_days=0
+        )
+        for habit_id, (frequency, entries) in zip(seeded["habit_ids"], frequency_entries):
+            db.query(Habit).filter(Habit.id == habit_id).update({"frequency": frequency})
+            db.add_all(
+                HabitEntry(
+                    habit_id=habit_id,
+                    user_id=seeded["user_id"],
+                    date=day,
+                    completed=completed,
+                    value=2.0,
+                )
+                for day, completed in entries
+            )
+        db.commit()
+        summaries = PeriodService(db).summarize(seeded["user_id"], start, END)
+        return [
+            (
+                s.frequency, s.total_periods, s.completed_periods, s.completed_entries,
+                s.current_streak, s.longest_streak, s.completion_rate,
+            )
+            for s in summaries
+        ]
+    finally:
+        db.close()
+
+
+def test_daily_periods(client):
+    """Test daily completion, with today still open not breaking the streak."""
+    days = lambda *offsets: [(END - timedelta(days=o), True) for o in offsets]
+    assert _summaries(
+        [
+            ("daily", days(0, 1, 2, 4, 5)),
+            ("daily", days(1, 2) + [(END, False)]),
+            ("daily", []),
+        ],
+        date(2024, 3, 11),
+    ) == [
+        ("daily", 10, 5, 5, 3, 3, 50.0),
+        ("daily", 10, 2, 2, 2, 2, 20.0),
+        ("daily", 10, 0, 0, 0, 0, 0.0),
+    ]
+
+
+def test_weekly_periods(client):
+    """Test that a week is completed by any completed entry within it."""
+    entries = [
+        (date(2024, 3, 19), True),   # week of 18 March
+        (date(2024, 3, 13), True),   # week of 11 March
+        (date(2024, 3, 12), False),
+        (date(2024, 3, 5), False),   # week of 4 March: nothing completed
+        (date(2024, 2, 27), True),   # week of 26 February, twice
+        (date(2024, 3, 1), True),
+    ]
+    assert _summaries([("weekly", entries)], date(2024, 2, 26)) == [
+        ("weekly", 4, 3, 4, 2, 2, 75.0),
+    ]
+
+
+def test_monthly_periods(client):
+    """Test monthly buckets across month ends and a leap day."""
+    entries = [
+        (date(2023, 12, 31), False),
+        (date(2024, 1, 31), True),
+        (date(2024, 2, 29), True),
+        (date(2024, 3, 1), True),
+    ]
+    assert _summaries([("monthly", entries)], date(2023, 12, 15)) == [
+        ("monthly", 4, 3, 3, 3, 3, 75.0),
+    ]
+
+
+def test_weekly_streak_and_analytics(client):
+    """Test streaks and analytics of a weekly habit through the API."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "periods-api@example.com", 0)
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    habit = client.post(
+        f"{API}/habits/", headers=headers, json={"name": "Long run", "frequency": "weekly"}
+    ).json()
+    today = date.today()
+    for day in (today - timedelta(days=14), today - timedelta(days=7), today):
+        response = client.post(
+            f"{API}/habits/entries",
+            headers=headers,
+            json={"habit_id": habit["id"], "date": day.isoformat(), "completed": True},
+        )
+        assert response.status_code == 200, response.text
+
+    habit = client.get(f"{API}/habits/{habit['id']}", headers=headers).json()
+    assert habit["current_streak"] == 3 and habit["longest_streak"] == 3
+
+    analytics = client.get(f"{API}/analytics/habits?days=28", headers=headers).json()
+    assert len(analytics) == 1
+    assert analytics[0]["frequency"] == "weekly"
+    assert analytics[0]["total_periods"] == period_count(today - timedelta(days=28), today, "weekly")
+    assert analytics[0]["completed_periods"] == 3
+    assert analytics[0]["current_streak"] == 3
+
+
+def test_analytics_streak_longer_than_window(client):
+    """Test that a streak longer than the analyzed window is reported in full."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "periods-window@example.com", 0)
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    habit = client.post(f"{API}/habits/", headers=headers, json={"name": "Read"}).json()
+    today = date.today()
+    for offset in range(20):
+        client.post(
+            f"{API}/habits/entries",
+            headers=headers,
+            json={
+                "habit_id": habit["id"],
+                "date": (today - timedelta(days=offset)).isoformat(),
+                "completed": True,
+            },
+        )
+
+    analytics = client.get(f"{API}/analytics/habits?days=7", headers=headers).json()
+    # The window reaches back `days` days before today, today included
+    assert analytics[0]["completed_periods"] == 8
+    assert analytics[0]["current_streak"] == 20
+
+
+def test_analytics_streak_broken_since_last_write(client):
+    """Test that a streak broken since the last entry write is not reported as running."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "periods-broken@example.com", 0)
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    habit = client.post(f"{API}/habits/", headers=headers, json={"name": "Stretch"}).json()
+    today = date.today()
+    for offset in range(2, 10):
+        client.post(
+            f"{API}/habits/entries",
+            headers=headers,
+            json={
+                "habit_id": habit["id"],
+                "date": (today - timedelta(days=offset)).isoformat(),
+                "completed": True,
+            },
+        )
+    # As stored by the last write, two days ago
+    db = TestingSessionLocal()
+    try:
+        db.query(Habit).filter(Habit.id == habit["id"]).update({"current_streak": 8})
+        db.commit()
+    finally:
+        db.close()
+
+    analytics = client.get(f"{API}/analytics/habits?days=30", headers=headers).json()
+    assert analytics[0]["current_streak"] == 0
+    assert analytics[0]["longest_streak"] == 8
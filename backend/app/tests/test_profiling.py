@@ -0,0 +1,111 @@
+"""
+Test per-request profiling for superusers.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.core.config import settings
+from app.core.profiling import PROFILE_HEADER, RequestProfile, profile_store
+from app.models.user import User
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+
+
+def _headers(email, superuser=False):
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, email, 2)
+        if superuser:
+            db.query(User).filter(User.id == seeded["user_id"]).update({"is_superuser": True})
+            db.commit()
+    finally:
+        db.close()
+    return {"Authorization": f"Bearer {seeded['access_token']}"}
+
+
+def test_superuser_request_is_profiled(client):
+    """Test that a superuser's flagged request is sampled and its SQL recorded."""
+    headers = _headers("profiling-admin@example.com", superuser=True)
+
+    response = client.get(
+        f"{API}/analytics/dashboard", headers={**headers, PROFILE_HEADER: "1"}
+    )
+    assert response.status_code == 200
+    profile_id = response.headers[PROFILE_HEADER]
+
+    profile = client.get(f"{API}/admin/profiles/{profile_id}", headers=headers).json()
+    assert profile["path"] == f"{API}/analytics/dashboard"
+    assert profile["statements"] == len(profile["sql"]) >= 1
+    assert any("FROM habits" in statement["statement"] for statement in profile["sql"])
+    assert profile["samples"] == sum(stack["count"] for stack in profile["stacks"])
+
+    folded = client.get(
+        f"{API}/admin/profiles/{profile_id}", params={"format": "folded"}, headers=headers
+    )
+    assert folded.status_code == 200
+    assert folded.headers["content-type"].startswith("text/plain")
+    for line in folded.text.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert stack and int(count) > 0
+
+    listed = client.get(f"{API}/admin/profiles", headers=headers).json()
+    assert listed[0]["id"] == profile_id
+
+
+def test_query_flag_and_unflagged_requests(client):
+    """Test the query flag, and that requests without a flag are not profiled."""
+    headers = _headers("profiling-flag@example.com", superuser=True)
+    profile_store.clear()
+
+    response = client.get(f"{API}/habits/", params={"profile": "1"}, headers=headers)
+    assert PROFILE_HEADER in response.headers
+
+    response = client.get(f"{API}/habits/", headers=headers)
+    assert PROFILE_HEADER not in response.headers
+    assert len(profile_store.list()) == 1
+
+
+def test_other_users_cannot_profile(client):
+    """Test that only superusers get profiles or reach the admin endpoints."""
+    headers = _headers("profiling-user@example.com")
+    profile_store.clear()
+
+    response = client.get(f"{API}/analytics/dashboard", headers={**headers, PROFILE_HEADER: "1"})
+    assert response.status_code == 200
+    assert PROFILE_HEADER not in response.headers
+    assert profile_store.list() == []
+
+    assert client.get(f"{API}/admin/profiles", headers=headers).status_code == 403
+
+
+def _profiled_work(profile, done):
+    profile.attach()
+    done.wait(1)
+
+
+def _other_work(duration):
+    time.sleep(duration)
+
+
+def test_thread_is_not_sampled_after_leaving_the_request():
+    """Test that a pooled thread stops being sampled once it serves other work."""
+    profile = RequestProfile("GET", "/profiled")
+    profile.interval = 0.005
+    done = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        profile.start(user_id=1)
+        try:
+            attached = pool.submit(_profiled_work, profile, done)
+            time.sleep(0.1)
+            done.set()
+            attached.result()
+            pool.submit(_other_work, 0.1).result()
+        finally:
+            profile.stop()
+
+    assert any("_profiled_work" in stack for stack in profile.samples)
+    assert not any("_other_work" in stack for stack in profile.samples)
@@ -0,0 +1,100 @@
+"""
+Test soft deletion of habits and accounts and their background purge.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from app.core.config import settings
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.models.habit_entry_archive import HabitEntryArchive
+from app.models.user import User
+from app.services.archive_service import ArchiveService
+from app.services.purge_service import PurgeService
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+
+
+def test_deleted_habit_is_hidden_and_purged(client, monkeypatch):
+    """Test that a deleted habit disappears at once and its rows are purged."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "purge-habit@example.com", 2, entry_days=10)
+    finally:
+        db.close()
+    deleted_id, kept_id = seeded["habit_ids"]
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+
+    # Stop the background purge so the soft-deleted state can be observed
+    monkeypatch.setattr(PurgeService, "purge_habit", lambda self, habit_id: 0)
+    response = client.delete(f"{API}/habits/{deleted_id}", headers=headers)
+    assert response.status_code == 200
+
+    habits = client.get(f"{API}/habits/", headers=headers).json()
+    assert [habit["id"] for habit in habits] == [kept_id]
+    assert client.get(f"{API}/habits/{deleted_id}", headers=headers).status_code == 404
+    for path in (
+        f"habits/{deleted_id}/entries",
+        f"analytics/habits/{deleted_id}",
+        f"analytics/habits/{deleted_id}/calendar",
+        f"analytics/habits/{deleted_id}/progress",
+    ):
+        assert client.get(f"{API}/{path}", headers=headers).status_code == 404, path
+    dashboard = client.get(f"{API}/analytics/dashboard", headers=headers).json()
+    assert dashboard["total_habits"] == 1
+    assert dashboard["today_total"] == 1
+    monkeypatch.undo()
+
+    # The periodic purge removes the rows in chunks, leaving other habits alone
+    db = TestingSessionLocal()
+    try:
+        counts = PurgeService(db, chunk_size=4).purge_pending()
+        assert counts["habits"] >= 1 and counts["entries"] >= 10
+        assert db.query(Habit).filter(Habit.id == deleted_id).count() == 0
+        assert db.query(HabitEntry).filter(HabitEntry.habit_id == deleted_id).count() == 0
+        assert db.query(HabitEntry).filter(HabitEntry.habit_id == kept_id).count() == 10
+    finally:
+        db.close()
+
+
+def test_purge_removes_archives(client):
+    """Test that purging a habit also removes its archived years."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "purge-archive@example.com", 1, entry_days=5)
+        habit_id = seeded["habit_ids"][0]
+        ArchiveService(db).archive_before(datetime.now(timezone.utc).date() + timedelta(days=1))
+        assert db.query(HabitEntryArchive).filter_by(habit_id=habit_id).count() == 1
+
+        PurgeService(db).purge_habit(habit_id)
+        assert db.query(HabitEntryArchive).filter_by(habit_id=habit_id).count() == 0
+        assert db.query(Habit).filter_by(id=habit_id).count() == 0
+    finally:
+        db.close()
+
+
+def test_deactivated_user_purged_after_grace_period(client):
+    """Test that a deactivated account is kept until the grace period ends."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "purge-user@example.com", 2, entry_days=3)
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    assert client.delete(f"{API}/users/me", headers=headers).status_code == 200
+
+    db = TestingSessionLocal()
+    try:
+        user = db.query(User).get(seeded["user_id"])
+        assert user.is_active is False and user.deactivated_at is not None
+
+        assert PurgeService(db).purge_pending()["users"] == 0
+        later = datetime.now(timezone.utc) + timedelta(days=settings.PURGE_USER_GRACE_DAYS + 1)
+        counts = PurgeService(db).purge_pending(now=later)
+        assert counts["users"] == 1 and counts["entries"] == 6
+        assert db.query(User).filter_by(id=seeded["user_id"]).count() == 0
+        assert db.query(Habit).filter_by(owner_id=seeded["user_id"]).count() == 0
+    finally:
+        db.close()
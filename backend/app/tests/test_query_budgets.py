@@ -0,0 +1,166 @@
+"""
+Query budgets for every endpoint.
+
+Each route is called for a user with 1 habit and for a user with 100 habits;
+the number of SQL statements must stay within the route's budget and must
+not grow with the amount of data (which is how N+1 queries show up).
+"""
+
+import itertools
+from datetime import date
+from typing import Callable, Dict, NamedTuple
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.tests.conftest import TestingSessionLocal, engine
+from app.tests.utils import TEST_PASSWORD, QueryCounter, create_user_with_habits
+
+API = "/api/v1"
+DATA_SIZES = (1, 100)
+
+_user_sequence = itertools.count()
+
+
+class RouteCall(NamedTuple):
+    method: str
+    path: Callable[[Dict], str]
+    budget: int
+    kwargs: Callable[[Dict], Dict] = lambda seed: {}
+    authenticated: bool = True
+
+
+def _habit(seed: Dict) -> int:
+    return seed["habit_ids"][0]
+
+
+def _entry(seed: Dict) -> int:
+    return seed["entry_ids"][0]
+
+
+# Budgets include the statement that loads the authenticated user
+QUERY_BUDGETS = {
+    # habits.py
+    "list habits": RouteCall("GET", lambda s: f"{API}/habits/", 2),
+    "list active habits": RouteCall(
+        "GET", lambda s: f"{API}/habits/", 2, lambda s: {"params": {"active_only": True}}
+    ),
+    "create habit": RouteCall(
+        "POST", lambda s: f"{API}/habits/", 3, lambda s: {"json": {"name": "New habit"}}
+    ),
+    "read habit": RouteCall("GET", lambda s: f"{API}/habits/{_habit(s)}", 2),
+    "update habit": RouteCall(
+        "PUT", lambda s: f"{API}/habits/{_habit(s)}", 4, lambda s: {"json": {"name": "Renamed"}}
+    ),
+    "delete habit": RouteCall("DELETE", lambda s: f"{API}/habits/{_habit(s)}", 7),
+    "search": RouteCall("GET", lambda s: f"{API}/habits/search?q=habit", 2),
+    "today": RouteCall("GET", lambda s: f"{API}/habits/today", 2),
+    "list habit entries": RouteCall("GET", lambda s: f"{API}/habits/{_habit(s)}/entries", 3),
+    "create habit entry": RouteCall(
+        "POST",
+        lambda s: f"{API}/habits/entries",
+        11,
+        lambda s: {"json": {"habit_id": _habit(s), "date": "2020-01-01", "completed": True}},
+    ),
+    "read habit entry": RouteCall("GET", lambda s: f"{API}/habits/entries/{_entry(s)}", 2),
+    "update habit entry": RouteCall(
+        "PUT",
+        lambda s: f"{API}/habits/entries/{_entry(s)}",
+        9,
+        lambda s: {"json": {"completed": False, "notes": "updated"}},
+    ),
+    "delete habit entry": RouteCall(
+        "DELETE", lambda s: f"{API}/habits/entries/{_entry(s)}", 10
+    ),
+    "entries by date": RouteCall(
+        "GET", lambda s: f"{API}/habits/entries/date/{date.today().isoformat()}", 2
+    ),
+    # analytics.py
+    "dashboard": RouteCall("GET", lambda s: f"{API}/analytics/dashboard", 2),
+    "habit analytics": RouteCall(
+        "GET", lambda s: f"{API}/analytics/habits", 2, lambda s: {"params": {"days": 365}}
+    ),
+    "insights": RouteCall("GET", lambda s: f"{API}/analytics/insights", 3),
+    "habit calendar": RouteCall(
+        "GET", lambda s: f"{API}/analytics/habits/{_habit(s)}/calendar", 3
+    ),
+    "habit progress": RouteCall(
+        "GET", lambda s: f"{API}/analytics/habits/{_habit(s)}/progress", 3
+    ),
+    "habit values": RouteCall(
+        "GET", lambda s: f"{API}/analytics/habits/{_habit(s)}/values", 4
+    ),
+    # users.py
+    "read me": RouteCall("GET", lambda s: f"{API}/users/me", 1),
+    "update me": RouteCall(
+        "PUT", lambda s: f"{API}/users/me", 3, lambda s: {"json": {"full_name": "Renamed"}}
+    ),
+    "read user": RouteCall("GET", lambda s: f"{API}/users/{s['user_id']}", 2),
+    "delete me": RouteCall("DELETE", lambda s: f"{API}/users/me", 3),
+    # auth.py
+    "register": RouteCall(
+        "POST",
+        lambda s: f"{API}/auth/register",
+        3,
+        lambda s: {"json": {"email": f"new-{s['email']}", "password": TEST_PASSWORD}},
+        authenticated=False,
+    ),
+    "login form": RouteCall(
+        "POST",
+        lambda s: f"{API}/auth/login",
+        1,
+        lambda s: {"data": {"username": s["email"], "password": TEST_PASSWORD}},
+        authenticated=False,
+    ),
+    "login email": RouteCall(
+        "POST",
+        lambda s: f"{API}/auth/login/email",
+        1,
+        lambda s: {"json": {"email": s["email"], "password": TEST_PASSWORD}},
+        authenticated=False,
+    ),
+    "refresh": RouteCall(
+        "POST",
+        lambda s: f"{API}/auth/refresh",
+        1,
+        lambda s: {"params": {"refresh_token": s["refresh_token"]}},
+        authenticated=False,
+    ),
+    "test token": RouteCall("POST", lambda s: f"{API}/auth/test-token", 1),
+    "logout": RouteCall(
+        "POST",
+        lambda s: f"{API}/auth/logout",
+        3,
+        lambda s: {"params": {"refresh_token": s["refresh_token"]}},
+    ),
+    "revoke all": RouteCall("POST", lambda s: f"{API}/auth/revoke-all", 2),
+}
+
+
+def _count_statements(client: TestClient, call: RouteCall, habit_count: int) -> int:
+    db = TestingSessionLocal()
+    try:
+        seed = create_user_with_habits(
+            db, f"budget-{next(_user_sequence)}@example.com", habit_count
+        )
+    finally:
+        db.close()
+
+    kwargs = call.kwargs(seed)
+    if call.authenticated:
+        kwargs["headers"] = {"Authorization": f"Bearer {seed['access_token']}"}
+
+    with QueryCounter(engine) as counter:
+        response = client.request(call.method, call.path(seed), **kwargs)
+    assert response.status_code < 400, response.text
+    return counter.count
+
+
+@pytest.mark.parametrize("name", sorted(QUERY_BUDGETS))
+def test_query_budget(client: TestClient, name: str):
+    """Test that a route stays within its query budget at any data size."""
+    call = QUERY_BUDGETS[name]
+    counts = {size: _count_statements(client, call, size) for size in DATA_SIZES}
+
+    assert max(counts.values()) <= call.budget, f"{name}: {counts} > {call.budget}"
+    assert len(set(counts.values())) == 1, f"{name} grows with data size: {counts}"
@@ -0,0 +1,122 @@
+"""
+Test routing of sessions between a primary and a replica database.
+"""
+
+import pytest
+from sqlalchemy.orm import sessionmaker
+
+from app.api.deps import get_read_db
+from app.core.config import settings
+from app.core.database import Base, create_database_engine
+from app.core.routing import (
+    READ_ONLY,
+    USER_ID,
+    RecentWrites,
+    RoutingSession,
+    read_from_primary,
+    recent_writes,
+)
+from app.models.habit import Habit
+from app.models.user import User
+
+
+@pytest.fixture
+def routed_sessions(tmp_path):
+    """Session factory over two SQLite files holding distinguishable users."""
+    primary = create_database_engine(f"sqlite:///{tmp_path / 'primary.db'}")
+    replica = create_database_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    for name, bind in (("primary", primary), ("replica", replica)):
+        Base.metadata.create_all(bind=bind)
+        with sessionmaker(bind=bind)() as db:
+            db.add_all([
+                User(id=1, email=f"one@{name}.example.com", hashed_password="x"),
+                User(id=2, email=f"two@{name}.example.com", hashed_password="x"),
+            ])
+            db.commit()
+
+    recent_writes.clear()
+    yield sessionmaker(
+        class_=RoutingSession, autoflush=False, primary=primary, replicas=[replica]
+    )
+    recent_writes.clear()
+    primary.dispose()
+    replica.dispose()
+
+
+def _served_by(db, user_id: int) -> str:
+    email = db.query(User.email).filter(User.id == user_id).scalar()
+    return email.split("@")[1].split(".")[0]
+
+
+def test_sessions_use_primary_unless_read_only(routed_sessions):
+    """Test that only read-only sessions read from the replica."""
+    with routed_sessions() as db:
+        assert _served_by(db, 1) == "primary"
+
+    with routed_sessions() as db:
+        assert get_read_db(db) is db
+        assert _served_by(db, 1) == "replica"
+        assert _served_by(read_from_primary(db), 1) == "primary"
+
+
+def test_writes_go_to_primary_and_pin_the_session(routed_sessions):
+    """Test that a read-only session which writes stays on the primary."""
+    with routed_sessions() as db:
+        db.info[READ_ONLY] = True
+        db.add(Habit(name="Read", owner_id=1))
+        db.commit()
+        assert _served_by(db, 1) == "primary"
+        assert db.query(Habit).count() == 1
+
+    with routed_sessions() as db:
+        db.info[READ_ONLY] = True
+        assert db.query(Habit).count() == 0  # the replica has not caught up
+
+
+def test_read_your_writes_window(routed_sessions, monkeypatch):
+    """Test that a writer's reads stick to the primary for the window only."""
+    with routed_sessions() as db:
+        db.info[USER_ID] = 1
+        db.query(User).filter(User.id == 1).update({"full_name": "Updated"})
+        db.commit()
+
+    def read_only_session(user_id):
+        db = routed_sessions()
+        db.info.update({READ_ONLY: True, USER_ID: user_id})
+        return db
+
+    with read_only_session(1) as db:
+        assert _served_by(db, 1) == "primary"
+    with read_only_session(2) as db:
+        assert _served_by(db, 2) == "replica"
+
+    monkeypatch.setattr(settings, "READ_YOUR_WRITES_SECONDS", 0)
+    with read_only_session(1) as db:
+        assert _served_by(db, 1) == "replica"
+
+
+def test_write_markers_shared_between_workers():
+    """Test that a write recorded by one worker keeps another off the replica."""
+
+    class SharedMarkers:
+        def __init__(self):
+            self.keys = {}
+
+        def set(self, key, value, px):
+            self.keys[key] = px
+
+        def exists(self, key):
+            return int(key in self.keys)
+
+    shared = SharedMarkers()
+    writer, reader = RecentWrites(client=shared), RecentWrites(client=shared)
+    writer.record(1)
+    assert reader.is_recent(1, settings.READ_YOUR_WRITES_SECONDS)
+    assert not reader.is_recent(2, settings.READ_YOUR_WRITES_SECONDS)
+    assert shared.keys == {"habitflow:recent-write:1": settings.READ_YOUR_WRITES_SECONDS * 1000}
+
+
+def test_replica_uris_parsed_from_comma_separated_string():
+    """Test the SQLALCHEMY_REPLICA_URIS setting format."""
+    parsed = settings.assemble_replica_uris("sqlite:///./a.db, sqlite:///./b.db,")
+    assert parsed == ["sqlite:///./a.db", "sqlite:///./b.db"]
@@ -0,0 +1,157 @@
+"""
+Test token revocation and its Bloom filter fast path.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from app.core import security
+from app.core.cache import LocalBroker
+from app.core.config import settings
+from app.core.revocation import RevocationList, revocation_list
+from app.core.sketches import BloomFilter
+from app.tests.conftest import TestingSessionLocal, engine
+from app.tests.utils import QueryCounter, create_user_with_habits
+
+API = settings.API_V1_STR
+
+
+def test_bloom_filter_error_rate():
+    """Test that added items are always found and false positives stay rare."""
+    bloom = BloomFilter(10_000, error_rate=0.01)
+    bloom.update(f"revoked-{index}" for index in range(10_000))
+    assert all(f"revoked-{index}" in bloom for index in range(10_000))
+    false_positives = sum(f"other-{index}" in bloom for index in range(10_000))
+    assert false_positives < 200
+
+
+def _seed(email):
+    db = TestingSessionLocal()
+    try:
+        return create_user_with_habits(db, email, 0)
+    finally:
+        db.close()
+
+
+def test_unrevoked_token_costs_no_lookup(client):
+    """Test that only the user is loaded when the token was never revoked."""
+    seeded = _seed("revocation-fast@example.com")
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    with QueryCounter(engine) as counter:
+        assert client.post(f"{API}/auth/test-token", headers=headers).status_code == 200
+    assert counter.count == 1
+
+
+def test_logout_revokes_access_and_refresh_tokens(client):
+    """Test that logout revokes only the tokens it was given."""
+    seeded = _seed("revocation-logout@example.com")
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    other = {"Authorization": f"Bearer {security.create_access_token(seeded['user_id'])}"}
+
+    response = client.post(
+        f"{API}/auth/logout", headers=headers, params={"refresh_token": seeded["refresh_token"]}
+    )
+    assert response.status_code == 200
+
+    assert client.post(f"{API}/auth/test-token", headers=headers).status_code == 401
+    refresh = client.post(
+        f"{API}/auth/refresh", params={"refresh_token": seeded["refresh_token"]}
+    )
+    assert refresh.status_code == 401
+    assert client.post(f"{API}/auth/test-token", headers=other).status_code == 200
+
+    # Logging out again with the already revoked refresh token is fine
+    response = client.post(
+        f"{API}/auth/logout", headers=other, params={"refresh_token": seeded["refresh_token"]}
+    )
+    assert response.status_code == 200
+    assert client.post(f"{API}/auth/test-token", headers=other).status_code == 401
+
+
+def test_concurrent_revocations_of_one_token(client):
+    """Test that revoking a token revoked meanwhile keeps the rest of the transaction."""
+    seeded = _seed("revocation-race@example.com")
+    expires_at = datetime.now(timezone.utc) + timedelta(hours=1)
+    first, second = TestingSessionLocal(), TestingSessionLocal()
+    try:
+        # Both logouts found the token unrevoked before either committed
+        revocation_list.revoke(first, "race-jti", seeded["user_id"], expires_at)
+        first.commit()
+        revocation_list.revoke(second, "race-jti", seeded["user_id"], expires_at)
+        revocation_list.revoke(second, "race-refresh-jti", seeded["user_id"], expires_at)
+        second.commit()
+        assert revocation_list.is_revoked(second, "race-jti")
+        assert revocation_list.is_revoked(second, "race-refresh-jti")
+    finally:
+        first.close()
+        second.close()
+
+
+def test_revoke_all_and_password_change(client):
+    """Test that revoke-all and a password change end every session."""
+    seeded = _seed("revocation-all@example.com")
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    assert client.post(f"{API}/auth/revoke-all", headers=headers).status_code == 200
+    assert client.post(f"{API}/auth/test-token", headers=headers).status_code == 401
+    refresh = client.post(
+        f"{API}/auth/refresh", params={"refresh_token": seeded["refresh_token"]}
+    )
+    assert refresh.status_code == 401
+
+    # Tokens issued afterwards carry the new version
+    login = client.post(
+        f"{API}/auth/login/email",
+        json={"email": seeded["email"], "password": "testpassword123"},
+    ).json()
+    headers = {"Authorization": f"Bearer {login['access_token']}"}
+    assert client.post(f"{API}/auth/test-token", headers=headers).status_code == 200
+
+    response = client.put(f"{API}/users/me", headers=headers, json={"password": "newpassword123"})
+    assert response.status_code == 200
+    assert client.post(f"{API}/auth/test-token", headers=headers).status_code == 401
+
+
+def test_revocations_reach_other_workers(client):
+    """Test that a worker's filter learns revocations from the broker and the table."""
+    broker = LocalBroker()
+    worker = RevocationList(broker)
+    worker.start()
+    local = RevocationList(broker)
+    seeded = _seed("revocation-workers@example.com")
+    now = datetime.now(timezone.utc)
+
+    db = TestingSessionLocal()
+    try:
+        local.revoke(db, "live-jti", seeded["user_id"], now + timedelta(hours=1))
+        local.revoke(db, "expired-jti", seeded["user_id"], now - timedelta(hours=1))
+        db.commit()
+        assert "live-jti" in worker.bloom and worker.is_revoked(db, "live-jti")
+
+        # A restarted worker loads unexpired revocations only; pruning drops the rest
+        restarted = RevocationList(LocalBroker())
+        assert restarted.load(db) >= 1
+        assert "live-jti" in restarted.bloom and "expired-jti" not in restarted.bloom
+        assert restarted.prune(db) >= 1
+        assert not local.is_revoked(db, "expired-jti")
+    finally:
+        db.close()
+        worker.stop()
+    assert "live-jti" not in revocation_list.bloom
+
+
+def test_revocation_during_reload_is_kept():
+    """Test that a revocation received while the filter is rebuilt survives the swap."""
+    worker = RevocationList(LocalBroker())
+    db = TestingSessionLocal()
+
+    class Racing:
+        def execute(self, statement):
+            worker.publish([("racing-jti", datetime.now(timezone.utc) + timedelta(hours=1))])
+            return db.execute(statement)
+
+    try:
+        worker.load(Racing())
+    finally:
+        db.close()
+    assert "racing-jti" in worker.bloom
+    worker.publish([("later-jti", datetime.now(timezone.utc) + timedelta(hours=1))])
+    assert worker._rebuilding is None
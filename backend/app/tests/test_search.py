@@ -0,0 +1,104 @@
+"""
+Test full-text search over habits and entry notes.
+"""
+
+from datetime import date, timedelta
+
+from app.core.config import settings
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.services.search_service import snippet
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+
+
+def _seed(email, notes):
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, email, 2, entry_days=0)
+        habit_id = seeded["habit_ids"][0]
+        db.query(Habit).filter(Habit.id == habit_id).update(
+            {"name": "Morning run", "description": "Easy pace around the park"}
+        )
+        for offset, note in enumerate(notes):
+            db.add(HabitEntry(
+                habit_id=habit_id,
+                user_id=seeded["user_id"],
+                date=date.today() - timedelta(days=offset),
+                completed=True,
+                notes=note,
+            ))
+        db.commit()
+        return seeded
+    finally:
+        db.close()
+
+
+def _search(client, seeded, q, **params):
+    response = client.get(
+        f"{API}/habits/search",
+        headers={"Authorization": f"Bearer {seeded['access_token']}"},
+        params={"q": q, **params},
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_snippet_centres_on_match():
+    """Test that snippets start near the first matching word."""
+    content = "x" * 200 + " knee pain " + "y" * 200
+    excerpt = snippet(content, ["knee"], width=60)
+    assert excerpt.startswith("…") and excerpt.endswith("…")
+    assert "knee pain" in excerpt
+
+
+def test_search_notes_and_habits(client):
+    """Test ranked, stemmed matches in notes, names and descriptions."""
+    seeded = _seed("search@example.com", [
+        "Knee pain after the hills",
+        "Felt great, no knee problems",
+        "Rest day",
+    ])
+    other = _seed("search-other@example.com", ["knee pain too"])
+
+    results = _search(client, seeded, "knee pains")
+    assert [result["kind"] for result in results] == ["entry"]
+    assert results[0]["snippet"] == "Knee pain after the hills"
+    assert results[0]["habit_name"] == "Morning run"
+    assert results[0]["entry_date"] == date.today().isoformat()
+
+    results = _search(client, seeded, "knee")
+    assert len(results) == 2
+    assert all(result["habit_id"] == seeded["habit_ids"][0] for result in results)
+    assert results[0]["rank"] >= results[1]["rank"]
+
+    # Prefix match on the last word, against name and description
+    assert [result["kind"] for result in _search(client, seeded, "par")] == ["habit"]
+    assert _search(client, seeded, "knee", skip=1, limit=1)[0]["entry_id"] == results[1]["entry_id"]
+    assert len(_search(client, other, "knee")) == 1
+    assert _search(client, seeded, "?!") == []
+
+
+def test_search_index_follows_writes(client):
+    """Test that updated and deleted notes and habits leave the index."""
+    seeded = _seed("search-writes@example.com", ["blister on left foot"])
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    entry_id = _search(client, seeded, "blister")[0]["entry_id"]
+
+    response = client.put(
+        f"{API}/habits/entries/{entry_id}", headers=headers, json={"notes": "sore calves"}
+    )
+    assert response.status_code == 200
+    assert _search(client, seeded, "blister") == []
+    assert _search(client, seeded, "sore calves")[0]["entry_id"] == entry_id
+
+    response = client.put(
+        f"{API}/habits/{seeded['habit_ids'][1]}", headers=headers, json={"name": "Stretching"}
+    )
+    assert response.status_code == 200
+    assert _search(client, seeded, "stretch")[0]["habit_id"] == seeded["habit_ids"][1]
+
+    assert client.delete(f"{API}/habits/{seeded['habit_ids'][0]}", headers=headers).status_code == 200
+    assert _search(client, seeded, "calves") == []
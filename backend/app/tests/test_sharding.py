@@ -0,0 +1,287 @@
+"""
+Test sharding users across several databases and moving them between shards.
+"""
+
+from datetime import date, datetime
+
+import pytest
+from sqlalchemy import column, func, select, table, update
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.core.database import Base, create_database_engine, get_db
+from app.core.routing import SHARD, RoutingSession
+from app.core.sharding import HashRing, ShardRouter
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.models.habit_value_sketch import HabitValueSketch
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+from app.services.shard_service import ShardService
+from app.services.value_sketch_service import ValueSketchService
+from main import app
+
+API = settings.API_V1_STR
+PASSWORD = "testpassword123"
+
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    """Three SQLite shards serving the app, shard 0 holding the directory."""
+    monkeypatch.setattr(settings, "SHARD_MOVE_SETTLE_SECONDS", 0.0)
+    monkeypatch.setattr(settings, "SHARD_DIRECTORY_CACHE_TTL_SECONDS", 0.0)
+    urls = [f"sqlite:///{tmp_path / f'shard{shard}.db'}" for shard in range(3)]
+    engines = [create_database_engine(url) for url in urls]
+    for engine in engines:
+        Base.metadata.create_all(bind=engine)
+    router = ShardRouter(engines, directory=create_database_engine(urls[0]))
+    session_factory = sessionmaker(
+        class_=RoutingSession, autoflush=False, primary=engines[0], shard_router=router
+    )
+
+    def override_get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    previous_override = app.dependency_overrides[get_db]
+    app.dependency_overrides[get_db] = override_get_db
+    yield router
+    app.dependency_overrides[get_db] = previous_override
+    for engine in engines + [router.directory]:
+        engine.dispose()
+
+
+def _register(client, email):
+    response = client.post(f"{API}/auth/register", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    token = client.post(
+        f"{API}/auth/login/email", json={"email": email, "password": PASSWORD}
+    ).json()["access_token"]
+    return response.json()["id"], {"Authorization": f"Bearer {token}"}
+
+
+def _count(engine, model, **filters):
+    with Session(bind=engine) as db:
+        return db.scalar(select(func.count()).select_from(model).filter_by(**filters))
+
+
+def test_hash_ring_is_consistent():
+    """Test that adding a shard only moves keys onto the new shard."""
+    three, four = HashRing(3), HashRing(4)
+    moved = [key for key in range(2000) if three.shard_for(key) != four.shard_for(key)]
+    assert all(four.shard_for(key) == 3 for key in moved)
+    assert 300 < len(moved) < 700
+
+
+def test_users_and_their_data_live_on_one_shard(client, shards):
+    """Test that users are spread over shards and reach their data after login."""
+    users = [_register(client, f"sharded{n}@example.com") for n in range(6)]
+    assert len({shards.shard_for_user(user_id) for user_id, _ in users}) > 1
+
+    habit_ids = []
+    for user_id, headers in users:
+        habit = client.post(f"{API}/habits/", json={"name": "Read"}, headers=headers).json()
+        habit_ids.append(habit["id"])
+        entry = client.post(
+            f"{API}/habits/entries",
+            json={
+                "habit_id": habit["id"],
+                "date": date.today().isoformat(),
+                "completed": True,
+                "value": 1.0,
+            },
+            headers=headers,
+        )
+        assert entry.status_code == 200, entry.text
+
+        shard = shards.shard_for_user(user_id)
+        for index, engine in enumerate(shards.engines):
+            assert _count(engine, Habit, owner_id=user_id) == (1 if index == shard else 0)
+        assert client.get(f"{API}/users/me", headers=headers).json()["id"] == user_id
+
+    # Ids come from the directory, so they are unique across shards
+    assert len(set(habit_ids)) == len(habit_ids)
+    other_user_headers = users[1][1]
+    response = client.get(f"{API}/habits/{habit_ids[0]}", headers=other_user_headers)
+    assert response.status_code == 404
+    duplicate = client.post(
+        f"{API}/auth/register", json={"email": "sharded0@example.com", "password": PASSWORD}
+    )
+    assert duplicate.status_code == 400
+
+    # Sketches built after an upgrade also take their ids from the directory
+    for engine in shards.engines:
+        with Session(bind=engine) as db:
+            db.query(HabitValueSketch).delete()
+            db.commit()
+    session_factory = sessionmaker(
+        class_=RoutingSession, primary=shards.engines[0], shard_router=shards
+    )
+    for shard in range(len(shards.engines)):
+        with session_factory(info={SHARD: shard}) as db:
+            ValueSketchService(db).rebuild()
+    sketch_ids = []
+    for engine in shards.engines:
+        with Session(bind=engine) as db:
+            sketch_ids += db.scalars(select(HabitValueSketch.id)).all()
+    assert len(sketch_ids) == len(users) == len(set(sketch_ids))
+
+
+def test_move_user_online(client, shards):
+    """Test that a moved user keeps their ids, including writes made mid-move."""
+    user_id, headers = _register(client, "mover@example.com")
+    habit = client.post(f"{API}/habits/", json={"name": "Run"}, headers=headers).json()
+    client.post(
+        f"{API}/habits/entries",
+        json={"habit_id": habit["id"], "date": "2024-03-01", "completed": True},
+        headers=headers,
+    )
+    source = shards.shard_for_user(user_id)
+    target = (source + 1) % len(shards.engines)
+    service = ShardService(sessionmaker(
+        class_=RoutingSession, primary=shards.engines[0], shard_router=shards
+    )())
+
+    copy = service._copy
+
+    def copy_while_user_writes(*args):
+        copied = copy(*args)
+        # The user keeps checking in while the first copy runs
+        later = client.post(
+            f"{API}/habits/entries",
+            json={"habit_id": habit["id"], "date": "2024-03-02", "completed": True},
+            headers=headers,
+        )
+        assert later.status_code == 200, later.text
+        client.put(f"{API}/habits/{habit['id']}", json={"name": "Run 5k"}, headers=headers)
+        return copied
+
+    service._copy = copy_while_user_writes
+    moved = service.move_user(user_id, target)
+    assert (moved["source"], moved["target"], moved["copied"]) == (source, target, 3)
+    assert moved["caught_up"] >= 2
+
+    assert shards.shard_for_user(user_id) == target
+    assert _count(shards.engines[source], User, id=user_id) == 0
+    assert _count(shards.engines[source], HabitEntry, user_id=user_id) == 0
+    assert _count(shards.engines[target], HabitEntry, user_id=user_id) == 2
+    moved_habit = client.get(f"{API}/habits/{habit['id']}", headers=headers).json()
+    assert moved_habit["name"] == "Run 5k"
+
+    # Writes are refused while a move is in progress, also by workers whose
+    # cached placement has not seen it
+    shards.cache.set(user_id, (target, False), ttl=60)
+    with shards.directory.begin() as connection:
+        connection.execute(
+            update(table("user_shards", column("user_id"), column("moving")))
+            .where(column("user_id") == user_id)
+            .values(moving=True)
+        )
+    response = client.post(f"{API}/habits/", json={"name": "Swim"}, headers=headers)
+    assert response.status_code == 503 and "retry-after" in response.headers
+    # Buffered check-ins of the moving user are set aside, not failing the batch
+    records = [{"user_id": user_id}, {"user_id": 0}]
+    assert shards.partition(records) == ({0: [{"user_id": 0}]}, [{"user_id": user_id}])
+    assert client.get(f"{API}/habits/{habit['id']}", headers=headers).status_code == 200
+    shards.set_moving(user_id, False)
+
+    summary = service.summary()["shards"]
+    assert sum(shard["users"] for shard in summary) == 1
+    assert summary[target]["users"] == 1
+
+
+def test_move_keeps_writes_committed_with_old_timestamps(client, shards):
+    """Test that rows changed during the copy are re-copied whatever their timestamps."""
+    user_id, headers = _register(client, "late-commit@example.com")
+    habit = client.post(f"{API}/habits/", json={"name": "Read"}, headers=headers).json()
+    source = shards.shard_for_user(user_id)
+    target = (source + 1) % len(shards.engines)
+    with Session(bind=shards.engines[source]) as db:
+        db.execute(
+            update(Habit)
+            .where(Habit.id == habit["id"])
+            .values(created_at=datetime(2000, 1, 1), updated_at=datetime(2000, 1, 1))
+        )
+        db.commit()
+    service = ShardService(sessionmaker(
+        class_=RoutingSession, primary=shards.engines[0], shard_router=shards
+    )())
+
+    copy = service._copy
+
+    def copy_then_commit_late(*args):
+        copied = copy(*args)
+        # A transaction begun before the copy commits during it
+        with Session(bind=shards.engines[source]) as db:
+            db.execute(
+                update(Habit)
+                .where(Habit.id == habit["id"])
+                .values(name="Read daily", updated_at=datetime(2000, 1, 1))
+            )
+            db.commit()
+        return copied
+
+    service._copy = copy_then_commit_late
+    service.move_user(user_id, target)
+
+    with Session(bind=shards.engines[target]) as db:
+        assert db.get(Habit, habit["id"]).name == "Read daily"
+
+
+def test_moves_run_in_background_batches(client, shards, monkeypatch):
+    """Test that a move job flags its users together and moves them off the request."""
+    monkeypatch.setattr(settings, "SHARD_MOVE_BATCH_SIZE", 2)
+    users = [_register(client, f"batch-mover-{index}@example.com")[0] for index in range(2)]
+    plan = [(user_id, (shards.shard_for_user(user_id) + 1) % len(shards.engines)) for user_id in users]
+    service = ShardService(sessionmaker(
+        class_=RoutingSession, primary=shards.engines[0], shard_router=shards
+    )())
+    flagged = []
+    set_moving_many = shards.set_moving_many
+
+    def record_flagged(user_ids, moving):
+        flagged.append(sorted(user_ids))
+        set_moving_many(user_ids, moving)
+
+    monkeypatch.setattr(shards, "set_moving_many", record_flagged)
+    job = service.start_moves(plan)
+    job.thread.join(10)
+
+    assert job.status == "done" and job.as_dict()["users"] == 2
+    assert flagged == [sorted(users)]
+    assert [move["error"] for move in job.moves] == [None, None]
+    for user_id, target in plan:
+        assert shards.lookup(user_id, cached=False) == (target, False)
+        assert _count(shards.engines[target], User, id=user_id) == 1
+
+    admin_id, headers = _register(client, "shard-admin@example.com")
+    with Session(bind=shards.engines[shards.shard_for_user(admin_id)]) as db:
+        db.execute(update(User).where(User.id == admin_id).values(is_superuser=True))
+        db.commit()
+    response = client.post(
+        f"{API}/admin/shards/users/{admin_id}/move", params={"shard": 9}, headers=headers
+    )
+    assert response.status_code == 400
+    progress = client.get(f"{API}/admin/shards/moves/{job.id}", headers=headers)
+    assert progress.status_code == 200, progress.text
+    assert progress.json()["status"] == "done" and len(progress.json()["moves"]) == 2
+
+
+def test_logout_on_a_shard(client, shards):
+    """Test that revocations land on the user's shard with ids from the directory."""
+    users = [_register(client, f"sharded-logout{n}@example.com") for n in range(3)]
+    for user_id, headers in users:
+        assert client.post(f"{API}/auth/logout", headers=headers).status_code == 200
+        assert client.post(f"{API}/auth/test-token", headers=headers).status_code == 401
+        shard = shards.shard_for_user(user_id)
+        for index, engine in enumerate(shards.engines):
+            assert _count(engine, RevokedToken, user_id=user_id) == (1 if index == shard else 0)
+
+    revoked_ids = []
+    for engine in shards.engines:
+        with Session(bind=engine) as db:
+            revoked_ids += db.scalars(select(RevokedToken.id)).all()
+    assert len(revoked_ids) == len(users) == len(set(revoked_ids))
@@ -0,0 +1,136 @@
+"""
+Test coalescing of identical concurrent computations.
+"""
+
+import threading
+import time
+
+import pytest
+
+from app.core.cache import InvalidationBus, LocalBroker, TaggedCache, user_tag
+from app.core.singleflight import REQUESTS, SingleFlight
+
+
+def _wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.001)
+
+
+def _run_concurrently(flight, key, fn, callers, tags=()):
+    """Start `callers` threads calling `flight.do`; returns (threads, outcomes)."""
+    outcomes = []
+
+    def call():
+        try:
+            outcomes.append(flight.do(key, fn, tags=tags))
+        except Exception as error:
+            outcomes.append(error)
+
+    threads = [threading.Thread(target=call) for _ in range(callers)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def test_concurrent_calls_share_one_execution():
+    """Test that callers arriving during a computation share its result or error."""
+    flight = SingleFlight("test-shared")
+    release = threading.Event()
+    executions = []
+
+    def compute():
+        executions.append(1)
+        release.wait(5)
+        return {"habits": len(executions)}
+
+    threads, outcomes = _run_concurrently(flight, (1, 30), compute, callers=5)
+    _wait_for(lambda: REQUESTS.get(flight="test-shared", outcome="coalesced") == 4)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert executions == [1]
+    assert outcomes == [{"habits": 1}] * 5
+    assert REQUESTS.get(flight="test-shared", outcome="executed") == 1
+    assert len(flight) == 0
+
+    # Nothing is kept once the computation has finished
+    assert flight.do((1, 30), compute) == {"habits": 2}
+
+    release.clear()
+
+    def fail():
+        release.wait(5)
+        raise ValueError("boom")
+
+    threads, outcomes = _run_concurrently(flight, (1, 30), fail, callers=3)
+    _wait_for(lambda: REQUESTS.get(flight="test-shared", outcome="coalesced") == 6)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(outcomes) == 3 and all(isinstance(error, ValueError) for error in outcomes)
+    with pytest.raises(KeyError):
+        flight.do((2, 30), lambda: {}[0])
+
+
+def test_invalidation_detaches_running_computation():
+    """Test that callers arriving after a write do not share an older computation."""
+    flight = SingleFlight("test-invalidated")
+    release = threading.Event()
+    results = iter(["before write", "after write"])
+    started = []
+
+    def compute():
+        result = next(results)
+        started.append(result)
+        release.wait(5)
+        return result
+
+    threads, outcomes = _run_concurrently(
+        flight, "analytics", compute, callers=2, tags=[user_tag(1)]
+    )
+    _wait_for(lambda: REQUESTS.get(flight="test-invalidated", outcome="coalesced") == 1)
+    _wait_for(lambda: len(started) == 1)
+    assert flight.invalidate_tags([user_tag(2)]) == 0
+    assert flight.invalidate_tags([user_tag(1)]) == 1
+
+    later, later_outcomes = _run_concurrently(
+        flight, "analytics", compute, callers=1, tags=[user_tag(1)]
+    )
+    _wait_for(lambda: len(started) == 2)
+    release.set()
+    for thread in threads + later:
+        thread.join()
+    assert outcomes == ["before write"] * 2
+    assert later_outcomes == ["after write"]
+    assert len(flight) == 0
+
+
+def test_invalidated_flight_result_is_not_cached():
+    """Test that a result computed before a write does not reach the cache behind it."""
+    bus = InvalidationBus(LocalBroker())
+    flight = bus.register(SingleFlight("test-cached"))
+    cache = bus.register(TaggedCache("test-cached"))
+    release = threading.Event()
+    results = iter(["before write", "after write"])
+    tags = [user_tag(1)]
+
+    def compute():
+        result = next(results)
+        release.wait(5)
+        return result
+
+    def cached():
+        return cache.get_or_set("calendar", lambda: flight.do("calendar", compute, tags), tags)
+
+    outcomes = []
+    leader = threading.Thread(target=lambda: outcomes.append(cached()))
+    leader.start()
+    _wait_for(lambda: len(flight) == 1)
+    bus.publish(tags)
+    release.set()
+    leader.join()
+    assert outcomes == ["before write"]
+    assert cache.get("calendar") is None
+    assert cached() == "after write" and cache.get("calendar") == "after write"
@@ -0,0 +1,102 @@
+"""
+Test the slow-query log and its admin report.
+"""
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.instrumentation import add_statement_observer, remove_statement_observer
+from app.core.slow_queries import normalize, redact, slow_query_log
+from app.models.user import User
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+
+
+def test_normalize_and_redact():
+    """Test that literals and IN lists are normalized and strings redacted."""
+    assert normalize(
+        "SELECT * FROM habits\n WHERE id IN (?, ?, ?) AND name = 'x' LIMIT 10"
+    ) == "SELECT * FROM habits WHERE id IN (...) AND name = ? LIMIT ?"
+    assert normalize("SELECT 1 FROM habits WHERE owner_id = %(owner_id_1)s") == (
+        "SELECT ? FROM habits WHERE owner_id = ?"
+    )
+    assert normalize("SELECT x::text FROM t") == "SELECT x::text FROM t"
+    assert redact(("secret", 3, None)) == ["<str>", 3, None]
+    assert redact({"email": "a@example.com", "id": 4}) == {"email": "<str>", "id": 4}
+
+
+def test_slow_queries_are_aggregated_with_plans(client, monkeypatch):
+    """Test that slow statements are reported by fingerprint with caller and plan."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "slow-queries@example.com", 2)
+        db.query(User).filter(User.id == seeded["user_id"]).update({"is_superuser": True})
+        db.commit()
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0.0)
+    slow_query_log.clear()
+
+    for habit_id in seeded["habit_ids"]:
+        assert client.get(f"{API}/habits/{habit_id}", headers=headers).status_code == 200
+
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 1e9)
+    report = client.get(
+        f"{API}/admin/slow-queries", params={"order_by": "count"}, headers=headers
+    ).json()
+    habit_lookup = next(
+        query for query in report
+        if query["statement"].startswith("SELECT habits.") and "WHERE habits.id = ?" in query["statement"]
+    )
+    assert habit_lookup["count"] == 2
+    assert habit_lookup["callers"][0]["caller"].startswith("app.services.")
+    assert habit_lookup["plan"] and any("habits" in line for line in habit_lookup["plan"])
+    assert habit_lookup["max_ms"] >= habit_lookup["mean_ms"] > 0
+
+    single = client.get(
+        f"{API}/admin/slow-queries/{habit_lookup['fingerprint']}", headers=headers
+    ).json()
+    assert single["statement"] == habit_lookup["statement"]
+
+    assert client.delete(f"{API}/admin/slow-queries", headers=headers).status_code == 200
+    assert client.get(f"{API}/admin/slow-queries", headers=headers).json() == []
+
+
+def test_plans_are_captured_when_the_report_is_read(client, monkeypatch):
+    """Test that statements are not explained while they run, and failures are recorded."""
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 0.0)
+    slow_query_log.clear()
+    db = TestingSessionLocal()
+    try:
+        db.execute(text("PRAGMA user_version"))
+        db.execute(text("CREATE TEMP TABLE session_only (id INTEGER)"))
+        assert db.execute(text("SELECT id FROM session_only")).all() == []
+        assert db.execute(text("SELECT 1")).scalar() == 1
+    finally:
+        db.close()
+    monkeypatch.setattr(settings, "SLOW_QUERY_THRESHOLD_MS", 1e9)
+    statements = dict(slow_query_log._queries.items())
+    assert all(query.plan is None for query in statements.values())
+
+    statements = {query.statement: query for query in slow_query_log.report()}
+    assert statements["PRAGMA user_version"].plan is None
+    # Only visible to the connection that ran it
+    assert statements["SELECT id FROM session_only"].plan is None
+    assert statements["SELECT ?"].plan
+
+
+def test_failing_observer_does_not_fail_statements(client):
+    """Test that an observer's exception is logged instead of raised into the statement."""
+    def broken(statement, parameters, duration, context):
+        raise RuntimeError("observer bug")
+
+    add_statement_observer(broken)
+    db = TestingSessionLocal()
+    try:
+        assert db.execute(text("SELECT 1")).scalar() == 1
+    finally:
+        db.close()
+        remove_statement_observer(broken)
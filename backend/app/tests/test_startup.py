@@ -0,0 +1,77 @@
+"""
+Test application startup cost and schema startup modes.
+"""
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+
+from app.core.database import get_schema_head, verify_schema_version
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
+# Generous enough for CI runners; a cold start well above this is a regression
+STARTUP_BUDGET_SECONDS = 3.0
+
+HEAVY_OPTIONAL_MODULES = ["google", "gspread", "emails", "celery", "redis", "alembic"]
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+with TestClient(main.app):
+    pass
+print(json.dumps({
+    "elapsed": time.perf_counter() - started,
+    "report": main.app.state.startup_report,
+    "heavy": [m for m in %r if m in sys.modules],
+}))
+"""
+
+
+def _run_startup(tmp_path: Path, **env) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-c", STARTUP_SCRIPT % HEAVY_OPTIONAL_MODULES],
+        cwd=tmp_path,
+        env={"PYTHONPATH": str(BACKEND_DIR), "PATH": "", **env},
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_startup_within_budget(tmp_path: Path):
+    """Test that import plus lifespan startup stays under budget."""
+    startup = _run_startup(tmp_path)
+    assert startup["elapsed"] < STARTUP_BUDGET_SECONDS, startup["report"]
+    assert "schema:create" in startup["report"]
+    assert "import:api" in startup["report"]
+
+
+def test_startup_defers_heavy_imports(tmp_path: Path):
+    """Test that optional clients are not imported at startup."""
+    startup = _run_startup(tmp_path)
+    assert startup["heavy"] == []
+
+
+def test_verify_schema_version(tmp_path: Path):
+    """Test the Alembic revision check used by the verify startup mode."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'schema.db'}")
+    with pytest.raises(RuntimeError):
+        verify_schema_version(bind=engine)
+
+    with engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"
+        )
+        connection.exec_driver_sql(
+            f"INSERT INTO alembic_version VALUES ('{get_schema_head()}')"
+        )
+    assert verify_schema_version(bind=engine) == get_schema_head()
@@ -0,0 +1,81 @@
+"""
+Test the today view of active habits and their entries.
+"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.models.user import User
+from app.services.habit_service import local_today
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+NOW = datetime(2024, 3, 20, 23, 30, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("timezone_name, expected", [
+    ("UTC", date(2024, 3, 20)),
+    ("Asia/Tokyo", date(2024, 3, 21)),
+    ("America/Los_Angeles", date(2024, 3, 20)),
+    ("Not/AZone", date(2024, 3, 20)),
+    (None, date(2024, 3, 20)),
+])
+def test_local_today(timezone_name, expected):
+    """Test the user's current date, falling back to UTC for unknown zones."""
+    assert local_today(timezone_name, now=NOW) == expected
+
+
+def test_today_view(client):
+    """Test that active habits come back with today's entry or none."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "today@example.com", 4, entry_days=0)
+        first, second, inactive, deleted = seeded["habit_ids"]
+        db.query(Habit).filter(Habit.id == inactive).update({"is_active": False})
+        db.query(Habit).filter(Habit.id == deleted).update(
+            {"deleted_at": datetime.now(timezone.utc)}
+        )
+        today = local_today("UTC")
+        db.add_all([
+            HabitEntry(habit_id=first, user_id=seeded["user_id"], date=today, completed=True),
+            HabitEntry(
+                habit_id=second,
+                user_id=seeded["user_id"],
+                date=today - timedelta(days=1),
+                completed=True,
+            ),
+            HabitEntry(habit_id=inactive, user_id=seeded["user_id"], date=today, completed=True),
+        ])
+        db.commit()
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+
+    response = client.get(f"{API}/habits/today", headers=headers)
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["date"] == today.isoformat()
+    assert [item["habit"]["id"] for item in body["habits"]] == [first, second]
+    assert body["habits"][0]["entry"]["completed"] is True
+    assert body["habits"][0]["entry"]["date"] == today.isoformat()
+    assert body["habits"][1]["entry"] is None
+
+
+def test_today_view_uses_user_time_zone(client):
+    """Test that the view's date follows the user's time zone."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "today-tz@example.com", 1, entry_days=0)
+        db.query(User).filter(User.id == seeded["user_id"]).update({"timezone": "Pacific/Kiritimati"})
+        db.commit()
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+
+    body = client.get(f"{API}/habits/today", headers=headers).json()
+    assert body["date"] == local_today("Pacific/Kiritimati").isoformat()
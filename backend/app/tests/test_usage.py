@@ -0,0 +1,131 @@
+"""
+Test platform-wide usage rollups and their HyperLogLog sketches.
+"""
+
+from datetime import date, timedelta
+
+from app.core.config import settings
+from app.core.sketches import HyperLogLog
+from app.core.usage import usage_rollups
+from app.models.usage_rollup import UsageRollup
+from app.models.user import User
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import TEST_PASSWORD, create_user_with_habits
+
+API = settings.API_V1_STR
+
+
+def test_hyperloglog_estimates():
+    """Test distinct counts of small and large sets and of merged sketches."""
+    small = HyperLogLog()
+    small.update(str(user_id) for user_id in range(20) for _ in range(3))
+    assert small.count() == 20
+
+    first, second = HyperLogLog(), HyperLogLog()
+    first.update(f"user-{index}" for index in range(30_000))
+    second.update(f"user-{index}" for index in range(20_000, 50_000))
+    assert abs(first.count() - 30_000) < 1_000
+    first.merge(HyperLogLog.from_bytes(second.to_bytes()))
+    assert abs(first.count() - 50_000) < 1_500
+    assert len(first.to_bytes()) == 4097
+
+
+def _flush():
+    db = TestingSessionLocal()
+    try:
+        return usage_rollups.flush(db)
+    finally:
+        db.close()
+
+
+def test_usage_report(client):
+    """Test that usage is counted on the write path and survives flushing."""
+    usage_rollups.clear()
+    db = TestingSessionLocal()
+    try:
+        db.query(UsageRollup).delete()
+        seeded = create_user_with_habits(db, "usage-admin@example.com", 0)
+        db.query(User).filter(User.id == seeded["user_id"]).update({"is_superuser": True})
+        db.commit()
+    finally:
+        db.close()
+    admin = {"Authorization": f"Bearer {seeded['access_token']}"}
+
+    for index in range(3):
+        email = f"usage-{index}@example.com"
+        client.post(f"{API}/auth/register", json={"email": email, "password": TEST_PASSWORD})
+        token = client.post(
+            f"{API}/auth/login/email", json={"email": email, "password": TEST_PASSWORD}
+        ).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        habit = client.post(f"{API}/habits/", json={"name": "Walk"}, headers=headers).json()
+        for offset in range(2):
+            day = date.today() - timedelta(days=offset)
+            client.post(
+                f"{API}/habits/entries",
+                json={"habit_id": habit["id"], "date": day.isoformat(), "completed": True},
+                headers=headers,
+            )
+
+    def report(**params):
+        response = client.get(f"{API}/admin/usage", params=params, headers=admin)
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    today = date.today()
+    expected = {"active_users": 4, "check_ins": 6, "habits_created": 3, "users_registered": 3}
+    # Not flushed yet: this worker's pending counts are included
+    bucket = report()["buckets"][-1]
+    assert bucket["end_date"] == today.isoformat()
+    assert {name: bucket[name] for name in expected} == expected
+
+    assert _flush() == 1
+    bucket = report()["buckets"][-1]
+    assert {name: bucket[name] for name in expected} == expected
+
+    # Distinct users are not counted twice across the days of a week
+    yesterday = today - timedelta(days=1)
+    usage_rollups.active(seeded["user_id"], day=yesterday)
+    usage_rollups.active(10_000, day=yesterday)
+    usage_rollups.record(day=yesterday, check_ins=5)
+    _flush()
+    daily = report(start_date=yesterday.isoformat(), end_date=today.isoformat())
+    assert [bucket["active_users"] for bucket in daily["buckets"]] == [2, 4]
+    assert daily["active_users"] == 5
+    monthly = report(
+        start_date=yesterday.isoformat(), end_date=today.isoformat(), period="monthly"
+    )
+    assert sum(bucket["check_ins"] for bucket in monthly["buckets"]) == 11
+    assert monthly["active_users"] == 5
+
+    user = {"Authorization": f"Bearer {token}"}
+    assert client.get(f"{API}/admin/usage", headers=user).status_code == 403
+
+
+def test_check_ins_count_completions_only(client):
+    """Test that incomplete entries and re-posted days are not counted as check-ins."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "usage-check-ins@example.com", 1, entry_days=0)
+    finally:
+        db.close()
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    usage_rollups.clear()
+
+    def check_ins():
+        return sum(usage.counts["check_ins"] for usage in usage_rollups.pending().values())
+
+    def post(day, completed):
+        entry = {"habit_id": seeded["habit_ids"][0], "date": day.isoformat(), "completed": completed}
+        response = client.post(f"{API}/habits/entries", json=entry, headers=headers)
+        assert response.status_code in (200, 201), response.text
+
+    today = date.today()
+    post(today, False)
+    assert check_ins() == 0
+    post(today, True)
+    assert check_ins() == 1
+    post(today, True)
+    assert check_ins() == 1
+    post(today - timedelta(days=1), True)
+    assert check_ins() == 2
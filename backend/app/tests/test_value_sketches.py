@@ -0,0 +1,162 @@
+"""
+Test quantile sketches of habit values and the statistics built from them.
+"""
+
+import bisect
+import math
+import random
+from datetime import date, timedelta
+
+from app.core.config import settings
+from app.core.sketches import KLLSketch
+from app.models.habit_entry import HabitEntry
+from app.models.habit_value_sketch import HabitValueSketch
+from app.services.value_sketch_service import ValueSketchService
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+
+
+def _exact(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def test_kll_sketch_accuracy():
+    """Test merged sketches against exact quantiles, and exactness for few values."""
+    generator = random.Random(7)
+    values = [generator.lognormvariate(3, 1) for _ in range(50_000)]
+    parts = [KLLSketch(200) for _ in range(12)]
+    for index, value in enumerate(values):
+        parts[index % len(parts)].add(value)
+    sketch = KLLSketch(200)
+    for part in parts:
+        sketch.merge(KLLSketch.from_bytes(part.to_bytes()))
+
+    assert sketch.count == len(values) and sketch.size < 1_000
+    ordered = sorted(values)
+    for fraction in (0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99):
+        true_rank = bisect.bisect_right(ordered, sketch.quantile(fraction)) / len(values)
+        assert abs(true_rank - fraction) < 0.02, fraction
+    assert abs(sketch.rank(ordered[25_000]) - 25_000) < 1_000
+    assert sum(sketch.histogram([0, 10, 20, 40, sketch.max])) == len(values)
+    assert (sketch.quantile(0), sketch.quantile(1)) == (min(values), max(values))
+
+    small = KLLSketch(200)
+    small.update(values[:150])
+    for fraction in (0.1, 0.5, 0.9):
+        assert small.quantile(fraction) == _exact(values[:150], fraction)
+    assert KLLSketch().quantile(0.5) is None
+
+
+def test_habit_value_statistics(client):
+    """Test window statistics across stored and partial months as entries change."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "sketches@example.com", 1, entry_days=0)
+    finally:
+        db.close()
+    habit_id = seeded["habit_ids"][0]
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+
+    values = {}
+    day = date(2024, 1, 10)
+    while day <= date(2024, 3, 20):
+        values[day] = float((day.toordinal() * 37) % 101)
+        response = client.post(
+            f"{API}/habits/entries",
+            json={"habit_id": habit_id, "date": day.isoformat(), "completed": True, "value": values[day]},
+            headers=headers,
+        )
+        assert response.status_code == 200, response.text
+        day += timedelta(days=1)
+
+    def statistics(start, end, **params):
+        response = client.get(
+            f"{API}/analytics/habits/{habit_id}/values",
+            params={"start_date": start.isoformat(), "end_date": end.isoformat(), **params},
+            headers=headers,
+        )
+        assert response.status_code == 200, response.text
+        return response.json()
+
+    def expected(start, end):
+        return [value for day, value in values.items() if start <= day <= end]
+
+    start, end = date(2024, 1, 20), date(2024, 3, 5)
+    result = statistics(start, end, bins=4)
+    window = expected(start, end)
+    assert result["count"] == len(window) and not result["approximate"]
+    assert result["median_value"] == _exact(window, 0.5)
+    assert result["p90_value"] == _exact(window, 0.9)
+    assert result["quantiles"]["p25"] == _exact(window, 0.25)
+    assert (result["min_value"], result["max_value"]) == (min(window), max(window))
+    assert len(result["histogram"]) == 4
+    assert sum(bin["count"] for bin in result["histogram"]) == len(window)
+
+    # Changing and deleting entries rebuilds the month they belong to
+    entries = client.get(
+        f"{API}/habits/{habit_id}/entries",
+        params={"start_date": "2024-02-01", "end_date": "2024-02-29", "limit": 100},
+        headers=headers,
+    ).json()
+    changed, removed = entries[0], entries[1]
+    client.put(f"{API}/habits/entries/{changed['id']}", json={"value": 1000.0}, headers=headers)
+    client.delete(f"{API}/habits/entries/{removed['id']}", headers=headers)
+    values[date.fromisoformat(changed["date"])] = 1000.0
+    del values[date.fromisoformat(removed["date"])]
+
+    result = statistics(start, end)
+    window = expected(start, end)
+    assert result["count"] == len(window)
+    assert result["median_value"] == _exact(window, 0.5)
+    assert result["max_value"] == 1000.0
+
+    db = TestingSessionLocal()
+    try:
+        months = {
+            row.month: row.value_count
+            for row in db.query(HabitValueSketch).filter(HabitValueSketch.habit_id == habit_id)
+        }
+    finally:
+        db.close()
+    assert months == {date(2024, 1, 1): 22, date(2024, 2, 1): 28, date(2024, 3, 1): 20}
+
+    empty = statistics(date(2023, 1, 1), date(2023, 12, 31))
+    assert empty["count"] == 0 and empty["median_value"] is None
+
+
+def test_rebuild_builds_missing_sketches_in_batches(client):
+    """Test that sketches are built for values stored before they existed."""
+    db = TestingSessionLocal()
+    try:
+        seeded = create_user_with_habits(db, "sketches-backfill@example.com", 4)
+        habit_ids = seeded["habit_ids"]
+        db.commit()
+        service = ValueSketchService(db)
+        service.refresh(db.query(HabitEntry).filter(HabitEntry.habit_id.in_(habit_ids)).all())
+        db.commit()
+
+        def sketches():
+            return {
+                (row.habit_id, row.month): row.sketch
+                for row in db.query(HabitValueSketch).filter(
+                    HabitValueSketch.habit_id.in_(habit_ids)
+                )
+            }
+
+        expected = sketches()
+        assert expected
+        db.query(HabitValueSketch).delete()
+        db.commit()
+
+        written = service.rebuild(batch_size=3)
+        assert written >= len(expected)
+        assert sketches() == expected
+
+        # Running it again replaces the sketches instead of adding to them
+        assert service.rebuild(batch_size=3) == written
+        assert sketches() == expected
+    finally:
+        db.close()
@@ -0,0 +1,275 @@
+"""
+Test the write-behind check-in buffer, including recovery after crashes.
+"""
+
+from datetime import date, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.core.write_behind import JournalQueue, WriteBehindBuffer, write_behind
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.services.habit_service import HabitEntryService
+from app.tests.conftest import TestingSessionLocal
+from app.tests.utils import create_user_with_habits
+
+API = settings.API_V1_STR
+DAY = date(2024, 3, 20)
+
+
+def _seed(email, habit_count=2):
+    db = TestingSessionLocal()
+    try:
+        return create_user_with_habits(db, email, habit_count, entry_days=0)
+    finally:
+        db.close()
+
+
+def _flush(buffer):
+    db = TestingSessionLocal()
+
+    def apply(records):
+        HabitEntryService(db).upsert_many(records)
+
+    try:
+        return buffer.flush(apply)
+    finally:
+        db.close()
+
+
+def _stored(habit_ids):
+    db = TestingSessionLocal()
+    try:
+        entries = (
+            db.query(HabitEntry.habit_id, HabitEntry.date, HabitEntry.completed, HabitEntry.notes)
+            .filter(HabitEntry.habit_id.in_(habit_ids))
+            .order_by(HabitEntry.habit_id, HabitEntry.date)
+            .all()
+        )
+        completions = [
+            total
+            for (total,) in db.query(Habit.total_completions)
+            .filter(Habit.id.in_(habit_ids))
+            .order_by(Habit.id)
+        ]
+        return [tuple(entry) for entry in entries], completions
+    finally:
+        db.close()
+
+
+def test_journal_survives_a_crash_before_flushing(client, tmp_path):
+    """Test that queued check-ins are flushed after a restart, latest winning."""
+    seeded = _seed("write-behind-restart@example.com")
+    first, second = seeded["habit_ids"]
+    buffer = WriteBehindBuffer(JournalQueue(tmp_path))
+    buffer.enqueue(seeded["user_id"], first, DAY, False, notes="started")
+    buffer.enqueue(seeded["user_id"], first, DAY, True, notes="done")
+    buffer.enqueue(seeded["user_id"], second, DAY - timedelta(days=1), True)
+    buffer.queue.close()  # crash: nothing flushed or acknowledged
+
+    restarted = WriteBehindBuffer(JournalQueue(tmp_path))
+    assert [entry.notes for entry in restarted.pending(seeded["user_id"], DAY)] == ["done"]
+    assert _flush(restarted) == 3
+
+    assert _stored(seeded["habit_ids"]) == (
+        [(first, DAY, True, "done"), (second, DAY - timedelta(days=1), True, None)],
+        [1, 1],
+    )
+    assert restarted.pending(seeded["user_id"]) == []
+    assert _flush(restarted) == 0
+
+
+def test_replay_after_commit_is_idempotent(client, tmp_path):
+    """Test that a batch committed but never acknowledged is not applied twice."""
+    seeded = _seed("write-behind-replay@example.com", habit_count=1)
+    (habit_id,) = seeded["habit_ids"]
+    buffer = WriteBehindBuffer(JournalQueue(tmp_path))
+    buffer.enqueue(seeded["user_id"], habit_id, DAY, True)
+
+    # crash between the commit and the acknowledgement
+    db = TestingSessionLocal()
+    try:
+        HabitEntryService(db).upsert_many(buffer.queue.claim())
+    finally:
+        db.close()
+    buffer.queue.close()
+
+    restarted = WriteBehindBuffer(JournalQueue(tmp_path))
+    assert len(restarted.pending(seeded["user_id"])) == 1
+    assert _flush(restarted) == 1
+    assert _stored([habit_id]) == ([(habit_id, DAY, True, None)], [1])
+
+
+class _ReleaseCountingQueue(JournalQueue):
+    released = 0
+
+    def release(self):
+        self.released += 1
+
+
+def test_failed_flush_keeps_records(client, tmp_path):
+    """Test that records stay queued, and the claim is released, when applying them fails."""
+    seeded = _seed("write-behind-failure@example.com", habit_count=1)
+    (habit_id,) = seeded["habit_ids"]
+    buffer = WriteBehindBuffer(_ReleaseCountingQueue(tmp_path))
+    buffer.enqueue(seeded["user_id"], habit_id, DAY, True)
+
+    def fail(records):
+        raise RuntimeError("database unavailable")
+
+    with pytest.raises(RuntimeError):
+        buffer.flush(fail)
+    assert buffer.queue.released == 1
+    # A check-in made meanwhile goes to a fresh journal and is flushed next
+    buffer.enqueue(seeded["user_id"], habit_id, DAY + timedelta(days=1), True)
+
+    assert _flush(buffer) == 1
+    assert _flush(buffer) == 1
+    assert _stored([habit_id]) == (
+        [(habit_id, DAY, True, None), (habit_id, DAY + timedelta(days=1), True, None)],
+        [2],
+    )
+
+
+def test_deferred_records_are_queued_again(client, tmp_path):
+    """Test that records set aside by `apply` stay pending while the rest are flushed."""
+    moving = _seed("write-behind-moving@example.com", habit_count=1)
+    staying = _seed("write-behind-staying@example.com", habit_count=1)
+    buffer = WriteBehindBuffer(JournalQueue(tmp_path))
+    buffer.enqueue(moving["user_id"], moving["habit_ids"][0], DAY, False)
+    buffer.enqueue(moving["user_id"], moving["habit_ids"][0], DAY, True)
+    buffer.enqueue(staying["user_id"], staying["habit_ids"][0], DAY, True)
+
+    def apply_all_but_moving(records):
+        deferred = [record for record in records if record["user_id"] == moving["user_id"]]
+        db = TestingSessionLocal()
+        try:
+            HabitEntryService(db).upsert_many([r for r in records if r not in deferred])
+        finally:
+            db.close()
+        return deferred
+
+    assert buffer.flush(apply_all_but_moving) == 1
+    assert _stored(staying["habit_ids"]) == ([(staying["habit_ids"][0], DAY, True, None)], [1])
+    # Only the latest check-in of the day is queued again
+    assert [entry.completed for entry in buffer.pending(moving["user_id"])] == [True]
+    assert _flush(buffer) == 1
+    assert _stored(moving["habit_ids"]) == ([(moving["habit_ids"][0], DAY, True, None)], [1])
+    assert buffer.pending(moving["user_id"]) == []
+
+
+def test_queued_deletion_removes_stored_entry(client, tmp_path):
+    """Test that a queued deletion removes the entry and its completion."""
+    seeded = _seed("write-behind-delete@example.com", habit_count=1)
+    (habit_id,) = seeded["habit_ids"]
+    buffer = WriteBehindBuffer(JournalQueue(tmp_path))
+    buffer.enqueue(seeded["user_id"], habit_id, DAY, True)
+    assert _flush(buffer) == 1
+
+    buffer.enqueue(seeded["user_id"], habit_id, DAY, False, deleted=True)
+    assert buffer.pending(seeded["user_id"], DAY)[0].deleted
+    assert _flush(buffer) == 1
+    assert _stored([habit_id]) == ([], [0])
+    assert _flush(buffer) == 0
+
+
+def test_torn_journal_line_is_skipped(client, tmp_path):
+    """Test that a partially written last record does not block recovery."""
+    seeded = _seed("write-behind-torn@example.com", habit_count=1)
+    (habit_id,) = seeded["habit_ids"]
+    buffer = WriteBehindBuffer(JournalQueue(tmp_path))
+    buffer.enqueue(seeded["user_id"], habit_id, DAY, True)
+    buffer.queue.close()
+    with (tmp_path / "pending.jsonl").open("a") as journal:
+        journal.write('{"id": "torn", "user_id"')
+
+    assert _flush(WriteBehindBuffer(JournalQueue(tmp_path))) == 1
+    assert _stored([habit_id]) == ([(habit_id, DAY, True, None)], [1])
+
+
+def test_check_in_after_torn_journal_line_is_flushed(client, tmp_path):
+    """Test that a record appended after a torn line does not merge into it."""
+    seeded = _seed("write-behind-torn-append@example.com", habit_count=1)
+    (habit_id,) = seeded["habit_ids"]
+    buffer = WriteBehindBuffer(JournalQueue(tmp_path))
+    buffer.enqueue(seeded["user_id"], habit_id, DAY, True)
+    buffer.queue.close()
+    with (tmp_path / "pending.jsonl").open("a") as journal:
+        journal.write('{"id": "torn", "user_id"')
+
+    restarted = WriteBehindBuffer(JournalQueue(tmp_path))
+    restarted.enqueue(seeded["user_id"], habit_id, DAY + timedelta(days=1), True)
+    assert _flush(restarted) == 2
+    assert restarted.pending(seeded["user_id"]) == []
+    assert _stored([habit_id]) == (
+        [(habit_id, DAY, True, None), (habit_id, DAY + timedelta(days=1), True, None)],
+        [2],
+    )
+
+
+def test_check_ins_are_visible_before_flush(client, tmp_path, monkeypatch):
+    """Test that queued check-ins show up on the user's day and dashboard."""
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(write_behind, "_queue", JournalQueue(tmp_path))
+    seeded = _seed("write-behind-api@example.com")
+    first, second = seeded["habit_ids"]
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    today = date.today()
+
+    response = client.post(
+        f"{API}/habits/entries",
+        headers=headers,
+        json={"habit_id": first, "date": today.isoformat(), "completed": True},
+    )
+    assert response.status_code == 202, response.text
+    assert response.json()["pending"] is True
+    assert _stored([first]) == ([], [0])
+
+    entries = client.get(f"{API}/habits/entries/date/{today.isoformat()}", headers=headers).json()
+    assert [(entry["habit_id"], entry["completed"], entry["pending"]) for entry in entries] == [
+        (first, True, True)
+    ]
+    dashboard = client.get(f"{API}/analytics/dashboard", headers=headers).json()
+    assert (dashboard["today_total"], dashboard["today_completed"]) == (1, 1)
+    view = client.get(f"{API}/habits/today", headers=headers).json()
+    assert view["date"] == today.isoformat()
+    entries = {row["habit"]["id"]: row["entry"] for row in view["habits"]}
+    assert entries[second] is None
+    assert (entries[first]["completed"], entries[first]["pending"]) == (True, True)
+
+    assert _flush(write_behind) == 1
+    entries = client.get(f"{API}/habits/entries/date/{today.isoformat()}", headers=headers).json()
+    assert len(entries) == 1 and "pending" not in entries[0]
+    habit = client.get(f"{API}/habits/{first}", headers=headers).json()
+    assert habit["total_completions"] == 1 and habit["current_streak"] == 1
+
+
+def test_update_and_delete_behind_queued_check_in(client, tmp_path, monkeypatch):
+    """Test that edits of an entry with a queued check-in are not undone by the flush."""
+    monkeypatch.setattr(settings, "WRITE_BEHIND_ENABLED", True)
+    monkeypatch.setattr(write_behind, "_queue", JournalQueue(tmp_path))
+    seeded = _seed("write-behind-edits@example.com", habit_count=1)
+    (habit_id,) = seeded["habit_ids"]
+    headers = {"Authorization": f"Bearer {seeded['access_token']}"}
+    today = date.today()
+    check_in = {"habit_id": habit_id, "date": today.isoformat(), "completed": True}
+
+    client.post(f"{API}/habits/entries", headers=headers, json=check_in)
+    assert _flush(write_behind) == 1
+    (stored,) = client.get(f"{API}/habits/entries/date/{today.isoformat()}", headers=headers).json()
+    client.post(f"{API}/habits/entries", headers=headers, json={**check_in, "notes": "queued"})
+
+    response = client.put(f"{API}/habits/entries/{stored['id']}", headers=headers, json={"value": 5})
+    assert response.status_code == 202, response.text
+    assert (response.json()["id"], response.json()["notes"]) == (stored["id"], "queued")
+    view = client.get(f"{API}/habits/today", headers=headers).json()
+    assert view["habits"][0]["entry"]["value"] == 5
+
+    response = client.delete(f"{API}/habits/entries/{stored['id']}", headers=headers)
+    assert response.status_code == 200
+    assert client.get(f"{API}/habits/entries/date/{today.isoformat()}", headers=headers).json() == []
+    assert client.get(f"{API}/habits/today", headers=headers).json()["habits"][0]["entry"] is None
+
+    assert _flush(write_behind) == 3
+    assert _stored([habit_id]) == ([], [0])
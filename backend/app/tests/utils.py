@@ -0,0 +1,95 @@
+"""
+Shared helpers for tests: statement counting and data seeding.
+"""
+
+from datetime import date, timedelta
+from typing import Dict, List
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.core import security
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.models.user import User
+
+TEST_PASSWORD = "testpassword123"
+_password_hash = None
+
+
+class QueryCounter:
+    """Context manager counting SQL statements executed on an engine."""
+
+    def __init__(self, engine: Engine):
+        self.engine = engine
+        self.statements: List[str] = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def __enter__(self) -> "QueryCounter":
+        self.statements = []
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+def create_user_with_habits(
+    db: Session, email: str, habit_count: int, entry_days: int = 3
+) -> Dict:
+    """Create a user owning `habit_count` habits with recent entries.
+
+    Returns ids and an access token so tests can call the API directly.
+    """
+    global _password_hash
+    if _password_hash is None:
+        _password_hash = security.get_password_hash(TEST_PASSWORD)
+
+    user = User(email=email, hashed_password=_password_hash, is_active=True)
+    db.add(user)
+    db.flush()
+
+    today = date.today()
+    habits = [
+        Habit(
+            name=f"Habit {index}",
+            habit_type="count" if index % 2 else "boolean",
+            owner_id=user.id,
+            current_streak=0,
+            longest_streak=0,
+            total_completions=0,
+        )
+        for index in range(habit_count)
+    ]
+    db.add_all(habits)
+    db.flush()
+
+    entries = [
+        HabitEntry(
+            habit_id=habit.id,
+            user_id=user.id,
+            date=today - timedelta(days=offset),
+            completed=offset % 2 == 0,
+            value=float(offset),
+        )
+        for habit in habits
+        for offset in range(entry_days)
+    ]
+    db.add_all(entries)
+    db.commit()
+
+    return {
+        "user_id": user.id,
+        "email": email,
+        "habit_ids": [habit.id for habit in habits],
+        "entry_ids": [entry.id for entry in entries],
+        "access_token": security.create_access_token(user.id),
+        "refresh_token": security.create_refresh_token(user.id),
+    }
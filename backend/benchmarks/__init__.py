@@ -0,0 +1,8 @@
+"""
+Synthetic data generation and benchmark suites for the HabitFlow API.
+
+Run from the backend directory, for example::
+
+    python -m benchmarks.datagen --db sqlite:///./bench.db --users 50 --habits 8 --years 2
+    python -m benchmarks.api_load --users 20 --habits 10 --years 1 --save-baseline local
+"""
@@ -0,0 +1,168 @@
+"""
+Load-test benchmark driving the real FastAPI app through an in-process ASGI client.
+
+Generates a deterministic dataset, then fires concurrent requests at the
+check-in, habit list, dashboard, calendar and analytics endpoints and reports
+throughput and p50/p95/p99 latency per scenario. Results can be stored as a
+named baseline and compared against on later runs.
+
+    python -m benchmarks.api_load --users 20 --habits 10 --years 1 --save-baseline local
+    python -m benchmarks.api_load --users 20 --habits 10 --years 1 --compare local
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+from app.core import security
+from app.core.config import settings
+from benchmarks.common import (
+    compare,
+    create_benchmark_engine,
+    load_baseline,
+    override_database,
+    print_report,
+    save_baseline,
+    summarize,
+)
+from benchmarks.datagen import GeneratedData, generate
+
+API = settings.API_V1_STR
+
+# scenario -> (method, path, json body) for a given user and one of their habits
+RequestFactory = Callable[[random.Random, int, List[int]], Tuple[str, str, Optional[Dict]]]
+
+SCENARIOS: Dict[str, RequestFactory] = {
+    "checkin": lambda rng, user_id, habits: (
+        "POST",
+        f"{API}/habits/entries",
+        {
+            "habit_id": rng.choice(habits),
+            "date": (date.today() - timedelta(days=rng.randint(0, 6))).isoformat(),
+            "completed": rng.random() < 0.8,
+        },
+    ),
+    "list": lambda rng, user_id, habits: ("GET", f"{API}/habits/", None),
+    "dashboard": lambda rng, user_id, habits: ("GET", f"{API}/analytics/dashboard", None),
+    "calendar": lambda rng, user_id, habits: (
+        "GET", f"{API}/analytics/habits/{rng.choice(habits)}/calendar", None
+    ),
+    "analytics": lambda rng, user_id, habits: ("GET", f"{API}/analytics/habits?days=365", None),
+}
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    factory: RequestFactory,
+    data: GeneratedData,
+    tokens: Dict[int, str],
+    requests: int,
+    concurrency: int,
+    seed: int,
+) -> Dict[str, float]:
+    """Fire `requests` requests with at most `concurrency` in flight."""
+    rng = random.Random(seed)
+    users = [user_id for user_id in data.user_ids if data.habit_ids_by_user[user_id]]
+    calls = []
+    for _ in range(requests):
+        user_id = rng.choice(users)
+        calls.append((user_id, factory(rng, user_id, data.habit_ids_by_user[user_id])))
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def _call(user_id: int, method: str, path: str, body: Optional[Dict]):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(
+                method, path, json=body,
+                headers={"Authorization": f"Bearer {tokens[user_id]}"},
+            )
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    wall_started = time.perf_counter()
+    await asyncio.gather(*(_call(user_id, *call) for user_id, call in calls))
+    summary = summarize(latencies, time.perf_counter() - wall_started)
+    summary["errors"] = errors
+    return summary
+
+
+async def run_benchmark(
+    app,
+    data: GeneratedData,
+    requests: int,
+    concurrency: int,
+    scenarios: Optional[List[str]] = None,
+    seed: int = 42,
+) -> Dict:
+    """Run the selected scenarios against `app` and collect their summaries."""
+    tokens = {user_id: security.create_access_token(user_id) for user_id in data.user_ids}
+    results: Dict = {"scenarios": {}}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name in scenarios or list(SCENARIOS):
+            results["scenarios"][name] = await run_scenario(
+                client, SCENARIOS[name], data, tokens, requests, concurrency, seed
+            )
+    return results
+
+
+def main() -> None:
+    from main import app
+
+    parser = argparse.ArgumentParser(description="HabitFlow API load benchmark")
+    parser.add_argument("--db", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--habits", type=int, default=10, help="Habits per user")
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS))
+    parser.add_argument("--save-baseline", metavar="NAME")
+    parser.add_argument("--compare", metavar="NAME")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.db or f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_benchmark_engine(url)
+        override_database(app, engine)
+        data = generate(engine, args.users, args.habits, args.years, args.seed)
+        print(f"Dataset: {len(data.user_ids)} users, {data.entry_count} entries\n")
+
+        results = asyncio.run(
+            run_benchmark(app, data, args.requests, args.concurrency, args.scenario, args.seed)
+        )
+        results["parameters"] = {
+            key: getattr(args, key)
+            for key in ("users", "habits", "years", "seed", "requests", "concurrency")
+        }
+        engine.dispose()
+
+    changes = None
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        if baseline is None:
+            print(f"No baseline named '{args.compare}', skipping comparison")
+        else:
+            changes = compare(results, baseline)
+    print_report(results, changes)
+
+    if args.save_baseline:
+        path = save_baseline(args.save_baseline, results)
+        print(f"\nBaseline saved to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Archival benchmark: hot-table size and hot-query latency before and after archiving.
+
+Generates a multi-year dataset, measures the habit_entries table (rows and,
+on SQLite, on-disk bytes including its indexes) and the latency of recent
+progress/calendar queries, archives everything past the horizon and measures
+again.
+
+    python -m benchmarks.archive --users 20 --habits 5 --years 5
+"""
+
+import argparse
+import random
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.services.archive_service import ArchiveService
+from app.services.habit_service import HabitEntryService
+from benchmarks.common import create_benchmark_engine, summarize, timer
+from benchmarks.datagen import GeneratedData, generate
+
+
+def table_bytes(engine: Engine) -> Dict[str, int]:
+    """On-disk size of habit_entries and its indexes (SQLite only)."""
+    if engine.dialect.name != "sqlite":
+        return {}
+    with engine.connect() as conn:
+        conn.execute(text("VACUUM"))
+        try:
+            rows = conn.execute(
+                text(
+                    "SELECT name, SUM(pgsize) FROM dbstat WHERE name IN ("
+                    "SELECT name FROM sqlite_master WHERE tbl_name IN "
+                    "('habit_entries', 'habit_entry_archives')) GROUP BY name"
+                )
+            ).all()
+        except Exception:
+            # SQLite built without SQLITE_ENABLE_DBSTAT_VTAB
+            return {}
+    return {name: size for name, size in rows}
+
+
+def hot_query_latency(
+    session_factory: sessionmaker, data: GeneratedData, queries: int, seed: int
+) -> Dict[str, float]:
+    """Latency of recent-range reads (last 30 days and the current year)."""
+    rng = random.Random(seed)
+    habits = [habit for ids in data.habit_ids_by_user.values() for habit in ids]
+    today = date.today()
+    latencies: List[float] = []
+    db = session_factory()
+    try:
+        service = HabitEntryService(db)
+        with timer() as total:
+            for index in range(queries):
+                start = today - timedelta(days=30) if index % 2 else date(today.year, 1, 1)
+                with timer() as elapsed:
+                    service.get_range(rng.choice(habits), start, today)
+                latencies.append(elapsed["seconds"])
+    finally:
+        db.close()
+    return summarize(latencies, total["seconds"])
+
+
+def measure(
+    engine: Engine, session_factory: sessionmaker, data: GeneratedData, queries: int, seed: int
+) -> Dict:
+    """Hot/archived sizes and hot-query latency for the current state."""
+    db = session_factory()
+    try:
+        hot, archived = ArchiveService(db).table_sizes()
+    finally:
+        db.close()
+    return {
+        "hot_rows": hot,
+        "archived_entries": archived,
+        "bytes": table_bytes(engine),
+        "latency": hot_query_latency(session_factory, data, queries, seed),
+    }
+
+
+def print_measurement(label: str, result: Dict) -> None:
+    print(f"{label}:")
+    print(f"  hot rows         {result['hot_rows']}")
+    print(f"  archived entries {result['archived_entries']}")
+    for name, size in sorted(result["bytes"].items()):
+        print(f"  {name:<40} {size / 1024:>10.1f} KiB")
+    latency = result["latency"]
+    print(f"  hot query        p50 {latency['p50_ms']:.3f} ms  p95 {latency['p95_ms']:.3f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HabitFlow archival benchmark")
+    parser.add_argument("--db", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--habits", type=int, default=5, help="Habits per user")
+    parser.add_argument("--years", type=float, default=5.0)
+    parser.add_argument("--horizon-days", type=int, default=730)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.db or f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_benchmark_engine(url)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        data = generate(engine, args.users, args.habits, args.years, args.seed)
+        print(f"Dataset: {len(data.user_ids)} users, {data.entry_count} entries\n")
+
+        before = measure(engine, session_factory, data, args.queries, args.seed)
+        print_measurement("Before archiving", before)
+
+        db = session_factory()
+        try:
+            cutoff = date.today() - timedelta(days=args.horizon_days)
+            habit_count = sum(len(ids) for ids in data.habit_ids_by_user.values())
+            with timer() as elapsed:
+                moved = ArchiveService(db).archive_before(cutoff, max_habits=habit_count)
+        finally:
+            db.close()
+        print(f"\nArchived {moved} entries in {elapsed['seconds']:.2f}s\n")
+
+        after = measure(engine, session_factory, data, args.queries, args.seed)
+        print_measurement("After archiving", after)
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Authentication overhead per request with token revocation enabled.
+
+Revokes a number of tokens, then authenticates a stream of mostly valid
+tokens three ways: signature check only (no revocation), the Bloom-filter
+fast path used by `get_token_payload`, and a revocation-table lookup on
+every request. Reports per-request latency and the statements each
+strategy issued.
+
+    python -m benchmarks.auth --revoked 50000 --requests 20000
+"""
+
+import argparse
+import random
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core import security
+from app.core.cache import LocalBroker
+from app.core.instrumentation import add_statement_observer, remove_statement_observer
+from app.core.revocation import RevocationList
+from app.models.revoked_token import RevokedToken
+from app.models.user import User
+from benchmarks.common import create_benchmark_engine, summarize, timer
+
+
+def seed(session_factory: sessionmaker, revoked: int) -> int:
+    """A user with `revoked` revoked tokens; returns the user id."""
+    db = session_factory()
+    try:
+        user = User(email="auth@bench.local", hashed_password="x")
+        db.add(user)
+        db.flush()
+        expires_at = datetime.now(timezone.utc) + timedelta(days=1)
+        db.execute(
+            insert(RevokedToken),
+            [
+                {"jti": f"revoked-{index:08d}", "user_id": user.id, "expires_at": expires_at}
+                for index in range(revoked)
+            ],
+        )
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def run(db: Session, tokens: List[str], check: Callable[[Session, str], bool]) -> Dict:
+    """Authenticate every token; latency summary plus statements issued."""
+    statements: List[str] = []
+
+    def observer(statement, *args):
+        statements.append(statement)
+
+    add_statement_observer(observer)
+    latencies: List[float] = []
+    try:
+        with timer() as total:
+            for token in tokens:
+                with timer() as elapsed:
+                    payload = security.decode_token(token)
+                    check(db, payload["jti"])
+                latencies.append(elapsed["seconds"])
+    finally:
+        remove_statement_observer(observer)
+    return {**summarize(latencies, total["seconds"]), "statements": len(statements)}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HabitFlow token revocation benchmark")
+    parser.add_argument("--db", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--revoked", type=int, default=50_000)
+    parser.add_argument("--requests", type=int, default=20_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.db or f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_benchmark_engine(url)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        user_id = seed(session_factory, args.revoked)
+        tokens = [security.create_access_token(user_id) for _ in range(args.requests)]
+        random.Random(args.seed).shuffle(tokens)
+
+        revocations = RevocationList(LocalBroker())
+        db = session_factory()
+        try:
+            with timer() as load:
+                revocations.load(db)
+
+            def table_lookup(db: Session, jti: str) -> bool:
+                return db.scalar(
+                    select(RevokedToken.id).where(RevokedToken.jti == jti).limit(1)
+                ) is not None
+
+            strategies = {
+                "signature only": lambda db, jti: False,
+                "bloom filter": revocations.is_revoked,
+                "table lookup": table_lookup,
+            }
+            results = {name: run(db, tokens, check) for name, check in strategies.items()}
+        finally:
+            db.close()
+        engine.dispose()
+
+    bloom = revocations.bloom
+    print(
+        f"{args.revoked} revoked ids loaded in {load['seconds'] * 1000:.1f} ms "
+        f"({bloom.nbytes / 1024:.0f} KiB filter, {bloom.hash_count} hashes)\n"
+    )
+    print(f"{'strategy':<16} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9} {'statements':>11}")
+    for name, result in results.items():
+        print(
+            f"{name:<16} {result['mean_ms']:>9.4f} {result['p50_ms']:>9.4f} "
+            f"{result['p99_ms']:>9.4f} {result['statements']:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Check-in burst benchmark: synchronous writes versus the write-behind buffer.
+
+Simulates the morning rush: every generated user checks in all of their
+habits for today at once, with many requests in flight. The burst is run
+against the in-process app with synchronous check-ins and again with
+`WRITE_BEHIND_ENABLED` (journal queue in a temporary directory), reporting
+acknowledgement throughput and latency and, for write-behind, how long the
+flusher takes to store the burst.
+
+    python -m benchmarks.checkins --users 200 --habits 5 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+from sqlalchemy.orm import sessionmaker
+
+from app.core import security
+from app.core.config import settings
+from app.core.write_behind import JournalQueue, write_behind
+from app.services.habit_service import HabitEntryService
+from benchmarks.common import create_benchmark_engine, override_database, summarize, timer
+from benchmarks.datagen import generate
+
+API = settings.API_V1_STR
+
+
+async def burst(app, calls: List[Dict], concurrency: int) -> Dict:
+    """Post every check-in with at most `concurrency` requests in flight."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def _post(client: httpx.AsyncClient, call: Dict) -> None:
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post(
+                f"{API}/habits/entries", json=call["json"], headers=call["headers"]
+            )
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        wall_started = time.perf_counter()
+        await asyncio.gather(*(_post(client, call) for call in calls))
+        wall_time = time.perf_counter() - wall_started
+    return {**summarize(latencies, wall_time), "errors": errors}
+
+
+def main() -> None:
+    from main import app
+
+    parser = argparse.ArgumentParser(description="HabitFlow check-in burst benchmark")
+    parser.add_argument("--db", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--habits", type=int, default=5, help="Habits per user")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    results = {}
+    for mode in ("synchronous", "write-behind"):
+        with tempfile.TemporaryDirectory() as tmp:
+            url = args.db or f"sqlite:///{Path(tmp) / 'bench.db'}"
+            engine = create_benchmark_engine(url)
+            override_database(app, engine)
+            # A little history, but nothing for today
+            data = generate(engine, args.users, args.habits, 0.1, args.seed, notes_ratio=0.0)
+            rng = random.Random(args.seed)
+            calls = [
+                {
+                    "json": {
+                        "habit_id": habit_id,
+                        "date": date.today().isoformat(),
+                        "completed": rng.random() < 0.8,
+                    },
+                    "headers": {
+                        "Authorization": f"Bearer {security.create_access_token(user_id)}"
+                    },
+                }
+                for user_id in data.user_ids
+                for habit_id in data.habit_ids_by_user[user_id]
+            ]
+            rng.shuffle(calls)
+
+            settings.WRITE_BEHIND_ENABLED = mode == "write-behind"
+            write_behind._queue = JournalQueue(str(Path(tmp) / "journal"))
+            try:
+                results[mode] = asyncio.run(burst(app, calls, args.concurrency))
+                session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                db = session_factory()
+                try:
+                    with timer() as flush:
+                        write_behind.flush(HabitEntryService(db).upsert_many)
+                finally:
+                    db.close()
+                results[mode]["flush_ms"] = flush["seconds"] * 1000
+            finally:
+                settings.WRITE_BEHIND_ENABLED = False
+                write_behind.close()
+                engine.dispose()
+
+    print(f"{len(calls)} check-ins, {args.concurrency} in flight\n")
+    header = f"{'mode':<14}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'flush ms':>10}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for mode, result in results.items():
+        print(
+            f"{mode:<14}{result['throughput_rps']:>10.1f}{result['p50_ms']:>10.2f}"
+            f"{result['p95_ms']:>10.2f}{result['p99_ms']:>10.2f}"
+            f"{result['flush_ms']:>10.1f}{result['errors']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Shared helpers for benchmarks: engines, timing statistics and baselines.
+"""
+
+import json
+import math
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.database import Base, enable_sqlite_foreign_keys, get_db
+from app.core.instrumentation import instrument_engine
+import app.models  # noqa: F401  (register all models on Base.metadata)
+
+BASELINE_DIR = Path(__file__).resolve().parent / "baselines"
+
+
+def create_benchmark_engine(url: str) -> Engine:
+    """Create an engine for benchmark data, with the schema in place."""
+    connect_args = {}
+    if url.startswith("sqlite"):
+        # Concurrent writers wait for the lock instead of failing immediately
+        connect_args = {"check_same_thread": False, "timeout": 30}
+    engine = create_engine(url, connect_args=connect_args)
+    if url.startswith("sqlite"):
+        enable_sqlite_foreign_keys(engine)
+    instrument_engine(engine)
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def override_database(app, engine: Engine) -> sessionmaker:
+    """Point the application's `get_db` dependency at `engine`."""
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    def _get_db():
+        db = session_factory()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    app.dependency_overrides[get_db] = _get_db
+    return session_factory
+
+
+def percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    """Nearest-rank percentile of already sorted values."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies: List[float], wall_time: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (in milliseconds) for one scenario."""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "throughput_rps": round(len(ordered) / wall_time, 2) if wall_time else 0.0,
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3) if ordered else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+@contextmanager
+def timer() -> Iterator[Dict[str, float]]:
+    """Measure the wrapped block; the elapsed seconds end up in result["seconds"]."""
+    result = {"seconds": 0.0}
+    started = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result["seconds"] = time.perf_counter() - started
+
+
+def save_baseline(name: str, results: Dict, directory: Path = BASELINE_DIR) -> Path:
+    """Store benchmark results so later runs can be compared against them."""
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.json"
+    path.write_text(json.dumps(results, indent=2, sort_keys=True))
+    return path
+
+
+def load_baseline(name: str, directory: Path = BASELINE_DIR) -> Optional[Dict]:
+    """Load previously stored results, if any."""
+    path = directory / f"{name}.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def compare(results: Dict, baseline: Dict) -> Dict[str, Dict[str, float]]:
+    """Relative change (in percent) of each numeric metric against a baseline."""
+    changes: Dict[str, Dict[str, float]] = {}
+    for scenario, metrics in results.get("scenarios", {}).items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            continue
+        changes[scenario] = {
+            metric: round((value - previous[metric]) / previous[metric] * 100, 1)
+            for metric, value in metrics.items()
+            if isinstance(value, (int, float)) and previous.get(metric)
+        }
+    return changes
+
+
+def print_report(results: Dict, changes: Optional[Dict] = None) -> None:
+    """Print one line per scenario, with deltas against a baseline if given."""
+    header = f"{'scenario':<20}{'req':>7}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print("-" * len(header))
+    for scenario, metrics in results["scenarios"].items():
+        print(
+            f"{scenario:<20}{metrics['requests']:>7}{metrics['throughput_rps']:>10}"
+            f"{metrics['p50_ms']:>10}{metrics['p95_ms']:>10}{metrics['p99_ms']:>10}"
+        )
+        if changes and scenario in changes:
+            delta = changes[scenario]
+            print(
+                f"{'  vs baseline':<27}{delta.get('throughput_rps', 0):>+9}%"
+                f"{delta.get('p50_ms', 0):>+9}%{delta.get('p95_ms', 0):>+9}%"
+                f"{delta.get('p99_ms', 0):>+9}%"
+            )
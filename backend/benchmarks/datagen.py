@@ -0,0 +1,248 @@
+"""
+Deterministic synthetic data generator.
+
+Bulk-creates N users x M habits x Y years of habit entries with realistic
+completion patterns: each habit has its own adherence level, completions
+cluster into streaks, weekends and lapses (holidays, illness) reduce
+check-ins, and count/duration values scatter around the habit's target.
+The same seed and end date always produce the same rows.
+
+    python -m benchmarks.datagen --db sqlite:///./bench.db --users 50 --habits 8 --years 2
+"""
+
+import argparse
+import random
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+
+from app.core.security import get_password_hash
+from app.models.habit import Habit, HabitType
+from app.models.habit_entry import HabitEntry
+from app.models.user import User
+
+BENCHMARK_PASSWORD = "benchmark-password"
+
+HABIT_TEMPLATES = [
+    ("Drink water", HabitType.COUNT, 8.0, "glasses", "💧"),
+    ("Morning run", HabitType.DURATION, 30.0, "minutes", "🏃"),
+    ("Read", HabitType.DURATION, 20.0, "minutes", "📚"),
+    ("Meditate", HabitType.BOOLEAN, 1.0, None, "🧘"),
+    ("Push-ups", HabitType.COUNT, 25.0, "reps", "💪"),
+    ("Journal", HabitType.BOOLEAN, 1.0, None, "📝"),
+    ("No sugar", HabitType.BOOLEAN, 1.0, None, "🍎"),
+    ("Practice guitar", HabitType.DURATION, 15.0, "minutes", "🎸"),
+    ("Walk 10k steps", HabitType.COUNT, 10000.0, "steps", "🚶"),
+    ("Stretch", HabitType.BOOLEAN, 1.0, None, "🤸"),
+]
+
+NOTE_WORDS = [
+    "tired", "great", "knee", "pain", "rain", "early", "late", "travel", "sick",
+    "focused", "gym", "park", "slept", "badly", "well", "busy", "work", "weekend",
+    "family", "skipped", "breakfast", "coffee", "headache", "motivated", "sore",
+]
+
+INSERT_BATCH_SIZE = 10_000
+
+
+@dataclass
+class GeneratedData:
+    """Ids of the generated rows, for driving benchmarks."""
+
+    user_ids: List[int] = field(default_factory=list)
+    user_emails: List[str] = field(default_factory=list)
+    habit_ids_by_user: Dict[int, List[int]] = field(default_factory=dict)
+    entry_count: int = 0
+
+
+def _habit_days(rng: random.Random, start: date, end: date, adherence: float):
+    """Yield (day, completed) for the days a user logged this habit."""
+    day = start
+    completed_yesterday = False
+    weekend_dip = rng.uniform(0.0, 0.3)
+    while day <= end:
+        # Occasional lapse: holidays or illness with no check-ins at all
+        if rng.random() < 0.01:
+            day += timedelta(days=rng.randint(3, 14))
+            completed_yesterday = False
+            continue
+
+        probability = adherence + (0.15 if completed_yesterday else -0.15)
+        if day.weekday() >= 5:
+            probability -= weekend_dip
+        logged = rng.random() < min(0.98, probability + 0.1)
+        if logged:
+            completed = rng.random() < max(0.02, min(0.98, probability))
+            completed_yesterday = completed
+            yield day, completed
+        else:
+            completed_yesterday = False
+        day += timedelta(days=1)
+
+
+def _value(rng: random.Random, habit_type: str, target: float, completed: bool) -> Optional[float]:
+    if habit_type == HabitType.BOOLEAN:
+        return None
+    spread = target * (0.25 if completed else 0.5)
+    base = target if completed else target * 0.4
+    value = max(0.0, rng.gauss(base, spread))
+    return round(value) if habit_type == HabitType.COUNT else round(value, 1)
+
+
+def _streaks(days: List[date], completed: List[bool], end: date):
+    """Current (ending today or yesterday) and longest daily completion streaks."""
+    longest = run = 0
+    previous = None
+    for day, done in zip(days, completed):
+        if done and previous is not None and day - previous == timedelta(days=1):
+            run += 1
+        elif done:
+            run = 1
+        else:
+            run = 0
+        previous = day if done else None
+        longest = max(longest, run)
+    current = run if previous is not None and end - previous <= timedelta(days=1) else 0
+    return current, longest
+
+
+def generate(
+    engine: Engine,
+    users: int,
+    habits_per_user: int,
+    years: float,
+    seed: int = 42,
+    end_date: Optional[date] = None,
+    notes_ratio: float = 0.05,
+) -> GeneratedData:
+    """Bulk-insert a deterministic dataset and return the generated ids."""
+    end_date = end_date or date.today()
+    span_days = max(1, int(years * 365))
+    password_hash = get_password_hash(BENCHMARK_PASSWORD)
+    data = GeneratedData()
+
+    with engine.begin() as connection:
+        first_user_id = (connection.exec_driver_sql("SELECT MAX(id) FROM users").scalar() or 0) + 1
+        first_habit_id = (connection.exec_driver_sql("SELECT MAX(id) FROM habits").scalar() or 0) + 1
+
+    user_rows, habit_rows, entry_rows = [], [], []
+    habit_id = first_habit_id
+    now = datetime.combine(end_date, datetime.min.time())
+
+    with engine.begin() as connection:
+        for user_index in range(users):
+            # One generator per user keeps users independent of batch order
+            rng = random.Random(f"{seed}:{user_index}")
+            user_id = first_user_id + user_index
+            email = f"bench-{seed}-{user_index}@example.com"
+            user_rows.append({
+                "id": user_id,
+                "email": email,
+                "username": f"bench_{seed}_{user_index}",
+                "full_name": f"Benchmark User {user_index}",
+                "hashed_password": password_hash,
+                "is_active": True,
+                "is_superuser": False,
+                "timezone": "UTC",
+                "created_at": now - timedelta(days=span_days),
+            })
+            data.user_ids.append(user_id)
+            data.user_emails.append(email)
+            data.habit_ids_by_user[user_id] = []
+
+            for habit_index in range(habits_per_user):
+                name, habit_type, target, unit, icon = HABIT_TEMPLATES[
+                    (user_index + habit_index) % len(HABIT_TEMPLATES)
+                ]
+                # Most habits exist for the whole span, some were started later
+                start = end_date - timedelta(days=span_days - 1)
+                if rng.random() < 0.3:
+                    start += timedelta(days=rng.randint(0, span_days - 1))
+                adherence = rng.uniform(0.3, 0.95)
+
+                days, flags = [], []
+                for day, completed in _habit_days(rng, start, end_date, adherence):
+                    notes = None
+                    if rng.random() < notes_ratio:
+                        notes = " ".join(rng.choices(NOTE_WORDS, k=rng.randint(2, 6)))
+                    entry_rows.append({
+                        "habit_id": habit_id,
+                        "user_id": user_id,
+                        "date": day,
+                        "completed": completed,
+                        "value": _value(rng, habit_type, target, completed),
+                        "notes": notes,
+                    })
+                    days.append(day)
+                    flags.append(completed)
+
+                current, longest = _streaks(days, flags, end_date)
+                habit_rows.append({
+                    "id": habit_id,
+                    "name": f"{name} {habit_index + 1}" if habit_index >= len(HABIT_TEMPLATES) else name,
+                    "habit_type": habit_type.value,
+                    "frequency": "daily",
+                    "target_value": target,
+                    "unit": unit,
+                    "icon": icon,
+                    "color": "#3B82F6",
+                    "is_active": rng.random() > 0.1,
+                    "reminder_enabled": False,
+                    "current_streak": current,
+                    "longest_streak": longest,
+                    "total_completions": sum(flags),
+                    "owner_id": user_id,
+                    "created_at": datetime.combine(start, datetime.min.time()),
+                })
+                data.habit_ids_by_user[user_id].append(habit_id)
+                habit_id += 1
+
+                if len(entry_rows) >= INSERT_BATCH_SIZE:
+                    _flush(connection, user_rows, habit_rows, entry_rows, data)
+
+        _flush(connection, user_rows, habit_rows, entry_rows, data)
+
+    return data
+
+
+def _flush(connection, user_rows, habit_rows, entry_rows, data: GeneratedData) -> None:
+    # Parents first so foreign keys hold in every batch
+    if user_rows:
+        connection.execute(insert(User), user_rows)
+    if habit_rows:
+        connection.execute(insert(Habit), habit_rows)
+    if entry_rows:
+        connection.execute(insert(HabitEntry), entry_rows)
+        data.entry_count += len(entry_rows)
+    user_rows.clear()
+    habit_rows.clear()
+    entry_rows.clear()
+
+
+def main() -> None:
+    from benchmarks.common import create_benchmark_engine, timer
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--db", default="sqlite:///./bench.db", help="Database URL")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--habits", type=int, default=8, help="Habits per user")
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--end-date", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    engine = create_benchmark_engine(args.db)
+    with timer() as elapsed:
+        data = generate(engine, args.users, args.habits, args.years, args.seed, args.end_date)
+    print(
+        f"Generated {len(data.user_ids)} users, "
+        f"{sum(len(h) for h in data.habit_ids_by_user.values())} habits, "
+        f"{data.entry_count} entries in {elapsed['seconds']:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Insights benchmark: cross-habit statistics over years of history.
+
+Generates one user with many habits, then times `InsightsService.insights`
+with an empty cache (full load and matrix products), with a cached state
+for the same day, and after the window moves forward by a day (only the new
+day is read and the statistics are updated incrementally). For comparison,
+the same co-completion counts are computed pair by pair with Python sets.
+
+    python -m benchmarks.insights --habits 100 --years 5
+"""
+
+import argparse
+import itertools
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import select
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.models.habit_entry import HabitEntry
+from app.services.insights_service import InsightsService, insights_cache
+from benchmarks.common import create_benchmark_engine, timer
+from benchmarks.datagen import generate
+
+
+def pairwise_sets(db, user_id: int, start: date, end: date) -> Dict[tuple, int]:
+    """Co-completion counts of every habit pair from per-habit day sets."""
+    days: Dict[int, set] = {}
+    rows = db.execute(
+        select(HabitEntry.habit_id, HabitEntry.date).where(
+            HabitEntry.user_id == user_id,
+            HabitEntry.completed == True,
+            HabitEntry.date >= start,
+            HabitEntry.date <= end,
+        )
+    )
+    for habit_id, day in rows:
+        days.setdefault(habit_id, set()).add(day)
+    return {
+        (first, second): len(days[first] & days[second])
+        for first, second in itertools.combinations(sorted(days), 2)
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HabitFlow insights benchmark")
+    parser.add_argument("--db", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--habits", type=int, default=100)
+    parser.add_argument("--years", type=float, default=5.0)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    end = date.today() - timedelta(days=1)
+    settings.INSIGHTS_WINDOW_DAYS = int(args.years * 365)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.db or f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_benchmark_engine(url)
+        data = generate(engine, 1, args.habits, args.years, end_date=end, notes_ratio=0.0)
+        user_id = data.user_ids[0]
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+        timings: Dict[str, List[float]] = {}
+
+        def measure(label, run):
+            db = session_factory()
+            try:
+                with timer() as elapsed:
+                    run(db)
+            finally:
+                db.close()
+            timings.setdefault(label, []).append(elapsed["seconds"] * 1000)
+
+        start = end - timedelta(days=settings.INSIGHTS_WINDOW_DAYS - 1)
+        for _ in range(args.repeat):
+            insights_cache.clear()
+            # Compute the previous day's state so the next call advances by one day
+            measure("full", lambda db: InsightsService(db).insights(user_id, end=end - timedelta(days=1)))
+            measure("incremental (+1 day)", lambda db: InsightsService(db).insights(user_id, end=end))
+            measure("cached", lambda db: InsightsService(db).insights(user_id, end=end))
+            measure("pairwise sets", lambda db: pairwise_sets(db, user_id, start, end))
+        engine.dispose()
+
+    print(
+        f"{args.habits} habits × {settings.INSIGHTS_WINDOW_DAYS} days, "
+        f"{data.entry_count} entries"
+    )
+    print(f"{'strategy':<22} {'best ms':>10} {'median ms':>10}")
+    for label, values in timings.items():
+        values.sort()
+        print(f"{label:<22} {values[0]:>10.2f} {values[len(values) // 2]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Payload size and encode time of each response format.
+
+Fetches a one-year calendar, a 365-day progress series and an entry list in
+every negotiable format (regular JSON, columnar JSON, MessagePack) and
+reports raw and gzip-compressed body sizes plus the time to encode each
+payload.
+
+    python -m benchmarks.payloads --years 1 --repeat 200
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+from sqlalchemy import text
+
+from app.core import lazy, security
+from app.core.config import settings
+from app.core.formats import COLUMNAR_JSON, JSON, MSGPACK, render
+from benchmarks.common import create_benchmark_engine, override_database, timer
+from benchmarks.datagen import generate
+
+API = settings.API_V1_STR
+FORMATS = (JSON, COLUMNAR_JSON, MSGPACK)
+
+
+def endpoints(habit_id: int) -> Dict[str, str]:
+    return {
+        "calendar": f"{API}/analytics/habits/{habit_id}/calendar",
+        "progress": f"{API}/analytics/habits/{habit_id}/progress?days=365",
+        "entries": f"{API}/habits/{habit_id}/entries?limit=366",
+    }
+
+
+def decode(body: bytes, media_type: str):
+    if media_type == MSGPACK:
+        return lazy.msgpack.unpackb(body)
+    return json.loads(body)
+
+
+def encode_seconds(content, media_type: str, repeat: int) -> float:
+    """Median time to encode `content` in `media_type`."""
+    samples: List[float] = []
+    for _ in range(repeat):
+        with timer() as elapsed:
+            render(content, media_type)
+        samples.append(elapsed["seconds"])
+    return sorted(samples)[len(samples) // 2]
+
+
+async def measure(app, user_id: int, habit_id: int, repeat: int) -> Dict:
+    headers = {"Authorization": f"Bearer {security.create_access_token(user_id)}"}
+    results: Dict = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, url in endpoints(habit_id).items():
+            results[name] = {}
+            for media_type in FORMATS:
+                response = await client.get(url, headers={**headers, "Accept": media_type})
+                response.raise_for_status()
+                body = response.content
+                results[name][media_type] = {
+                    "bytes": len(body),
+                    "gzip_bytes": len(gzip.compress(body)),
+                    "encode_ms": round(
+                        encode_seconds(decode(body, media_type), media_type, repeat) * 1000, 4
+                    ),
+                }
+    return results
+
+
+def print_results(results: Dict) -> None:
+    print(f"{'endpoint':<10} {'format':<42} {'bytes':>9} {'gzip':>9} {'encode ms':>10}")
+    for name, formats in results.items():
+        baseline = formats[JSON]["bytes"]
+        for media_type, result in formats.items():
+            ratio = result["bytes"] / baseline if baseline else 0
+            print(
+                f"{name:<10} {media_type:<42} {result['bytes']:>9} {result['gzip_bytes']:>9} "
+                f"{result['encode_ms']:>10.4f}  ({ratio:.0%})"
+            )
+
+
+def main() -> None:
+    from main import app
+
+    parser = argparse.ArgumentParser(description="HabitFlow response format benchmark")
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=200, help="Encodings per measurement")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_benchmark_engine(f"sqlite:///{Path(tmp) / 'bench.db'}")
+        override_database(app, engine)
+        data = generate(engine, 1, 5, args.years, args.seed, notes_ratio=0.1)
+        user_id = data.user_ids[0]
+        # Measure the habit with the longest history
+        with engine.connect() as conn:
+            habit_id = conn.execute(
+                text(
+                    "SELECT habit_id FROM habit_entries GROUP BY habit_id "
+                    "ORDER BY COUNT(*) DESC LIMIT 1"
+                )
+            ).scalar()
+        results = asyncio.run(measure(app, user_id, habit_id, args.repeat))
+        engine.dispose()
+
+    print_results(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+"""
+Habit deletion benchmark: per-row ORM delete versus soft delete plus chunked purge.
+
+Creates one user with two habits carrying the same years of daily entries, deletes
+one habit the old way (load every entry and delete it through the session)
+and another through `HabitService.delete` followed by
+`PurgeService.purge_habit`, and reports the latency a client would see and
+the total time spent removing the rows.
+
+    python -m benchmarks.purge --years 10 --chunk-size 5000
+"""
+
+import argparse
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import sessionmaker
+
+from app.models.habit import Habit
+from app.models.habit_entry import HabitEntry
+from app.models.user import User
+from app.services.habit_service import HabitService
+from app.services.purge_service import PurgeService
+from benchmarks.common import create_benchmark_engine, timer
+
+
+def seed(session_factory: sessionmaker, years: float) -> List[int]:
+    """Two habits of one user, each with a daily entry for `years` years."""
+    db = session_factory()
+    try:
+        user = User(email="purge@bench.local", username="purge", hashed_password="x")
+        habits = [Habit(name=f"Habit {index}", owner=user) for index in range(2)]
+        db.add_all(habits)
+        db.flush()
+        today = date.today()
+        for habit in habits:
+            db.execute(
+                insert(HabitEntry),
+                [
+                    {
+                        "habit_id": habit.id,
+                        "user_id": user.id,
+                        "date": today - timedelta(days=offset),
+                        "completed": offset % 3 != 0,
+                    }
+                    for offset in range(int(years * 365))
+                ],
+            )
+        db.commit()
+        return [habit.id for habit in habits]
+    finally:
+        db.close()
+
+
+def entry_count(session_factory: sessionmaker, habit_id: int) -> int:
+    db = session_factory()
+    try:
+        return db.scalar(select(func.count(HabitEntry.id)).where(HabitEntry.habit_id == habit_id))
+    finally:
+        db.close()
+
+
+def orm_delete(session_factory: sessionmaker, habit_id: int) -> Dict[str, float]:
+    """Delete a habit by loading and deleting each entry in one transaction."""
+    db = session_factory()
+    try:
+        with timer() as elapsed:
+            habit = db.get(Habit, habit_id)
+            for entry in db.scalars(select(HabitEntry).where(HabitEntry.habit_id == habit_id)):
+                db.delete(entry)
+            db.delete(habit)
+            db.commit()
+    finally:
+        db.close()
+    return {"response_ms": elapsed["seconds"] * 1000, "total_ms": elapsed["seconds"] * 1000}
+
+
+def soft_delete_and_purge(
+    session_factory: sessionmaker, habit_id: int, chunk_size: int
+) -> Dict[str, float]:
+    """Soft-delete a habit as the endpoint does, then purge it in chunks."""
+    db = session_factory()
+    try:
+        with timer() as response:
+            HabitService(db).delete(id=habit_id)
+        with timer() as purge:
+            PurgeService(db, chunk_size=chunk_size).purge_habit(habit_id)
+    finally:
+        db.close()
+    return {
+        "response_ms": response["seconds"] * 1000,
+        "total_ms": (response["seconds"] + purge["seconds"]) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HabitFlow habit deletion benchmark")
+    parser.add_argument("--db", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--years", type=float, default=10.0)
+    parser.add_argument("--chunk-size", type=int, default=5000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.db or f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_benchmark_engine(url)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        old_id, new_id = seed(session_factory, args.years)
+
+        results = {}
+        for label, habit_id, run in (
+            ("orm delete", old_id, lambda h: orm_delete(session_factory, h)),
+            (
+                "soft delete + purge",
+                new_id,
+                lambda h: soft_delete_and_purge(session_factory, h, args.chunk_size),
+            ),
+        ):
+            entries = entry_count(session_factory, habit_id)
+            results[label] = {"entries": entries, **run(habit_id)}
+        engine.dispose()
+
+    print(f"{'strategy':<22} {'entries':>8} {'response ms':>12} {'total ms':>10}")
+    for label, result in results.items():
+        print(
+            f"{label:<22} {result['entries']:>8} "
+            f"{result['response_ms']:>12.2f} {result['total_ms']:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
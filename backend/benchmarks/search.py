@@ -0,0 +1,100 @@
+"""
+Search latency over a large dataset of entry notes.
+
+Generates entries with a note on (by default) every day, then runs ranked
+searches for random users through `SearchService` (FTS5 on SQLite, GIN
+indexes on PostgreSQL) and, for comparison, the LIKE scan a client would
+otherwise need.
+
+    python -m benchmarks.search --users 300 --habits 10 --years 2
+"""
+
+import argparse
+import random
+import tempfile
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.services.search_service import SearchService
+from benchmarks.common import create_benchmark_engine, summarize, timer
+from benchmarks.datagen import generate
+
+QUERIES = ["knee pain", "coffee", "headache sore", "gym motiv", "travel sick"]
+
+
+def like_scan(db: Session, user_id: int, query: str, limit: int) -> List:
+    """Entries whose notes contain every word, without an index."""
+    words = query.split()
+    conditions = " AND ".join(f"notes LIKE :w{index}" for index in range(len(words)))
+    params = {f"w{index}": f"%{word}%" for index, word in enumerate(words)}
+    return db.execute(
+        text(
+            f"SELECT id FROM habit_entries WHERE user_id = :user_id AND {conditions} "
+            "ORDER BY date DESC LIMIT :limit"
+        ),
+        {**params, "user_id": user_id, "limit": limit},
+    ).all()
+
+
+def measure(session_factory: sessionmaker, user_ids: List[int], queries: int, seed: int) -> Dict:
+    rng = random.Random(seed)
+    workload = [(rng.choice(user_ids), rng.choice(QUERIES)) for _ in range(queries)]
+    results: Dict = {}
+    db = session_factory()
+    try:
+        for name, run in (
+            ("indexed search", lambda u, q: SearchService(db).search(u, q, limit=20)),
+            ("like scan", lambda u, q: like_scan(db, u, q, 20)),
+        ):
+            latencies: List[float] = []
+            with timer() as total:
+                for user_id, query in workload:
+                    with timer() as elapsed:
+                        run(user_id, query)
+                    latencies.append(elapsed["seconds"])
+            results[name] = summarize(latencies, total["seconds"])
+    finally:
+        db.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HabitFlow search benchmark")
+    parser.add_argument("--db", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=300)
+    parser.add_argument("--habits", type=int, default=10, help="Habits per user")
+    parser.add_argument("--years", type=float, default=2.0)
+    parser.add_argument("--notes-ratio", type=float, default=1.0)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.db or f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_benchmark_engine(url)
+        session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+        with timer() as elapsed:
+            data = generate(
+                engine, args.users, args.habits, args.years, args.seed, notes_ratio=args.notes_ratio
+            )
+        with engine.connect() as conn:
+            notes = conn.execute(
+                text("SELECT COUNT(*) FROM habit_entries WHERE notes IS NOT NULL")
+            ).scalar()
+        print(f"Dataset: {data.entry_count} entries, {notes} notes ({elapsed['seconds']:.1f}s)\n")
+
+        results = measure(session_factory, data.user_ids, args.queries, args.seed)
+        engine.dispose()
+
+    print(f"{'strategy':<16} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, result in results.items():
+        print(
+            f"{name:<16} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} {result['p99_ms']:>9.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Today screen benchmark: one `GET /habits/today` versus the two-call flow.
+
+The main screen used to list active habits, fetch the entries for today and
+join the two on the client. This drives both flows through the in-process
+app for random users and reports latency per screen load and the SQL
+statements each flow issued.
+
+    python -m benchmarks.today --users 50 --habits 20 --years 1
+"""
+
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+from app.core import security
+from app.core.config import settings
+from app.core.instrumentation import add_statement_observer, remove_statement_observer
+from benchmarks.common import create_benchmark_engine, override_database, summarize
+from benchmarks.datagen import generate
+
+API = settings.API_V1_STR
+
+
+async def two_calls(client: httpx.AsyncClient, headers: Dict[str, str]) -> List[Dict]:
+    habits = await client.get(f"{API}/habits/", params={"active_only": True}, headers=headers)
+    entries = await client.get(
+        f"{API}/habits/entries/date/{date.today().isoformat()}", headers=headers
+    )
+    by_habit = {entry["habit_id"]: entry for entry in entries.json()}
+    return [{"habit": habit, "entry": by_habit.get(habit["id"])} for habit in habits.json()]
+
+
+async def one_call(client: httpx.AsyncClient, headers: Dict[str, str]) -> List[Dict]:
+    response = await client.get(f"{API}/habits/today", headers=headers)
+    return response.json()["habits"]
+
+
+async def measure(app, flow, tokens: List[str], loads: int, seed: int) -> Dict:
+    """Load the screen `loads` times for random users, one at a time."""
+    rng = random.Random(seed)
+    statements: List[str] = []
+
+    def observer(statement, *args):
+        statements.append(statement)
+
+    latencies: List[float] = []
+    transport = httpx.ASGITransport(app=app)
+    add_statement_observer(observer)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            wall_started = time.perf_counter()
+            for _ in range(loads):
+                headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+                started = time.perf_counter()
+                await flow(client, headers)
+                latencies.append(time.perf_counter() - started)
+            wall_time = time.perf_counter() - wall_started
+    finally:
+        remove_statement_observer(observer)
+    return {**summarize(latencies, wall_time), "statements_per_load": len(statements) / loads}
+
+
+def main() -> None:
+    from main import app
+
+    parser = argparse.ArgumentParser(description="HabitFlow today screen benchmark")
+    parser.add_argument("--db", default=None, help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--habits", type=int, default=20, help="Habits per user")
+    parser.add_argument("--years", type=float, default=1.0)
+    parser.add_argument("--loads", type=int, default=500, help="Screen loads per flow")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.db or f"sqlite:///{Path(tmp) / 'bench.db'}"
+        engine = create_benchmark_engine(url)
+        override_database(app, engine)
+        data = generate(engine, args.users, args.habits, args.years, args.seed, notes_ratio=0.0)
+        print(f"Dataset: {len(data.user_ids)} users, {data.entry_count} entries\n")
+        tokens = [security.create_access_token(user_id) for user_id in data.user_ids]
+
+        results = {
+            label: asyncio.run(measure(app, flow, tokens, args.loads, args.seed))
+            for label, flow in (("two calls + join", two_calls), ("GET /habits/today", one_call))
+        }
+        engine.dispose()
+
+    print(f"{'flow':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'statements':>12}")
+    for label, result in results.items():
+        print(
+            f"{label:<20}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+            f"{result['p99_ms']:>10.2f}{result['statements_per_load']:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
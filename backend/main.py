@@ -3,21 +3,215 @@ HabitFlow FastAPI Application
 """
 
 from contextlib import asynccontextmanager
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
+from functools import partial
 
-from app.core.config import settings
-from app.core.database import create_tables
+from app.core.startup import startup_report
+
+with startup_report.phase("import:fastapi"):
+    from fastapi import Depends, FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from fastapi.responses import JSONResponse, Response
+
+with startup_report.phase("import:config"):
+    from app.core.config import settings
+
+with startup_report.phase("import:database"):
+    from app.core.cache import invalidation_bus
+    from app.core.events import event_hub
+    from app.core.database import (
+        SessionLocal,
+        dispose_engines,
+        each_shard,
+        engine,
+        prepare_schema,
+        shard_router,
+    )
+    from app.core.drain import DrainMiddleware, drain, shutdown_step
+    from app.core.jobs import scheduler
+    from app.core.partitioning import ensure_partitions
+    from app.core.revocation import revocation_list
+    from app.core.routing import SHARD
+    from app.core.sharding import ShardMoving
+    from app.core.write_behind import write_behind
+    from app.core.instrumentation import MetricsMiddleware
+    from app.core.metrics import PROMETHEUS_CONTENT_TYPE, registry
+    from app.core.profiling import ProfilingMiddleware
+    from app.core.slow_queries import slow_query_log
+    from app.core.usage import usage_rollups
+
+with startup_report.phase("import:api"):
+    from app.api.api_v1.api import api_router
+    from app.api.deps import verify_metrics_token
+    from app.services.archive_service import ArchiveService
+    from app.services.habit_service import HabitEntryService
+    from app.services.purge_service import PurgeService
+    from app.services.shard_service import move_jobs
+
+
+def archive_old_entries() -> int:
+    """Move entries past the archive horizon into cold storage."""
+    horizon = ArchiveService.horizon()
+    return sum(ArchiveService(db).archive_before(horizon) for db in each_shard())
+
+
+def purge_deleted() -> dict:
+    """Remove soft-deleted habits and expired deactivated accounts."""
+    counts = {}
+    for db in each_shard():
+        for key, count in PurgeService(db).purge_pending().items():
+            counts[key] = counts.get(key, 0) + count
+    return counts
+
+
+def reload_revocations() -> int:
+    """Prune expired token revocations and rebuild this worker's filter."""
+    sessions = list(each_shard())
+    try:
+        for db in sessions:
+            revocation_list.prune(db)
+        return revocation_list.load(*sessions)
+    finally:
+        for db in sessions:
+            db.close()
+
+
+def apply_check_ins(records) -> list:
+    """Apply a batch of queued check-ins, one transaction per shard.
+
+    Returns the check-ins of users being moved between shards, to be queued again.
+    """
+    if shard_router is not None:
+        by_shard, moving = shard_router.partition(records)
+    else:
+        by_shard, moving = {0: records}, []
+    for shard, batch in by_shard.items():
+        db = SessionLocal(info={SHARD: shard})
+        try:
+            HabitEntryService(db).upsert_many(batch)
+        finally:
+            db.close()
+    return moving
+
+
+def flush_check_ins() -> int:
+    """Write check-ins queued by the write-behind buffer to the database."""
+    return write_behind.flush(apply_check_ins)
+
+
+def flush_usage() -> int:
+    """Merge this worker's usage counts into the daily rollups on the primary."""
+    db = SessionLocal(info={SHARD: 0})
+    try:
+        return usage_rollups.flush(db)
+    finally:
+        db.close()
+
+
+def register_background_jobs():
+    """Register periodic maintenance jobs according to settings."""
+    if settings.HABIT_ENTRIES_PARTITIONING and engine.dialect.name == "postgresql":
+        scheduler.add(
+            "ensure_partitions",
+            partial(
+                ensure_partitions,
+                engine,
+                settings.HABIT_ENTRIES_PARTITIONING,
+                settings.PARTITIONS_AHEAD,
+            ),
+            interval=settings.PARTITION_MAINTENANCE_INTERVAL_SECONDS,
+            run_at_startup=True,
+        )
+    if settings.ARCHIVE_ENABLED:
+        scheduler.add(
+            "archive_entries",
+            archive_old_entries,
+            interval=settings.ARCHIVE_INTERVAL_SECONDS,
+        )
+    scheduler.add(
+        "purge_deleted",
+        purge_deleted,
+        interval=settings.PURGE_INTERVAL_SECONDS,
+    )
+    scheduler.add(
+        "reload_revocations",
+        reload_revocations,
+        interval=settings.TOKEN_REVOCATION_REFRESH_SECONDS,
+    )
+    scheduler.add(
+        "flush_usage",
+        flush_usage,
+        interval=settings.USAGE_FLUSH_INTERVAL_SECONDS,
+    )
+    if settings.WRITE_BEHIND_ENABLED:
+        # Run at startup to apply check-ins left queued by a crash
+        scheduler.add(
+            "flush_check_ins",
+            flush_check_ins,
+            interval=settings.WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+            run_at_startup=True,
+        )
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan events."""
     # Startup
-    create_tables()
+    with startup_report.phase(f"schema:{settings.SCHEMA_STARTUP_MODE}"):
+        prepare_schema()
+    register_background_jobs()
+    scheduler.start()
+    with startup_report.phase("pubsub:subscribe"):
+        invalidation_bus.start()
+        event_hub.start()
+        revocation_list.start()
+    with startup_report.phase("auth:revocations"):
+        reload_revocations()
+    app.state.startup_report = startup_report.as_dict()
+    startup_report.log()
+    drain.start()
+    # SIGTERM flips /ready first; open event streams would hold the server's
+    # shutdown, so they end when it starts
+    drain.install_signal_handler(on_handover=event_hub.stop)
     yield
-    # Shutdown
-    pass
+    # Shutdown; the waits share what the server's graceful wait left of the
+    # drain timeout
+    drain.begin()
+    with shutdown_step("event streams"):
+        event_hub.stop()
+    with shutdown_step("in-flight requests"):
+        await drain.wait_idle(drain.remaining(settings.DRAIN_TIMEOUT_SECONDS))
+    with shutdown_step("scheduler"):
+        await scheduler.stop(timeout=drain.remaining(settings.DRAIN_TIMEOUT_SECONDS))
+    with shutdown_step("shard moves"):
+        move_jobs.stop(drain.remaining(settings.DRAIN_TIMEOUT_SECONDS))
+    if settings.WRITE_BEHIND_ENABLED:
+        with shutdown_step("write-behind flush"):
+            flush_check_ins()
+        with shutdown_step("write-behind close"):
+            write_behind.close()
+    with shutdown_step("usage flush"):
+        flush_usage()
+    with shutdown_step("revocations"):
+        revocation_list.stop()
+    with shutdown_step("invalidation bus"):
+        invalidation_bus.stop()
+    with shutdown_step("database pools"):
+        dispose_engines()
+    drain.remove_signal_handler()
+
+
+async def shard_moving_handler(request, exc: ShardMoving):
+    """Ask clients to retry writes made while their data moves between shards."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Your data is being moved, please retry shortly"},
+        headers={"Retry-After": str(max(1, round(settings.SHARD_MOVE_SETTLE_SECONDS)))},
+    )
+
+
+def metrics():
+    """Prometheus metrics endpoint."""
+    return Response(content=registry.render(), media_type=PROMETHEUS_CONTENT_TYPE)
 
 
 def create_application() -> FastAPI:
@@ -40,11 +234,36 @@ def create_application() -> FastAPI:
             allow_headers=["*"],
         )
 
+    if settings.METRICS_ENABLED:
+        app.add_middleware(
+            MetricsMiddleware, server_timing=settings.SERVER_TIMING_ENABLED
+        )
+        app.add_api_route(
+            "/metrics",
+            metrics,
+            include_in_schema=False,
+            dependencies=[Depends(verify_metrics_token)],
+        )
+
+    if settings.PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware)
+
+    if settings.SLOW_QUERY_LOG_ENABLED:
+        slow_query_log.install()
+
+    # Outermost, so that every request counts as in flight until it is done
+    app.add_middleware(DrainMiddleware)
+
+    app.add_exception_handler(ShardMoving, shard_moving_handler)
+
+    app.include_router(api_router, prefix=settings.API_V1_STR)
+
     return app
 
 
 # Create the FastAPI app
-app = create_application()
+with startup_report.phase("create_app"):
+    app = create_application()
 
 
 @app.get("/")
@@ -57,3 +276,28 @@ async def root():
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "HabitFlow API"}
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until startup completes and while draining."""
+    if not drain.ready:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "draining" if drain.draining else "starting"},
+        )
+    return {"status": "ready"}
+
+
+if __name__ == "__main__":
+    import math
+
+    import uvicorn
+
+    # The server's own graceful wait is the drain timeout (in whole seconds)
+    uvicorn.run(
+        app,
+        host="0.0.0.0",
+        port=8000,
+        timeout_graceful_shutdown=math.ceil(settings.DRAIN_TIMEOUT_SECONDS),
+    )